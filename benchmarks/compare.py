@@ -0,0 +1,142 @@
+"""Compare benchmark results against a stored baseline.
+
+    python -m pytest benchmarks --bench-json results.json
+    python -m benchmarks.compare results.json --save       # store as the baseline
+    python -m benchmarks.compare results.json              # later: flag regressions
+
+Benchmarks are matched by pytest node id. One whose time per call grew by
+more than the threshold is reported as a regression, and the command then
+exits with status 1, so it can gate a CI job. Baselines are only comparable
+on the machine they were recorded on; a different interpreter or CPU is
+pointed out.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from benchmarks.harness import RESULTS_VERSION
+
+DEFAULT_BASELINE = os.path.join('.benchmarks', 'baseline.json')
+DEFAULT_THRESHOLD = 0.10  # Fraction a benchmark may slow down by before it counts as a regression
+STATS = ('min', 'median', 'mean')
+MACHINE_KEYS = ('python_version', 'python_implementation', 'machine', 'cpu_count', 'numpy_version')
+
+
+class Comparison(NamedTuple):
+    fullname: str
+    baseline: Optional[float]  # Seconds per call, None for a benchmark new since the baseline
+    current: Optional[float]  # Seconds per call, None for a benchmark no longer run
+    status: str  # 'regression', 'faster', 'same', 'new' or 'missing'
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    """Read a results file written with --bench-json.
+
+    Raises:
+        ValueError: If the file was written by another results version
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') != RESULTS_VERSION:
+        raise ValueError(f"{path} is not a version {RESULTS_VERSION} benchmark results file")
+    return data
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD,
+            stat: str = 'median') -> List[Comparison]:
+    """Compare two benchmark runs, one entry per benchmark in either.
+
+    Args:
+        baseline: Results to compare against
+        current: Results of the run being checked
+        threshold: Fraction a benchmark may slow down (or must speed up) by to be reported
+        stat: Statistic compared, one of STATS
+
+    Raises:
+        ValueError: On an unknown statistic or a negative threshold
+    """
+    if stat not in STATS:
+        raise ValueError(f"stat must be one of {', '.join(STATS)}")
+    if threshold < 0:
+        raise ValueError("threshold must not be negative")
+    before = {bench['fullname']: bench['stats'][stat] for bench in baseline['benchmarks']}
+    after = {bench['fullname']: bench['stats'][stat] for bench in current['benchmarks']}
+
+    comparisons = []
+    for fullname, seconds in after.items():
+        old = before.get(fullname)
+        if old is None:
+            status = 'new'
+        elif seconds > old * (1 + threshold):
+            status = 'regression'
+        elif seconds * (1 + threshold) < old:
+            status = 'faster'
+        else:
+            status = 'same'
+        comparisons.append(Comparison(fullname, old, seconds, status))
+    comparisons.extend(Comparison(fullname, seconds, None, 'missing') for fullname, seconds in before.items()
+                       if fullname not in after)
+    return comparisons
+
+
+def machine_differences(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Describe how the machines two runs were recorded on differ."""
+    old, new = baseline.get('machine_info', {}), current.get('machine_info', {})
+    return [f"{key}: {old.get(key)} -> {new.get(key)}" for key in MACHINE_KEYS if old.get(key) != new.get(key)]
+
+
+def format_seconds(seconds: Optional[float]) -> str:
+    """Format a time per call with a readable unit."""
+    if seconds is None:
+        return '-'
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.2f} {unit}'
+    return f'{seconds / 1e-9:.0f} ns'
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.compare', description=__doc__.split('\n\n')[0])
+    parser.add_argument('results', help='results file written with --bench-json')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help=f'baseline results (default: {DEFAULT_BASELINE})')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'allowed slowdown as a fraction (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--stat', choices=STATS, default='median', help='statistic compared (default: median)')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline instead')
+    args = parser.parse_args(argv)
+
+    current = load_results(args.results)
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+        print(f"Saved {len(current['benchmarks'])} benchmarks as the baseline in {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; store one with --save", file=sys.stderr)
+        return 2
+    baseline = load_results(args.baseline)
+    for difference in machine_differences(baseline, current):
+        print(f"[WARN] Baseline recorded on a different machine ({difference})")
+
+    comparisons = compare(baseline, current, args.threshold, args.stat)
+    width = max([len(comparison.fullname) for comparison in comparisons] + [9])
+    print(f"{'benchmark':<{width}}  {'baseline':>10}  {'current':>10}  {'change':>8}  status  ({args.stat} per call)")
+    for comparison in comparisons:
+        change = ''
+        if comparison.baseline and comparison.current is not None:
+            change = f'{comparison.current / comparison.baseline - 1:+.1%}'
+        status = comparison.status.upper() if comparison.status == 'regression' else comparison.status
+        print(f"{comparison.fullname:<{width}}  {format_seconds(comparison.baseline):>10}  "
+              f"{format_seconds(comparison.current):>10}  {change:>8}  {status}")
+
+    regressions = sum(comparison.status == 'regression' for comparison in comparisons)
+    print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
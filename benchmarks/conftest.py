@@ -0,0 +1,101 @@
+"""pytest setup for the benchmark suite.
+
+    python -m pytest benchmarks --bench-json results.json
+    python -m benchmarks.compare results.json          # against .benchmarks/baseline.json
+
+Benchmarks take a ``benchmark`` fixture as with pytest-benchmark (see
+benchmarks/harness.py), so the suite runs offline with plain pytest.
+"""
+import contextlib
+import io
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import import_gtfs_data
+from benchmarks.compare import format_seconds
+from benchmarks.feeds import random_stops, read_stops, write_feed
+from benchmarks.harness import DEFAULT_MAX_TIME, Benchmark, results
+from utils.feed_cache import feed_cache
+
+# Feeds the end-to-end benchmarks run against: stops, lines
+FEEDS = {
+    'wroclaw': (read_stops, 40),
+    'synthetic': (lambda: random_stops(1000), 20),
+}
+
+_benchmarks = pytest.StashKey[list]()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('bench', 'benchmarks')
+    group.addoption('--bench-json', metavar='PATH', help='write the results to a JSON file')
+    group.addoption('--bench-max-time', type=float, default=DEFAULT_MAX_TIME, metavar='SECONDS',
+                    help=f'time spent on each benchmark after its minimum rounds (default: {DEFAULT_MAX_TIME})')
+    group.addoption('--bench-disable', action='store_true',
+                    help='run every benchmarked function once without timing it')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark(group): group benchmarks in the report')
+    config.stash[_benchmarks] = []
+
+
+@pytest.fixture
+def benchmark(request):
+    """Time one function; see benchmarks.harness.Benchmark."""
+    marker = request.node.get_closest_marker('benchmark')
+    bench = Benchmark(
+        request.node.name,
+        request.node.nodeid,
+        group=marker.kwargs.get('group') if marker else None,
+        max_time=request.config.getoption('--bench-max-time'),
+        disabled=request.config.getoption('--bench-disable')
+    )
+    request.config.stash[_benchmarks].append(bench)
+    return bench
+
+
+def pytest_sessionfinish(session):
+    path = session.config.getoption('--bench-json')
+    if path and not session.config.getoption('--bench-disable'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results(session.config.stash[_benchmarks]), f, indent=2)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    timed = [bench for bench in config.stash.get(_benchmarks, []) if bench.samples]
+    if not timed:
+        return
+    terminalreporter.section('benchmarks (per call)')
+    width = max(len(bench.name) for bench in timed)
+    terminalreporter.write_line(f"{'name':<{width}}  {'min':>10}  {'median':>10}  {'mean':>10}  {'rounds':>7}")
+    for bench in timed:
+        stats = bench.stats()
+        terminalreporter.write_line(
+            f"{bench.name:<{width}}  {format_seconds(stats['min']):>10}  {format_seconds(stats['median']):>10}  "
+            f"{format_seconds(stats['mean']):>10}  {stats['rounds']:>7}"
+        )
+
+
+@pytest.fixture(scope='session', params=sorted(FEEDS))
+def feed_db(request, tmp_path_factory):
+    """Imported feed database, with its timetable snapshot, for each of FEEDS."""
+    make_stops, lines = FEEDS[request.param]
+    directory = tmp_path_factory.mktemp(request.param)
+    write_feed(directory, make_stops(), lines)
+    db_path = str(directory / 'feed.db')
+    with contextlib.redirect_stdout(io.StringIO()):
+        import_gtfs_data.import_full(db_path, str(directory), {})
+        import_gtfs_data.write_timetable_snapshot(db_path)
+    yield db_path
+    feed_cache.discard(db_path)
+
+
+@pytest.fixture
+def feed_connection(feed_db):
+    conn = sqlite3.connect(Path(feed_db).as_uri() + '?mode=ro', uri=True)
+    yield conn
+    conn.close()
@@ -0,0 +1,131 @@
+"""Feeds the benchmarks run against.
+
+The checked-in Wrocław feed has stops, trips and calendars but no
+stop_times.txt, so departure benchmarks lay synthetic lines over the real
+Wrocław stops; synthetic feeds place their stops at random in a box of the
+same size instead. Everything is generated from a fixed seed, so two runs
+time the same work.
+"""
+import csv
+import math
+import random
+from datetime import date
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+WROCLAW_GTFS = ROOT / 'OtwartyWroclaw_rozklad_jazdy_GTFS'
+
+# Box around Wrocław that synthetic stops are placed in: (min lat, min lon, max lat, max lon)
+WROCLAW_BOUNDS = (51.04, 16.88, 51.20, 17.17)
+
+# Synthetic timetables run on weekdays in this range; SERVICE_DAY is a Wednesday inside it
+SERVICE_START, SERVICE_END = date(2025, 3, 3), date(2025, 3, 30)
+SERVICE_DAY = date(2025, 3, 12)
+
+FIRST_DEPARTURE = 5 * 3600  # Seconds after midnight
+LAST_DEPARTURE = 23 * 3600
+HOP_SECONDS = (60, 90, 120, 150)  # Running times between consecutive stops
+HEADWAYS = (360, 600, 900)  # Seconds between trips of one line
+
+Stop = Tuple[str, str, float, float]  # stop_id, stop_name, stop_lat, stop_lon
+
+
+def read_stops(gtfs_dir: Path = WROCLAW_GTFS) -> List[Stop]:
+    """Read the stops of a GTFS feed directory."""
+    with open(gtfs_dir / 'stops.txt', encoding='utf-8-sig', newline='') as f:
+        return [
+            (row['stop_id'], row['stop_name'], float(row['stop_lat']), float(row['stop_lon']))
+            for row in csv.DictReader(f)
+        ]
+
+
+def random_stops(count: int, seed: int = 1) -> List[Stop]:
+    """Place stops uniformly at random in WROCLAW_BOUNDS."""
+    rng = random.Random(seed)
+    min_lat, min_lon, max_lat, max_lon = WROCLAW_BOUNDS
+    return [
+        (f'S{i}', f'Stop {i}', rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon))
+        for i in range(count)
+    ]
+
+
+def draw_lines(stops: Sequence[Stop], count: int, length: int, seed: int = 1) -> List[List[int]]:
+    """Draw bus lines as walks between nearby stops that keep roughly one heading.
+
+    Returns:
+        For each line, the positions of its stops in order
+    """
+    rng = random.Random(seed)
+    lon_scale = math.cos(math.radians(stops[0][2]))
+    lines = []
+    for _ in range(count):
+        current = rng.randrange(len(stops))
+        heading = rng.uniform(0, 2 * math.pi)
+        line = [current]
+        while len(line) < length:
+            lat, lon = stops[current][2], stops[current][3]
+            candidates = [i for i in rng.sample(range(len(stops)), min(200, len(stops))) if i not in line]
+            candidates.sort(key=lambda i: (stops[i][2] - lat) ** 2 + ((stops[i][3] - lon) * lon_scale) ** 2)
+
+            def turn(i):
+                bearing = math.atan2(stops[i][2] - lat, (stops[i][3] - lon) * lon_scale)
+                return abs((bearing - heading + math.pi) % (2 * math.pi) - math.pi)
+
+            current = min(candidates[:12], key=turn)
+            line.append(current)
+            heading += rng.uniform(-0.3, 0.3)
+        lines.append(line)
+    return lines
+
+
+def _format_time(seconds: int) -> str:
+    return f'{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
+
+
+def write_feed(directory: Path, stops: Sequence[Stop], lines: int, line_length: int = 25, seed: int = 1) -> int:
+    """Write a GTFS feed running lines in both directions over the given stops.
+
+    Args:
+        directory: Existing directory to write stops.txt, trips.txt, stop_times.txt and calendar.txt to
+        stops: Stops of the feed
+        lines: Number of lines
+        line_length: Stops per line
+        seed: Random seed for the lines and their timetables
+
+    Returns:
+        Number of stop times written
+    """
+    rng = random.Random(seed)
+    directory = Path(directory)
+    with open(directory / 'stops.txt', 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['stop_id', 'stop_name', 'stop_lat', 'stop_lon'])
+        writer.writerows((stop_id, name, f'{lat:.7f}', f'{lon:.7f}') for stop_id, name, lat, lon in stops)
+
+    with open(directory / 'calendar.txt', 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['service_id', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday',
+                         'saturday', 'sunday', 'start_date', 'end_date'])
+        writer.writerow(['WD', 1, 1, 1, 1, 1, 0, 0, SERVICE_START.strftime('%Y%m%d'), SERVICE_END.strftime('%Y%m%d')])
+
+    rows = 0
+    with open(directory / 'trips.txt', 'w', encoding='utf-8', newline='') as trips_file, \
+            open(directory / 'stop_times.txt', 'w', encoding='utf-8', newline='') as stop_times_file:
+        trips, stop_times = csv.writer(trips_file), csv.writer(stop_times_file)
+        trips.writerow(['route_id', 'service_id', 'trip_id', 'trip_headsign'])
+        stop_times.writerow(['trip_id', 'arrival_time', 'departure_time', 'stop_id', 'stop_sequence'])
+        for number, line in enumerate(draw_lines(stops, lines, line_length, seed)):
+            hops = [rng.choice(HOP_SECONDS) for _ in line]
+            headway = rng.choice(HEADWAYS)
+            for direction, positions in enumerate((line, line[::-1])):
+                for first in range(FIRST_DEPARTURE + rng.randrange(headway), LAST_DEPARTURE, headway):
+                    trip_id = f'L{number}_{direction}_{first}'
+                    trips.writerow([f'L{number}', 'WD', trip_id, stops[positions[-1]][1]])
+                    departure = first
+                    for sequence, (position, hop) in enumerate(zip(positions, hops), start=1):
+                        time_str = _format_time(departure)
+                        stop_times.writerow([trip_id, time_str, time_str, stops[position][0], sequence])
+                        departure += hop
+                    rows += len(positions)
+    return rows
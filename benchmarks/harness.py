@@ -0,0 +1,186 @@
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RESULTS_VERSION = 1  # Bumped when the layout of result files changes
+MIN_ROUNDS = 5  # Rounds timed for every benchmark, however slow
+MIN_ROUND_TIME = 0.001  # Seconds; fast functions are called in a loop until a round takes this long
+MAX_ITERATIONS = 1_000_000  # Calls per round, at most
+DEFAULT_MAX_TIME = 0.5  # Seconds spent timing one benchmark once MIN_ROUNDS are done
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class Benchmark:
+    """Times a function, in the style of pytest-benchmark's ``benchmark`` fixture.
+
+    ``benchmark(func, *args)`` calibrates how many calls make a measurable
+    round, times rounds until ``max_time`` is spent (and at least MIN_ROUNDS
+    are done) and returns what the function returned. ``benchmark.pedantic``
+    gives the caller the rounds, iterations and a per-round setup instead.
+    Times are kept per call, in seconds.
+    """
+
+    def __init__(self, name: str, fullname: str, group: Optional[str] = None,
+                 max_time: float = DEFAULT_MAX_TIME, disabled: bool = False):
+        """
+        Args:
+            name: Test name, with parameters
+            fullname: pytest node id, which identifies the benchmark across runs
+            group: Benchmarks reported together
+            max_time: Seconds to spend timing after MIN_ROUNDS
+            disabled: Call the function once without timing, e.g. to check benchmarks still run
+        """
+        self.name = name
+        self.fullname = fullname
+        self.group = group
+        self.max_time = max_time
+        self.disabled = disabled
+        self.samples: List[float] = []
+        self.iterations = 0
+        self.extra_info: Dict[str, Any] = {}
+
+    def __call__(self, func: Callable, *args, **kwargs) -> Any:
+        if self.disabled:
+            return func(*args, **kwargs)
+        self._check_unused()
+
+        iterations, duration, result = 1, 0.0, None
+        while True:
+            duration, result = self._time_round(func, args, kwargs, iterations)
+            if duration >= MIN_ROUND_TIME or iterations >= MAX_ITERATIONS:
+                break
+            # Aim straight for the round time, with some margin, rather than growing slowly
+            needed = math.ceil(iterations * MIN_ROUND_TIME * 1.2 / max(duration, 1e-9))
+            iterations = min(MAX_ITERATIONS, max(iterations * 2, needed))
+
+        self.iterations = iterations
+        self.samples = [duration / iterations]
+        deadline = time.perf_counter() + self.max_time
+        while len(self.samples) < MIN_ROUNDS or time.perf_counter() < deadline:
+            duration, result = self._time_round(func, args, kwargs, iterations)
+            self.samples.append(duration / iterations)
+        return result
+
+    def pedantic(self, target: Callable, args: Tuple = (), kwargs: Optional[Dict[str, Any]] = None,
+                 setup: Optional[Callable] = None, rounds: int = 1, iterations: int = 1, warmup_rounds: int = 0) -> Any:
+        """Time ``target`` for exactly ``rounds`` rounds of ``iterations`` calls.
+
+        Args:
+            target: Function to time
+            args: Positional arguments of the calls
+            kwargs: Keyword arguments of the calls
+            setup: Called, untimed, before each round; may return ``(args, kwargs)`` to use instead
+            rounds: Rounds timed
+            iterations: Calls per round; must be 1 with a setup
+            warmup_rounds: Untimed rounds run first
+
+        Raises:
+            ValueError: On a setup with more than one iteration, or a non-positive count
+        """
+        if rounds <= 0 or iterations <= 0 or warmup_rounds < 0:
+            raise ValueError("rounds and iterations must be positive, warmup_rounds non-negative")
+        if setup is not None and iterations > 1:
+            raise ValueError("A setup runs once per round, so iterations must be 1")
+        kwargs = kwargs or {}
+        if self.disabled:
+            if setup is not None:
+                args, kwargs = setup() or (args, kwargs)
+            return target(*args, **kwargs)
+        self._check_unused()
+
+        result = None
+        self.iterations = iterations
+        for round_number in range(warmup_rounds + rounds):
+            round_args, round_kwargs = args, kwargs
+            if setup is not None:
+                round_args, round_kwargs = setup() or (args, kwargs)
+            duration, result = self._time_round(target, round_args, round_kwargs, iterations)
+            if round_number >= warmup_rounds:
+                self.samples.append(duration / iterations)
+        return result
+
+    def _check_unused(self) -> None:
+        if self.samples:
+            raise RuntimeError("A benchmark fixture can only time one function")
+
+    @staticmethod
+    def _time_round(func: Callable, args, kwargs, iterations: int) -> Tuple[float, Any]:
+        result = None
+        started = time.perf_counter()
+        for _ in range(iterations):
+            result = func(*args, **kwargs)
+        return time.perf_counter() - started, result
+
+    def stats(self) -> Dict[str, Any]:
+        """Summarize the timed rounds, in seconds per call."""
+        samples = self.samples
+        quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+        mean = statistics.fmean(samples)
+        return {
+            'min': min(samples),
+            'max': max(samples),
+            'mean': mean,
+            'median': statistics.median(samples),
+            'stddev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            'iqr': quartiles[2] - quartiles[0],
+            'ops': 1 / mean if mean > 0 else math.inf,
+            'rounds': len(samples),
+            'iterations': self.iterations,
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'fullname': self.fullname,
+            'group': self.group,
+            'extra_info': self.extra_info,
+            'stats': self.stats(),
+        }
+
+
+def machine_info() -> Dict[str, Any]:
+    """Describe the interpreter and machine the benchmarks ran on."""
+    return {
+        'python_version': platform.python_version(),
+        'python_implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy_version': np.__version__ if np is not None else None,
+    }
+
+
+def commit_info() -> Dict[str, Any]:
+    """Return the checked-out commit and whether the tree has local changes, if this is a git checkout."""
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+
+    try:
+        return {'id': git('rev-parse', 'HEAD'), 'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+    except (OSError, subprocess.CalledProcessError):
+        return {'id': None, 'dirty': None}
+
+
+def results(benchmarks: List[Benchmark]) -> Dict[str, Any]:
+    """Build the JSON document of one benchmark run."""
+    return {
+        'version': RESULTS_VERSION,
+        'datetime': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'machine_info': machine_info(),
+        'commit_info': commit_info(),
+        'argv': sys.argv,
+        'benchmarks': [benchmark.as_dict() for benchmark in benchmarks if benchmark.samples],
+    }
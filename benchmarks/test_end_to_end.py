@@ -0,0 +1,79 @@
+import itertools
+import random
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from benchmarks.feeds import SERVICE_DAY, WROCLAW_GTFS, read_stops
+from import_gtfs_data import import_csv
+from src.public_transport_api.services.departures_service import DepartureService
+from utils.feed_cache import feed_cache
+
+QUERY_COUNT = 50
+
+
+def make_queries(db_path, count=QUERY_COUNT, seed=1):
+    """Departure queries from near one stop of the feed towards another, on SERVICE_DAY."""
+    rng = random.Random(seed)
+    stops = read_stops(Path(db_path).parent)
+    queries = []
+    for _ in range(count):
+        start, end = rng.sample(stops, 2)
+        start_time = datetime(SERVICE_DAY.year, SERVICE_DAY.month, SERVICE_DAY.day, rng.randrange(6, 21), rng.randrange(60))
+        queries.append((
+            start[2] + rng.uniform(-0.003, 0.003), start[3] + rng.uniform(-0.004, 0.004),
+            end[2], end[3], start_time, 10, 1000
+        ))
+    return queries
+
+
+@pytest.mark.benchmark(group='departures')
+def test_closest_departures(benchmark, feed_connection, feed_db):
+    """One query at a time against the shared index, as the API serves them."""
+    service = DepartureService(feed_connection)
+    queries = make_queries(feed_db)
+    next_query = itertools.cycle(queries).__next__
+    service.get_departure_index()
+    
+    benchmark(lambda: service.get_closest_departures(*next_query()))
+    
+    assert sum(bool(service.get_closest_departures(*query)) for query in queries) > QUERY_COUNT // 2
+
+
+@pytest.mark.benchmark(group='departures')
+def test_closest_departures_cold(benchmark, feed_connection, feed_db):
+    """First query after a new feed version: the index is mapped from its snapshot."""
+    query = make_queries(feed_db, count=1)[0]
+    
+    def fresh_service():
+        feed_cache.discard(feed_db)
+        return (DepartureService(feed_connection),), {}
+    
+    benchmark.pedantic(lambda service: service.get_closest_departures(*query), setup=fresh_service, rounds=5)
+
+
+@pytest.mark.benchmark(group='import')
+@pytest.mark.parametrize('filename', ['stops.txt', 'trips.txt'])
+def test_import_csv_wroclaw(benchmark, filename):
+    """Checked-in Wrocław files, into a fresh in-memory database each round."""
+    table = filename[:-len('.txt')]
+    
+    rows = benchmark.pedantic(
+        import_csv, setup=lambda: ((sqlite3.connect(':memory:'), WROCLAW_GTFS / filename, table), {}), rounds=5
+    )
+    
+    assert rows > 1000
+
+
+@pytest.mark.benchmark(group='import')
+def test_import_csv_stop_times(benchmark, feed_db):
+    """The feed's synthetic stop_times.txt, the largest file of a real feed."""
+    path = Path(feed_db).parent / 'stop_times.txt'
+    
+    rows = benchmark.pedantic(
+        import_csv, setup=lambda: ((sqlite3.connect(':memory:'), path, 'stop_times'), {}), rounds=3
+    )
+    
+    assert rows > 10000
@@ -0,0 +1,62 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from benchmarks.feeds import read_stops
+from src.public_transport_api.services import trips_service
+from src.public_transport_api.services.departures_service import DepartureService
+from src.public_transport_api.services.direction_service import is_heading_towards_destination
+from utils.geo_utils import calculate_distance, filter_stops_by_radius
+
+RYNEK = (51.1110606, 17.0272088)
+PLAC_GRUNWALDZKI = (51.1119811, 17.0640336)
+
+
+@pytest.fixture(scope='module')
+def wroclaw_stops():
+    """The checked-in Wrocław stops, shaped like stops rows."""
+    return [
+        {'stop_id': stop_id, 'stop_name': name, 'stop_lat': lat, 'stop_lon': lon}
+        for stop_id, name, lat, lon in read_stops()
+    ]
+
+
+@pytest.mark.benchmark(group='geo')
+def test_calculate_distance(benchmark):
+    distance = benchmark(calculate_distance, *RYNEK, *PLAC_GRUNWALDZKI)
+    
+    assert distance == pytest.approx(2570, rel=0.01)
+
+
+@pytest.mark.benchmark(group='geo')
+@pytest.mark.parametrize('radius', [500, 2000])
+def test_filter_stops_by_radius(benchmark, wroclaw_stops, radius):
+    nearby = benchmark(filter_stops_by_radius, *RYNEK, wroclaw_stops, radius)
+    
+    assert nearby and all(stop['distance'] <= radius for stop in nearby)
+
+
+@pytest.mark.benchmark(group='direction')
+def test_is_heading_towards_destination(benchmark, wroclaw_stops):
+    trip_stops = wroclaw_stops[:20]
+    
+    heading = benchmark(is_heading_towards_destination, *RYNEK, *PLAC_GRUNWALDZKI, trip_stops)
+    
+    assert isinstance(heading, bool)
+
+
+@pytest.mark.benchmark(group='iso')
+def test_convert_to_iso(benchmark):
+    iso = benchmark(trips_service._convert_to_iso, datetime(2025, 3, 12), '25:10:30')
+    
+    assert iso == '2025-03-13T01:10:30Z'
+
+
+@pytest.mark.benchmark(group='iso')
+def test_seconds_to_iso(benchmark):
+    convert = DepartureService(sqlite3.connect(':memory:'))._seconds_to_iso
+    
+    iso = benchmark(convert, datetime(2025, 3, 12), 25 * 3600 + 10 * 60 + 30)
+    
+    assert iso == '2025-03-13T01:10:30Z'
@@ -1,15 +1,28 @@
 from flask import Blueprint, request, jsonify
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Tuple, Dict, Any
 import sqlite3
 from services.departure_service import DepartureService
+from utils.connection_pool import connection_pool
+from utils.db_versions import use_database
 
 departures_bp = Blueprint('departures', __name__)
 
+DB_FILE = 'wroclaw_transport.db'
+
+@contextmanager
 def get_db_connection():
-    """Get database connection."""
-    conn = sqlite3.connect('wroclaw_transport.db')
-    return conn
+    """Borrow a pooled read-only connection to the live database version.
+    
+    The version is pinned for the whole block, so a request started before a
+    new feed is published finishes on the version it started with.
+    
+    Yields:
+        Connection, returned to the pool on exit
+    """
+    with use_database(DB_FILE) as db_path, connection_pool.connection(db_path) as conn:
+        yield conn
 
 @departures_bp.route('/public_transport/city/<city>/closest_departures', methods=['GET'])
 def get_closest_departures(city: str) -> Tuple[Dict[str, Any], int]:
@@ -69,8 +82,7 @@ def get_closest_departures(city: str) -> Tuple[Dict[str, Any], int]:
             return jsonify({'error': 'Invalid limit. Expected positive integer'}), 400
         
         # Get departures
-        conn = get_db_connection()
-        try:
+        with get_db_connection() as conn:
             service = DepartureService(conn)
             departures = service.get_closest_departures(
                 start_lat, start_lon,
@@ -78,8 +90,6 @@ def get_closest_departures(city: str) -> Tuple[Dict[str, Any], int]:
                 start_time,
                 limit
             )
-        finally:
-            conn.close()
         
         # Build response
         response = {
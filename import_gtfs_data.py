@@ -1,54 +1,94 @@
+import argparse
 import csv
+import hashlib
+import io
 import sqlite3
 import os
+import shutil
+import struct
+import sys
+import time
+import zipfile
+from contextlib import contextmanager
+from itertools import groupby
 from pathlib import Path
 
+from utils.db_versions import collect_garbage, hold_version, new_version_path, publish_version, resolve_db_path
+from utils.departure_index import build_departure_index
+from utils.footpaths import FOOTPATH_RADIUS, WALKING_SPEED, find_footpaths
+from utils.geo_utils import calculate_bearing
+from utils.shapes import pack_points
+from utils.stop_catalogue import StopCatalogue
+from utils.timetable_snapshot import snapshot_path, write_snapshot
+
 GTFS_DIR = "OtwartyWroclaw_rozklad_jazdy_GTFS"
 DB_FILE = "wroclaw_transport.db"
-BATCH_SIZE = 1000
+METADATA_TABLE = "import_metadata"
+STAGING_SUFFIX = "__new"
+READ_CHUNK_SIZE = 1 << 20
+FICLONE = 0x40049409  # Linux ioctl making a file share another's blocks (btrfs, XFS, ...)
 
-def detect_type(value):
-    """Detect SQLite type from value."""
-    if not value or value == '':
-        return 'TEXT'
-    try:
-        float(value)
-        return 'REAL' if '.' in value else 'INTEGER'
-    except ValueError:
-        return 'TEXT'
-
-def infer_schema(filepath, encoding='utf-8'):
-    """Infer schema from CSV file."""
-    with open(filepath, 'r', encoding=encoding, errors='replace') as f:
-        reader = csv.reader(f)
-        headers = next(reader)
-        
-        # Clean BOM from first column if present
-        if headers[0].startswith('\ufeff'):
-            headers[0] = headers[0].replace('\ufeff', '')
-        
-        # Sample rows to detect types
-        type_votes = {h: [] for h in headers}
-        for i, row in enumerate(reader):
-            if i >= 100:  # Sample first 100 rows
-                break
-            for header, value in zip(headers, row):
-                type_votes[header].append(detect_type(value))
-        
-        # Determine final type (prefer TEXT if mixed)
-        schema = {}
-        for header in headers:
-            votes = type_votes[header]
-            if not votes or 'TEXT' in votes:
-                schema[header] = 'TEXT'
-            elif all(v == 'REAL' for v in votes):
-                schema[header] = 'REAL'
-            elif all(v in ('INTEGER', 'REAL') for v in votes):
-                schema[header] = 'REAL'
-            else:
-                schema[header] = 'TEXT'
-        
-        return headers, schema
+# Feed files and the tables they are imported into
+FILES_TO_IMPORT = [
+    ('stops.txt', 'stops'),
+    ('trips.txt', 'trips'),
+    ('stop_times.txt', 'stop_times'),
+    ('calendar.txt', 'calendar'),
+    ('calendar_dates.txt', 'calendar_dates'),
+    ('feed_info.txt', 'feed_info'),
+    ('shapes.txt', 'shapes'),
+]
+
+# Files the timetable and its derived tables are built from; an update never drops them
+REQUIRED_FILES = {'stops.txt', 'trips.txt', 'stop_times.txt'}
+
+# Indexes on frequently queried columns: (name, table, columns)
+INDEXES = [
+    ('idx_stops_stop_id', 'stops', 'stop_id'),
+    ('idx_trips_trip_id', 'trips', 'trip_id'),
+    ('idx_stop_times_trip_sequence', 'stop_times', 'trip_id, stop_sequence'),
+    ('idx_stop_times_stop_id', 'stop_times', 'stop_id'),
+    ('idx_stops_coords', 'stops', 'stop_lat, stop_lon'),
+    ('idx_shapes_shape_sequence', 'shapes', 'shape_id, shape_pt_sequence'),
+]
+
+# SQLite types of GTFS columns; columns not listed here are stored as TEXT.
+# Identifiers, times and dates stay TEXT so '015' or '08:05:00' keep their form.
+GTFS_COLUMN_TYPES = {
+    'stop_lat': 'REAL',
+    'stop_lon': 'REAL',
+    'location_type': 'INTEGER',
+    'wheelchair_boarding': 'INTEGER',
+    'stop_sequence': 'INTEGER',
+    'pickup_type': 'INTEGER',
+    'drop_off_type': 'INTEGER',
+    'timepoint': 'INTEGER',
+    'shape_dist_traveled': 'REAL',
+    'direction_id': 'INTEGER',
+    'wheelchair_accessible': 'INTEGER',
+    'bikes_allowed': 'INTEGER',
+    'route_type': 'INTEGER',
+    'route_sort_order': 'INTEGER',
+    'monday': 'INTEGER',
+    'tuesday': 'INTEGER',
+    'wednesday': 'INTEGER',
+    'thursday': 'INTEGER',
+    'friday': 'INTEGER',
+    'saturday': 'INTEGER',
+    'sunday': 'INTEGER',
+    'exception_type': 'INTEGER',
+    'shape_pt_lat': 'REAL',
+    'shape_pt_lon': 'REAL',
+    'shape_pt_sequence': 'INTEGER',
+    'min_transfer_time': 'INTEGER',
+    'transfer_type': 'INTEGER',
+    'headway_secs': 'INTEGER',
+    'exact_times': 'INTEGER',
+}
+
+def column_types(headers):
+    """Map each column to its fixed SQLite type."""
+    return {h: GTFS_COLUMN_TYPES.get(h, 'TEXT') for h in headers}
 
 def create_table(conn, table_name, headers, schema):
     """Create SQLite table."""
@@ -57,108 +97,579 @@ def create_table(conn, table_name, headers, schema):
     conn.execute(f'CREATE TABLE {table_name} ({columns})')
     print(f"[OK] Created table: {table_name}")
 
-def import_csv(conn, filepath, table_name, encoding='utf-8'):
-    """Import CSV data into SQLite table."""
-    headers, schema = infer_schema(filepath, encoding)
+def import_rows(conn, f, table_name):
+    """Stream CSV text from an open file into a new SQLite table in a single pass.
+    
+    Column types come from GTFS_COLUMN_TYPES rather than from sampling the
+    file, so it is read only once, and the CSV reader feeds SQLite directly,
+    so memory use does not grow with file size. Empty numeric fields are
+    stored as NULL. The caller owns the transaction.
+    """
+    reader = csv.reader(f)
+    headers = next(reader)
+    
+    # Clean BOM from first column if the stream was not decoded as utf-8-sig
+    if headers[0].startswith('\ufeff'):
+        headers[0] = headers[0].replace('\ufeff', '')
+    
+    schema = column_types(headers)
     create_table(conn, table_name, headers, schema)
     
-    cursor = conn.cursor()
-    rows_imported = 0
-    batch = []
+    placeholders = ','.join(["NULLIF(?, '')" if schema[h] != 'TEXT' else '?' for h in headers])
+    cursor = conn.executemany(
+        f'INSERT INTO {table_name} VALUES ({placeholders})',
+        (row for row in reader if any(row))  # Skip empty rows, including ones of bare commas
+    )
+    return cursor.rowcount
+
+def import_csv(conn, filepath, table_name, encoding='utf-8-sig'):
+    """Import a CSV file into a new SQLite table (see import_rows)."""
+    with open(filepath, 'r', encoding=encoding, errors='replace', newline='') as f:
+        return import_rows(conn, f, table_name)
+
+class _HashingReader(io.RawIOBase):
+    """Binary stream wrapper that feeds every byte read into a hash."""
     
-    with open(filepath, 'r', encoding=encoding, errors='replace') as f:
-        reader = csv.reader(f)
-        next(reader)  # Skip header
-        
-        placeholders = ','.join(['?' for _ in headers])
-        insert_sql = f'INSERT INTO {table_name} VALUES ({placeholders})'
-        
-        for row in reader:
-            if not any(row):  # Skip empty rows
-                continue
-            batch.append(row)
-            
-            if len(batch) >= BATCH_SIZE:
-                cursor.executemany(insert_sql, batch)
-                rows_imported += len(batch)
-                batch = []
-        
-        # Insert remaining rows
-        if batch:
-            cursor.executemany(insert_sql, batch)
-            rows_imported += len(batch)
-    
-    conn.commit()
-    return rows_imported
-
-def create_indexes(conn):
-    """Create indexes on frequently queried columns."""
-    indexes = [
-        ('idx_stops_stop_id', 'stops', 'stop_id'),
-        ('idx_trips_trip_id', 'trips', 'trip_id'),
-        ('idx_stop_times_trip_id', 'stop_times', 'trip_id'),
-        ('idx_stop_times_stop_id', 'stop_times', 'stop_id'),
-        ('idx_stops_coords', 'stops', 'stop_lat, stop_lon'),
-    ]
-    
-    for idx_name, table, columns in indexes:
+    def __init__(self, raw, digest):
+        self._raw = raw
+        self.digest = digest
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        n = self._raw.readinto(buffer)
+        if n:
+            self.digest.update(memoryview(buffer)[:n])
+        return n
+
+@contextmanager
+def open_gtfs_binary(source, filename):
+    """Open one file of a GTFS feed as bytes, from a directory or a .zip archive.
+    
+    Zip members are decompressed while they are read, so nothing is extracted
+    to disk. Members are matched by name anywhere in the archive, since some
+    feeds wrap their files in a folder.
+    
+    Yields:
+        Binary stream, or None if the feed has no such file
+    """
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            members = [name for name in archive.namelist() if name.rsplit('/', 1)[-1] == filename]
+            if not members:
+                yield None
+                return
+            with archive.open(members[0]) as raw:
+                yield raw
+        return
+    
+    filepath = os.path.join(source, filename)
+    if not os.path.exists(filepath):
+        yield None
+        return
+    with open(filepath, 'rb') as raw:
+        yield raw
+
+@contextmanager
+def open_gtfs_file(source, filename, encoding='utf-8-sig', digest=None):
+    """Open one file of a GTFS feed as text (see open_gtfs_binary).
+    
+    The default encoding strips the byte order mark GTFS exports often start
+    with. If ``digest`` is given, the raw bytes are added to it as they are read.
+    
+    Yields:
+        Text stream, or None if the feed has no such file
+    """
+    with open_gtfs_binary(source, filename) as raw:
+        if raw is None:
+            yield None
+            return
+        if digest is not None:
+            raw = io.BufferedReader(_HashingReader(raw, digest), buffer_size=READ_CHUNK_SIZE)
+        yield io.TextIOWrapper(raw, encoding=encoding, errors='replace', newline='')
+
+def file_hash(source, filename):
+    """Return the SHA-256 of a feed file's contents, or None if the feed has no such file."""
+    digest = hashlib.sha256()
+    with open_gtfs_binary(source, filename) as raw:
+        if raw is None:
+            return None
+        for chunk in iter(lambda: raw.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def import_file(conn, source, filename, table_name):
+    """Import one feed file into a new table, printing the load rate.
+    
+    Returns:
+        Tuple of (rows imported, SHA-256 of the file), or None if the feed has no such file
+    """
+    digest = hashlib.sha256()
+    started = time.perf_counter()
+    with open_gtfs_file(source, filename, digest=digest) as f:
+        if f is None:
+            return None
+        print(f"\nImporting {filename}...")
+        rows = import_rows(conn, f, table_name)
+    elapsed = time.perf_counter() - started
+    print(f"[OK] Imported {rows:,} rows into {table_name} "
+          f"in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    return rows, digest.hexdigest()
+
+def create_indexes(conn, table=None, staged_as=None, suffix=''):
+    """Create indexes on frequently queried columns.
+    
+    Args:
+        table: Only create the indexes of this table (default: all tables)
+        staged_as: Build them on this staging copy of ``table`` instead
+        suffix: Appended to index names, which must be unique within the database
+    """
+    for idx_name, idx_table, columns in INDEXES:
+        if table is not None and idx_table != table:
+            continue
+        target = staged_as or idx_table
         try:
-            conn.execute(f'CREATE INDEX IF NOT EXISTS {idx_name} ON {table}({columns})')
-            print(f"[OK] Created index: {idx_name}")
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {idx_name}{suffix} ON {target}({columns})')
+            print(f"[OK] Created index: {idx_name}{suffix}")
         except sqlite3.OperationalError as e:
-            print(f"[WARN] Skipped index {idx_name}: {e}")
+            print(f"[WARN] Skipped index {idx_name}{suffix}: {e}")
 
-def main():
-    """Main import function."""
-    print("=" * 60)
-    print("GTFS Data Import to SQLite")
-    print("=" * 60)
+def build_trip_patterns(conn, stops_table='stops', stop_times_table='stop_times', suffix=''):
+    """Precompute stop patterns and their direction from stop_times.
     
-    # Check if GTFS directory exists
-    if not os.path.exists(GTFS_DIR):
-        print(f"[ERROR] Directory '{GTFS_DIR}' not found!")
-        return
+    Trips visiting the same stops in the same order share a pattern. Each
+    pattern stores its first and last stop coordinates and the bearing between
+    them (NULL for patterns with fewer than two stops), so the API can check a
+    trip's direction with a lookup instead of reading its stop times.
     
-    # Remove existing database
-    if os.path.exists(DB_FILE):
-        os.remove(DB_FILE)
-        print(f"[OK] Removed existing database: {DB_FILE}")
+    Args:
+        stops_table: Table to read stops from
+        stop_times_table: Table to read stop times from
+        suffix: Appended to the names of the patterns and trip_patterns tables
+    """
+    stops = {
+        stop_id: (lat, lon)
+        for stop_id, lat, lon in conn.execute(f'SELECT stop_id, stop_lat, stop_lon FROM {stops_table}')
+    }
+    rows = conn.execute(f'SELECT trip_id, stop_id FROM {stop_times_table} ORDER BY trip_id, stop_sequence')
     
-    # Connect to database
-    conn = sqlite3.connect(DB_FILE)
-    print(f"[OK] Connected to database: {DB_FILE}\n")
+    patterns = {}
+    trip_patterns = []
+    for trip_id, trip_rows in groupby(rows, key=lambda row: row[0]):
+        sequence = tuple(stop_id for _, stop_id in trip_rows)
+        pattern_id = patterns.setdefault(sequence, len(patterns))
+        trip_patterns.append((trip_id, pattern_id))
     
-    # Files to import
-    files_to_import = [
-        ('stops.txt', 'stops'),
-        ('trips.txt', 'trips'),
-        ('stop_times.txt', 'stop_times'),
-    ]
+    pattern_rows = []
+    for sequence, pattern_id in patterns.items():
+        start = stops.get(sequence[0], (None, None))
+        end = stops.get(sequence[-1], (None, None))
+        bearing = None
+        if len(sequence) >= 2 and None not in start + end:
+            bearing = calculate_bearing(float(start[0]), float(start[1]), float(end[0]), float(end[1]))
+        pattern_rows.append((pattern_id, len(sequence), *start, *end, bearing))
     
-    stats = {}
+    conn.execute(f'DROP TABLE IF EXISTS patterns{suffix}')
+    conn.execute(
+        f'CREATE TABLE patterns{suffix} (pattern_id INTEGER PRIMARY KEY, stop_count INTEGER, '
+        'start_lat REAL, start_lon REAL, end_lat REAL, end_lon REAL, bearing REAL)'
+    )
+    conn.execute(f'DROP TABLE IF EXISTS trip_patterns{suffix}')
+    conn.execute(f'CREATE TABLE trip_patterns{suffix} (trip_id TEXT PRIMARY KEY, pattern_id INTEGER)')
+    conn.executemany(f'INSERT INTO patterns{suffix} VALUES (?, ?, ?, ?, ?, ?, ?)', pattern_rows)
+    conn.executemany(f'INSERT INTO trip_patterns{suffix} VALUES (?, ?)', trip_patterns)
+    return len(patterns), len(trip_patterns)
+
+def build_footpaths_table(conn, stops_table='stops', suffix='', radius=FOOTPATH_RADIUS, speed=WALKING_SPEED):
+    """Precompute walking transfers between stops close to each other.
+    
+    Every stop is linked, in both directions, to the stops within ``radius``
+    found through a grid index, so routing reads a stop's footpaths instead
+    of measuring distances to all other stops.
+    
+    Args:
+        stops_table: Table to read stops from
+        suffix: Appended to the name of the footpaths table
+        radius: Maximum distance between linked stops in meters
+        speed: Walking speed in meters per second
+    
+    Returns:
+        Number of footpaths
+    """
+    rows = conn.execute(
+        f'SELECT stop_id, stop_lat, stop_lon FROM {stops_table} '
+        'WHERE stop_lat IS NOT NULL AND stop_lon IS NOT NULL ORDER BY rowid'
+    ).fetchall()
+    stop_ids = [row[0] for row in rows]
+    catalogue = StopCatalogue(stop_ids, stop_ids, [row[1] for row in rows], [row[2] for row in rows])
+    footpaths = find_footpaths(catalogue, radius, speed)
+    
+    conn.execute(f'DROP TABLE IF EXISTS footpaths{suffix}')
+    conn.execute(
+        f'CREATE TABLE footpaths{suffix} (from_stop_id TEXT, to_stop_id TEXT, distance REAL, walking_seconds INTEGER, '
+        'PRIMARY KEY (from_stop_id, to_stop_id)) WITHOUT ROWID'
+    )
+    conn.executemany(
+        f'INSERT OR IGNORE INTO footpaths{suffix} VALUES (?, ?, ?, ?)',
+        ((stop_ids[a], stop_ids[b], round(distance, 1), seconds) for a, b, distance, seconds in footpaths)
+    )
+    return len(footpaths)
+
+def build_shape_geometries(conn, shapes_table='shapes', suffix=''):
+    """Pack each shape's points into one row of interleaved lat/lon doubles.
+    
+    A shape has hundreds to thousands of points; reading it as one blob by
+    primary key is much cheaper than fetching and ordering its rows.
+    
+    Args:
+        shapes_table: Table to read shape points from
+        suffix: Appended to the name of the shape_geometries table
+    
+    Returns:
+        Number of shapes
+    """
+    rows = conn.execute(
+        f'SELECT shape_id, shape_pt_lat, shape_pt_lon FROM {shapes_table} '
+        'WHERE shape_pt_lat IS NOT NULL AND shape_pt_lon IS NOT NULL ORDER BY shape_id, shape_pt_sequence'
+    )
+    conn.execute(f'DROP TABLE IF EXISTS shape_geometries{suffix}')
+    conn.execute(
+        f'CREATE TABLE shape_geometries{suffix} (shape_id TEXT PRIMARY KEY, point_count INTEGER, coords BLOB) '
+        'WITHOUT ROWID'
+    )
+    shapes = 0
+    for shape_id, points in groupby(rows, key=lambda row: row[0]):
+        points = [(lat, lon) for _, lat, lon in points]
+        conn.execute(
+            f'INSERT INTO shape_geometries{suffix} VALUES (?, ?, ?)', (shape_id, len(points), pack_points(points))
+        )
+        shapes += 1
+    return shapes
+
+def create_metadata_table(conn):
+    """Create the table recording which file contents each table was imported from."""
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS {METADATA_TABLE} (filename TEXT PRIMARY KEY, table_name TEXT, '
+        'content_hash TEXT, row_count INTEGER, imported_at TEXT)'
+    )
+
+def read_metadata(conn):
+    """Return {filename: content hash} of the files the database was imported from."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (METADATA_TABLE,)
+    ).fetchone()
+    if not exists:
+        return None
+    return dict(conn.execute(f'SELECT filename, content_hash FROM {METADATA_TABLE}'))
+
+def record_import(conn, filename, table_name, rows, content_hash):
+    """Remember the contents a table was imported from."""
+    conn.execute(
+        f"INSERT OR REPLACE INTO {METADATA_TABLE} VALUES (?, ?, ?, ?, datetime('now'))",
+        (filename, table_name, content_hash, rows)
+    )
+
+def import_full(db_path, source, stats, footpath_radius=FOOTPATH_RADIUS, walking_speed=WALKING_SPEED):
+    """Build a database from scratch.
+    
+    The load runs as one transaction without a journal, which is safe because
+    the file is a new version nobody reads before it is published.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    conn.execute('PRAGMA cache_size = -65536')
+    conn.execute('BEGIN')
+    print(f"[OK] Connected to database: {db_path}")
+    create_metadata_table(conn)
     
     # Import each file
-    for filename, table_name in files_to_import:
-        filepath = os.path.join(GTFS_DIR, filename)
-        
-        if not os.path.exists(filepath):
-            print(f"[WARN] File '{filename}' not found, skipping...")
-            continue
-        
-        print(f"\nImporting {filename}...")
+    for filename, table_name in FILES_TO_IMPORT:
         try:
-            rows = import_csv(conn, filepath, table_name, encoding='utf-8')
-            stats[table_name] = rows
-            print(f"[OK] Imported {rows:,} rows into {table_name}")
+            result = import_file(conn, source, filename, table_name)
+            if result is None:
+                print(f"[WARN] File '{filename}' not found, skipping...")
+                continue
+            stats[table_name] = result[0]
+            record_import(conn, filename, table_name, *result)
         except Exception as e:
+            # Without a journal there is nothing to roll back to; drop the partial table
+            conn.execute(f'DROP TABLE IF EXISTS {table_name}')
             print(f"[ERROR] Error importing {filename}: {e}")
     
-    # Create indexes
+    # Create indexes once all rows are in
     print("\nCreating indexes...")
+    started = time.perf_counter()
     create_indexes(conn)
+    print(f"[OK] Indexes built in {time.perf_counter() - started:.2f}s")
+    
+    # Precompute trip directions
+    if 'stops' in stats and 'stop_times' in stats:
+        print("\nBuilding trip patterns...")
+        n_patterns, n_trips = build_trip_patterns(conn)
+        print(f"[OK] {n_trips:,} trips share {n_patterns:,} stop patterns")
     
-    # Close connection
+    # Precompute walking transfers
+    if 'stops' in stats:
+        print("\nBuilding footpaths...")
+        started = time.perf_counter()
+        n_footpaths = build_footpaths_table(conn, radius=footpath_radius, speed=walking_speed)
+        print(f"[OK] {n_footpaths:,} footpaths within {footpath_radius:g} m in {time.perf_counter() - started:.2f}s")
+    
+    # Pack shapes for the geometry endpoint
+    if 'shapes' in stats:
+        print("\nPacking shapes...")
+        n_shapes = build_shape_geometries(conn)
+        print(f"[OK] {n_shapes:,} shapes packed")
+    
+    # Commit and close connection
+    conn.execute('COMMIT')
     conn.close()
+
+def copy_database(live, target):
+    """Copy the live database as the starting point of an incremental update.
+    
+    Where the filesystem supports reflinks the copy shares the live file's
+    blocks, so it is near-instant and only the pages the update rewrites take
+    new space. Elsewhere it is a plain copy, and an update costs one read and
+    write of the whole database however few files changed; that is the price
+    of publishing every update as a new version the API can switch to at once.
+    
+    Returns:
+        True if the copy was a reflink
+    """
+    if sys.platform.startswith('linux'):
+        import fcntl
+        with open(live, 'rb') as src, open(target, 'wb') as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return True
+            except OSError:
+                pass  # Not supported here, e.g. ext4, tmpfs or across filesystems
+    shutil.copyfile(live, target)
+    return False
+
+def import_changed(conn, source, known, stats, footpath_radius=FOOTPATH_RADIUS, walking_speed=WALKING_SPEED):
+    """Update a copy of the live database with the feed files whose contents changed.
+    
+    Each changed file is loaded, with its indexes, into a staging table next
+    to the current one. Once everything is staged, all staged tables replace
+    the current ones in a single transaction, so a file that fails to load
+    leaves its table, and the tables derived from it, as they were. The same
+    goes for a required file (REQUIRED_FILES) missing from the feed.
+    
+    Args:
+        conn: Connection to the database copy
+        source: GTFS feed directory or zip archive
+        known: {filename: content hash} from the previous import
+        stats: Dictionary receiving {table: rows} for re-imported tables
+        footpath_radius: Maximum footpath length in meters, used if stops changed
+        walking_speed: Walking speed in meters per second, used if stops changed
+        
+    Returns:
+        Number of tables replaced or removed
+    """
+    # Leftovers of an interrupted update
+    for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?", (f'*{STAGING_SUFFIX}',)
+    ).fetchall():
+        conn.execute(f'DROP TABLE {name}')
+    
+    staged = []  # (filename, table, rows, content hash)
+    removed = []  # (filename, table)
+    for filename, table_name in FILES_TO_IMPORT:
+        content_hash = file_hash(source, filename)
+        if content_hash is None:
+            if filename in known and filename in REQUIRED_FILES:
+                print(f"[ERROR] {filename} missing from feed, keeping the current {table_name}")
+            elif filename in known:
+                print(f"[OK] {filename} no longer in feed, dropping {table_name}")
+                removed.append((filename, table_name))
+            continue
+        if known.get(filename) == content_hash:
+            print(f"[OK] {filename} unchanged, skipping")
+            continue
+        
+        staging_table = table_name + STAGING_SUFFIX
+        conn.execute('BEGIN')
+        try:
+            rows, content_hash = import_file(conn, source, filename, staging_table)
+            create_indexes(conn, table_name, staging_table, suffix=f'_{content_hash[:12]}')
+            conn.execute('COMMIT')
+        except Exception as e:
+            conn.execute('ROLLBACK')
+            print(f"[ERROR] Error importing {filename}, keeping the current {table_name}: {e}")
+            continue
+        staged.append((filename, table_name, rows, content_hash))
+        stats[table_name] = rows
+    
+    # Trip patterns depend on stops and stop times, footpaths on stops, shape geometries on shapes
+    new_tables = {table for _, table, _, _ in staged}
+    derived = []
+    if new_tables & {'stops', 'stop_times'}:
+        print("\nBuilding trip patterns...")
+        conn.execute('BEGIN')
+        n_patterns, n_trips = build_trip_patterns(
+            conn,
+            'stops' + STAGING_SUFFIX if 'stops' in new_tables else 'stops',
+            'stop_times' + STAGING_SUFFIX if 'stop_times' in new_tables else 'stop_times',
+            suffix=STAGING_SUFFIX
+        )
+        conn.execute('COMMIT')
+        derived = ['patterns', 'trip_patterns']
+        print(f"[OK] {n_trips:,} trips share {n_patterns:,} stop patterns")
+    if 'stops' in new_tables:
+        print("\nBuilding footpaths...")
+        conn.execute('BEGIN')
+        n_footpaths = build_footpaths_table(
+            conn, 'stops' + STAGING_SUFFIX, STAGING_SUFFIX, footpath_radius, walking_speed
+        )
+        conn.execute('COMMIT')
+        derived.append('footpaths')
+        print(f"[OK] {n_footpaths:,} footpaths within {footpath_radius:g} m")
+    if 'shapes' in new_tables:
+        print("\nPacking shapes...")
+        conn.execute('BEGIN')
+        n_shapes = build_shape_geometries(conn, 'shapes' + STAGING_SUFFIX, STAGING_SUFFIX)
+        conn.execute('COMMIT')
+        derived.append('shape_geometries')
+        print(f"[OK] {n_shapes:,} shapes packed")
+    
+    if not staged and not removed:
+        return 0
+    
+    # Swap everything in at once
+    started = time.perf_counter()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for table_name in [table for _, table, _, _ in staged] + derived:
+            conn.execute(f'DROP TABLE IF EXISTS {table_name}')
+            conn.execute(f'ALTER TABLE {table_name}{STAGING_SUFFIX} RENAME TO {table_name}')
+        for filename, table_name in removed:
+            conn.execute(f'DROP TABLE IF EXISTS {table_name}')
+            if table_name == 'shapes':
+                conn.execute('DROP TABLE IF EXISTS shape_geometries')
+            conn.execute(f'DELETE FROM {METADATA_TABLE} WHERE filename = ?', (filename,))
+        for filename, table_name, rows, content_hash in staged:
+            record_import(conn, filename, table_name, rows, content_hash)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    print(f"\n[OK] Swapped in {len(staged) + len(removed)} table(s) in {time.perf_counter() - started:.3f}s")
+    return len(staged) + len(removed)
+
+def write_timetable_snapshot(db_path):
+    """Write the binary timetable snapshot the API maps instead of reading SQLite.
+    
+    A database the departure index cannot be built from, e.g. because a
+    file failed to import, or whose index cannot be packed gets no snapshot;
+    the API then reads it directly.
+    
+    Args:
+        db_path: Finished database version
+    
+    Returns:
+        Path of the snapshot, or None if none was written
+    """
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    try:
+        index = build_departure_index(conn)
+    except sqlite3.Error as e:
+        print(f"[WARN] No timetable snapshot written: {e}")
+        return None
+    finally:
+        conn.close()
+    path = snapshot_path(db_path)
+    try:
+        write_snapshot(path, index)
+    except (OSError, ValueError, TypeError, struct.error) as e:
+        if os.path.exists(path):
+            os.remove(path)
+        print(f"[WARN] No timetable snapshot written: {e}")
+        return None
+    print(f"[OK] Wrote timetable snapshot ({os.path.getsize(path):,} bytes) in {time.perf_counter() - start:.2f}s")
+    return path
+
+def main(source=None, full=False, footpath_radius=FOOTPATH_RADIUS, walking_speed=WALKING_SPEED):
+    """Main import function.
+    
+    Every import writes a new version of the database next to the live one
+    and then publishes it by flipping the version pointer, so a running API
+    keeps serving the old version until the new one is complete. If a
+    version is already live, it is copied and only the files whose contents
+    changed are re-imported into the copy; otherwise (or with ``full``) the
+    new version is built from scratch. Each version gets a binary timetable
+    snapshot for the API to map. Old versions nobody uses any more are
+    deleted afterwards.
+    
+    Args:
+        source: GTFS feed as an extracted directory or a .zip archive (default GTFS_DIR)
+        full: Rebuild the whole database even if it is up to date
+        footpath_radius: Maximum distance in meters between stops linked by a footpath
+        walking_speed: Walking speed in meters per second for footpath times
+    """
+    source = source or GTFS_DIR
+    print("=" * 60)
+    print("GTFS Data Import to SQLite")
+    print("=" * 60)
+    
+    # Check if the GTFS feed exists
+    if not os.path.exists(source):
+        print(f"[ERROR] GTFS feed '{source}' not found!")
+        return
+    if not os.path.isdir(source) and not zipfile.is_zipfile(source):
+        print(f"[ERROR] '{source}' is neither a directory nor a zip archive!")
+        return
+    
+    live = resolve_db_path(DB_FILE)
+    known = None
+    if not full and os.path.exists(live):
+        conn = sqlite3.connect(Path(live).resolve().as_uri() + '?mode=ro', uri=True)
+        try:
+            known = read_metadata(conn)
+        finally:
+            conn.close()
+        if known is None:
+            print(f"[WARN] {live} has no import metadata, rebuilding it")
+    
+    stats = {}
+    copy_seconds = None
+    target = new_version_path(DB_FILE)
+    changed = True
+    try:
+        with hold_version(target):
+            if known is None:
+                import_full(target, source, stats, footpath_radius, walking_speed)
+            else:
+                started = time.perf_counter()
+                reflinked = copy_database(live, target)
+                copy_seconds = time.perf_counter() - started
+                print(f"[OK] Updating a copy of {live} ({'reflink' if reflinked else 'full copy'}, {copy_seconds:.2f}s)")
+                conn = sqlite3.connect(target, isolation_level=None)
+                try:
+                    # Keep a journal, in memory, so a file that fails to load can be rolled back
+                    conn.execute('PRAGMA journal_mode = MEMORY')
+                    conn.execute('PRAGMA synchronous = OFF')
+                    conn.execute('PRAGMA temp_store = MEMORY')
+                    conn.execute('PRAGMA cache_size = -65536')
+                    changed = import_changed(conn, source, known, stats, footpath_radius, walking_speed) > 0
+                finally:
+                    conn.close()
+            if changed:
+                write_timetable_snapshot(target)
+                publish_version(DB_FILE, target)
+    finally:
+        if not changed or resolve_db_path(DB_FILE) != target:
+            for path in (target, snapshot_path(target)):
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    for path in collect_garbage(DB_FILE):
+        print(f"[OK] Removed unused version: {path}")
     
     # Print summary
     print("\n" + "=" * 60)
@@ -166,9 +677,25 @@ def main():
     print("=" * 60)
     for table, rows in stats.items():
         print(f"{table:20s}: {rows:,} rows")
+    if copy_seconds is not None:
+        print(f"{'copy of live db':20s}: {copy_seconds:.2f}s")
     print("=" * 60)
-    print(f"[OK] Database created: {DB_FILE}")
+    if changed:
+        print(f"[OK] Database published: {target}")
+    else:
+        print(f"[OK] Database already up to date: {live}")
     print("=" * 60)
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Import a GTFS feed into SQLite.')
+    parser.add_argument('source', nargs='?', default=GTFS_DIR,
+                        help=f'GTFS directory or .zip archive (default: {GTFS_DIR})')
+    parser.add_argument('--full', action='store_true',
+                        help='rebuild the database from scratch instead of importing changed files only')
+    parser.add_argument('--footpath-radius', type=float, default=FOOTPATH_RADIUS,
+                        help=f'link stops within this many meters by footpaths (default: {FOOTPATH_RADIUS}); '
+                             'takes effect when stops change or with --full')
+    parser.add_argument('--walking-speed', type=float, default=WALKING_SPEED,
+                        help=f'walking speed in m/s for footpath times (default: {WALKING_SPEED})')
+    args = parser.parse_args()
+    main(args.source, args.full, args.footpath_radius, args.walking_speed)
@@ -1,20 +1,62 @@
 import sqlite3
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
-from utils.geo_utils import calculate_distance, filter_stops_by_radius
-from services.direction_service import is_heading_towards_destination
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from utils.departure_index import DepartureIndex, build_departure_index, get_departure_index
+from utils.stop_catalogue import StopCatalogue
+from utils.geo_utils import calculate_bearing
+from services.direction_service import are_bearings_towards
+
+# Departures checked for direction together while scanning a stop's timetable
+DIRECTION_BATCH_SIZE = 32
 
 class DepartureService:
     """Service for querying public transport departures."""
     
-    def __init__(self, db_connection: sqlite3.Connection):
+    def __init__(self, db_connection: sqlite3.Connection, departure_index: Optional[DepartureIndex] = None):
         """Initialize service with database connection.
         
         Args:
             db_connection: SQLite database connection
+            departure_index: Shared departure index (optional, resolved from the connection if omitted)
         """
         self.db = db_connection
-        self.db.row_factory = sqlite3.Row
+        self.departure_index = departure_index
+    
+    def get_departure_index(self) -> DepartureIndex:
+        """Return the departure index for this service's database.
+        
+        File databases use the process-wide index, so stop_times is read once
+        per database version rather than once per request.
+        
+        Returns:
+            Departure index
+        """
+        if self.departure_index is None:
+            db_path = self.db.execute("PRAGMA database_list").fetchone()[2]
+            self.departure_index = get_departure_index(db_path) if db_path else build_departure_index(self.db)
+        return self.departure_index
+    
+    def get_catalogue(self) -> StopCatalogue:
+        """Return the stop catalogue the departure index was built against.
+        
+        Returns:
+            Stop catalogue
+        """
+        return self.get_departure_index().catalogue
+    
+    def find_nearby_stops(self, lat: float, lon: float, radius: float) -> List[Dict[str, Any]]:
+        """Find stops within a given radius from a point.
+        
+        Args:
+            lat: Latitude of the point
+            lon: Longitude of the point
+            radius: Search radius in meters
+            
+        Returns:
+            List of stops within radius, closest first, each with added 'distance' key
+        """
+        return self.get_catalogue().find_nearby(lat, lon, radius)
     
     def get_closest_departures(
         self,
@@ -28,6 +70,13 @@ class DepartureService:
     ) -> List[Dict[str, Any]]:
         """Get closest departures heading towards destination.
         
+        Stops within radius are visited closest first and each stop's departures
+        in time order, so results are ordered by stop distance, then departure
+        time. Only trips whose service runs on the service day are considered;
+        this includes the previous day's trips running past midnight. Each trip
+        run is reported once, at the closest stop where it departs after
+        start_time.
+        
         Args:
             start_lat: Starting latitude
             start_lon: Starting longitude
@@ -50,115 +99,116 @@ class DepartureService:
             raise ValueError("Invalid end coordinates")
         
         try:
-            # Get all stops
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM stops")
-            all_stops = [dict(row) for row in cursor.fetchall()]
-            
-            # Filter stops by radius
-            nearby_stops = filter_stops_by_radius(start_lat, start_lon, all_stops, radius)
-            
-            if not nearby_stops:
-                return []
+            # Find stops within radius using the grid index
+            index = self.get_departure_index()
+            nearby_stops = index.catalogue.grid.query_radius(start_lat, start_lon, radius)
+            start_seconds = start_time.hour * 3600 + start_time.minute * 60 + start_time.second
             
-            stop_ids = [s['stop_id'] for s in nearby_stops]
-            stop_map = {s['stop_id']: s for s in nearby_stops}
-            
-            # Get departures for nearby stops
-            placeholders = ','.join('?' * len(stop_ids))
-            query = f"""
-                SELECT st.trip_id, st.stop_id, st.arrival_time, st.departure_time, st.stop_sequence,
-                       t.route_id, t.trip_headsign,
-                       s.stop_name, s.stop_lat, s.stop_lon
-                FROM stop_times st
-                JOIN trips t ON st.trip_id = t.trip_id
-                JOIN stops s ON st.stop_id = s.stop_id
-                WHERE st.stop_id IN ({placeholders})
-                ORDER BY st.trip_id, st.stop_sequence
-            """
-            
-            cursor.execute(query, stop_ids)
-            rows = cursor.fetchall()
-            
-            # Group by trip_id
-            trips = {}
-            for row in rows:
-                trip_id = row['trip_id']
-                if trip_id not in trips:
-                    trips[trip_id] = {
-                        'route_id': row['route_id'],
-                        'trip_headsign': row['trip_headsign'],
-                        'stops': []
-                    }
-                trips[trip_id]['stops'].append(dict(row))
-            
-            # Filter and build departures
+            # Take departures closest stop first, skipping trip runs already reported
             departures = []
             seen_trips = set()
-            start_time_str = start_time.strftime('%H:%M:%S')
-            
-            for trip_id, trip_data in trips.items():
-                # Check direction
-                if not is_heading_towards_destination(start_lat, start_lon, end_lat, end_lon, trip_data['stops']):
+            candidates = self._departures_heading_towards(
+                index, nearby_stops, start_time.date(), start_seconds, start_lat, start_lon, end_lat, end_lon
+            )
+            for stop, entry, day_offset in candidates:
+                trip_run = (index.trips[entry], day_offset)
+                if trip_run in seen_trips:
                     continue
-                
-                # Find departures after start_time
-                for stop in trip_data['stops']:
-                    if stop['stop_id'] not in stop_map:
-                        continue
-                    
-                    if stop['departure_time'] >= start_time_str and trip_id not in seen_trips:
-                        departures.append({
-                            'trip_id': trip_id,
-                            'route_id': trip_data['route_id'],
-                            'trip_headsign': trip_data['trip_headsign'],
-                            'stop': {
-                                'name': stop['stop_name'],
-                                'coordinates': {
-                                    'latitude': float(stop['stop_lat']),
-                                    'longitude': float(stop['stop_lon'])
-                                },
-                                'arrival_time': self._convert_to_iso(start_time, stop['arrival_time']),
-                                'departure_time': self._convert_to_iso(start_time, stop['departure_time'])
-                            },
-                            'distance': stop_map[stop['stop_id']]['distance']
-                        })
-                        seen_trips.add(trip_id)
-                        break
+                seen_trips.add(trip_run)
+                service_day = start_time + timedelta(days=day_offset)
+                departures.append(self._build_departure(index, stop, entry, service_day))
+                if len(departures) >= limit:
+                    break
             
-            # Sort by distance and limit
-            departures.sort(key=lambda d: d['distance'])
-            result = departures[:limit]
-            
-            # Remove distance from final output
-            for d in result:
-                del d['distance']
-            
-            return result
+            return departures
             
         except sqlite3.Error as e:
             raise sqlite3.Error(f"Database query failed: {e}")
     
-    def _convert_to_iso(self, base_date: datetime, time_str: str) -> str:
-        """Convert HH:MM:SS to ISO 8601 format.
+    def _departures_heading_towards(
+        self,
+        index: DepartureIndex,
+        nearby_stops: List[Tuple[int, float]],
+        day: date,
+        start_seconds: int,
+        start_lat: float,
+        start_lon: float,
+        end_lat: float,
+        end_lon: float
+    ) -> Iterator[Tuple[int, int, int]]:
+        """Yield departures after start_seconds for active trips heading towards the destination.
+        
+        Args:
+            index: Departure index
+            nearby_stops: (stop position, distance) tuples, closest first
+            day: Date of the query, selecting today's and yesterday's active services
+            start_seconds: Earliest departure, in seconds since midnight of day
+            start_lat: Starting latitude
+            start_lon: Starting longitude
+            end_lat: Destination latitude
+            end_lon: Destination longitude
+            
+        Yields:
+            (stop position, entry position, service-day offset) tuples by stop
+            distance, then departure time
+        """
+        desired_bearing = calculate_bearing(start_lat, start_lon, end_lat, end_lon)
+        headings: Dict[int, bool] = {}
+        for stop, _ in nearby_stops:
+            active = index.active_departures_after(stop, day, start_seconds)
+            while True:
+                batch = list(islice(active, DIRECTION_BATCH_SIZE))
+                if not batch:
+                    break
+                
+                # Look up precomputed bearings once per trip, for all new trips of the batch together
+                unknown = list({index.trips[e] for e, _ in batch} - headings.keys())
+                if unknown:
+                    flags = are_bearings_towards(desired_bearing, [index.trip_bearings[trip] for trip in unknown])
+                    headings.update(zip(unknown, flags))
+                
+                for entry, day_offset in batch:
+                    if headings[index.trips[entry]]:
+                        yield stop, entry, day_offset
+    
+    def _build_departure(self, index: DepartureIndex, stop: int, entry: int, start_time: datetime) -> Dict[str, Any]:
+        """Build the response dictionary for one departure.
+        
+        Args:
+            index: Departure index
+            stop: Stop position
+            entry: Entry position in the departure index
+            start_time: Midnight-relative base for the entry's times (the service day)
+            
+        Returns:
+            Departure dictionary
+        """
+        trip = index.trips[entry]
+        catalogue = index.catalogue
+        return {
+            'trip_id': index.trip_ids[trip],
+            'route_id': index.route_ids[trip],
+            'trip_headsign': index.trip_headsigns[trip],
+            'stop': {
+                'name': catalogue.stop_names[stop],
+                'coordinates': {
+                    'latitude': catalogue.stop_lats[stop],
+                    'longitude': catalogue.stop_lons[stop]
+                },
+                'arrival_time': self._seconds_to_iso(start_time, index.arrival_times[entry]),
+                'departure_time': self._seconds_to_iso(start_time, index.departure_times[entry])
+            }
+        }
+    
+    def _seconds_to_iso(self, base_date: datetime, seconds: int) -> str:
+        """Convert seconds since the start of base_date's day to ISO 8601 format.
         
         Args:
             base_date: Base date for conversion
-            time_str: Time string in HH:MM:SS format
+            seconds: Seconds since midnight, may exceed one day
             
         Returns:
             ISO 8601 formatted datetime string
         """
-        parts = time_str.split(':')
-        hours = int(parts[0])
-        minutes = int(parts[1])
-        seconds = int(parts[2])
-        
-        # Handle times >= 24:00:00
-        days_offset = hours // 24
-        hours = hours % 24
-        
-        dt = base_date.replace(hour=hours, minute=minutes, second=seconds, microsecond=0)
-        dt += timedelta(days=days_offset)
-        
+        dt = base_date.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(seconds=seconds)
         return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
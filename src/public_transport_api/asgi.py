@@ -0,0 +1,371 @@
+"""ASGI entry point for the API.
+
+Serves the same Flask app, blueprints and JSON contracts as main.py, but
+from an event loop: each request runs on a bounded worker pool, so a slow
+query occupies one worker instead of the server, and requests beyond what
+the pool and its queue can hold are turned away with 503 at once.
+
+    uvicorn src.public_transport_api.asgi:app --port 5001
+
+Workers are threads by default. Departure and journey searches are
+CPU-bound Python, so threads mostly help with waiting on SQLite; with
+FLASK_ASGI_POOL=process they run in forked processes. The timetables are
+then loaded once before forking, as in the pre-fork server (prefork.py),
+and shared by every worker (see tools/benchmark_concurrency.py).
+
+``app`` is built when first looked up, by the ASGI server, so importing
+this module never starts workers.
+"""
+import asyncio
+import contextvars
+import gc
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Defaults, overridable through the Flask app config
+DEFAULT_CONFIG = {
+    'ASGI_POOL': 'thread',  # Run requests on 'thread' or 'process' workers
+    'ASGI_WORKERS': min(32, (os.cpu_count() or 1) + 4),  # Threads or processes running requests
+    'ASGI_QUEUE_SIZE': 64,  # Requests waiting for a thread before new ones get 503
+    'ASGI_MAX_BODY': 1 << 20,  # Bytes; larger request bodies get 413
+}
+
+POOL_TYPES = ('thread', 'process')
+
+_END = object()
+_DISCONNECTED = object()
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadPoolAsgiApp:
+    """ASGI application running a WSGI app on a bounded thread pool.
+
+    Requests in flight are counted on the event loop; once ``workers +
+    queue_size`` are admitted, further requests get ``503 Service
+    Unavailable`` with ``Retry-After`` without touching the pool. Response
+    bodies are read from the WSGI iterable chunk by chunk on the pool, so
+    streamed responses (NDJSON) reach the client as they are produced. Each
+    request keeps one context across the threads it runs on, so Flask's
+    request context stays valid while streaming.
+    """
+
+    def __init__(self, wsgi_app: Callable, workers: int, queue_size: int, max_body: int = DEFAULT_CONFIG['ASGI_MAX_BODY']):
+        """
+        Args:
+            wsgi_app: WSGI application to serve
+            workers: Threads running requests
+            queue_size: Requests allowed to wait for a free thread
+            max_body: Largest request body accepted, in bytes
+        """
+        if workers <= 0 or queue_size < 0 or max_body < 0:
+            raise ValueError("workers must be positive, queue_size and max_body non-negative")
+        self.wsgi_app = wsgi_app
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_body = max_body
+        self.admitted = 0
+        self.rejected = 0
+        self.executor = self._create_executor()
+
+    def _create_executor(self):
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='asgi-worker')
+
+    def stats(self) -> Dict[str, int]:
+        """Return the requests in flight and the number turned away so far."""
+        return {'in_flight': self.admitted, 'rejected': self.rejected}
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+        if self.admitted >= self.workers + self.queue_size:
+            self.rejected += 1
+            await self._send_error(send, 503, 'Server busy, retry shortly', [(b'retry-after', b'1')])
+            return
+
+        self.admitted += 1
+        try:
+            body = await self._read_body(receive)
+            if body is _DISCONNECTED:
+                return  # Nobody is left to answer
+            if body is None:
+                await self._send_error(send, 413, f'Request body larger than {self.max_body} bytes')
+                return
+            await self._run(scope, body, send)
+        finally:
+            self.admitted -= 1
+
+    async def _run(self, scope: Dict[str, Any], body: bytes, send: Callable) -> None:
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+
+        def on_pool(func, *args):
+            return loop.run_in_executor(self.executor, context.run, func, *args)
+
+        environ = build_environ(scope, body)
+        try:
+            status, headers, chunks = await on_pool(self._start, environ)
+        except Exception:
+            await self._send_error(send, 500, 'Internal server error')
+            return
+
+        try:
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            if isinstance(chunks, (list, tuple)):
+                await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+                return
+            iterator = iter(chunks)
+            while True:
+                chunk = await on_pool(next, iterator, _END)
+                if chunk is _END:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                await on_pool(close)
+
+    def _start(self, environ: Dict[str, Any]) -> Tuple[int, List[Tuple[bytes, bytes]], Iterable[bytes]]:
+        return call_wsgi(self.wsgi_app, environ)
+
+    async def _read_body(self, receive: Callable):
+        """Return the request body, None if it is too large, or _DISCONNECTED if the client left."""
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return _DISCONNECTED
+            body.extend(message.get('body', b''))
+            if len(body) > self.max_body:
+                return None
+            if not message.get('more_body', False):
+                break
+        return bytes(body)
+
+    async def _send_error(self, send: Callable, status: int, message: str, headers: Sequence[Tuple[bytes, bytes]] = ()) -> None:
+        body = json.dumps({'error': message}).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())] + list(headers)
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _lifespan(self, receive: Callable, send: Callable) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+class ProcessPoolAsgiApp(ThreadPoolAsgiApp):
+    """ASGI application running a WSGI app on a bounded pool of forked processes.
+
+    The workers are forked when the pool is created, after ``preload`` has
+    loaded what they should share (stop catalogue, indexes, timetables); it
+    is then frozen out of garbage collection so the pages stay shared
+    copy-on-write. Responses are buffered in the worker and sent whole,
+    so streamed responses lose their incremental delivery in this mode. If
+    a worker dies, the requests it affected get 503 and the pool is forked
+    again.
+    """
+
+    def __init__(self, wsgi_app: Callable, workers: int, queue_size: int, max_body: int = DEFAULT_CONFIG['ASGI_MAX_BODY'],
+                 preload: Optional[Callable[[], Any]] = None):
+        """
+        Args:
+            wsgi_app: WSGI application to serve
+            workers: Processes running requests
+            queue_size: Requests allowed to wait for a free process
+            max_body: Largest request body accepted, in bytes
+            preload: Called before every fork to load the data the workers share
+        """
+        self.preload = preload
+        super().__init__(wsgi_app, workers, queue_size, max_body)
+
+    def _create_executor(self):
+        global _worker_app
+        _worker_app = self.wsgi_app
+        if self.preload is not None:
+            # Keep the collector from leaving holes between loaded objects, then keep it off them for good
+            gc.disable()
+            try:
+                self.preload()
+            finally:
+                gc.freeze()
+                gc.enable()
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context('fork'), initializer=_init_worker
+        )
+        # Fork every worker now, before the server starts any threads
+        executor.submit(os.getpid).result()
+        return executor
+
+    async def _run(self, scope: Dict[str, Any], body: bytes, send: Callable) -> None:
+        environ = build_environ(scope, b'')
+        del environ['wsgi.input'], environ['wsgi.errors']  # Rebuilt in the worker
+        executor = self.executor
+        try:
+            status, headers, content = await asyncio.get_running_loop().run_in_executor(
+                executor, _call_in_worker, environ, body
+            )
+        except BrokenProcessPool:
+            self._replace_broken(executor)
+            await self._send_error(send, 503, 'Worker failed, retry shortly', [(b'retry-after', b'1')])
+            return
+        except Exception:
+            await self._send_error(send, 500, 'Internal server error')
+            return
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': content})
+
+    def _replace_broken(self, executor: ProcessPoolExecutor) -> None:
+        # Every request that was on the broken pool ends up here; only the first replaces it
+        if executor is not self.executor:
+            return
+        logger.error("A worker process died; forking a new pool of %d workers", self.workers)
+        executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = self._create_executor()
+
+
+_worker_app: Optional[Callable] = None
+
+
+def _init_worker() -> None:
+    from utils.connection_pool import connection_pool
+    connection_pool.after_fork()
+
+
+def _call_in_worker(environ: Dict[str, Any], body: bytes) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    environ.update({'wsgi.input': io.BytesIO(body), 'wsgi.errors': sys.stderr})
+    status, headers, chunks = call_wsgi(_worker_app, environ)
+    try:
+        return status, headers, b''.join(chunks)
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def call_wsgi(wsgi_app: Callable, environ: Dict[str, Any]) -> Tuple[int, List[Tuple[bytes, bytes]], Iterable[bytes]]:
+    """Call a WSGI app, returning its status code, ASGI-style headers and body iterable."""
+    started = {}
+
+    def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        return lambda data: None  # The legacy write() callable is not supported
+
+    chunks = wsgi_app(environ, start_response)
+    if 'status' not in started:
+        # start_response may be deferred until the first chunk of a generator
+        iterator = iter(chunks)
+        first = next(iterator, b'')
+        chunks = _Prepend(first, iterator, chunks)
+    return started['status'], started['headers'], chunks
+
+
+class _Prepend:
+    """Body iterable with an already read first chunk put back in front."""
+
+    def __init__(self, first: bytes, rest, original):
+        self._first = first
+        self._rest = rest
+        self._original = original
+
+    def __iter__(self):
+        yield self._first
+        yield from self._rest
+
+    def close(self):
+        close = getattr(self._original, 'close', None)
+        if close is not None:
+            close()
+
+
+def build_environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    """Translate an ASGI HTTP scope and its body into a WSGI environ (PEP 3333)."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+            continue
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def create_asgi_app(flask_app=None) -> ThreadPoolAsgiApp:
+    """Wrap the API's Flask app (default: the one in main.py) for an ASGI server.
+
+    The pool is set up from the app's ASGI_* config keys, filled in with the
+    defaults.
+
+    Raises:
+        ValueError: On an unknown ASGI_POOL
+    """
+    if flask_app is None:
+        from src.public_transport_api.main import app as flask_app
+    for key, value in DEFAULT_CONFIG.items():
+        flask_app.config.setdefault(key, value)
+    pool = flask_app.config['ASGI_POOL']
+    if pool not in POOL_TYPES:
+        raise ValueError(f"ASGI_POOL must be one of {', '.join(POOL_TYPES)}")
+    args = (flask_app, flask_app.config['ASGI_WORKERS'], flask_app.config['ASGI_QUEUE_SIZE'], flask_app.config['ASGI_MAX_BODY'])
+    if pool == 'process':
+        from src.public_transport_api.prefork import preload
+        asgi_app = ProcessPoolAsgiApp(*args, preload=preload)
+    else:
+        asgi_app = ThreadPoolAsgiApp(*args)
+    flask_app.extensions['asgi'] = asgi_app
+    return asgi_app
+
+
+def __getattr__(name: str):
+    # Build ``app`` on first lookup rather than at import, so importing never forks workers
+    if name == 'app':
+        global app
+        app = create_asgi_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,78 +1,241 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, List, Optional
 import sqlite3
-from src.public_transport_api.services.departures_service import DepartureService
+from src.public_transport_api.services.departures_service import DepartureQuery, DepartureService
+from utils.connection_pool import connection_pool
+from utils.db_versions import use_database
+from utils.feed_cache import feed_version
+from utils.ndjson import ndjson_response, wants_ndjson
+from utils.result_cache import minute_bucket, result_cache, snap_point
 
 departures_bp = Blueprint('departures', __name__)
 
+DB_FILE = 'wroclaw_transport.db'
+MAX_BATCH_SIZE = 1000  # Queries accepted in one batch request
+
+@contextmanager
 def get_db_connection():
-    """Get database connection."""
-    conn = sqlite3.connect('wroclaw_transport.db')
-    return conn
+    """Borrow a pooled read-only connection to the live database version, pinned for the block."""
+    with use_database(DB_FILE) as db_path, connection_pool.connection(db_path) as conn:
+        yield conn
+
+def canonical_query(query: DepartureQuery, grid: float) -> DepartureQuery:
+    """Snap a query's coordinates to grid cell centres and its start time to the minute.
+
+    Queries with the same canonical form share one cached result.
+    """
+    start_lat, start_lon = _clamp(*snap_point(query.start_lat, query.start_lon, grid))
+    end_lat, end_lon = _clamp(*snap_point(query.end_lat, query.end_lon, grid))
+    return query._replace(
+        start_lat=start_lat, start_lon=start_lon, end_lat=end_lat, end_lon=end_lon,
+        start_time=minute_bucket(query.start_time)
+    )
+
+def _clamp(lat: float, lon: float) -> Tuple[float, float]:
+    return min(max(lat, -90.0), 90.0), min(max(lon, -180.0), 180.0)
+
+def _in_range(query: DepartureQuery) -> bool:
+    return (-90 <= query.start_lat <= 90 and -180 <= query.start_lon <= 180
+            and -90 <= query.end_lat <= 90 and -180 <= query.end_lon <= 180)
+
+def find_closest_departures(db_path: str, queries: List[DepartureQuery]) -> List[List[Dict[str, Any]]]:
+    """Answer queries from the result cache, computing the misses in one batch.
+
+    A pooled connection is only borrowed when something has to be computed.
+    With the cache disabled, the queries are answered exactly as given, as
+    are batches with invalid coordinates so the service reports them.
+    """
+    if not result_cache.enabled or not all(_in_range(query) for query in queries):
+        with connection_pool.connection(db_path) as conn:
+            service = DepartureService(conn)
+            if len(queries) == 1:
+                return [service.get_closest_departures(*queries[0])]
+            return service.get_closest_departures_batch(queries)
+    
+    version = feed_version(db_path)
+    keys = [('closest_departures', version, canonical_query(query, result_cache.grid)) for query in queries]
+    results = [result_cache.get(key) for key in keys]
+    missing = list(dict.fromkeys(key for key, result in zip(keys, results) if result is None))
+    if missing:
+        with connection_pool.connection(db_path) as conn:
+            service = DepartureService(conn)
+            if len(missing) == 1:
+                computed = [service.get_closest_departures(*missing[0][2])]
+            else:
+                computed = service.get_closest_departures_batch([key[2] for key in missing])
+        for key, departures in zip(missing, computed):
+            result_cache.put(key, departures)
+        computed_by_key = dict(zip(missing, computed))
+        results = [computed_by_key[key] if result is None else result for key, result in zip(keys, results)]
+    return results
+
+def stream_closest_departures(query: DepartureQuery) -> Response:
+    """Stream departures as NDJSON straight off the departure index, bypassing the result cache.
+
+    The query is validated before the response starts, so errors still get a
+    status code; the database version and connection stay held until the
+    stream ends.
+    """
+    resources = ExitStack()
+    try:
+        db_path = resources.enter_context(use_database(DB_FILE))
+        conn = resources.enter_context(connection_pool.connection(db_path))
+        rows = DepartureService(conn).iter_closest_departures(*query)
+    except BaseException:
+        resources.close()
+        raise
+    return ndjson_response(rows, resources)
+
+def parse_coordinates(value: Optional[str], name: str) -> Tuple[float, float]:
+    """Parse a required "lat,lon" parameter.
+
+    Raises:
+        ValueError: With the message to return to the client if it is missing or malformed
+    """
+    if not value:
+        raise ValueError(f'Missing required parameter: {name}')
+    try:
+        lat, lon = map(float, value.split(','))
+    except (ValueError, AttributeError):
+        raise ValueError('Invalid coordinate format. Expected: "lat,lon"')
+    return lat, lon
+
+def parse_start_point(params: Dict[str, Any]) -> Tuple[float, float, datetime, Dict[str, Any]]:
+    """Parse the start_coordinates and start_time every search endpoint takes.
+
+    Returns:
+        Start latitude, longitude and time (now if not given), and their echo for the response metadata
+
+    Raises:
+        ValueError: With the message to return to the client if a parameter is missing or invalid
+    """
+    start_coords_str = params.get('start_coordinates')
+    start_lat, start_lon = parse_coordinates(start_coords_str, 'start_coordinates')
+    
+    start_time_str = params.get('start_time')
+    if start_time_str:
+        try:
+            start_time = datetime.fromisoformat(start_time_str.replace('Z', '+00:00'))
+        except (ValueError, AttributeError):
+            raise ValueError('Invalid start_time format. Expected ISO 8601')
+    else:
+        start_time = datetime.now()
+    
+    echo = {'start_coordinates': start_coords_str, 'start_time': start_time.strftime('%Y-%m-%dT%H:%M:%SZ')}
+    return start_lat, start_lon, start_time, echo
+
+def parse_departure_query(params: Dict[str, Any], default_limit: str = '5',
+                          max_limit: Optional[int] = None) -> Tuple[DepartureQuery, Dict[str, Any]]:
+    """Parse closest-departures parameters into a query and their echo for the response metadata.
+
+    The journey endpoint shares these parameters and parses them here too.
+
+    Args:
+        params: Request parameters
+        default_limit: Limit used when the parameter is missing
+        max_limit: Largest limit accepted, if any
+
+    Raises:
+        ValueError: With the message to return to the client if a parameter is missing or invalid
+    """
+    start_lat, start_lon, start_time, query_parameters = parse_start_point(params)
+    end_coords_str = params.get('end_coordinates')
+    end_lat, end_lon = parse_coordinates(end_coords_str, 'end_coordinates')
+    limit_str = params.get('limit', default_limit)
+    
+    try:
+        limit = int(limit_str)
+        if limit <= 0 or isinstance(limit_str, (bool, float)):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise ValueError('Invalid limit. Expected positive integer')
+    if max_limit is not None and limit > max_limit:
+        raise ValueError(f'Invalid limit. At most {max_limit} allowed')
+    
+    query = DepartureQuery(start_lat, start_lon, end_lat, end_lon, start_time, limit)
+    query_parameters.update(end_coordinates=end_coords_str, limit=limit)
+    return query, query_parameters
 
 @departures_bp.route('/public_transport/city/<city>/closest_departures', methods=['GET'])
 def get_closest_departures(city: str) -> Tuple[Dict[str, Any], int]:
-    """Get closest departures heading towards destination."""
+    """Get closest departures heading towards destination.
+
+    With ``Accept: application/x-ndjson`` the departures are streamed one per
+    line instead, as they are found.
+    """
     if city.lower() != 'wroclaw':
         return jsonify({'error': 'City not supported'}), 404
     
     try:
-        start_coords_str = request.args.get('start_coordinates')
-        end_coords_str = request.args.get('end_coordinates')
-        start_time_str = request.args.get('start_time')
-        limit_str = request.args.get('limit', '5')
+        query, query_parameters = parse_departure_query(request.args)
+        if wants_ndjson():
+            return stream_closest_departures(query)
         
-        if not start_coords_str:
-            return jsonify({'error': 'Missing required parameter: start_coordinates'}), 400
-        if not end_coords_str:
-            return jsonify({'error': 'Missing required parameter: end_coordinates'}), 400
+        with use_database(DB_FILE) as db_path:
+            departures = find_closest_departures(db_path, [query])[0]
         
-        try:
-            start_lat, start_lon = map(float, start_coords_str.split(','))
-            end_lat, end_lon = map(float, end_coords_str.split(','))
-        except (ValueError, AttributeError):
-            return jsonify({'error': 'Invalid coordinate format. Expected: "lat,lon"'}), 400
+        response = {
+            'metadata': {
+                'self': request.full_path.rstrip('?'),
+                'city': city,
+                'query_parameters': query_parameters
+            },
+            'departures': departures
+        }
         
-        if start_time_str:
-            try:
-                start_time = datetime.fromisoformat(start_time_str.replace('Z', '+00:00'))
-            except ValueError:
-                return jsonify({'error': 'Invalid start_time format. Expected ISO 8601'}), 400
-        else:
-            start_time = datetime.now()
+        return jsonify(response), 200
         
-        try:
-            limit = int(limit_str)
-            if limit <= 0:
-                raise ValueError
-        except ValueError:
-            return jsonify({'error': 'Invalid limit. Expected positive integer'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+    except Exception as e:
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
+@departures_bp.route('/public_transport/city/<city>/closest_departures:batch', methods=['POST'])
+def get_closest_departures_batch(city: str) -> Tuple[Dict[str, Any], int]:
+    """Get closest departures for many queries at once.
+
+    The body is a JSON array of objects with the parameters of the GET
+    endpoint. Results come back in the same order, each as the GET endpoint
+    would return it.
+    """
+    if city.lower() != 'wroclaw':
+        return jsonify({'error': 'City not supported'}), 404
+    
+    try:
+        body = request.get_json(silent=True)
+        if not isinstance(body, list):
+            return jsonify({'error': 'Invalid body. Expected a JSON array of queries'}), 400
+        if len(body) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Too many queries. At most {MAX_BATCH_SIZE} per batch'}), 400
         
-        conn = get_db_connection()
-        try:
-            service = DepartureService(conn)
-            departures = service.get_closest_departures(
-                start_lat, start_lon,
-                end_lat, end_lon,
-                start_time,
-                limit
-            )
-        finally:
-            conn.close()
+        queries, parameters = [], []
+        for i, params in enumerate(body):
+            if not isinstance(params, dict):
+                return jsonify({'error': f'Query {i}: Expected an object of parameters'}), 400
+            try:
+                query, query_parameters = parse_departure_query(params)
+            except ValueError as e:
+                return jsonify({'error': f'Query {i}: {e}'}), 400
+            queries.append(query)
+            parameters.append(query_parameters)
+        
+        with use_database(DB_FILE) as db_path:
+            results = find_closest_departures(db_path, queries)
         
         response = {
             'metadata': {
-                'self': request.full_path.rstrip('?'),
+                'self': request.path,
                 'city': city,
-                'query_parameters': {
-                    'start_coordinates': start_coords_str,
-                    'end_coordinates': end_coords_str,
-                    'start_time': start_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                    'limit': limit
-                }
+                'count': len(results)
             },
-            'departures': departures
+            'results': [
+                {'query_parameters': query_parameters, 'departures': departures}
+                for query_parameters, departures in zip(parameters, results)
+            ]
         }
         
         return jsonify(response), 200
@@ -82,4 +245,4 @@ def get_closest_departures(city: str) -> Tuple[Dict[str, Any], int]:
     except sqlite3.Error as e:
         return jsonify({'error': f'Database error: {str(e)}'}), 500
     except Exception as e:
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
@@ -0,0 +1,53 @@
+from flask import Blueprint, request, jsonify
+from typing import Tuple, Dict, Any
+import sqlite3
+from src.public_transport_api.controllers.departures_controller import get_db_connection, parse_start_point
+from src.public_transport_api.services.isochrone_service import IsochroneService
+from utils.ndjson import ndjson_response, wants_ndjson
+
+isochrone_bp = Blueprint('isochrone', __name__)
+
+@isochrone_bp.route('/public_transport/city/<city>/isochrone', methods=['GET'])
+def get_isochrone(city: str) -> Tuple[Dict[str, Any], int]:
+    """Get every stop reachable from a point within a number of minutes.
+
+    With ``Accept: application/x-ndjson`` the stops are streamed one per line instead.
+    """
+    if city.lower() != 'wroclaw':
+        return jsonify({'error': 'City not supported'}), 404
+
+    try:
+        start_lat, start_lon, start_time, query_parameters = parse_start_point(request.args)
+        max_minutes_str = request.args.get('max_minutes')
+        if not max_minutes_str:
+            return jsonify({'error': 'Missing required parameter: max_minutes'}), 400
+
+        try:
+            max_minutes = int(max_minutes_str)
+        except ValueError:
+            return jsonify({'error': 'Invalid max_minutes. Expected positive integer'}), 400
+
+        with get_db_connection() as conn:
+            service = IsochroneService(conn)
+            stops = service.reachable_stops(start_lat, start_lon, start_time, max_minutes)
+
+        if wants_ndjson():
+            return ndjson_response(stops)
+
+        response = {
+            'metadata': {
+                'self': request.full_path.rstrip('?'),
+                'city': city,
+                'query_parameters': {**query_parameters, 'max_minutes': max_minutes}
+            },
+            'stops': stops
+        }
+
+        return jsonify(response), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+    except Exception as e:
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
@@ -0,0 +1,58 @@
+from flask import Blueprint, request, jsonify
+from typing import Tuple, Dict, Any
+import sqlite3
+from src.public_transport_api.controllers.departures_controller import get_db_connection, parse_departure_query
+from src.public_transport_api.services.journey_service import JourneyService
+
+journey_bp = Blueprint('journey', __name__)
+
+# Supported values of the criteria parameter
+ARRIVAL = 'arrival'
+ARRIVAL_AND_TRANSFERS = 'arrival,transfers'
+
+MAX_JOURNEYS = 10  # Largest limit accepted; each journey may take several searches
+
+@journey_bp.route('/public_transport/city/<city>/journey', methods=['GET'])
+def get_journey(city: str) -> Tuple[Dict[str, Any], int]:
+    """Get the earliest-arriving journeys, or the arrival/transfers trade-offs, between two points."""
+    if city.lower() != 'wroclaw':
+        return jsonify({'error': 'City not supported'}), 404
+
+    try:
+        query, query_parameters = parse_departure_query(request.args, default_limit='3', max_limit=MAX_JOURNEYS)
+        criteria = request.args.get('criteria', ARRIVAL)
+
+        if criteria not in (ARRIVAL, ARRIVAL_AND_TRANSFERS):
+            return jsonify({'error': f'Invalid criteria. Expected "{ARRIVAL}" or "{ARRIVAL_AND_TRANSFERS}"'}), 400
+
+        with get_db_connection() as conn:
+            service = JourneyService(conn)
+            if criteria == ARRIVAL_AND_TRANSFERS:
+                journeys = service.plan_pareto_journeys(
+                    query.start_lat, query.start_lon, query.end_lat, query.end_lon, query.start_time
+                )
+            else:
+                journeys = service.plan_journeys(
+                    query.start_lat, query.start_lon,
+                    query.end_lat, query.end_lon,
+                    query.start_time,
+                    query.limit
+                )
+
+        response = {
+            'metadata': {
+                'self': request.full_path.rstrip('?'),
+                'city': city,
+                'query_parameters': {**query_parameters, 'criteria': criteria}
+            },
+            'journeys': journeys
+        }
+
+        return jsonify(response), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+    except Exception as e:
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
@@ -1,12 +1,21 @@
-from flask import Blueprint, jsonify
+import sqlite3
+from datetime import date
 
-# Adjust import path based on your project structure
-from src.public_transport_api.services.trips_service import get_trip_details
+from flask import Blueprint, jsonify, request
+
+from src.public_transport_api.services import trips_service
+from src.public_transport_api.services.trips_service import get_trip_details, get_trip_shape
+from utils.http_cache import feed_static
 
 trips_bp = Blueprint('trips', __name__, url_prefix='/public_transport/city/<string:city>/trip')
 
+def _trip_resource(city, trip_id):
+    """Identify a trip details response: stop times depend on the requested (or current) day."""
+    return f"trip/{city.lower()}/{trip_id}/{request.args.get('date') or date.today().isoformat()}"
+
 @trips_bp.route("/<string:trip_id>", methods=["GET"])
-def handle_trip_details(city, trip_id):
+@feed_static(lambda: trips_service.DB_FILE, _trip_resource)
+def handle_trip_details(city, trip_id, db_path):
     """
     Retrieves details about a specific trip, including its route, headsign, and stop details.
 
@@ -17,15 +26,23 @@ def handle_trip_details(city, trip_id):
         Path Parameters:
         - city (str): Specifies the city for which trip details are requested. Currently, only "wroclaw" is supported.
         - trip_id (str): The unique identifier of the trip whose details need to be retrieved.
+        Query Parameters:
+        - date (str, optional): Service day in YYYY-MM-DD format the stop times refer to. Defaults to today.
 
     Returns:
         JSON response containing:
         - metadata: Information about the request, including the URL and query parameters.
         - trip_details: Details of the trip, including trip_id, route_id, trip_headsign, and a list of stops with their names, coordinates, arrival times, and departure times.
 
+    Caching:
+        Responses carry an ETag and Last-Modified derived from the imported feed and a
+        Cache-Control lifetime ending with the feed. A matching If-None-Match gets
+        304 Not Modified without querying the database.
+
     Errors:
-        - 400 Bad Request: If the city is not "wroclaw".
-        - 404 Not Found: If the trip with the specified trip_id is not found.
+        - 400 Bad Request: If the date is invalid.
+        - 404 Not Found: If the city is not "wroclaw" or the trip with the specified trip_id is not found.
+        - 500 Internal Server Error: If the database query fails.
 
     Example Response:
     {
@@ -69,5 +86,90 @@ def handle_trip_details(city, trip_id):
             ]
         }
     """
-    # TODO handle the city and the metadata. Add also error handling (i.e.: 404)
-    return jsonify(get_trip_details(trip_id))
\ No newline at end of file
+    if city.lower() != 'wroclaw':
+        return jsonify({'error': 'City not supported'}), 404
+
+    date_str = request.args.get('date')
+    try:
+        service_date = date.fromisoformat(date_str) if date_str else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Expected YYYY-MM-DD'}), 400
+
+    try:
+        trip_details = get_trip_details(trip_id, service_date, db_path)
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+
+    if trip_details is None:
+        return jsonify({'error': f'Trip not found: {trip_id}'}), 404
+
+    return jsonify({
+        'metadata': {
+            'self': request.full_path.rstrip('?'),
+            'city': city,
+            'trip_id': trip_id
+        },
+        'trip_details': trip_details
+    }), 200
+
+
+def _shape_resource(city, trip_id):
+    return f"shape/{city.lower()}/{trip_id}/{request.args.get('zoom', '')}"
+
+@trips_bp.route("/<string:trip_id>/shape", methods=["GET"])
+@feed_static(lambda: trips_service.DB_FILE, _shape_resource)
+def handle_trip_shape(city, trip_id, db_path):
+    """
+    Retrieves the geometry a trip follows, for drawing its route on a map.
+
+    Endpoint:
+        GET /public_transport/city/<city>/trip/<trip_id>/shape
+
+    Parameters:
+        Path Parameters:
+        - city (str): Currently, only "wroclaw" is supported.
+        - trip_id (str): The unique identifier of the trip.
+        Query Parameters:
+        - zoom (int, optional): Map zoom level from 0 to 20. The line is simplified (Douglas-Peucker)
+          so it deviates from the full shape by about a pixel at that zoom. Without it, every point is returned.
+
+    Returns:
+        JSON response containing:
+        - metadata: Information about the request.
+        - shape: trip_id, shape_id, zoom, point_count and the line as a Google encoded polyline (precision 5).
+
+    Caching:
+        Like trip details, responses carry an ETag and Cache-Control tied to the imported feed.
+
+    Errors:
+        - 400 Bad Request: If zoom is not an integer from 0 to 20.
+        - 404 Not Found: If the city is not "wroclaw", the trip is not found or has no shape.
+        - 500 Internal Server Error: If the database query fails.
+    """
+    if city.lower() != 'wroclaw':
+        return jsonify({'error': 'City not supported'}), 404
+
+    zoom_str = request.args.get('zoom')
+    try:
+        zoom = int(zoom_str) if zoom_str else None
+    except ValueError:
+        return jsonify({'error': 'Invalid zoom. Expected an integer'}), 400
+
+    try:
+        shape = get_trip_shape(trip_id, zoom, db_path)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+
+    if shape is None:
+        return jsonify({'error': f'Shape not found for trip: {trip_id}'}), 404
+
+    return jsonify({
+        'metadata': {
+            'self': request.full_path.rstrip('?'),
+            'city': city,
+            'trip_id': trip_id
+        },
+        'shape': shape
+    }), 200
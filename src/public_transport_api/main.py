@@ -1,23 +1,48 @@
+from typing import Any, Mapping, Optional
+
 from flask import Flask
 from flask_cors import CORS
 
 
 from src.public_transport_api.controllers.departures_controller import departures_bp
+from src.public_transport_api.controllers.isochrone_controller import isochrone_bp
+from src.public_transport_api.controllers.journey_controller import journey_bp
 from src.public_transport_api.controllers.trips_controller import trips_bp
+from utils.connection_pool import connection_pool
+from utils.result_cache import result_cache
+
+
+def create_app(config: Optional[Mapping[str, Any]] = None) -> Flask:
+    """Create the API's Flask app.
+
+    Args:
+        config: Settings applied after the FLASK_-prefixed environment variables
+    """
+    app = Flask(__name__)
+
+    CORS(app)
 
+    # Settings can be overridden with FLASK_-prefixed environment variables, e.g. FLASK_ASGI_POOL=process
+    app.config.from_prefixed_env()
+    if config:
+        app.config.update(config)
 
-app = Flask(__name__)
+    connection_pool.init_app(app)
+    result_cache.init_app(app)
 
-CORS(app)
+    app.register_blueprint(departures_bp)
+    app.register_blueprint(isochrone_bp)
+    app.register_blueprint(journey_bp)
+    app.register_blueprint(trips_bp)
 
+    @app.route("/")
+    def index():
+        return "Welcome to the Public Transport API for Wrocław!"
 
-app.register_blueprint(departures_bp)
-app.register_blueprint(trips_bp)
+    return app
 
 
-@app.route("/")
-def index():
-    return "Welcome to the Public Transport API for Wrocław!"
+app = create_app()
 
 if __name__ == "__main__":
     app.run(debug=True, port=5001)
\ No newline at end of file
@@ -0,0 +1,138 @@
+"""Pre-fork server for the API.
+
+The master process loads everything the API serves from (stop catalogue,
+departure index, connection and route timetables, footpaths, timetable
+snapshot) once, then forks worker processes that inherit it copy-on-write,
+so N workers cost about one dataset of memory rather than N.
+
+    python -m src.public_transport_api.prefork --workers 4 --port 5001
+
+Timetables are flat arrays or memory-mapped snapshot columns, so serving
+requests reads their pages without writing to them. The remaining Python
+objects stay shared because the garbage collector is kept off them: it is
+disabled while loading, and everything loaded is moved to the permanent
+generation with gc.freeze() just before forking. tools/memory_report.py
+shows how much of each worker is shared.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Iterable, List, Optional
+
+from werkzeug.serving import BaseWSGIServer
+
+from src.public_transport_api.controllers import departures_controller
+from src.public_transport_api.main import create_app
+from src.public_transport_api.services import trips_service
+from utils.connection_pool import connection_pool
+from utils.connection_scan import get_connection_timetable
+from utils.db_versions import resolve_db_path
+from utils.http_cache import get_feed_end_date
+from utils.raptor import get_route_timetable
+
+RESPAWN_DELAY = 1.0  # Seconds to wait before replacing a worker that died right after starting
+
+
+def preload(db_files: Optional[Iterable[str]] = None) -> List[str]:
+    """Load the shared feed structures of each database into this process.
+
+    Args:
+        db_files: Logical database paths, as the controllers name them
+            (default: the databases the API serves from)
+
+    Returns:
+        Paths of the database versions loaded
+
+    Raises:
+        OSError: If a database file does not exist
+    """
+    if db_files is None:
+        db_files = [departures_controller.DB_FILE, trips_service.DB_FILE]
+    loaded = []
+    for db_file in dict.fromkeys(db_files):
+        db_path = resolve_db_path(db_file)
+        connections = get_connection_timetable(db_path)  # Also loads the stops, departures and footpaths
+        connections.index.trip_positions  # Built on first use otherwise, in every worker
+        get_route_timetable(db_path)
+        get_feed_end_date(db_path)
+        loaded.append(db_path)
+    return loaded
+
+
+def serve(app, host: str, port: int, workers: int) -> None:
+    """Load the feeds, then run ``workers`` forked copies of a WSGI app on one socket.
+
+    The master only supervises: it replaces workers that exit and stops them
+    all on SIGTERM or SIGINT.
+    """
+    # Keep the collector from freeing objects between loaded ones and leaving holes in shared pages
+    gc.disable()
+    preload()
+
+    listener = socket.create_server((host, port), backlog=128)
+    host, port = listener.getsockname()[:2]
+    print(f"Listening on http://{host}:{port} with {workers} workers (master pid {os.getpid()})", flush=True)
+
+    gc.freeze()
+    children: Dict[int, float] = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                _run_worker(app, listener)
+                status = 0
+            finally:
+                os._exit(status)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        pid, status = os.wait()
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, starting another", file=sys.stderr)
+        if time.monotonic() - started < RESPAWN_DELAY:
+            time.sleep(RESPAWN_DELAY)
+        if not stopping:
+            spawn()
+    listener.close()
+
+
+def _run_worker(app, listener: socket.socket) -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C reaches the whole group; the master stops workers
+    gc.enable()
+    connection_pool.after_fork()
+    host, port = listener.getsockname()[:2]
+    server = BaseWSGIServer(host, port, app, fd=listener.fileno())
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the API from pre-forked worker processes.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=5001, help='port to listen on, 0 for any free one (default: 5001)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='worker processes (default: one per CPU)')
+    args = parser.parse_args()
+    if args.workers <= 0:
+        parser.error('--workers must be positive')
+    serve(create_app(), args.host, args.port, args.workers)
@@ -1,15 +1,93 @@
 import sqlite3
-from datetime import datetime, timedelta
-from typing import List, Dict, Any
-from utils.geo_utils import calculate_distance, filter_stops_by_radius
-from src.public_transport_api.services.direction_service import is_heading_towards_destination
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Callable, List, Dict, Any, Iterator, NamedTuple, Optional, Sequence, Tuple
+from utils.departure_index import SECONDS_PER_DAY, DepartureIndex, build_departure_index, get_departure_index
+from utils.stop_catalogue import StopCatalogue
+from utils.geo_utils import calculate_bearing
+from src.public_transport_api.services.direction_service import are_bearings_towards
+
+# Departures checked for direction together while scanning a stop's timetable
+DIRECTION_BATCH_SIZE = 32
+
+class DepartureQuery(NamedTuple):
+    """Parameters of one closest-departures query."""
+    start_lat: float
+    start_lon: float
+    end_lat: float
+    end_lon: float
+    start_time: datetime
+    limit: int = 5
+    radius: float = 1000
+
+class SharedDepartures:
+    """Active departures at stops, read once per stop and day for a batch of queries.
+
+    Each (stop, day) stream starts at the earliest time any query of the batch
+    asks for and is read only as far as some query needs, so queries whose
+    nearby stops overlap share the scan of those stops' timetables.
+    """
+    
+    def __init__(self, index: DepartureIndex, starts: Dict[Tuple[int, date], int]):
+        """
+        Args:
+            index: Departure index to read from
+            starts: Earliest start, in seconds of the day, requested for each (stop, day)
+        """
+        self.index = index
+        self.starts = starts
+        self._streams: Dict[Tuple[int, date], Tuple[Iterator[Tuple[int, int]], List[int], List[Tuple[int, int]]]] = {}
+    
+    def after(self, stop: int, day: date, start: int) -> Iterator[Tuple[int, int]]:
+        """Yield what ``index.active_departures_after(stop, day, start)`` would, from the shared stream."""
+        key = (stop, day)
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = (self.index.active_departures_after(stop, day, self.starts[key]), [], [])
+        _, times, departures = stream
+        
+        while not times or times[-1] < start:
+            if not self._read_more(stream):
+                break
+        position = bisect_left(times, start)
+        while True:
+            while position < len(departures):
+                yield departures[position]
+                position += 1
+            if not self._read_more(stream):
+                return
+    
+    def _read_more(self, stream) -> bool:
+        source, times, departures = stream
+        read = len(departures)
+        departure_times = self.index.departure_times
+        for entry, day_offset in islice(source, DIRECTION_BATCH_SIZE):
+            times.append(departure_times[entry] + day_offset * SECONDS_PER_DAY)
+            departures.append((entry, day_offset))
+        return len(departures) > read
 
 class DepartureService:
     """Service for querying public transport departures."""
     
-    def __init__(self, db_connection: sqlite3.Connection):
+    def __init__(self, db_connection: sqlite3.Connection, departure_index: Optional[DepartureIndex] = None):
         self.db = db_connection
-        self.db.row_factory = sqlite3.Row
+        self.departure_index = departure_index
+    
+    def get_departure_index(self) -> DepartureIndex:
+        """Return the shared departure index for this service's database."""
+        if self.departure_index is None:
+            db_path = self.db.execute("PRAGMA database_list").fetchone()[2]
+            self.departure_index = get_departure_index(db_path) if db_path else build_departure_index(self.db)
+        return self.departure_index
+    
+    def get_catalogue(self) -> StopCatalogue:
+        """Return the stop catalogue the departure index was built against."""
+        return self.get_departure_index().catalogue
+    
+    def find_nearby_stops(self, lat: float, lon: float, radius: float) -> List[Dict[str, Any]]:
+        """Find stops within radius of a point, closest first, with added 'distance' key."""
+        return self.get_catalogue().find_nearby(lat, lon, radius)
     
     def get_closest_departures(
         self,
@@ -21,100 +99,171 @@ class DepartureService:
         limit: int = 5,
         radius: float = 1000
     ) -> List[Dict[str, Any]]:
-        if not (-90 <= start_lat <= 90) or not (-180 <= start_lon <= 180):
-            raise ValueError("Invalid start coordinates")
-        if not (-90 <= end_lat <= 90) or not (-180 <= end_lon <= 180):
-            raise ValueError("Invalid end coordinates")
+        """Get the next departures at the closest stops, heading towards the destination.
+
+        Stops within radius are visited closest first and each stop's departures in
+        time order, so results are ordered by stop distance, then departure time.
+        Only trips running on the service day (or past midnight from the previous
+        one) count, and each trip run is reported once, at the closest stop where
+        it departs after ``start_time``.
+        """
+        return list(self.iter_closest_departures(start_lat, start_lon, end_lat, end_lon, start_time, limit, radius))
+    
+    def iter_closest_departures(
+        self,
+        start_lat: float,
+        start_lon: float,
+        end_lat: float,
+        end_lon: float,
+        start_time: datetime,
+        limit: int = 5,
+        radius: float = 1000
+    ) -> Iterator[Dict[str, Any]]:
+        """Like get_closest_departures, but yield departures one at a time as they are found.
+
+        The query is validated and the nearby stops looked up before this returns,
+        so errors are raised here rather than from the iterator. Departures are
+        built only as they are consumed, so a large ``limit`` is never held in memory.
+        """
+        query = DepartureQuery(start_lat, start_lon, end_lat, end_lon, start_time, limit, radius)
+        self._validate(query)
         
         try:
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM stops")
-            all_stops = [dict(row) for row in cursor.fetchall()]
-            
-            nearby_stops = filter_stops_by_radius(start_lat, start_lon, all_stops, radius)
-            
-            if not nearby_stops:
-                return []
-            
-            stop_ids = [s['stop_id'] for s in nearby_stops]
-            stop_map = {s['stop_id']: s for s in nearby_stops}
-            
-            placeholders = ','.join('?' * len(stop_ids))
-            query = f"""
-                SELECT st.trip_id, st.stop_id, st.arrival_time, st.departure_time, st.stop_sequence,
-                       t.route_id, t.trip_headsign,
-                       s.stop_name, s.stop_lat, s.stop_lon
-                FROM stop_times st
-                JOIN trips t ON st.trip_id = t.trip_id
-                JOIN stops s ON st.stop_id = s.stop_id
-                WHERE st.stop_id IN ({placeholders})
-                ORDER BY st.trip_id, st.stop_sequence
-            """
-            
-            cursor.execute(query, stop_ids)
-            rows = cursor.fetchall()
+            index = self.get_departure_index()
+            nearby_stops = index.catalogue.grid.query_radius(start_lat, start_lon, radius)
+            return self._iter_closest_departures(index, query, nearby_stops, index.active_departures_after)
             
-            trips = {}
-            for row in rows:
-                trip_id = row['trip_id']
-                if trip_id not in trips:
-                    trips[trip_id] = {
-                        'route_id': row['route_id'],
-                        'trip_headsign': row['trip_headsign'],
-                        'stops': []
-                    }
-                trips[trip_id]['stops'].append(dict(row))
-            
-            departures = []
-            start_time_str = start_time.strftime('%H:%M:%S')
-            
-            for trip_id, trip_data in trips.items():
-                if not is_heading_towards_destination(start_lat, start_lon, end_lat, end_lon, trip_data['stops']):
-                    continue
-                
-                for stop in trip_data['stops']:
-                    if stop['stop_id'] not in stop_map:
-                        continue
-                    
-                    if stop['departure_time'] >= start_time_str:
-                        departures.append({
-                            'trip_id': trip_id,
-                            'route_id': trip_data['route_id'],
-                            'trip_headsign': trip_data['trip_headsign'],
-                            'stop': {
-                                'name': stop['stop_name'],
-                                'coordinates': {
-                                    'latitude': float(stop['stop_lat']),
-                                    'longitude': float(stop['stop_lon'])
-                                },
-                                'arrival_time': self._convert_to_iso(start_time, stop['arrival_time']),
-                                'departure_time': self._convert_to_iso(start_time, stop['departure_time'])
-                            },
-                            'distance': stop_map[stop['stop_id']]['distance']
-                        })
-                        break
-            
-            departures.sort(key=lambda d: d['distance'])
-            result = departures[:limit]
-            
-            for d in result:
-                del d['distance']
+        except sqlite3.Error as e:
+            raise sqlite3.Error(f"Database query failed: {e}")
+    
+    def get_closest_departures_batch(self, queries: Sequence[DepartureQuery]) -> List[List[Dict[str, Any]]]:
+        """Answer many closest-departures queries at once, in input order.
+
+        Each result is what get_closest_departures returns for the query. The
+        stops near all queries are collected first, and the timetable of a stop
+        shared by several queries on the same day is read once for all of them.
+        """
+        for i, query in enumerate(queries):
+            try:
+                self._validate(query)
+            except ValueError as e:
+                raise ValueError(f"Query {i}: {e}")
+        
+        try:
+            index = self.get_departure_index()
+            grid = index.catalogue.grid
+            nearby: Dict[Tuple[float, float, float], List[Tuple[int, float]]] = {}
+            starts: Dict[Tuple[int, date], int] = {}
+            for query in queries:
+                point = (query.start_lat, query.start_lon, query.radius)
+                if point not in nearby:
+                    nearby[point] = grid.query_radius(*point)
+                day, start_seconds = query.start_time.date(), self._seconds_of_day(query.start_time)
+                for stop, _ in nearby[point]:
+                    key = (stop, day)
+                    starts[key] = min(starts.get(key, start_seconds), start_seconds)
             
-            return result
+            shared = SharedDepartures(index, starts)
+            return [
+                self._closest_departures(index, query, nearby[(query.start_lat, query.start_lon, query.radius)], shared.after)
+                for query in queries
+            ]
             
         except sqlite3.Error as e:
             raise sqlite3.Error(f"Database query failed: {e}")
     
-    def _convert_to_iso(self, base_date: datetime, time_str: str) -> str:
-        parts = time_str.split(':')
-        hours = int(parts[0])
-        minutes = int(parts[1])
-        seconds = int(parts[2])
-        
-        days_offset = hours // 24
-        hours = hours % 24
-        
-        dt = base_date.replace(hour=hours, minute=minutes, second=seconds, microsecond=0)
-        dt += timedelta(days=days_offset)
-        
+    def _validate(self, query: DepartureQuery) -> None:
+        if not (-90 <= query.start_lat <= 90) or not (-180 <= query.start_lon <= 180):
+            raise ValueError("Invalid start coordinates")
+        if not (-90 <= query.end_lat <= 90) or not (-180 <= query.end_lon <= 180):
+            raise ValueError("Invalid end coordinates")
+    
+    def _seconds_of_day(self, time: datetime) -> int:
+        return time.hour * 3600 + time.minute * 60 + time.second
+    
+    def _closest_departures(
+        self,
+        index: DepartureIndex,
+        query: DepartureQuery,
+        nearby_stops: List[Tuple[int, float]],
+        departures_after: Callable[[int, date, int], Iterator[Tuple[int, int]]]
+    ) -> List[Dict[str, Any]]:
+        """Collect up to ``query.limit`` departures heading towards the destination, one per trip run."""
+        return list(self._iter_closest_departures(index, query, nearby_stops, departures_after))
+    
+    def _iter_closest_departures(
+        self,
+        index: DepartureIndex,
+        query: DepartureQuery,
+        nearby_stops: List[Tuple[int, float]],
+        departures_after: Callable[[int, date, int], Iterator[Tuple[int, int]]]
+    ) -> Iterator[Dict[str, Any]]:
+        start_time = query.start_time
+        found = 0
+        seen_trips = set()
+        candidates = self._departures_heading_towards(
+            index, nearby_stops, start_time.date(), self._seconds_of_day(start_time),
+            query.start_lat, query.start_lon, query.end_lat, query.end_lon, departures_after
+        )
+        for stop, entry, day_offset in candidates:
+            trip_run = (index.trips[entry], day_offset)
+            if trip_run in seen_trips:
+                continue
+            seen_trips.add(trip_run)
+            service_day = start_time + timedelta(days=day_offset)
+            yield self._build_departure(index, stop, entry, service_day)
+            found += 1
+            if found >= query.limit:
+                return
+    
+    def _departures_heading_towards(
+        self,
+        index: DepartureIndex,
+        nearby_stops: List[Tuple[int, float]],
+        day: date,
+        start_seconds: int,
+        start_lat: float,
+        start_lon: float,
+        end_lat: float,
+        end_lon: float,
+        departures_after: Callable[[int, date, int], Iterator[Tuple[int, int]]]
+    ) -> Iterator[Tuple[int, int, int]]:
+        """Yield (stop, entry, day offset) for active trips heading towards the destination."""
+        desired_bearing = calculate_bearing(start_lat, start_lon, end_lat, end_lon)
+        headings: Dict[int, bool] = {}
+        for stop, _ in nearby_stops:
+            active = departures_after(stop, day, start_seconds)
+            while True:
+                batch = list(islice(active, DIRECTION_BATCH_SIZE))
+                if not batch:
+                    break
+                unknown = list({index.trips[e] for e, _ in batch} - headings.keys())
+                if unknown:
+                    flags = are_bearings_towards(desired_bearing, [index.trip_bearings[trip] for trip in unknown])
+                    headings.update(zip(unknown, flags))
+                for entry, day_offset in batch:
+                    if headings[index.trips[entry]]:
+                        yield stop, entry, day_offset
+    
+    def _build_departure(self, index: DepartureIndex, stop: int, entry: int, start_time: datetime) -> Dict[str, Any]:
+        trip = index.trips[entry]
+        catalogue = index.catalogue
+        return {
+            'trip_id': index.trip_ids[trip],
+            'route_id': index.route_ids[trip],
+            'trip_headsign': index.trip_headsigns[trip],
+            'stop': {
+                'name': catalogue.stop_names[stop],
+                'coordinates': {
+                    'latitude': catalogue.stop_lats[stop],
+                    'longitude': catalogue.stop_lons[stop]
+                },
+                'arrival_time': self._seconds_to_iso(start_time, index.arrival_times[entry]),
+                'departure_time': self._seconds_to_iso(start_time, index.departure_times[entry])
+            }
+        }
+    
+    def _seconds_to_iso(self, base_date: datetime, seconds: int) -> str:
+        """Convert seconds since the start of base_date's day to ISO 8601 format."""
+        dt = base_date.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(seconds=seconds)
         return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
@@ -1,19 +1,11 @@
 import math
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Sequence
+from utils.geo_utils import calculate_bearing
 
-def calculate_bearing(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate bearing (direction) in degrees from point 1 to point 2."""
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lon = math.radians(lon2 - lon1)
-    
-    x = math.sin(delta_lon) * math.cos(lat2_rad)
-    y = math.cos(lat1_rad) * math.sin(lat2_rad) - math.sin(lat1_rad) * math.cos(lat2_rad) * math.cos(delta_lon)
-    
-    bearing = math.atan2(x, y)
-    bearing_degrees = (math.degrees(bearing) + 360) % 360
-    
-    return bearing_degrees
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 def is_heading_towards_destination(
     start_lat: float,
@@ -42,3 +34,19 @@ def is_heading_towards_destination(
         angle_diff = 360 - angle_diff
     
     return angle_diff <= 90
+
+def is_bearing_towards(desired_bearing: float, trip_bearing: float) -> bool:
+    """Compare a precomputed trip bearing (NaN if undirected) with the desired bearing."""
+    if math.isnan(trip_bearing):
+        return True
+    angle_diff = abs(desired_bearing - trip_bearing) % 360
+    return min(angle_diff, 360 - angle_diff) <= 90
+
+def are_bearings_towards(desired_bearing: float, trip_bearings: Sequence[float]) -> List[bool]:
+    """Batch variant of is_bearing_towards, one vectorized comparison when NumPy is available."""
+    if np is None:
+        return [is_bearing_towards(desired_bearing, bearing) for bearing in trip_bearings]
+    
+    angle_diff = np.abs(desired_bearing - np.asarray(trip_bearings, dtype=float)) % 360
+    angle_diff = np.minimum(angle_diff, 360 - angle_diff)
+    return ((angle_diff <= 90) | np.isnan(angle_diff)).tolist()
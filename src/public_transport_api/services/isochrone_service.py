@@ -0,0 +1,68 @@
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from utils.connection_scan import MAX_JOURNEY_SECONDS, ConnectionTimetable, build_connection_timetable, get_connection_timetable
+
+# Longest time budget accepted, the connection scan's journey horizon
+MAX_MINUTES = MAX_JOURNEY_SECONDS // 60
+
+class IsochroneService:
+    """Service for finding the stops reachable from a point within a time budget."""
+
+    def __init__(self, db_connection: sqlite3.Connection, connections: Optional[ConnectionTimetable] = None):
+        self.db = db_connection
+        self.connections = connections
+
+    def get_connection_timetable(self) -> ConnectionTimetable:
+        """Return the shared connection timetable for this service's database."""
+        if self.connections is None:
+            db_path = self.db.execute("PRAGMA database_list").fetchone()[2]
+            self.connections = get_connection_timetable(db_path) if db_path else build_connection_timetable(self.db)
+        return self.connections
+
+    def reachable_stops(
+        self,
+        start_lat: float,
+        start_lon: float,
+        start_time: datetime,
+        max_minutes: int,
+        radius: float = 1000
+    ) -> List[Dict[str, Any]]:
+        """Find every stop reachable by transit and walking within ``max_minutes`` of ``start_time``.
+
+        Stops within ``radius`` meters of the start are reached on foot; the
+        rest by rides and walking transfers. Stops are ordered by arrival.
+        """
+        if not (-90 <= start_lat <= 90) or not (-180 <= start_lon <= 180):
+            raise ValueError("Invalid start coordinates")
+        if not 0 < max_minutes <= MAX_MINUTES:
+            raise ValueError(f"max_minutes must be between 1 and {MAX_MINUTES}")
+
+        try:
+            connections = self.get_connection_timetable()
+            catalogue = connections.index.catalogue
+            start = start_time.hour * 3600 + start_time.minute * 60 + start_time.second
+            access = catalogue.grid.query_radius(start_lat, start_lon, radius)
+            arrivals = connections.earliest_arrivals(access, start_time.date(), start, start + max_minutes * 60)
+
+            return [
+                {
+                    'stop_id': catalogue.stop_ids[stop],
+                    'stop_name': catalogue.stop_names[stop],
+                    'coordinates': {
+                        'latitude': catalogue.stop_lats[stop],
+                        'longitude': catalogue.stop_lons[stop]
+                    },
+                    'arrival_time': self._seconds_to_iso(start_time, arrival),
+                    'travel_time': arrival - start
+                }
+                for stop, arrival in sorted(arrivals.items(), key=lambda item: (item[1], item[0]))
+            ]
+
+        except sqlite3.Error as e:
+            raise sqlite3.Error(f"Database query failed: {e}")
+
+    def _seconds_to_iso(self, base_date: datetime, seconds: int) -> str:
+        """Convert seconds since the start of base_date's day to ISO 8601 format."""
+        dt = base_date.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(seconds=seconds)
+        return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
@@ -0,0 +1,183 @@
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from utils.connection_scan import (
+    DESTINATION, ORIGIN, ConnectionTimetable, Leg, build_connection_timetable, get_connection_timetable
+)
+from utils.departure_index import DepartureIndex
+from utils.geo_utils import calculate_distance
+from utils.raptor import RouteTimetable, build_route_timetable, get_route_timetable
+
+# Journeys looked up per requested journey before giving up on finding later ones
+MAX_SEARCHES_PER_JOURNEY = 3
+
+class JourneyService:
+    """Service for planning journeys with transfers."""
+
+    def __init__(
+        self,
+        db_connection: sqlite3.Connection,
+        connections: Optional[ConnectionTimetable] = None,
+        routes: Optional[RouteTimetable] = None
+    ):
+        self.db = db_connection
+        self.connections = connections
+        self.routes = routes
+
+    def get_connection_timetable(self) -> ConnectionTimetable:
+        """Return the shared connection timetable for this service's database."""
+        if self.connections is None:
+            db_path = self.db.execute("PRAGMA database_list").fetchone()[2]
+            self.connections = get_connection_timetable(db_path) if db_path else build_connection_timetable(self.db)
+        return self.connections
+
+    def get_route_timetable(self) -> RouteTimetable:
+        """Return the shared route timetable for this service's database."""
+        if self.routes is None:
+            db_path = self.db.execute("PRAGMA database_list").fetchone()[2]
+            self.routes = get_route_timetable(db_path) if db_path else build_route_timetable(self.db)
+        return self.routes
+
+    def plan_journeys(
+        self,
+        start_lat: float,
+        start_lon: float,
+        end_lat: float,
+        end_lon: float,
+        start_time: datetime,
+        limit: int = 3,
+        radius: float = 1000
+    ) -> List[Dict[str, Any]]:
+        """Find the earliest-arriving journeys leaving at or after ``start_time``.
+
+        The first journey arrives earliest; each following one leaves later than
+        the previous one. Stops within ``radius`` meters of either end are
+        reached on foot.
+        """
+        self._validate(start_lat, start_lon, end_lat, end_lon)
+        try:
+            connections = self.get_connection_timetable()
+            access, egress, direct_walk = self._walks(connections.index, start_lat, start_lon, end_lat, end_lon, radius)
+            day, start = start_time.date(), self._seconds_of_day(start_time)
+
+            journeys: List[List[Leg]] = []
+            for _ in range(limit * MAX_SEARCHES_PER_JOURNEY):
+                legs = connections.earliest_arrival(access, egress, day, start, direct_walk)
+                if legs is None:
+                    break
+                # A later start arriving just as early makes the previous journey pointless
+                if journeys and legs[-1].arrival <= journeys[-1][-1].arrival:
+                    journeys.pop()
+                journeys.append(legs)
+                if len(journeys) >= limit or all(leg.trip is None for leg in legs):
+                    break
+                start = legs[0].departure + 1
+
+            points = {ORIGIN: (start_lat, start_lon), DESTINATION: (end_lat, end_lon)}
+            return [self._build_journey(connections.index, legs, points, start_time) for legs in journeys]
+
+        except sqlite3.Error as e:
+            raise sqlite3.Error(f"Database query failed: {e}")
+
+    def plan_pareto_journeys(
+        self,
+        start_lat: float,
+        start_lon: float,
+        end_lat: float,
+        end_lon: float,
+        start_time: datetime,
+        radius: float = 1000
+    ) -> List[Dict[str, Any]]:
+        """Find the journeys trading arrival time against transfers, leaving at or after ``start_time``.
+
+        Every returned journey arrives earlier than all journeys with fewer
+        transfers; they are ordered by number of transfers.
+        """
+        self._validate(start_lat, start_lon, end_lat, end_lon)
+        try:
+            routes = self.get_route_timetable()
+            access, egress, direct_walk = self._walks(routes.index, start_lat, start_lon, end_lat, end_lon, radius)
+            journeys = routes.pareto_journeys(
+                access, egress, start_time.date(), self._seconds_of_day(start_time), direct_walk
+            )
+            points = {ORIGIN: (start_lat, start_lon), DESTINATION: (end_lat, end_lon)}
+            return [self._build_journey(routes.index, legs, points, start_time) for legs in journeys]
+
+        except sqlite3.Error as e:
+            raise sqlite3.Error(f"Database query failed: {e}")
+
+    def _validate(self, start_lat: float, start_lon: float, end_lat: float, end_lon: float) -> None:
+        if not (-90 <= start_lat <= 90) or not (-180 <= start_lon <= 180):
+            raise ValueError("Invalid start coordinates")
+        if not (-90 <= end_lat <= 90) or not (-180 <= end_lon <= 180):
+            raise ValueError("Invalid end coordinates")
+
+    def _walks(
+        self, index: DepartureIndex, start_lat: float, start_lon: float, end_lat: float, end_lon: float, radius: float
+    ) -> Tuple[List[Tuple[int, float]], List[Tuple[int, float]], Optional[float]]:
+        """Return the access stops, egress stops and direct walking distance, if within radius."""
+        grid = index.catalogue.grid
+        direct = calculate_distance(start_lat, start_lon, end_lat, end_lon)
+        return (
+            grid.query_radius(start_lat, start_lon, radius),
+            grid.query_radius(end_lat, end_lon, radius),
+            direct if direct <= radius else None
+        )
+
+    def _seconds_of_day(self, time: datetime) -> int:
+        return time.hour * 3600 + time.minute * 60 + time.second
+
+    def _build_journey(
+        self, index: DepartureIndex, legs: List[Leg], points: Dict[int, Any], start_time: datetime
+    ) -> Dict[str, Any]:
+        rides = sum(1 for leg in legs if leg.trip is not None)
+        return {
+            'departure_time': self._seconds_to_iso(start_time, legs[0].departure),
+            'arrival_time': self._seconds_to_iso(start_time, legs[-1].arrival),
+            'duration': legs[-1].arrival - legs[0].departure,
+            'transfers': max(rides - 1, 0),
+            'legs': [self._build_leg(index, leg, points, start_time) for leg in legs]
+        }
+
+    def _build_leg(
+        self, index: DepartureIndex, leg: Leg, points: Dict[int, Any], start_time: datetime
+    ) -> Dict[str, Any]:
+        built = {
+            'from': self._build_place(index.catalogue, leg.from_stop, points),
+            'to': self._build_place(index.catalogue, leg.to_stop, points),
+            'departure_time': self._seconds_to_iso(start_time, leg.departure),
+            'arrival_time': self._seconds_to_iso(start_time, leg.arrival)
+        }
+        if leg.trip is None:
+            start, end = built['from']['coordinates'], built['to']['coordinates']
+            return {
+                'mode': 'walk',
+                'distance': round(calculate_distance(
+                    start['latitude'], start['longitude'], end['latitude'], end['longitude']
+                )),
+                **built
+            }
+        return {
+            'mode': 'transit',
+            'trip_id': index.trip_ids[leg.trip],
+            'route_id': index.route_ids[leg.trip],
+            'trip_headsign': index.trip_headsigns[leg.trip],
+            **built
+        }
+
+    def _build_place(self, catalogue, stop: int, points: Dict[int, Any]) -> Dict[str, Any]:
+        if stop in points:
+            lat, lon = points[stop]
+            return {'name': None, 'coordinates': {'latitude': lat, 'longitude': lon}}
+        return {
+            'name': catalogue.stop_names[stop],
+            'coordinates': {
+                'latitude': catalogue.stop_lats[stop],
+                'longitude': catalogue.stop_lons[stop]
+            }
+        }
+
+    def _seconds_to_iso(self, base_date: datetime, seconds: int) -> str:
+        """Convert seconds since the start of base_date's day to ISO 8601 format."""
+        dt = base_date.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(seconds=seconds)
+        return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
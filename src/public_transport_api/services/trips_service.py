@@ -1,56 +1,178 @@
 import sqlite3
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
+from utils.connection_pool import connection_pool
+from utils.db_versions import use_database
+from utils.feed_cache import FeedVersion, feed_version
+from utils.shapes import MAX_ZOOM, encode_polyline, load_shape, significance, zoom_tolerance
 
-def get_trip_details(trip_id):
-    # FIXME This is a mock implementation and should be replaced with actual database queries.
-    conn = sqlite3.connect('trips.sqlite')
-    cursor = conn.cursor()
+DB_FILE = 'wroclaw_transport.db'
+TRIP_CACHE_SIZE = 2048  # Trips whose stops are kept in memory
+SHAPE_CACHE_SIZE = 512  # Shapes whose simplified geometries are kept in memory
 
-    cursor.execute("""
-        SELECT route_id, trip_headsign FROM main.trips LIMIT 1
-    """)
-    first_trip_row = cursor.fetchone()
+# A trip as stored: (route_id, trip_headsign, [(stop name, lat, lon, arrival, departure), ...])
+StoredTrip = Tuple[str, str, List[Tuple[str, float, float, Optional[str], Optional[str]]]]
 
-    conn.close()
 
-    if not first_trip_row:
+@lru_cache(maxsize=TRIP_CACHE_SIZE)
+def _load_trip(version: FeedVersion, trip_id: str) -> Optional[StoredTrip]:
+    """Read a trip and its stops in order from one version of the database.
+
+    Keyed by feed version, so a new import never serves stops of the old one.
+    Stop times are read through the (trip_id, stop_sequence) index, already ordered.
+    """
+    with connection_pool.connection(version[0]) as conn:
+        trip = conn.execute(
+            "SELECT route_id, trip_headsign FROM trips WHERE trip_id = ?", (trip_id,)
+        ).fetchone()
+        if trip is None:
+            return None
+        stops = conn.execute("""
+            SELECT s.stop_name, s.stop_lat, s.stop_lon, st.arrival_time, st.departure_time
+            FROM stop_times st
+            JOIN stops s ON s.stop_id = st.stop_id
+            WHERE st.trip_id = ?
+            ORDER BY st.stop_sequence
+        """, (trip_id,)).fetchall()
+    return trip[0], trip[1], [tuple(stop) for stop in stops]
+
+
+@lru_cache(maxsize=TRIP_CACHE_SIZE)
+def _load_shape_id(version: FeedVersion, trip_id: str) -> Optional[str]:
+    """Return the shape a trip follows, or None for unknown trips and trips without one."""
+    with connection_pool.connection(version[0]) as conn:
+        try:
+            row = conn.execute("SELECT shape_id FROM trips WHERE trip_id = ?", (trip_id,)).fetchone()
+        except sqlite3.OperationalError:
+            return None  # shape_id is optional in GTFS
+    return row[0] if row and row[0] else None
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def _load_shape_levels(version: FeedVersion, shape_id: str) -> Optional[Tuple[Tuple[int, str], ...]]:
+    """Simplify and encode a shape for every zoom level at once.
+
+    Returns:
+        (point count, encoded polyline) for zoom 0 to MAX_ZOOM, then for the full
+        shape; or None if the feed has no such shape. Many trips share a shape,
+        so this runs once per shape and feed version.
+    """
+    with connection_pool.connection(version[0]) as conn:
+        points = load_shape(conn, shape_id)
+    if not points:
+        return None
+    ranks = significance(points)
+    latitude = points[len(points) // 2][0]
+    levels = []
+    for tolerance in [zoom_tolerance(zoom, latitude) for zoom in range(MAX_ZOOM + 1)] + [-1.0]:
+        kept = [point for point, rank in zip(points, ranks) if rank > tolerance]
+        # Higher zooms often keep the same points; reuse the previous encoding then
+        if levels and levels[-1][0] == len(kept):
+            levels.append(levels[-1])
+        else:
+            levels.append((len(kept), encode_polyline(kept)))
+    return tuple(levels)
+
+
+def _pinned(db_path: Optional[str]):
+    return nullcontext(db_path) if db_path is not None else use_database(DB_FILE)
+
+
+def get_trip_shape(trip_id: str, zoom: Optional[int] = None, db_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Return the geometry a trip follows as an encoded polyline.
+
+    Args:
+        trip_id: GTFS trip identifier
+        zoom: Map zoom level (0 to MAX_ZOOM) to simplify for, or None for every point
+        db_path: Database version the caller has pinned (default: pin the live version of DB_FILE)
+
+    Returns:
+        Shape details, or None if the trip is unknown or has no shape
+
+    Raises:
+        ValueError: If the zoom level is out of range
+        sqlite3.Error: If the database query fails
+    """
+    if zoom is not None and not (0 <= zoom <= MAX_ZOOM):
+        raise ValueError(f"Invalid zoom. Expected an integer from 0 to {MAX_ZOOM}")
+
+    with _pinned(db_path) as db_path:
+        version = feed_version(db_path)
+        try:
+            shape_id = _load_shape_id(version, trip_id)
+            levels = _load_shape_levels(version, shape_id) if shape_id is not None else None
+        except sqlite3.Error as e:
+            raise sqlite3.Error(f"Database query failed: {e}")
+
+    if levels is None:
         return None
 
-    route_id, trip_headsign = first_trip_row
-
-    mocked_stop_details = [
-        {
-            "name": "Mock Stop A",
-            "coordinates": {
-                "latitude": 40.7128,
-                "longitude": -74.0060
-            },
-            "arrival_time": "2025-04-02T08:00:00Z",
-            "departure_time": "2025-04-02T08:05:00Z"
-        },
-        {
-            "name": "Mock Stop B",
-            "coordinates": {
-                "latitude": 40.7580,
-                "longitude": -73.9855
-            },
-            "arrival_time": "2025-04-02T08:15:00Z",
-            "departure_time": "2025-04-02T08:20:00Z"
-        },
-        {
-            "name": "Mock Stop C",
-            "coordinates": {
-                "latitude": 40.7850,
-                "longitude": -73.9650
-            },
-            "arrival_time": "2025-04-02T08:30:00Z",
-            "departure_time": "2025-04-02T08:35:00Z"
-        }
-    ]
+    point_count, polyline = levels[MAX_ZOOM + 1 if zoom is None else zoom]
+    return {
+        "trip_id": trip_id,
+        "shape_id": shape_id,
+        "zoom": zoom,
+        "point_count": point_count,
+        "polyline": polyline
+    }
+
+
+def get_trip_details(trip_id: str, service_date: Optional[date] = None,
+                     db_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Return a trip's route, headsign and its stops in order.
+
+    Args:
+        trip_id: GTFS trip identifier
+        service_date: Day the trip runs on, for the stop times (default: today)
+        db_path: Database version the caller has pinned (default: pin the live version of DB_FILE)
+
+    Returns:
+        Trip details, or None if there is no such trip
 
+    Raises:
+        sqlite3.Error: If the database query fails
+    """
+    with _pinned(db_path) as db_path:
+        try:
+            trip = _load_trip(feed_version(db_path), trip_id)
+        except sqlite3.Error as e:
+            raise sqlite3.Error(f"Database query failed: {e}")
+
+    if trip is None:
+        return None
+
+    route_id, trip_headsign, stops = trip
+    base_date = datetime.combine(service_date or date.today(), datetime.min.time())
     return {
         "trip_id": trip_id,
         "route_id": route_id,
         "trip_headsign": trip_headsign,
-        "stops": mocked_stop_details
+        "stops": [
+            {
+                "name": name,
+                "coordinates": {
+                    "latitude": lat,
+                    "longitude": lon
+                },
+                # Stops that are not timepoints may leave one or both times empty
+                "arrival_time": _convert_to_iso(base_date, arrival_time or departure_time),
+                "departure_time": _convert_to_iso(base_date, departure_time or arrival_time)
+            }
+            for name, lat, lon, arrival_time, departure_time in stops
+        ]
     }
+
+
+def _convert_to_iso(base_date: datetime, time_str: Optional[str]) -> Optional[str]:
+    """Convert a GTFS time, which may run past 24:00, on a service day to ISO 8601.
+
+    Returns None for an empty or missing time.
+    """
+    if not time_str:
+        return None
+    hours, minutes, seconds = map(int, time_str.split(':'))
+    dt = base_date + timedelta(hours=hours, minutes=minutes, seconds=seconds)
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
@@ -1,7 +1,9 @@
 from flask import Flask
 from controllers.departures_controller import departures_bp
+from utils.connection_pool import connection_pool
 
 app = Flask(__name__)
+connection_pool.init_app(app)
 app.register_blueprint(departures_bp)
 
 if __name__ == '__main__':
@@ -5,13 +5,14 @@ sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 import sqlite3
 from datetime import datetime
 from services.departure_service import DepartureService
+from utils.db_versions import resolve_db_path
 
 print("Testing DepartureService:")
 print("=" * 60)
 
 # Connect to database
 try:
-    conn = sqlite3.connect('wroclaw_transport.db')
+    conn = sqlite3.connect(resolve_db_path('wroclaw_transport.db'))
     service = DepartureService(conn)
     print("✓ Connected to database\n")
 except Exception as e:
@@ -80,18 +81,18 @@ except Exception as e:
     print(f"✗ Test failed: {e}")
 
 # Test 4: Time conversion
-print("\n\nTest 4: Time conversion (HH:MM:SS to ISO 8601)")
+print("\n\nTest 4: Time conversion (seconds after midnight to ISO 8601)")
 print("-" * 60)
 try:
     base_date = datetime(2025, 4, 2, 0, 0, 0)
     
     # Test normal time
-    iso_time = service._convert_to_iso(base_date, "08:30:00")
+    iso_time = service._seconds_to_iso(base_date, 8 * 3600 + 30 * 60)
     print(f"08:30:00 -> {iso_time}")
     assert iso_time == "2025-04-02T08:30:00Z"
     
     # Test time >= 24:00:00 (next day)
-    iso_time = service._convert_to_iso(base_date, "25:30:00")
+    iso_time = service._seconds_to_iso(base_date, 25 * 3600 + 30 * 60)
     print(f"25:30:00 -> {iso_time}")
     assert iso_time == "2025-04-03T01:30:00Z"
     
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from src.public_transport_api.services import direction_service
+from src.public_transport_api.services.direction_service import (
+    are_bearings_towards,
+    is_bearing_towards,
+    is_heading_towards_destination,
+)
+from utils.geo_utils import calculate_bearing
+
+
+@pytest.fixture
+def random_trips():
+    """Random trips of varying length, including trips without a direction."""
+    rng = random.Random(11)
+    trips = []
+    for _ in range(300):
+        trips.append([
+            {'stop_lat': 51.0 + rng.random() * 0.2, 'stop_lon': 16.9 + rng.random() * 0.3}
+            for _ in range(rng.choice([0, 1, 2, 5, 12]))
+        ])
+    return trips
+
+
+class TestBearingsTowards:
+    """Tests for direction checks against precomputed trip bearings."""
+
+    @pytest.mark.parametrize('trip_bearing, expected', [
+        (45.0, True),
+        (134.0, True),
+        (136.0, False),
+        (350.0, True),
+        (226.0, False),
+        (float('nan'), True),
+    ])
+    def test_scalar(self, trip_bearing, expected):
+        """Test the 90 degree tolerance across north and undirected trips."""
+        assert is_bearing_towards(44.0, trip_bearing) == expected
+
+    @pytest.mark.parametrize('use_numpy', [True, False])
+    def test_matches_stop_based_check(self, monkeypatch, random_trips, use_numpy):
+        """Test bearing lookups agree with is_heading_towards_destination."""
+        if use_numpy:
+            pytest.importorskip('numpy')
+        else:
+            monkeypatch.setattr(direction_service, 'np', None)
+        bearings = [
+            calculate_bearing(trip[0]['stop_lat'], trip[0]['stop_lon'], trip[-1]['stop_lat'], trip[-1]['stop_lon'])
+            if len(trip) >= 2 else float('nan')
+            for trip in random_trips
+        ]
+        expected = [
+            is_heading_towards_destination(51.1079, 17.0385, 51.1141, 17.0301, trip)
+            for trip in random_trips
+        ]
+        
+        result = are_bearings_towards(calculate_bearing(51.1079, 17.0385, 51.1141, 17.0301), bearings)
+        
+        assert result == expected
@@ -0,0 +1,49 @@
+import pytest
+from datetime import datetime
+from unittest.mock import Mock
+from src.public_transport_api.services.isochrone_service import IsochroneService
+from utils.connection_scan import ConnectionTimetable
+from utils.departure_index import DepartureIndex
+from utils.stop_catalogue import StopCatalogue
+
+
+@pytest.fixture
+def isochrone_service():
+    """IsochroneService over stops A-B-C on a line with one trip at 08:00."""
+    catalogue = StopCatalogue(['A', 'B', 'C'], ['Stop A', 'Stop B', 'Stop C'], [51.10, 51.12, 51.14], [17.0] * 3)
+    stop_times = [('T1', 'A', '08:00:00', '08:00:00'), ('T1', 'B', '08:10:00', '08:10:00'), ('T1', 'C', '08:40:00', '08:40:00')]
+    index = DepartureIndex(catalogue, [('T1', 'R1', 'Stop C', 'WD')], sorted((s, t, 0, a, d) for t, s, a, d in stop_times))
+    return IsochroneService(Mock(), ConnectionTimetable(index, stop_times))
+
+
+class TestIsochroneService:
+    """Test cases for IsochroneService class."""
+
+    def test_reachable_stops(self, isochrone_service):
+        """Test stops reached within the budget are listed by arrival with their travel time."""
+        stops = isochrone_service.reachable_stops(51.10, 17.0, datetime(2025, 4, 2, 7, 55), 30)
+        
+        assert [stop['stop_id'] for stop in stops] == ['A', 'B']
+        assert stops[0]['arrival_time'] == '2025-04-02T07:55:00Z'
+        assert stops[1] == {
+            'stop_id': 'B',
+            'stop_name': 'Stop B',
+            'coordinates': {'latitude': 51.12, 'longitude': 17.0},
+            'arrival_time': '2025-04-02T08:10:00Z',
+            'travel_time': 900
+        }
+
+    def test_larger_budget_reaches_further(self, isochrone_service):
+        """Test a longer budget adds the stops reached later."""
+        stops = isochrone_service.reachable_stops(51.10, 17.0, datetime(2025, 4, 2, 7, 55), 60)
+        
+        assert [stop['stop_id'] for stop in stops] == ['A', 'B', 'C']
+
+    def test_invalid_parameters(self, isochrone_service):
+        """Test invalid coordinates and budgets are rejected."""
+        with pytest.raises(ValueError, match="Invalid start coordinates"):
+            isochrone_service.reachable_stops(91, 17.0, datetime(2025, 4, 2, 8, 0), 30)
+        with pytest.raises(ValueError, match="max_minutes"):
+            isochrone_service.reachable_stops(51.10, 17.0, datetime(2025, 4, 2, 8, 0), 0)
+        with pytest.raises(ValueError, match="max_minutes"):
+            isochrone_service.reachable_stops(51.10, 17.0, datetime(2025, 4, 2, 8, 0), 181)
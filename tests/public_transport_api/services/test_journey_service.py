@@ -0,0 +1,76 @@
+import pytest
+from datetime import datetime
+from unittest.mock import Mock
+from src.public_transport_api.services.journey_service import JourneyService
+from utils.connection_scan import ConnectionTimetable
+from utils.departure_index import DepartureIndex
+from utils.raptor import RouteTimetable
+from utils.stop_catalogue import StopCatalogue
+
+
+@pytest.fixture
+def timetable():
+    """Stops A-B-C on a line with a ride and a transfer every hour, and a slow direct trip at 07:58."""
+    catalogue = StopCatalogue(['A', 'B', 'C'], ['Stop A', 'Stop B', 'Stop C'], [51.10, 51.11, 51.12], [17.0] * 3)
+    stop_times = [('Z', 'A', '07:58:00', '07:58:00'), ('Z', 'C', '08:40:00', '08:40:00')]
+    trips = [('Z', 'R3', 'Stop C', 'WD')]
+    for i, start in enumerate(['08', '09']):
+        trips += [(f'X{i}', 'R1', 'Stop B', 'WD'), (f'Y{i}', 'R2', 'Stop C', 'WD')]
+        stop_times += [
+            (f'X{i}', 'A', f'{start}:00:00', f'{start}:00:00'), (f'X{i}', 'B', f'{start}:05:00', f'{start}:05:00'),
+            (f'Y{i}', 'B', f'{start}:10:00', f'{start}:10:00'), (f'Y{i}', 'C', f'{start}:15:00', f'{start}:15:00'),
+        ]
+    stop_times.sort(key=lambda row: row[0])
+    index = DepartureIndex(catalogue, trips, sorted((stop, trip, 0, arr, dep) for trip, stop, arr, dep in stop_times))
+    return index, stop_times
+
+
+@pytest.fixture
+def journey_service(timetable):
+    """JourneyService over the sample connections and route patterns."""
+    index, stop_times = timetable
+    return JourneyService(Mock(), ConnectionTimetable(index, stop_times), RouteTimetable(index, stop_times))
+
+
+class TestJourneyService:
+    """Test cases for JourneyService class."""
+
+    def test_plan_journeys(self, journey_service):
+        """Test journeys are returned earliest first with walk and transit legs."""
+        journeys = journey_service.plan_journeys(51.10, 17.0, 51.12, 17.0, datetime(2025, 4, 2, 7, 50), limit=2)
+        
+        assert [j['departure_time'] for j in journeys] == ['2025-04-02T08:00:00Z', '2025-04-02T09:00:00Z']
+        first = journeys[0]
+        assert first['arrival_time'] == '2025-04-02T08:15:00Z'
+        assert first['transfers'] == 1
+        assert [leg['mode'] for leg in first['legs']] == ['walk', 'transit', 'transit', 'walk']
+        assert first['legs'][1]['trip_id'] == 'X0'
+        assert first['legs'][1]['from']['name'] == 'Stop A'
+        assert first['legs'][2]['to']['name'] == 'Stop C'
+        assert first['legs'][0]['from'] == {'name': None, 'coordinates': {'latitude': 51.10, 'longitude': 17.0}}
+        assert first['legs'][0]['distance'] == 0
+
+    def test_plan_pareto_journeys(self, journey_service):
+        """Test the direct trip and the faster journey with a transfer are both offered, fewest transfers first."""
+        journeys = journey_service.plan_pareto_journeys(51.10, 17.0, 51.12, 17.0, datetime(2025, 4, 2, 7, 50))
+        
+        assert [j['transfers'] for j in journeys] == [0, 1]
+        assert [j['arrival_time'] for j in journeys] == ['2025-04-02T08:40:00Z', '2025-04-02T08:15:00Z']
+        assert [leg.get('trip_id') for leg in journeys[0]['legs']] == [None, 'Z', None]
+        assert journeys[1]['legs'][2]['to']['name'] == 'Stop C'
+
+    def test_pareto_invalid_coordinates(self, journey_service):
+        """Test coordinates are validated for Pareto journeys too."""
+        with pytest.raises(ValueError, match="Invalid start coordinates"):
+            journey_service.plan_pareto_journeys(91, 17.0, 51.12, 17.0, datetime(2025, 4, 2, 8, 0))
+
+    def test_no_journey(self, journey_service):
+        """Test an empty list when nothing runs any more."""
+        assert journey_service.plan_journeys(51.10, 17.0, 51.12, 17.0, datetime(2025, 4, 2, 22, 0)) == []
+
+    def test_invalid_coordinates(self, journey_service):
+        """Test coordinates outside valid ranges are rejected."""
+        with pytest.raises(ValueError, match="Invalid start coordinates"):
+            journey_service.plan_journeys(91, 17.0, 51.12, 17.0, datetime(2025, 4, 2, 8, 0))
+        with pytest.raises(ValueError, match="Invalid end coordinates"):
+            journey_service.plan_journeys(51.10, 17.0, 51.12, 181, datetime(2025, 4, 2, 8, 0))
@@ -1,9 +1,12 @@
 import pytest
 import sqlite3
-from datetime import datetime
+from datetime import date, datetime
 from unittest.mock import Mock, MagicMock, patch
-from src.public_transport_api.services.departures_service import DepartureService
+from src.public_transport_api.services.departures_service import DepartureQuery, DepartureService
 from src.public_transport_api.services import trips_service
+from utils.departure_index import DepartureIndex
+from utils.service_calendar import ServiceCalendar
+from utils.stop_catalogue import StopCatalogue
 
 
 @pytest.fixture
@@ -45,43 +48,60 @@ def sample_stop_times():
 
 
 @pytest.fixture
-def departure_service(mock_db):
+def catalogue(sample_stops):
+    """Stop catalogue built from sample stops."""
+    return StopCatalogue(
+        [s['stop_id'] for s in sample_stops],
+        [s['stop_name'] for s in sample_stops],
+        [s['stop_lat'] for s in sample_stops],
+        [s['stop_lon'] for s in sample_stops]
+    )
+
+
+@pytest.fixture
+def sample_trips():
+    """Sample trips data."""
+    return [('T1', 'R1', 'Downtown', 'S')]
+
+
+def build_index(catalogue, trips, stop_times):
+    """Build a departure index from stop time dictionaries."""
+    rows = sorted(
+        (st['stop_id'], st['trip_id'], st['stop_sequence'], st['arrival_time'], st['departure_time'])
+        for st in stop_times
+    )
+    return DepartureIndex(catalogue, trips, rows)
+
+
+@pytest.fixture
+def departure_index(catalogue, sample_trips, sample_stop_times):
+    """Departure index over the sample timetable."""
+    return build_index(catalogue, sample_trips, sample_stop_times)
+
+
+@pytest.fixture
+def departure_service(mock_db, departure_index):
     """Create DepartureService instance with mock database."""
-    return DepartureService(mock_db)
+    return DepartureService(mock_db, departure_index)
 
 
 class TestDepartureService:
     """Tests for DepartureService."""
 
-    def test_init(self, mock_db):
-        """Test service initialization."""
-        service = DepartureService(mock_db)
-        assert service.db == mock_db
-        assert mock_db.row_factory == sqlite3.Row
+    def test_init(self):
+        """Test service initialization leaves the connection's row factory alone."""
+        conn = sqlite3.connect(':memory:')
+        try:
+            service = DepartureService(conn)
+            assert service.db is conn
+            assert conn.row_factory is None
+        finally:
+            conn.close()
 
-    def test_get_closest_departures_valid_inputs(self, departure_service, mock_db, mock_cursor, sample_stops, sample_stop_times):
+    def test_get_closest_departures_valid_inputs(self, departure_service):
         """Test finding departures with valid inputs."""
-        mock_db.cursor.return_value = mock_cursor
-        
-        def create_row_mock(data):
-            m = Mock()
-            m.keys.return_value = data.keys()
-            m.__getitem__ = lambda self, key: data[key]
-            return m
-        
-        mock_cursor.fetchall.side_effect = [
-            [create_row_mock(stop) for stop in sample_stops],
-            [create_row_mock(st) for st in sample_stop_times]
-        ]
-        
-        with patch('src.public_transport_api.services.departures_service.filter_stops_by_radius') as mock_filter, \
-             patch('src.public_transport_api.services.departures_service.is_heading_towards_destination') as mock_heading:
-            
-            mock_filter.return_value = [
-                {**sample_stops[0], 'distance': 100},
-                {**sample_stops[1], 'distance': 200}
-            ]
-            mock_heading.return_value = True
+        with patch('src.public_transport_api.services.departures_service.are_bearings_towards') as mock_heading:
+            mock_heading.side_effect = lambda *args: [True] * len(args[-1])
             
             result = departure_service.get_closest_departures(
                 start_lat=51.1079,
@@ -93,9 +113,17 @@ class TestDepartureService:
                 radius=1000
             )
             
-            assert isinstance(result, list)
-            assert len(result) <= 5
-            mock_filter.assert_called_once()
+            assert result == [{
+                'trip_id': 'T1',
+                'route_id': 'R1',
+                'trip_headsign': 'Downtown',
+                'stop': {
+                    'name': 'Stop A',
+                    'coordinates': {'latitude': 51.1079, 'longitude': 17.0385},
+                    'arrival_time': '2025-04-02T08:00:00Z',
+                    'departure_time': '2025-04-02T08:01:00Z'
+                }
+            }]
             mock_heading.assert_called()
 
     def test_get_closest_departures_invalid_start_coordinates(self, departure_service):
@@ -120,55 +148,26 @@ class TestDepartureService:
                 start_time=datetime(2025, 4, 2, 8, 0, 0)
             )
 
-    def test_filtering_by_radius(self, departure_service, mock_db, mock_cursor, sample_stops):
+    def test_filtering_by_radius(self, departure_service):
         """Test filtering by radius."""
-        mock_db.cursor.return_value = mock_cursor
+        query = dict(
+            start_lat=51.1079,
+            start_lon=17.0385,
+            end_lat=51.1200,
+            end_lon=17.0500,
+            start_time=datetime(2025, 4, 2, 8, 5, 0)
+        )
         
-        def create_row_mock(data):
-            m = Mock()
-            m.keys.return_value = data.keys()
-            m.__getitem__ = lambda self, key: data[key]
-            return m
+        # T1 has already left Stop A; Stop B (~260 m away) is only inside the larger radius
+        assert departure_service.get_closest_departures(**query, radius=100) == []
+        result = departure_service.get_closest_departures(**query, radius=500)
         
-        mock_cursor.fetchall.side_effect = [
-            [create_row_mock(stop) for stop in sample_stops],
-            []
-        ]
-        
-        with patch('src.public_transport_api.services.departures_service.filter_stops_by_radius') as mock_filter:
-            mock_filter.return_value = [{**sample_stops[0], 'distance': 100}]
-            
-            departure_service.get_closest_departures(
-                start_lat=51.1079,
-                start_lon=17.0385,
-                end_lat=51.1100,
-                end_lon=17.0400,
-                start_time=datetime(2025, 4, 2, 8, 0, 0),
-                radius=500
-            )
-            
-            mock_filter.assert_called_once_with(51.1079, 17.0385, sample_stops, 500)
+        assert [d['stop']['name'] for d in result] == ['Stop B']
 
-    def test_direction_filtering(self, departure_service, mock_db, mock_cursor, sample_stops, sample_stop_times):
+    def test_direction_filtering(self, departure_service):
         """Test direction filtering."""
-        mock_db.cursor.return_value = mock_cursor
-        
-        def create_row_mock(data):
-            m = Mock()
-            m.keys.return_value = data.keys()
-            m.__getitem__ = lambda self, key: data[key]
-            return m
-        
-        mock_cursor.fetchall.side_effect = [
-            [create_row_mock(stop) for stop in sample_stops],
-            [create_row_mock(st) for st in sample_stop_times]
-        ]
-        
-        with patch('src.public_transport_api.services.departures_service.filter_stops_by_radius') as mock_filter, \
-             patch('src.public_transport_api.services.departures_service.is_heading_towards_destination') as mock_heading:
-            
-            mock_filter.return_value = [{**sample_stops[0], 'distance': 100}]
-            mock_heading.return_value = False
+        with patch('src.public_transport_api.services.departures_service.are_bearings_towards') as mock_heading:
+            mock_heading.side_effect = lambda *args: [False] * len(args[-1])
             
             result = departure_service.get_closest_departures(
                 start_lat=51.1079,
@@ -180,32 +179,38 @@ class TestDepartureService:
             
             assert result == []
 
-    def test_time_filtering(self, departure_service, mock_db, mock_cursor, sample_stops, sample_stop_times):
-        """Test time filtering."""
-        mock_db.cursor.return_value = mock_cursor
-        
-        def create_row_mock(data):
-            m = Mock()
-            m.keys.return_value = data.keys()
-            m.__getitem__ = lambda self, key: data[key]
-            return m
+    def test_direction_uses_whole_trip(self, departure_service):
+        """Test a trip's direction comes from its first and last stop."""
+        # T1 runs from Stop A north-east to Stop B
+        heading_away = departure_service.get_closest_departures(
+            start_lat=51.1079,
+            start_lon=17.0385,
+            end_lat=51.0900,
+            end_lon=17.0200,
+            start_time=datetime(2025, 4, 2, 7, 0, 0)
+        )
+        heading_towards = departure_service.get_closest_departures(
+            start_lat=51.1079,
+            start_lon=17.0385,
+            end_lat=51.1300,
+            end_lon=17.0600,
+            start_time=datetime(2025, 4, 2, 7, 0, 0)
+        )
         
+        assert heading_away == []
+        assert [d['trip_id'] for d in heading_towards] == ['T1']
+
+    def test_time_filtering(self, catalogue, sample_trips, sample_stop_times, mock_db):
+        """Test time filtering."""
         past_stop_times = [
             {**sample_stop_times[0], 'departure_time': '06:00:00'}
         ]
+        service = DepartureService(mock_db, build_index(catalogue, sample_trips, past_stop_times))
         
-        mock_cursor.fetchall.side_effect = [
-            [create_row_mock(stop) for stop in sample_stops],
-            [create_row_mock(st) for st in past_stop_times]
-        ]
-        
-        with patch('src.public_transport_api.services.departures_service.filter_stops_by_radius') as mock_filter, \
-             patch('src.public_transport_api.services.departures_service.is_heading_towards_destination') as mock_heading:
+        with patch('src.public_transport_api.services.departures_service.are_bearings_towards') as mock_heading:
+            mock_heading.side_effect = lambda *args: [True] * len(args[-1])
             
-            mock_filter.return_value = [{**sample_stops[0], 'distance': 100}]
-            mock_heading.return_value = True
-            
-            result = departure_service.get_closest_departures(
+            result = service.get_closest_departures(
                 start_lat=51.1079,
                 start_lon=17.0385,
                 end_lat=51.1100,
@@ -215,82 +220,142 @@ class TestDepartureService:
             
             assert result == []
 
-    def test_limit_parameter(self, departure_service, mock_db, mock_cursor, sample_stops):
-        """Test limit parameter."""
-        mock_db.cursor.return_value = mock_cursor
+    def test_trip_reported_once_at_closest_stop(self, departure_service):
+        """Test a trip passing several nearby stops appears once, at the closest one."""
+        result = departure_service.get_closest_departures(
+            start_lat=51.1100,
+            start_lon=17.0400,
+            end_lat=51.1200,
+            end_lon=17.0500,
+            start_time=datetime(2025, 4, 2, 7, 0, 0)
+        )
         
-        def create_row_mock(data):
-            m = Mock()
-            m.keys.return_value = data.keys()
-            m.__getitem__ = lambda self, key: data[key]
-            return m
+        assert len(result) == 1
+        assert result[0]['stop']['name'] == 'Stop B'
+        assert result[0]['stop']['departure_time'] == '2025-04-02T08:11:00Z'
+
+    def test_calendar_filtering(self, catalogue, sample_stop_times, mock_db):
+        """Test trips run only on their service days, including past midnight."""
+        trips = [('T1', 'R1', 'Downtown', 'WD'), ('T2', 'R2', 'Night', 'WD')]
+        stop_times = sample_stop_times + [
+            {'trip_id': 'T2', 'stop_id': 'S1', 'arrival_time': '24:30:00', 'departure_time': '24:30:00', 'stop_sequence': 1},
+            {'trip_id': 'T2', 'stop_id': 'S2', 'arrival_time': '24:40:00', 'departure_time': '24:40:00', 'stop_sequence': 2}
+        ]
+        index = build_index(catalogue, trips, stop_times)
+        index.calendar = ServiceCalendar([('WD', 1, 1, 1, 1, 1, 0, 0, '20250401', '20250430')])
+        service = DepartureService(mock_db, index)
+        
+        def departures(start_time):
+            return service.get_closest_departures(51.1079, 17.0385, 51.1100, 17.0400, start_time, radius=100)
         
+        assert [d['trip_id'] for d in departures(datetime(2025, 4, 2, 7, 0))] == ['T1', 'T2']
+        assert departures(datetime(2025, 4, 6, 7, 0)) == []
+        
+        # Friday's night trip runs at 00:30 on Saturday
+        saturday = departures(datetime(2025, 4, 5, 0, 15))
+        assert [d['trip_id'] for d in saturday] == ['T2']
+        assert saturday[0]['stop']['departure_time'] == '2025-04-05T00:30:00Z'
+
+    def test_limit_parameter(self, catalogue, mock_db):
+        """Test limit parameter."""
         many_stop_times = []
         for i in range(10):
             many_stop_times.append({
                 'trip_id': f'T{i}', 'stop_id': 'S1', 'arrival_time': f'08:{i:02d}:00',
-                'departure_time': f'08:{i:02d}:00', 'stop_sequence': 1, 'route_id': 'R1',
-                'trip_headsign': 'Downtown', 'stop_name': 'Stop A',
-                'stop_lat': 51.1079, 'stop_lon': 17.0385
+                'departure_time': f'08:{i:02d}:00', 'stop_sequence': 1
             })
+        trips = [(f'T{i}', 'R1', 'Downtown', 'S') for i in range(10)]
+        service = DepartureService(mock_db, build_index(catalogue, trips, many_stop_times))
         
-        mock_cursor.fetchall.side_effect = [
-            [create_row_mock(stop) for stop in sample_stops],
-            [create_row_mock(st) for st in many_stop_times]
-        ]
-        
-        with patch('src.public_transport_api.services.departures_service.filter_stops_by_radius') as mock_filter, \
-             patch('src.public_transport_api.services.departures_service.is_heading_towards_destination') as mock_heading:
+        with patch('src.public_transport_api.services.departures_service.are_bearings_towards') as mock_heading:
+            mock_heading.side_effect = lambda *args: [True] * len(args[-1])
             
-            mock_filter.return_value = [{**sample_stops[0], 'distance': 100}]
-            mock_heading.return_value = True
-            
-            result = departure_service.get_closest_departures(
+            result = service.get_closest_departures(
                 start_lat=51.1079,
                 start_lon=17.0385,
                 end_lat=51.1100,
                 end_lon=17.0400,
-                start_time=datetime(2025, 4, 2, 7, 0, 0),
+                start_time=datetime(2025, 4, 2, 8, 4, 30),
                 limit=3
             )
             
-            assert len(result) <= 3
+            assert [d['trip_id'] for d in result] == ['T5', 'T6', 'T7']
+
+    def test_iter_closest_departures_lazy(self, catalogue, mock_db):
+        """Test departures are yielded as found, in the same order, and a bad query fails before iterating."""
+        stop_times = [
+            {'trip_id': f'T{i}', 'stop_id': 'S1', 'arrival_time': f'08:{i:02d}:00',
+             'departure_time': f'08:{i:02d}:00', 'stop_sequence': 1}
+            for i in range(10)
+        ]
+        trips = [(f'T{i}', 'R1', 'Downtown', 'S') for i in range(10)]
+        service = DepartureService(mock_db, build_index(catalogue, trips, stop_times))
+        query = DepartureQuery(51.1079, 17.0385, 51.1100, 17.0400, datetime(2025, 4, 2, 8, 0), limit=100)
+        
+        with patch('src.public_transport_api.services.departures_service.are_bearings_towards') as mock_heading:
+            mock_heading.side_effect = lambda *args: [True] * len(args[-1])
+            
+            rows = service.iter_closest_departures(*query)
+            assert next(rows)['trip_id'] == 'T0'
+            assert [d['trip_id'] for d in rows] == [f'T{i}' for i in range(1, 10)]
+            assert list(service.iter_closest_departures(*query)) == service.get_closest_departures(*query)
+        
+        with pytest.raises(ValueError, match="Invalid end coordinates"):
+            service.iter_closest_departures(51.1079, 17.0385, 95.0, 17.0400, datetime(2025, 4, 2, 8, 0))
 
-    def test_no_results(self, departure_service, mock_db, mock_cursor, sample_stops):
+    def test_no_results(self, departure_service):
         """Test with no results."""
-        mock_db.cursor.return_value = mock_cursor
+        result = departure_service.get_closest_departures(
+            start_lat=52.2297,
+            start_lon=21.0122,
+            end_lat=51.1100,
+            end_lon=17.0400,
+            start_time=datetime(2025, 4, 2, 8, 0, 0)
+        )
         
-        def create_row_mock(data):
-            m = Mock()
-            m.keys.return_value = data.keys()
-            m.__getitem__ = lambda self, key: data[key]
-            return m
+        assert result == []
+
+    def test_batch_matches_single_queries(self, catalogue, sample_stop_times, mock_db):
+        """Test a batch returns, in input order, what each query returns on its own."""
+        trips = [('T1', 'R1', 'Downtown', 'WD'), ('T2', 'R2', 'Night', 'WD')]
+        stop_times = sample_stop_times + [
+            {'trip_id': 'T2', 'stop_id': 'S1', 'arrival_time': '24:30:00', 'departure_time': '24:30:00', 'stop_sequence': 1},
+            {'trip_id': 'T2', 'stop_id': 'S2', 'arrival_time': '24:40:00', 'departure_time': '24:40:00', 'stop_sequence': 2}
+        ]
+        index = build_index(catalogue, trips, stop_times)
+        index.calendar = ServiceCalendar([('WD', 1, 1, 1, 1, 1, 0, 0, '20250401', '20250430')])
+        service = DepartureService(mock_db, index)
+        queries = [
+            DepartureQuery(51.1079, 17.0385, 51.1100, 17.0400, datetime(2025, 4, 2, 8, 5), limit=5),
+            DepartureQuery(51.1079, 17.0385, 51.1100, 17.0400, datetime(2025, 4, 2, 7, 0), limit=1),
+            DepartureQuery(51.1079, 17.0385, 51.1100, 17.0400, datetime(2025, 4, 5, 0, 15)),
+            DepartureQuery(51.1100, 17.0400, 51.1079, 17.0385, datetime(2025, 4, 2, 7, 0)),
+            DepartureQuery(51.1079, 17.0385, 51.1100, 17.0400, datetime(2025, 4, 2, 7, 0), radius=100),
+        ]
         
-        mock_cursor.fetchall.side_effect = [
-            [create_row_mock(stop) for stop in sample_stops],
-            []
+        results = service.get_closest_departures_batch(queries)
+        
+        assert results == [service.get_closest_departures(*query) for query in queries]
+        assert [[d['trip_id'] for d in result] for result in results] == [['T2', 'T1'], ['T1'], ['T2'], [], ['T1', 'T2']]
+        assert results[0][1]['stop']['name'] == 'Stop B'
+
+    def test_batch_invalid_query(self, departure_service):
+        """Test an invalid query is reported with its position."""
+        queries = [
+            DepartureQuery(51.1079, 17.0385, 51.1100, 17.0400, datetime(2025, 4, 2, 8, 0)),
+            DepartureQuery(51.1079, 17.0385, 51.1100, 181.0, datetime(2025, 4, 2, 8, 0)),
         ]
         
-        with patch('src.public_transport_api.services.departures_service.filter_stops_by_radius') as mock_filter:
-            mock_filter.return_value = []
-            
-            result = departure_service.get_closest_departures(
-                start_lat=51.1079,
-                start_lon=17.0385,
-                end_lat=51.1100,
-                end_lon=17.0400,
-                start_time=datetime(2025, 4, 2, 8, 0, 0)
-            )
-            
-            assert result == []
+        with pytest.raises(ValueError, match="Query 1: Invalid end coordinates"):
+            departure_service.get_closest_departures_batch(queries)
 
-    def test_database_error(self, departure_service, mock_db, mock_cursor):
+    def test_database_error(self, mock_db):
         """Test database error handling."""
-        mock_db.cursor.return_value = mock_cursor
-        mock_cursor.fetchall.side_effect = sqlite3.Error("Database error")
+        mock_db.execute.side_effect = sqlite3.Error("Database error")
+        service = DepartureService(mock_db)
         
         with pytest.raises(sqlite3.Error, match="Database query failed"):
-            departure_service.get_closest_departures(
+            service.get_closest_departures(
                 start_lat=51.1079,
                 start_lon=17.0385,
                 end_lat=51.1100,
@@ -298,70 +363,137 @@ class TestDepartureService:
                 start_time=datetime(2025, 4, 2, 8, 0, 0)
             )
 
-    def test_convert_to_iso_normal_time(self, departure_service):
+    def test_find_nearby_stops_uses_catalogue(self, departure_service, mock_db):
+        """Test nearby stop lookup through the shared catalogue."""
+        result = departure_service.find_nearby_stops(51.1079, 17.0385, 1000)
+        
+        assert [s['stop_id'] for s in result] == ['S1', 'S2']
+        assert result[0]['stop_name'] == 'Stop A'
+        assert result[0]['distance'] == 0
+        assert result[1]['distance'] > 0
+        mock_db.cursor.assert_not_called()
+
+    def test_index_loaded_from_connection(self, sample_stops, sample_stop_times):
+        """Test departure index resolution for an in-memory database."""
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE stops (stop_id TEXT, stop_name TEXT, stop_lat REAL, stop_lon REAL)")
+        conn.execute("CREATE TABLE trips (route_id TEXT, service_id TEXT, trip_id TEXT, trip_headsign TEXT)")
+        conn.execute(
+            "CREATE TABLE stop_times (trip_id TEXT, arrival_time TEXT, departure_time TEXT, stop_id TEXT, stop_sequence INTEGER)"
+        )
+        conn.executemany(
+            "INSERT INTO stops VALUES (?, ?, ?, ?)",
+            [(s['stop_id'], s['stop_name'], s['stop_lat'], s['stop_lon']) for s in sample_stops]
+        )
+        conn.execute("INSERT INTO trips VALUES ('R1', 'S', 'T1', 'Downtown')")
+        conn.executemany(
+            "INSERT INTO stop_times VALUES (?, ?, ?, ?, ?)",
+            [(st['trip_id'], st['arrival_time'], st['departure_time'], st['stop_id'], st['stop_sequence'])
+             for st in sample_stop_times]
+        )
+        service = DepartureService(conn)
+        
+        assert service.get_catalogue().stop_ids == ('S1', 'S2', 'S3')
+        assert service.get_departure_index() is service.get_departure_index()
+        assert len(service.get_closest_departures(51.1079, 17.0385, 51.1300, 17.0600, datetime(2025, 4, 2, 7, 0))) == 1
+        conn.close()
+
+    def test_seconds_to_iso_normal_time(self, departure_service):
         """Test ISO time conversion for normal time."""
-        base_date = datetime(2025, 4, 2, 0, 0, 0)
-        result = departure_service._convert_to_iso(base_date, '08:30:45')
+        base_date = datetime(2025, 4, 2, 7, 15, 0)
+        result = departure_service._seconds_to_iso(base_date, 8 * 3600 + 30 * 60 + 45)
         assert result == '2025-04-02T08:30:45Z'
 
-    def test_convert_to_iso_overflow_time(self, departure_service):
+    def test_seconds_to_iso_overflow_time(self, departure_service):
         """Test ISO time conversion for time overflow (>24h)."""
         base_date = datetime(2025, 4, 2, 0, 0, 0)
-        result = departure_service._convert_to_iso(base_date, '25:30:00')
+        result = departure_service._seconds_to_iso(base_date, 25 * 3600 + 30 * 60)
         assert result == '2025-04-03T01:30:00Z'
 
 
+@pytest.fixture
+def trips_db(tmp_path, monkeypatch):
+    """Database file with trip T1 visiting stops S2 then S1, used by trips_service."""
+    path = str(tmp_path / 'trips.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE stops (stop_id TEXT, stop_name TEXT, stop_lat REAL, stop_lon REAL);
+        CREATE TABLE trips (trip_id TEXT, route_id TEXT, trip_headsign TEXT);
+        CREATE TABLE stop_times (trip_id TEXT, stop_id TEXT, arrival_time TEXT, departure_time TEXT, stop_sequence INTEGER);
+        CREATE INDEX idx_stop_times_trip_sequence ON stop_times(trip_id, stop_sequence);
+        INSERT INTO stops VALUES ('S1', 'Stop A', 51.1079, 17.0385), ('S2', 'Stop B', 51.11, 17.04);
+        INSERT INTO trips VALUES ('T1', 'R1', 'Downtown');
+        INSERT INTO stop_times VALUES
+            ('T1', 'S1', '24:10:00', '24:11:00', 2),
+            ('T1', 'S2', '23:55:00', '23:56:00', 1);
+    """)
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(trips_service, 'DB_FILE', path)
+    return path
+
+
 class TestTripService:
     """Tests for trip_service."""
 
-    @patch('src.public_transport_api.services.trips_service.sqlite3.connect')
-    def test_get_trip_details_valid_trip(self, mock_connect):
+    def test_get_trip_details_valid_trip(self, trips_db):
         """Test retrieving valid trip."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_connect.return_value = mock_conn
-        mock_conn.cursor.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = ('R1', 'Downtown')
-        
-        result = trips_service.get_trip_details('T1')
+        result = trips_service.get_trip_details('T1', date(2025, 4, 2))
         
-        assert result is not None
         assert result['trip_id'] == 'T1'
         assert result['route_id'] == 'R1'
         assert result['trip_headsign'] == 'Downtown'
-        assert 'stops' in result
-        assert len(result['stops']) == 3
+        assert result['stops'][0] == {
+            'name': 'Stop B',
+            'coordinates': {'latitude': 51.11, 'longitude': 17.04},
+            'arrival_time': '2025-04-02T23:55:00Z',
+            'departure_time': '2025-04-02T23:56:00Z'
+        }
 
-    @patch('src.public_transport_api.services.trips_service.sqlite3.connect')
-    def test_get_trip_details_invalid_trip_id(self, mock_connect):
+    def test_get_trip_details_invalid_trip_id(self, trips_db):
         """Test with invalid trip_id."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_connect.return_value = mock_conn
-        mock_conn.cursor.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = None
+        assert trips_service.get_trip_details('INVALID') is None
+
+    def test_get_trip_details_stop_ordering(self, trips_db):
+        """Test stops follow stop_sequence and times past midnight roll over to the next day."""
+        stops = trips_service.get_trip_details('T1', date(2025, 4, 2))['stops']
         
-        result = trips_service.get_trip_details('INVALID')
+        assert [stop['name'] for stop in stops] == ['Stop B', 'Stop A']
+        assert stops[1]['arrival_time'] == '2025-04-03T00:10:00Z'
+        for i in range(len(stops) - 1):
+            assert stops[i]['departure_time'] < stops[i + 1]['arrival_time']
+
+    def test_get_trip_details_empty_times(self, trips_db):
+        """Test stops without times fall back to their other time, or null when both are empty."""
+        conn = sqlite3.connect(trips_db)
+        conn.execute("INSERT INTO trips VALUES ('T3', 'R1', 'Interpolated')")
+        conn.executemany("INSERT INTO stop_times VALUES ('T3', ?, ?, ?, ?)", [
+            ('S2', '08:00:00', '08:00:00', 1),
+            ('S1', '', None, 2),
+            ('S2', None, '08:20:00', 3),
+        ])
+        conn.commit()
+        conn.close()
         
-        assert result is None
-
-    @patch('src.public_transport_api.services.trips_service.sqlite3.connect')
-    def test_get_trip_details_stop_ordering(self, mock_connect):
-        """Test stop ordering in trip details."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_connect.return_value = mock_conn
-        mock_conn.cursor.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = ('R1', 'Downtown')
+        stops = trips_service.get_trip_details('T3', date(2025, 4, 2))['stops']
         
-        result = trips_service.get_trip_details('T1')
+        assert [(stop['arrival_time'], stop['departure_time']) for stop in stops] == [
+            ('2025-04-02T08:00:00Z', '2025-04-02T08:00:00Z'),
+            (None, None),
+            ('2025-04-02T08:20:00Z', '2025-04-02T08:20:00Z'),
+        ]
+
+    def test_get_trip_details_cached_per_feed_version(self, trips_db):
+        """Test a trip is read once per database version and again after the file changes."""
+        trips_service.get_trip_details('T1')
+        hits = trips_service._load_trip.cache_info().hits
+        trips_service.get_trip_details('T1')
+        assert trips_service._load_trip.cache_info().hits == hits + 1
         
-        assert result is not None
-        stops = result['stops']
-        assert len(stops) == 3
-        assert stops[0]['name'] == 'Mock Stop A'
-        assert stops[1]['name'] == 'Mock Stop B'
-        assert stops[2]['name'] == 'Mock Stop C'
+        conn = sqlite3.connect(trips_db)
+        conn.execute("UPDATE trips SET trip_headsign = 'Uptown'")
+        conn.execute("INSERT INTO trips VALUES ('T2', 'R1', 'Padding')")
+        conn.commit()
+        conn.close()
         
-        for i in range(len(stops) - 1):
-            assert stops[i]['departure_time'] < stops[i + 1]['arrival_time']
+        assert trips_service.get_trip_details('T1')['trip_headsign'] == 'Uptown'
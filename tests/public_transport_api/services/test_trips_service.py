@@ -1,14 +1,108 @@
-import unittest
+import sqlite3
 from unittest.mock import patch
 
+import pytest
+from flask import Flask
 
+from src.public_transport_api.controllers.trips_controller import trips_bp
+from src.public_transport_api.services import trips_service
+from utils.shapes import decode_polyline
 
 
-class TestGetTripDetails(unittest.TestCase):
-    # TODO replace with actual tests implementation
-    @patch('public_transport_api.services.trips_service.sqlite3.connect')
-    def test_get_trip_details_success(self, mock_connect):
-        pass
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client of the trips endpoints over a database with trip T1 on shape SH1 and T2 without a shape."""
+    path = str(tmp_path / 'trips.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE stops (stop_id TEXT, stop_name TEXT, stop_lat REAL, stop_lon REAL);
+        CREATE TABLE trips (trip_id TEXT, route_id TEXT, trip_headsign TEXT, shape_id TEXT);
+        CREATE TABLE stop_times (trip_id TEXT, stop_id TEXT, arrival_time TEXT, departure_time TEXT, stop_sequence INTEGER);
+        CREATE TABLE shapes (shape_id TEXT, shape_pt_lat REAL, shape_pt_lon REAL, shape_pt_sequence INTEGER);
+        INSERT INTO stops VALUES ('S1', 'Stop A', 51.1079, 17.0385);
+        INSERT INTO trips VALUES ('T1', 'R1', 'Downtown', 'SH1'), ('T2', 'R1', 'Downtown', NULL);
+        INSERT INTO shapes VALUES ('SH1', 51.1000, 17.0000, 1), ('SH1', 51.10005, 17.0010, 2), ('SH1', 51.1000, 17.0020, 3);
+        INSERT INTO stop_times VALUES ('T1', 'S1', '08:00:00', '08:01:00', 1);
+    """)
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(trips_service, 'DB_FILE', path)
+    app = Flask(__name__)
+    app.register_blueprint(trips_bp)
+    return app.test_client()
 
-if __name__ == '__main__':
-    unittest.main()
+
+class TestGetTripDetails:
+    """Tests for the trip details endpoint."""
+
+    def test_get_trip_details_success(self, client):
+        """Test a known trip is returned with metadata and stop times on the requested day."""
+        response = client.get('/public_transport/city/wroclaw/trip/T1?date=2025-04-02')
+        
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['metadata'] == {
+            'self': '/public_transport/city/wroclaw/trip/T1?date=2025-04-02',
+            'city': 'wroclaw',
+            'trip_id': 'T1'
+        }
+        assert body['trip_details']['stops'][0]['arrival_time'] == '2025-04-02T08:00:00Z'
+
+    def test_unknown_trip(self, client):
+        """Test an unknown trip is a 404."""
+        response = client.get('/public_transport/city/wroclaw/trip/MISSING')
+        
+        assert response.status_code == 404
+        assert 'error' in response.get_json()
+
+    def test_unsupported_city(self, client):
+        """Test other cities are a 404."""
+        assert client.get('/public_transport/city/krakow/trip/T1').status_code == 404
+
+    def test_invalid_date(self, client):
+        """Test a malformed date is a 400."""
+        assert client.get('/public_transport/city/wroclaw/trip/T1?date=02.04.2025').status_code == 400
+
+    def test_not_modified(self, client):
+        """Test a repeated request with the ETag gets a 304 without reading the trip."""
+        etag = client.get('/public_transport/city/wroclaw/trip/T1?date=2025-04-02').headers['ETag']
+        
+        with patch('src.public_transport_api.controllers.trips_controller.get_trip_details') as mock_details:
+            response = client.get('/public_transport/city/wroclaw/trip/T1?date=2025-04-02', headers={'If-None-Match': etag})
+        
+        assert response.status_code == 304
+        mock_details.assert_not_called()
+        assert client.get('/public_transport/city/wroclaw/trip/T1?date=2025-04-03', headers={'If-None-Match': etag}).status_code == 200
+
+
+class TestGetTripShape:
+    """Tests for the trip shape endpoint."""
+
+    def test_full_shape(self, client):
+        """Test without a zoom every point of the shape is returned."""
+        response = client.get('/public_transport/city/wroclaw/trip/T1/shape')
+        
+        assert response.status_code == 200
+        shape = response.get_json()['shape']
+        assert shape['shape_id'] == 'SH1'
+        assert shape['point_count'] == 3
+        assert decode_polyline(shape['polyline']) == [(51.1, 17.0), (51.10005, 17.001), (51.1, 17.002)]
+        assert response.headers['ETag']
+
+    def test_simplified_by_zoom(self, client):
+        """Test low zooms drop the 5 m bend while the highest keeps it."""
+        low = client.get('/public_transport/city/wroclaw/trip/T1/shape?zoom=12').get_json()['shape']
+        high = client.get('/public_transport/city/wroclaw/trip/T1/shape?zoom=20').get_json()['shape']
+        
+        assert low['point_count'] == 2
+        assert high['point_count'] == 3
+
+    def test_trip_without_shape(self, client):
+        """Test unknown trips and trips without a shape are a 404."""
+        assert client.get('/public_transport/city/wroclaw/trip/T2/shape').status_code == 404
+        assert client.get('/public_transport/city/wroclaw/trip/MISSING/shape').status_code == 404
+
+    def test_invalid_zoom(self, client):
+        """Test zooms that are not integers from 0 to 20 are a 400."""
+        assert client.get('/public_transport/city/wroclaw/trip/T1/shape?zoom=21').status_code == 400
+        assert client.get('/public_transport/city/wroclaw/trip/T1/shape?zoom=high').status_code == 400
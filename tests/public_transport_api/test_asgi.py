@@ -0,0 +1,250 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+from flask import Flask, request
+
+from src.public_transport_api.asgi import ProcessPoolAsgiApp, ThreadPoolAsgiApp, build_environ, create_asgi_app
+from utils.ndjson import ndjson_response
+
+
+@pytest.fixture
+def flask_app():
+    """Flask app echoing requests, streaming NDJSON and blocking on demand."""
+    app = Flask(__name__)
+    app.release = threading.Event()
+
+    @app.route('/echo', methods=['GET', 'POST'])
+    def echo():
+        return {'args': request.args.to_dict(), 'body': request.get_data(as_text=True), 'agent': request.headers.get('User-Agent')}
+
+    @app.route('/stream')
+    def stream():
+        def rows():
+            for i in range(3):
+                yield {'n': i, 'path': request.path}
+        return ndjson_response(rows())
+
+    @app.route('/block')
+    def block():
+        app.release.wait(5)
+        return {'done': True}
+
+    @app.route('/crash')
+    def crash():
+        os._exit(1)
+
+    return app
+
+
+def call(asgi_app, path, method='GET', query=b'', body=b'', headers=()):
+    """Run one request through an ASGI app and return (status, headers, body chunks)."""
+    async def run():
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+        
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+        
+        async def send(message):
+            sent.append(message)
+        
+        scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query, 'headers': list(headers)}
+        await asgi_app(scope, receive, send)
+        return sent
+    return asyncio.run(run())
+
+
+def unpack(sent):
+    start = sent[0]
+    return start['status'], dict(start['headers']), [m['body'] for m in sent[1:] if m['body']]
+
+
+class TestThreadPoolAsgiApp:
+    """Tests for the ASGI adapter."""
+
+    def test_get_with_query_and_headers(self, flask_app):
+        """Test method, query string and headers reach the Flask view."""
+        status, headers, chunks = unpack(call(
+            ThreadPoolAsgiApp(flask_app, 2, 2), '/echo', query=b'a=1', headers=[(b'user-agent', b'tests')]
+        ))
+        
+        assert status == 200
+        assert headers[b'content-type'] == b'application/json'
+        assert json.loads(b''.join(chunks)) == {'args': {'a': '1'}, 'body': '', 'agent': 'tests'}
+
+    def test_post_body(self, flask_app):
+        """Test the request body is passed through."""
+        _, _, chunks = unpack(call(ThreadPoolAsgiApp(flask_app, 2, 2), '/echo', method='POST', body=b'[1, 2]'))
+        
+        assert json.loads(b''.join(chunks))['body'] == '[1, 2]'
+
+    def test_streamed_chunks(self, flask_app):
+        """Test NDJSON rows arrive as separate chunks with the request context available."""
+        _, headers, chunks = unpack(call(ThreadPoolAsgiApp(flask_app, 2, 2), '/stream'))
+        
+        assert headers[b'content-type'] == b'application/x-ndjson'
+        assert [json.loads(chunk) for chunk in chunks] == [{'n': i, 'path': '/stream'} for i in range(3)]
+
+    def test_body_too_large(self, flask_app):
+        """Test oversized bodies are refused."""
+        status, _, _ = unpack(call(ThreadPoolAsgiApp(flask_app, 1, 0, max_body=4), '/echo', method='POST', body=b'12345'))
+        
+        assert status == 413
+
+    def test_client_disconnect(self, flask_app):
+        """Test a request whose client leaves before the body is read is not run."""
+        sent = []
+        
+        async def receive():
+            return {'type': 'http.disconnect'}
+        
+        async def send(message):
+            sent.append(message)
+        
+        asgi_app = ThreadPoolAsgiApp(flask_app, 1, 0)
+        asyncio.run(asgi_app({'type': 'http', 'method': 'POST', 'path': '/crash', 'headers': []}, receive, send))
+        
+        assert sent == []
+        assert asgi_app.stats() == {'in_flight': 0, 'rejected': 0}
+
+    def test_backpressure(self, flask_app):
+        """Test requests beyond workers plus queue get 503 while the pool is busy."""
+        asgi_app = ThreadPoolAsgiApp(flask_app, 1, 1)
+        
+        async def run():
+            async def request_status():
+                sent = []
+                
+                async def receive():
+                    return {'type': 'http.request', 'body': b''}
+                
+                async def send(message):
+                    sent.append(message)
+                await asgi_app({'type': 'http', 'method': 'GET', 'path': '/block', 'headers': []}, receive, send)
+                return sent[0]['status']
+            
+            tasks = [asyncio.ensure_future(request_status()) for _ in range(3)]
+            await asyncio.sleep(0.2)
+            flask_app.release.set()
+            return sorted(await asyncio.gather(*tasks))
+        
+        assert asyncio.run(run()) == [200, 200, 503]
+        assert asgi_app.stats() == {'in_flight': 0, 'rejected': 1}
+
+    def test_lifespan(self, flask_app):
+        """Test startup and shutdown are acknowledged."""
+        asgi_app = ThreadPoolAsgiApp(flask_app, 1, 0)
+        messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+        
+        async def receive():
+            return messages.pop(0)
+        
+        async def send(message):
+            sent.append(message['type'])
+        
+        asyncio.run(asgi_app({'type': 'lifespan'}, receive, send))
+        
+        assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+
+    def test_process_pool(self, flask_app):
+        """Test requests run in forked workers and streamed bodies arrive whole."""
+        asgi_app = ProcessPoolAsgiApp(flask_app, 1, 1)
+        try:
+            _, _, chunks = unpack(call(asgi_app, '/echo', query=b'a=1'))
+            _, _, streamed = unpack(call(asgi_app, '/stream'))
+        finally:
+            asgi_app.executor.shutdown()
+        
+        assert json.loads(b''.join(chunks))['args'] == {'a': '1'}
+        assert len(streamed) == 1
+        assert [json.loads(line) for line in streamed[0].splitlines()] == [{'n': i, 'path': '/stream'} for i in range(3)]
+
+    def test_process_pool_preload(self, flask_app):
+        """Test workers are forked after the preload and inherit what it loaded."""
+        @flask_app.route('/preloaded')
+        def preloaded():
+            return {'preloaded': flask_app.config.get('PRELOADED', False)}
+        
+        asgi_app = ProcessPoolAsgiApp(flask_app, 1, 1, preload=lambda: flask_app.config.update(PRELOADED=True))
+        try:
+            flask_app.config['PRELOADED'] = False  # Only the parent's copy
+            _, _, chunks = unpack(call(asgi_app, '/preloaded'))
+        finally:
+            asgi_app.executor.shutdown()
+        
+        assert json.loads(b''.join(chunks)) == {'preloaded': True}
+
+    def test_process_pool_replaced_after_crash(self, flask_app):
+        """Test a dead worker fails its request with 503 and a new pool serves the next."""
+        loads = []
+        asgi_app = ProcessPoolAsgiApp(flask_app, 1, 1, preload=lambda: loads.append(True))
+        try:
+            status, headers, _ = unpack(call(asgi_app, '/crash'))
+            next_status, _, chunks = unpack(call(asgi_app, '/echo', query=b'a=1'))
+        finally:
+            asgi_app.executor.shutdown()
+        
+        assert status == 503
+        assert headers[b'retry-after'] == b'1'
+        assert next_status == 200
+        assert json.loads(b''.join(chunks))['args'] == {'a': '1'}
+        assert len(loads) == 2
+
+
+class TestCreateAsgiApp:
+    """Tests for create_asgi_app."""
+
+    def test_reads_config(self, flask_app):
+        """Test pool settings come from the Flask config."""
+        flask_app.config['ASGI_WORKERS'] = 3
+        
+        asgi_app = create_asgi_app(flask_app)
+        
+        assert isinstance(asgi_app, ThreadPoolAsgiApp)
+        assert asgi_app.workers == 3
+        assert flask_app.extensions['asgi'] is asgi_app
+
+    def test_unknown_pool(self, flask_app):
+        """Test pool types other than thread and process are rejected."""
+        flask_app.config['ASGI_POOL'] = 'greenlet'
+        
+        with pytest.raises(ValueError):
+            create_asgi_app(flask_app)
+
+    def test_import_does_not_build_app(self):
+        """Test importing the module leaves building the app, and forking its workers, to the first lookup."""
+        code = (
+            'import sys; import src.public_transport_api.asgi as asgi; '
+            'print("app" in vars(asgi), "src.public_transport_api.main" in sys.modules)'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=Path(__file__).parents[2],
+            env={**os.environ, 'FLASK_ASGI_POOL': 'process'}
+        )
+        
+        assert result.stdout.split() == ['False', 'False']
+
+
+class TestBuildEnviron:
+    """Tests for build_environ."""
+
+    def test_environ(self):
+        """Test the scope maps onto WSGI keys, with repeated headers joined."""
+        environ = build_environ({
+            'type': 'http', 'method': 'GET', 'path': '/trip/ł', 'query_string': b'zoom=3',
+            'headers': [(b'content-type', b'application/json'), (b'accept', b'a'), (b'accept', b'b')],
+            'server': ('example.org', 8000), 'scheme': 'https'
+        }, b'')
+        
+        assert environ['PATH_INFO'] == '/trip/ł'.encode('utf-8').decode('latin-1')
+        assert environ['QUERY_STRING'] == 'zoom=3'
+        assert environ['CONTENT_TYPE'] == 'application/json'
+        assert environ['HTTP_ACCEPT'] == 'a,b'
+        assert (environ['SERVER_NAME'], environ['SERVER_PORT'], environ['wsgi.url_scheme']) == ('example.org', '8000', 'https')
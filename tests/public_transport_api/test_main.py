@@ -0,0 +1,59 @@
+import pytest
+
+from src.public_transport_api.controllers.journey_controller import MAX_JOURNEYS
+from src.public_transport_api.main import create_app
+from utils import connection_pool, result_cache
+
+
+@pytest.fixture(autouse=True)
+def restore_defaults():
+    """Put the shared pool and cache back to their defaults after each test."""
+    yield
+    connection_pool.connection_pool.configure(**connection_pool.DEFAULT_CONFIG)
+    result_cache.result_cache.configure(**result_cache.DEFAULT_CONFIG)
+
+
+class TestCreateApp:
+    """Tests for the app factory."""
+
+    def test_config_and_blueprints(self):
+        """Test settings passed in are applied and every blueprint is registered."""
+        app = create_app({'RESULT_CACHE_TTL': 5, 'SQLITE_POOL_SIZE': 2})
+        
+        assert app.config['RESULT_CACHE_TTL'] == 5
+        assert app.extensions['connection_pool'].config['SQLITE_POOL_SIZE'] == 2
+        assert set(app.blueprints) == {'departures', 'isochrone', 'journey', 'trips'}
+        assert app.test_client().get('/').status_code == 200
+
+
+class TestJourneyEndpoint:
+    """Tests for the journey endpoint's parameter checks."""
+
+    @pytest.mark.parametrize('limit', ['0', 'x', str(MAX_JOURNEYS + 1)])
+    def test_invalid_limit(self, limit):
+        """Test limits that are not positive or above MAX_JOURNEYS are refused before any search."""
+        response = create_app().test_client().get('/public_transport/city/wroclaw/journey', query_string={
+            'start_coordinates': '51.1,17.0', 'end_coordinates': '51.11,17.03', 'limit': limit
+        })
+        
+        assert response.status_code == 400
+        assert response.get_json()['error'].startswith('Invalid limit')
+
+
+class TestStartPointValidation:
+    """Tests for the start point checks the search endpoints share."""
+
+    @pytest.mark.parametrize('endpoint', ['closest_departures', 'journey', 'isochrone'])
+    @pytest.mark.parametrize('params, error', [
+        ({}, 'Missing required parameter: start_coordinates'),
+        ({'start_coordinates': '51.1'}, 'Invalid coordinate format. Expected: "lat,lon"'),
+        ({'start_coordinates': '51.1,17.0', 'start_time': 'morning'}, 'Invalid start_time format. Expected ISO 8601'),
+    ])
+    def test_same_errors(self, endpoint, params, error):
+        """Test every endpoint refuses a bad start point with the same message."""
+        query = {'end_coordinates': '51.11,17.03', 'max_minutes': '10', **params}
+        
+        response = create_app().test_client().get(f'/public_transport/city/wroclaw/{endpoint}', query_string=query)
+        
+        assert response.status_code == 400
+        assert response.get_json() == {'error': error}
@@ -0,0 +1,82 @@
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from src.public_transport_api.prefork import preload
+from utils.connection_scan import get_connection_timetable
+from utils.departure_index import get_departure_index
+from utils.feed_cache import feed_cache
+from utils.raptor import get_route_timetable
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+@pytest.fixture
+def feed_db(tmp_path):
+    """Feed database with two stops and one trip, named like the live one."""
+    db_path = tmp_path / 'wroclaw_transport.db'
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE stops (stop_id TEXT, stop_name TEXT, stop_lat REAL, stop_lon REAL)")
+    conn.execute("CREATE TABLE trips (route_id TEXT, service_id TEXT, trip_id TEXT, trip_headsign TEXT)")
+    conn.execute(
+        "CREATE TABLE stop_times (trip_id TEXT, arrival_time TEXT, departure_time TEXT, stop_id TEXT, stop_sequence INTEGER)"
+    )
+    conn.executemany("INSERT INTO stops VALUES (?, ?, 51.1, ?)", [('A', 'A', 17.0), ('B', 'B', 17.01)])
+    conn.execute("INSERT INTO trips VALUES ('R1', 'WD', 'T1', 'B')")
+    conn.executemany("INSERT INTO stop_times VALUES ('T1', ?, ?, ?, ?)", [
+        ('08:00:00', '08:00:00', 'A', 1), ('08:05:00', '08:05:00', 'B', 2)
+    ])
+    conn.commit()
+    conn.close()
+    feed_cache.clear()
+    yield str(db_path)
+    feed_cache.clear()
+
+
+class TestPreload:
+    """Tests for loading the shared structures before forking."""
+
+    def test_loads_every_structure_once(self, feed_db):
+        """Test the timetables and trip positions are built, and repeated names load once."""
+        loaded = preload([feed_db, feed_db])
+        
+        assert loaded == [feed_db]
+        connections = get_connection_timetable(feed_db)
+        assert connections.index is get_departure_index(feed_db)
+        assert get_route_timetable(feed_db).index is connections.index
+        assert 'trip_positions' in vars(connections.index)
+
+    def test_missing_database(self, tmp_path):
+        """Test a missing database stops the launcher before it forks."""
+        with pytest.raises(OSError):
+            preload([str(tmp_path / 'missing.db')])
+
+
+class TestServe:
+    """Tests for the pre-fork server."""
+
+    def test_workers_serve_and_stop(self, feed_db):
+        """Test forked workers answer requests and exit when the master is told to stop."""
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'src.public_transport_api.prefork', '--port', '0', '--workers', '2'],
+            cwd=os.path.dirname(feed_db), env=dict(os.environ, PYTHONPATH=str(ROOT)),
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        try:
+            line = server.stdout.readline()
+            assert line.startswith('Listening on ')
+            base_url = line.split()[2]
+            
+            for _ in range(3):
+                with urllib.request.urlopen(f'{base_url}/', timeout=10) as response:
+                    assert response.read().decode('utf-8').startswith('Welcome')
+        finally:
+            server.send_signal(signal.SIGTERM)
+            
+        assert server.wait(10) == 0
@@ -0,0 +1,359 @@
+import os
+import sqlite3
+import struct
+import sys
+import zipfile
+
+import pytest
+
+import import_gtfs_data
+from utils.db_versions import list_versions, resolve_db_path
+from utils.shapes import unpack_points
+from utils.timetable_snapshot import snapshot_path
+
+
+@pytest.fixture
+def conn():
+    """In-memory database."""
+    conn = sqlite3.connect(':memory:')
+    yield conn
+    conn.close()
+
+
+def write(path, text):
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+class TestImportCsv:
+    """Tests for import_csv."""
+
+    def test_fixed_column_types(self, conn, tmp_path):
+        """Test known GTFS columns get their type and identifiers stay text."""
+        filepath = write(tmp_path / 'stop_times.txt', (
+            '﻿trip_id,arrival_time,departure_time,stop_id,stop_sequence,shape_dist_traveled\n'
+            '3_100,08:00:00,08:01:00,015,1,\n'
+            '3_100,08:05:00,08:05:00,16,2,1.5\n'
+        ))
+        
+        rows = import_gtfs_data.import_csv(conn, filepath, 'stop_times')
+        
+        assert rows == 2
+        assert conn.execute(
+            "SELECT trip_id, stop_id, typeof(stop_sequence), shape_dist_traveled FROM stop_times"
+        ).fetchall() == [('3_100', '015', 'integer', None), ('3_100', '16', 'integer', 1.5)]
+
+    def test_bom_stripped_and_empty_rows_skipped(self, conn, tmp_path):
+        """Test the header BOM is removed and blank lines, bare commas included, are ignored."""
+        filepath = write(tmp_path / 'stops.txt', (
+            '﻿stop_id,stop_name,stop_lat,stop_lon\n'
+            '15,"Metalowców",51.13,16.95\n'
+            '\n'
+            ',,,\n'
+        ))
+        
+        rows = import_gtfs_data.import_csv(conn, filepath, 'stops')
+        
+        assert rows == 1
+        assert conn.execute("SELECT stop_id, stop_lat FROM stops").fetchone() == ('15', 51.13)
+
+    def test_unknown_columns_are_text(self):
+        """Test columns outside the GTFS type map default to TEXT."""
+        assert import_gtfs_data.column_types(['stop_lat', 'brigade_id']) == {'stop_lat': 'REAL', 'brigade_id': 'TEXT'}
+
+
+@pytest.fixture
+def feed_files():
+    """Minimal GTFS feed, with byte order marks like the MPK export."""
+    return {
+        'stops.txt': '\ufeffstop_id,stop_name,stop_lat,stop_lon\n1,A,51.10,17.00\n2,B,51.20,17.00\n',
+        'trips.txt': '\ufeffroute_id,service_id,trip_id,trip_headsign\nR1,3,T1,North\n',
+        'stop_times.txt': (
+            '\ufefftrip_id,arrival_time,departure_time,stop_id,stop_sequence\n'
+            'T1,08:00:00,08:00:00,1,1\nT1,08:10:00,08:10:00,2,2\n'
+        ),
+    }
+
+
+class TestOpenGtfsFile:
+    """Tests for reading feed files from directories and archives."""
+
+    def test_zip_member_in_folder(self, tmp_path, feed_files):
+        """Test members are found in a wrapping folder and the BOM is stripped."""
+        archive = tmp_path / 'feed.zip'
+        with zipfile.ZipFile(archive, 'w') as z:
+            for name, text in feed_files.items():
+                z.writestr(f'gtfs/{name}', text.encode('utf-8'))
+        
+        with import_gtfs_data.open_gtfs_file(str(archive), 'stops.txt') as f:
+            assert f.readline() == 'stop_id,stop_name,stop_lat,stop_lon\n'
+        with import_gtfs_data.open_gtfs_file(str(archive), 'shapes.txt') as f:
+            assert f is None
+
+    def test_directory(self, tmp_path, feed_files):
+        """Test extracted directories keep working."""
+        write(tmp_path / 'stops.txt', feed_files['stops.txt'])
+        
+        with import_gtfs_data.open_gtfs_file(str(tmp_path), 'stops.txt') as f:
+            assert f.readline().startswith('stop_id,')
+        with import_gtfs_data.open_gtfs_file(str(tmp_path), 'trips.txt') as f:
+            assert f is None
+
+
+class TestMain:
+    """Tests for the import entry point."""
+
+    def test_import_from_zip(self, tmp_path, monkeypatch, feed_files):
+        """Test a whole feed is imported from an archive with clean column names."""
+        archive = tmp_path / 'feed.zip'
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as z:
+            for name, text in feed_files.items():
+                z.writestr(name, text.encode('utf-8'))
+        db_path = str(tmp_path / 'feed.db')
+        monkeypatch.setattr(import_gtfs_data, 'DB_FILE', db_path)
+        
+        import_gtfs_data.main(str(archive))
+        
+        conn = sqlite3.connect(resolve_db_path(db_path))
+        assert conn.execute("SELECT stop_id, stop_name FROM stops ORDER BY stop_id").fetchall() == [('1', 'A'), ('2', 'B')]
+        assert conn.execute("SELECT service_id FROM trips").fetchone() == ('3',)
+        assert conn.execute("SELECT COUNT(*) FROM stop_times").fetchone() == (2,)
+        assert conn.execute("SELECT bearing FROM patterns").fetchone()[0] == pytest.approx(0.0)
+        assert conn.execute("SELECT COUNT(*) FROM footpaths").fetchone() == (0,)
+        conn.close()
+
+
+class TestIncrementalImport:
+    """Tests for updating an existing database."""
+
+    @pytest.fixture
+    def feed_dir(self, tmp_path, feed_files):
+        """Extracted feed directory."""
+        feed = tmp_path / 'feed'
+        feed.mkdir()
+        for name, text in feed_files.items():
+            write(feed / name, text)
+        return feed
+
+    @pytest.fixture
+    def db_path(self, tmp_path, monkeypatch):
+        """Database path used by the importer."""
+        db_path = str(tmp_path / 'feed.db')
+        monkeypatch.setattr(import_gtfs_data, 'DB_FILE', db_path)
+        return db_path
+
+    def query(self, db_path, sql):
+        conn = sqlite3.connect(resolve_db_path(db_path))
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_unchanged_files_skipped(self, feed_dir, db_path, capsys):
+        """Test a second import of the same feed does no work."""
+        import_gtfs_data.main(str(feed_dir))
+        capsys.readouterr()
+        
+        import_gtfs_data.main(str(feed_dir))
+        
+        output = capsys.readouterr().out
+        assert 'Importing' not in output
+        assert 'already up to date' in output
+        assert len(list_versions(db_path)) == 1
+
+    def test_only_changed_file_reimported(self, feed_dir, db_path, capsys):
+        """Test a changed file replaces its table and dependent trip patterns."""
+        import_gtfs_data.main(str(feed_dir))
+        write(feed_dir / 'stop_times.txt', (
+            'trip_id,arrival_time,departure_time,stop_id,stop_sequence\n'
+            'T1,08:00:00,08:00:00,2,1\nT1,08:10:00,08:10:00,1,2\n'
+        ))
+        capsys.readouterr()
+        
+        import_gtfs_data.main(str(feed_dir))
+        
+        output = capsys.readouterr().out
+        assert 'Importing stop_times.txt' in output
+        assert 'Importing stops.txt' not in output
+        assert 'copy of live db' in output
+        assert self.query(db_path, "SELECT stop_id FROM stop_times ORDER BY stop_sequence") == [('2',), ('1',)]
+        assert self.query(db_path, "SELECT bearing FROM patterns")[0][0] == pytest.approx(180.0)
+        assert self.query(db_path, "SELECT name FROM sqlite_master WHERE name GLOB '*__new'") == []
+        indexed = self.query(db_path, "SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND tbl_name = 'stop_times'")
+        assert indexed == [(2,)]
+
+    def test_footpaths_rebuilt_with_stops(self, feed_dir, db_path):
+        """Test footpaths follow a changed stops file."""
+        import_gtfs_data.main(str(feed_dir))
+        write(feed_dir / 'stops.txt', 'stop_id,stop_name,stop_lat,stop_lon\n1,A,51.10,17.00\n2,B,51.101,17.00\n')
+        
+        import_gtfs_data.main(str(feed_dir))
+        
+        assert self.query(db_path, "SELECT from_stop_id, to_stop_id FROM footpaths ORDER BY 1") == [('1', '2'), ('2', '1')]
+        assert self.query(db_path, "SELECT name FROM sqlite_master WHERE name GLOB '*__new'") == []
+
+    def test_shape_geometries_follow_shapes(self, feed_dir, db_path):
+        """Test shapes are packed on import and their geometries dropped with them."""
+        write(feed_dir / 'shapes.txt', (
+            'shape_id,shape_pt_lat,shape_pt_lon,shape_pt_sequence\n'
+            'S1,51.11,17.01,2\nS1,51.10,17.00,1\n'
+        ))
+        import_gtfs_data.main(str(feed_dir))
+        
+        (blob,), = self.query(db_path, "SELECT coords FROM shape_geometries WHERE shape_id = 'S1'")
+        assert unpack_points(blob) == [(51.10, 17.00), (51.11, 17.01)]
+        
+        (feed_dir / 'shapes.txt').unlink()
+        import_gtfs_data.main(str(feed_dir))
+        
+        assert self.query(db_path, "SELECT name FROM sqlite_master WHERE name LIKE 'shape%'") == []
+
+    def test_removed_file_dropped(self, feed_dir, db_path):
+        """Test tables of files that left the feed are dropped."""
+        write(feed_dir / 'calendar_dates.txt', 'service_id,date,exception_type\n3,20250401,2\n')
+        import_gtfs_data.main(str(feed_dir))
+        (feed_dir / 'calendar_dates.txt').unlink()
+        
+        import_gtfs_data.main(str(feed_dir))
+        
+        assert self.query(db_path, "SELECT name FROM sqlite_master WHERE name = 'calendar_dates'") == []
+        assert ('calendar_dates.txt',) not in self.query(db_path, "SELECT filename FROM import_metadata")
+
+    def test_snapshot_failure_still_publishes(self, feed_dir, db_path, monkeypatch, capsys):
+        """Test a snapshot that cannot be packed leaves no file behind and the database is published anyway."""
+        def failing_write(path, index):
+            with open(path, 'wb') as f:
+                f.write(b'partial')
+            raise struct.error('argument out of range')
+        monkeypatch.setattr(import_gtfs_data, 'write_snapshot', failing_write)
+        
+        import_gtfs_data.main(str(feed_dir))
+        
+        assert 'No timetable snapshot written: argument out of range' in capsys.readouterr().out
+        assert self.query(db_path, "SELECT trip_headsign FROM trips") == [('North',)]
+        assert not os.path.exists(snapshot_path(resolve_db_path(db_path)))
+
+    def test_copy_database_without_reflinks(self, tmp_path, monkeypatch):
+        """Test the live database is copied in full where the filesystem cannot share blocks."""
+        live = tmp_path / 'live.db'
+        live.write_bytes(b'SQLite format 3\0' + bytes(range(256)) * 16)
+        if sys.platform.startswith('linux'):
+            def no_reflink(*args):
+                raise OSError('reflinks not supported')
+            monkeypatch.setattr('fcntl.ioctl', no_reflink)
+        
+        reflinked = import_gtfs_data.copy_database(str(live), str(tmp_path / 'copy.db'))
+        
+        assert not reflinked
+        assert (tmp_path / 'copy.db').read_bytes() == live.read_bytes()
+
+    def test_required_file_kept(self, feed_dir, db_path, capsys):
+        """Test a required file missing from the feed keeps its table and the tables derived from it."""
+        import_gtfs_data.main(str(feed_dir))
+        patterns = self.query(db_path, "SELECT * FROM trip_patterns")
+        (feed_dir / 'stops.txt').unlink()
+        
+        import_gtfs_data.main(str(feed_dir))
+        
+        assert 'stops.txt missing from feed' in capsys.readouterr().out
+        assert self.query(db_path, "SELECT stop_id FROM stops ORDER BY stop_id") == [('1',), ('2',)]
+        assert self.query(db_path, "SELECT * FROM trip_patterns") == patterns
+        assert ('stops.txt',) in self.query(db_path, "SELECT filename FROM import_metadata")
+
+    def test_failed_file_keeps_live_table(self, feed_dir, db_path):
+        """Test a file that fails to import leaves the current table in place."""
+        import_gtfs_data.main(str(feed_dir))
+        write(feed_dir / 'trips.txt', 'route_id,service_id,trip_id,trip_headsign\nR1,3,T1\n')
+        
+        import_gtfs_data.main(str(feed_dir))
+        
+        assert self.query(db_path, "SELECT trip_headsign FROM trips") == [('North',)]
+
+    def test_full_rebuild(self, feed_dir, db_path, capsys):
+        """Test --full re-imports every file."""
+        import_gtfs_data.main(str(feed_dir))
+        capsys.readouterr()
+        
+        import_gtfs_data.main(str(feed_dir), full=True)
+        
+        assert capsys.readouterr().out.count('Importing') == 3
+
+    def test_new_version_published_and_old_one_removed(self, feed_dir, db_path):
+        """Test each changed import goes to a new file with a snapshot and the previous ones are collected."""
+        import_gtfs_data.main(str(feed_dir))
+        first = resolve_db_path(db_path)
+        write(feed_dir / 'trips.txt', 'route_id,service_id,trip_id,trip_headsign\nR1,3,T1,South\n')
+        
+        import_gtfs_data.main(str(feed_dir))
+        
+        assert resolve_db_path(db_path) != first
+        assert list_versions(db_path) == [resolve_db_path(db_path)]
+        assert os.path.exists(snapshot_path(resolve_db_path(db_path)))
+        assert not os.path.exists(snapshot_path(first))
+        assert self.query(db_path, "SELECT trip_headsign FROM trips") == [('South',)]
+
+
+class TestBuildTripPatterns:
+    """Tests for build_trip_patterns."""
+
+    def test_trips_grouped_by_stop_sequence(self, conn):
+        """Test trips with the same stops share a pattern with a precomputed bearing."""
+        conn.execute("CREATE TABLE stops (stop_id TEXT, stop_lat REAL, stop_lon REAL)")
+        conn.execute("CREATE TABLE stop_times (trip_id TEXT, stop_id TEXT, stop_sequence INTEGER)")
+        conn.executemany("INSERT INTO stops VALUES (?, ?, ?)", [('A', 51.10, 17.00), ('B', 51.20, 17.00)])
+        conn.executemany("INSERT INTO stop_times VALUES (?, ?, ?)", [
+            ('T1', 'B', 2), ('T1', 'A', 1),
+            ('T2', 'A', 1), ('T2', 'B', 2),
+            ('T3', 'B', 1), ('T3', 'A', 2),
+            ('T4', 'A', 1),
+        ])
+        
+        assert import_gtfs_data.build_trip_patterns(conn) == (3, 4)
+        rows = conn.execute(
+            "SELECT tp.trip_id, p.stop_count, p.bearing FROM trip_patterns tp "
+            "JOIN patterns p ON p.pattern_id = tp.pattern_id ORDER BY tp.trip_id"
+        ).fetchall()
+        assert [(trip, count) for trip, count, _ in rows] == [('T1', 2), ('T2', 2), ('T3', 2), ('T4', 1)]
+        assert rows[0][2] == rows[1][2] == pytest.approx(0.0)
+        assert rows[2][2] == pytest.approx(180.0)
+        assert rows[3][2] is None
+
+
+class TestBuildShapeGeometries:
+    """Tests for build_shape_geometries."""
+
+    def test_points_packed_in_sequence(self, conn):
+        """Test each shape becomes one row with its points ordered by sequence."""
+        conn.execute("CREATE TABLE shapes (shape_id TEXT, shape_pt_lat REAL, shape_pt_lon REAL, shape_pt_sequence INTEGER)")
+        conn.executemany("INSERT INTO shapes VALUES (?, ?, ?, ?)", [
+            ('S1', 51.2, 17.2, 3), ('S1', 51.0, 17.0, 1), ('S1', 51.1, 17.1, 2), ('S2', 50.0, 16.0, 1)
+        ])
+        
+        assert import_gtfs_data.build_shape_geometries(conn) == 2
+        rows = conn.execute("SELECT shape_id, point_count, coords FROM shape_geometries ORDER BY shape_id").fetchall()
+        assert [(shape_id, count) for shape_id, count, _ in rows] == [('S1', 3), ('S2', 1)]
+        assert unpack_points(rows[0][2]) == [(51.0, 17.0), (51.1, 17.1), (51.2, 17.2)]
+
+
+class TestBuildFootpathsTable:
+    """Tests for build_footpaths_table."""
+
+    def test_nearby_stops_linked_both_ways(self, conn):
+        """Test stops within the radius get footpaths in both directions with walking times."""
+        conn.execute("CREATE TABLE stops (stop_id TEXT, stop_lat REAL, stop_lon REAL)")
+        conn.executemany("INSERT INTO stops VALUES (?, ?, ?)", [
+            ('A', 51.1000, 17.0), ('B', 51.1020, 17.0), ('C', 51.2000, 17.0), ('D', None, None)
+        ])
+        
+        assert import_gtfs_data.build_footpaths_table(conn, radius=400, speed=1.0) == 2
+        rows = conn.execute("SELECT * FROM footpaths ORDER BY from_stop_id").fetchall()
+        assert [(a, b) for a, b, _, _ in rows] == [('A', 'B'), ('B', 'A')]
+        assert rows[0][2] == pytest.approx(222.4, abs=0.1)
+        assert rows[0][3] == 223
+
+    def test_radius_configurable(self, conn):
+        """Test stops farther apart than the radius are not linked."""
+        conn.execute("CREATE TABLE stops (stop_id TEXT, stop_lat REAL, stop_lon REAL)")
+        conn.executemany("INSERT INTO stops VALUES (?, ?, ?)", [('A', 51.1000, 17.0), ('B', 51.1020, 17.0)])
+        
+        assert import_gtfs_data.build_footpaths_table(conn, radius=200) == 0
@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+from flask import Flask
+
+from utils.connection_pool import DEFAULT_CONFIG, ConnectionPool
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Database file with one table."""
+    path = str(tmp_path / 'feed.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE stops (stop_id TEXT)")
+    conn.execute("INSERT INTO stops VALUES ('S1')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def pool():
+    """Pool closed after the test."""
+    pool = ConnectionPool()
+    yield pool
+    pool.close_all()
+
+
+class TestConnectionPool:
+    """Tests for ConnectionPool."""
+
+    def test_connection_reused(self, pool, db_path):
+        """Test a returned connection is handed out again and counted as a hit."""
+        with pool.connection(db_path) as first:
+            assert first.execute("SELECT stop_id FROM stops").fetchall() == [('S1',)]
+        with pool.connection(db_path) as second:
+            assert second is first
+        
+        assert pool.stats() == {'hits': 1, 'misses': 1, 'idle': 1}
+
+    def test_concurrent_borrowers_get_separate_connections(self, pool, db_path):
+        """Test a borrowed connection is never shared."""
+        with pool.connection(db_path) as first, pool.connection(db_path) as second:
+            assert first is not second
+        
+        assert pool.stats() == {'hits': 0, 'misses': 2, 'idle': 2}
+
+    def test_row_factory_reset_on_return(self, pool, db_path):
+        """Test a row factory set by one borrower does not reach the next."""
+        with pool.connection(db_path) as first:
+            first.row_factory = sqlite3.Row
+        with pool.connection(db_path) as second:
+            assert second is first
+            assert second.execute("SELECT stop_id FROM stops").fetchall() == [('S1',)]
+
+    def test_read_only(self, pool, db_path):
+        """Test pooled connections cannot write."""
+        with pool.connection(db_path) as conn:
+            with pytest.raises(sqlite3.OperationalError):
+                conn.execute("INSERT INTO stops VALUES ('S2')")
+
+    def test_pragmas_applied(self, db_path):
+        """Test tuning settings are applied to new connections."""
+        pool = ConnectionPool(SQLITE_CACHE_SIZE=-2048, SQLITE_TEMP_STORE='memory', SQLITE_MMAP_SIZE=1 << 20)
+        
+        with pool.connection(db_path) as conn:
+            assert conn.execute("PRAGMA cache_size").fetchone()[0] == -2048
+            assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+            assert conn.execute("PRAGMA mmap_size").fetchone()[0] in (0, 1 << 20)
+        pool.close_all()
+
+    def test_immutable_mode(self, db_path):
+        """Test immutable connections read the database."""
+        pool = ConnectionPool(SQLITE_IMMUTABLE=True)
+        
+        with pool.connection(db_path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM stops").fetchone()[0] == 1
+        pool.close_all()
+
+    def test_reopened_after_file_replaced(self, pool, db_path, tmp_path):
+        """Test connections to an older version of the file are not reused."""
+        with pool.connection(db_path) as first:
+            pass
+        
+        replacement = str(tmp_path / 'new.db')
+        conn = sqlite3.connect(replacement)
+        conn.execute("CREATE TABLE stops (stop_id TEXT)")
+        conn.executemany("INSERT INTO stops VALUES (?)", [('S1',), ('S2',)])
+        conn.commit()
+        conn.close()
+        os.replace(replacement, db_path)
+        
+        with pool.connection(db_path) as second:
+            assert second is not first
+            assert second.execute("SELECT COUNT(*) FROM stops").fetchone()[0] == 2
+        assert pool.stats()['misses'] == 2
+
+    def test_missing_file(self, pool, tmp_path):
+        """Test a missing database is reported as a SQLite error."""
+        with pytest.raises(sqlite3.OperationalError):
+            with pool.connection(str(tmp_path / 'missing.db')):
+                pass
+
+    def test_pool_size_bounds_idle_connections(self, db_path):
+        """Test connections beyond the pool size are closed on return."""
+        pool = ConnectionPool(SQLITE_POOL_SIZE=1)
+        
+        with pool.connection(db_path), pool.connection(db_path):
+            pass
+        
+        assert pool.stats()['idle'] == 1
+        pool.close_all()
+
+    def test_used_from_threads(self, pool, db_path):
+        """Test connections move safely between threads."""
+        errors = []
+
+        def query():
+            try:
+                for _ in range(20):
+                    with pool.connection(db_path) as conn:
+                        conn.execute("SELECT stop_id FROM stops").fetchall()
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=query) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert errors == []
+        stats = pool.stats()
+        assert stats['hits'] + stats['misses'] == 80
+        assert stats['misses'] <= 4
+
+    def test_invalid_settings(self, pool):
+        """Test unknown settings and temp_store values are rejected."""
+        with pytest.raises(ValueError):
+            pool.configure(SQLITE_PAGE_SIZE=4096)
+        with pytest.raises(ValueError):
+            pool.configure(SQLITE_TEMP_STORE='disk')
+
+
+class TestInitApp:
+    """Tests for configuration through Flask."""
+
+    def test_reads_app_config(self, pool, db_path):
+        """Test app config overrides defaults and receives the effective settings."""
+        app = Flask(__name__)
+        app.config['SQLITE_CACHE_SIZE'] = -1024
+        
+        pool.init_app(app)
+        
+        assert app.extensions['connection_pool'] is pool
+        assert app.config['SQLITE_POOL_SIZE'] == DEFAULT_CONFIG['SQLITE_POOL_SIZE']
+        with pool.connection(db_path) as conn:
+            assert conn.execute("PRAGMA cache_size").fetchone()[0] == -1024
@@ -0,0 +1,198 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+from utils.connection_scan import (
+    DESTINATION, ORIGIN, ConnectionTimetable, Leg, build_connection_timetable
+)
+from utils.departure_index import DepartureIndex, parse_gtfs_time
+from utils.footpaths import Footpaths, walking_seconds
+from utils.service_calendar import ServiceCalendar
+from utils.stop_catalogue import StopCatalogue
+
+WEDNESDAY, THURSDAY, SUNDAY = date(2025, 4, 2), date(2025, 4, 3), date(2025, 4, 6)
+
+STOP_TIMES = [
+    ('T1', 'A', '08:00:00', '08:00:00'), ('T1', 'B', '08:05:00', '08:05:00'), ('T1', 'C', '08:10:00', '08:10:00'),
+    ('T2', 'C', '08:12:00', '08:12:00'), ('T2', 'D', '08:20:00', '08:20:00'),
+    ('T3', 'A', '08:30:00', '08:30:00'), ('T3', 'D', '08:40:00', '08:40:00'),
+    ('T4', 'A', '07:00:00', '07:00:00'), ('T4', 'D', '07:10:00', '07:10:00'),
+    ('T5', 'B', '24:10:00', '24:10:00'), ('T5', 'D', '24:20:00', '24:20:00'),
+]
+
+
+@pytest.fixture
+def connections():
+    """Four stops on a line, a transfer at C, a later direct trip, a Sunday trip and a night trip."""
+    catalogue = StopCatalogue(['A', 'B', 'C', 'D'], ['A', 'B', 'C', 'D'], [51.10, 51.11, 51.12, 51.13], [17.0] * 4)
+    calendar = ServiceCalendar([
+        ('WD', 1, 1, 1, 1, 1, 0, 0, '20250331', '20250406'),
+        ('SU', 0, 0, 0, 0, 0, 0, 1, '20250331', '20250406'),
+    ])
+    trips = [('T1', 'R1', 'C', 'WD'), ('T2', 'R2', 'D', 'WD'), ('T3', 'R3', 'D', 'WD'), ('T4', 'R4', 'D', 'SU'),
+             ('T5', 'N1', 'D', 'WD')]
+    stop_time_rows = [(stop, trip, 0, arr, dep) for trip, stop, arr, dep in STOP_TIMES]
+    index = DepartureIndex(catalogue, trips, sorted(stop_time_rows), calendar)
+    return ConnectionTimetable(index, STOP_TIMES)
+
+
+def rides(connections, legs):
+    """(trip_id, from stop_id, to stop_id) of each ride."""
+    ids, stop_ids = connections.index.trip_ids, connections.index.catalogue.stop_ids
+    return [(ids[leg.trip], stop_ids[leg.from_stop], stop_ids[leg.to_stop]) for leg in legs if leg.trip is not None]
+
+
+class TestConnectionTimetable:
+    """Tests for building the connection array."""
+
+    def test_connections_sorted_with_night_copies(self, connections):
+        """Test hops are time-sorted and after-midnight hops also appear on the previous day's clock."""
+        departures = list(connections.departure_times)
+        
+        assert departures == sorted(departures)
+        assert len(connections) == 7
+        assert (departures[0], connections.day_offsets[0]) == (parse_gtfs_time('00:10:00'), -1)
+
+
+class TestEarliestArrival:
+    """Tests for the Connection Scan."""
+
+    def test_journey_with_transfer(self, connections):
+        """Test the earliest arrival uses a transfer instead of the later direct trip."""
+        legs = connections.earliest_arrival([(0, 0.0)], [(3, 0.0)], WEDNESDAY, parse_gtfs_time('07:55:00'))
+        
+        assert rides(connections, legs) == [('T1', 'A', 'C'), ('T2', 'C', 'D')]
+        assert legs[0] == Leg(ORIGIN, 0, parse_gtfs_time('08:00:00'), parse_gtfs_time('08:00:00'))
+        assert legs[-1] == Leg(3, DESTINATION, parse_gtfs_time('08:20:00'), parse_gtfs_time('08:20:00'))
+
+    def test_missed_connection(self, connections):
+        """Test a later start falls back to the next trip."""
+        legs = connections.earliest_arrival([(0, 0.0)], [(3, 0.0)], WEDNESDAY, parse_gtfs_time('08:01:00'))
+        
+        assert rides(connections, legs) == [('T3', 'A', 'D')]
+
+    def test_inactive_service_skipped(self, connections):
+        """Test only trips running on the query date are used."""
+        weekday = connections.earliest_arrival([(0, 0.0)], [(3, 0.0)], WEDNESDAY, parse_gtfs_time('06:55:00'))
+        sunday = connections.earliest_arrival([(0, 0.0)], [(3, 0.0)], SUNDAY, parse_gtfs_time('06:55:00'))
+        
+        assert rides(connections, weekday) == [('T1', 'A', 'C'), ('T2', 'C', 'D')]
+        assert rides(connections, sunday) == [('T4', 'A', 'D')]
+
+    def test_previous_day_night_trip(self, connections):
+        """Test trips of the previous service day running past midnight are found."""
+        legs = connections.earliest_arrival([(1, 0.0)], [(3, 0.0)], THURSDAY, parse_gtfs_time('00:05:00'))
+        
+        assert rides(connections, legs) == [('T5', 'B', 'D')]
+        assert legs[1].day_offset == -1
+        assert legs[-1].arrival == parse_gtfs_time('00:20:00')
+
+    def test_walking_time_counted(self, connections):
+        """Test access and egress walks shift the times of the journey."""
+        legs = connections.earliest_arrival([(0, 250.0)], [(3, 125.0)], WEDNESDAY, parse_gtfs_time('07:55:00'))
+        
+        assert legs[0].departure == parse_gtfs_time('08:00:00') - walking_seconds(250.0)
+        assert legs[-1].arrival == parse_gtfs_time('08:20:00') + walking_seconds(125.0)
+
+    def test_direct_walk_when_faster(self, connections):
+        """Test walking all the way wins when no ride arrives earlier."""
+        legs = connections.earliest_arrival([(0, 0.0)], [(3, 0.0)], WEDNESDAY, parse_gtfs_time('07:55:00'), 300.0)
+        
+        assert legs == [Leg(ORIGIN, DESTINATION, parse_gtfs_time('07:55:00'), parse_gtfs_time('07:55:00') + 240)]
+
+    def test_unreachable(self, connections):
+        """Test None is returned when no trip gets there."""
+        assert connections.earliest_arrival([(0, 0.0)], [(3, 0.0)], WEDNESDAY, parse_gtfs_time('09:00:00')) is None
+
+
+class TestEarliestArrivals:
+    """Tests for the one-to-all scan behind isochrones."""
+
+    def test_stops_reached_by_deadline(self, connections):
+        """Test every stop reached by the deadline is returned with its earliest arrival."""
+        arrivals = connections.earliest_arrivals(
+            [(0, 125.0)], WEDNESDAY, parse_gtfs_time('07:55:00'), parse_gtfs_time('08:12:00')
+        )
+        
+        assert arrivals == {
+            0: parse_gtfs_time('07:55:00') + walking_seconds(125.0),
+            1: parse_gtfs_time('08:05:00'),
+            2: parse_gtfs_time('08:10:00'),
+        }
+
+    def test_access_walk_beyond_budget(self, connections):
+        """Test stops only reachable after the deadline are left out, even on foot."""
+        arrivals = connections.earliest_arrivals(
+            [(0, 1250.0)], WEDNESDAY, parse_gtfs_time('07:55:00'), parse_gtfs_time('08:00:00')
+        )
+        
+        assert arrivals == {}
+
+
+class TestFootpathTransfers:
+    """Tests for changing between stops on foot."""
+
+    def test_walk_between_rides(self):
+        """Test a footpath connects a ride ending at B with one starting at C."""
+        catalogue = StopCatalogue(['A', 'B', 'C', 'D'], ['A', 'B', 'C', 'D'], [51.10, 51.11, 51.111, 51.13], [17.0] * 4)
+        stop_times = [
+            ('T1', 'A', '08:00:00', '08:00:00'), ('T1', 'B', '08:05:00', '08:05:00'),
+            ('T2', 'C', '08:08:00', '08:08:00'), ('T2', 'D', '08:15:00', '08:15:00'),
+        ]
+        trips = [('T1', 'R1', 'B', 'WD'), ('T2', 'R2', 'D', 'WD')]
+        index = DepartureIndex(catalogue, trips, sorted((s, t, 0, a, d) for t, s, a, d in stop_times))
+        footpaths = Footpaths(4, [(1, 2, 111.0, 120), (2, 1, 111.0, 120)])
+        
+        without = ConnectionTimetable(index, stop_times)
+        connections = ConnectionTimetable(index, stop_times, footpaths)
+        
+        assert without.earliest_arrival([(0, 0.0)], [(3, 0.0)], WEDNESDAY, parse_gtfs_time('07:55:00')) is None
+        legs = connections.earliest_arrival([(0, 0.0)], [(3, 0.0)], WEDNESDAY, parse_gtfs_time('07:55:00'))
+        assert [(leg.from_stop, leg.to_stop, leg.trip is None) for leg in legs[1:-1]] == [
+            (0, 1, False), (1, 2, True), (2, 3, False)
+        ]
+        assert legs[2] == Leg(1, 2, parse_gtfs_time('08:05:00'), parse_gtfs_time('08:07:00'))
+
+    def test_walk_follows_the_ride_it_started_from(self):
+        """Test the ride before a walk is the one the walk was timed from when a faster trip overtakes."""
+        catalogue = StopCatalogue(['A', 'B', 'C', 'D'], ['A', 'B', 'C', 'D'], [51.10, 51.11, 51.111, 51.13], [17.0] * 4)
+        stop_times = [
+            ('T1', 'A', '08:00:00', '08:00:00'), ('T1', 'B', '08:30:00', '08:30:00'),
+            ('T2', 'A', '08:05:00', '08:05:00'), ('T2', 'B', '08:20:00', '08:20:00'),
+            ('T3', 'C', '08:25:00', '08:25:00'), ('T3', 'D', '08:35:00', '08:35:00'),
+        ]
+        trips = [('T1', 'R1', 'B', 'WD'), ('T2', 'R2', 'B', 'WD'), ('T3', 'R3', 'D', 'WD')]
+        index = DepartureIndex(catalogue, trips, sorted((s, t, 0, a, d) for t, s, a, d in stop_times))
+        connections = ConnectionTimetable(index, stop_times, Footpaths(4, [(1, 2, 111.0, 120), (2, 1, 111.0, 120)]))
+        
+        legs = connections.earliest_arrival([(0, 0.0)], [(3, 0.0)], WEDNESDAY, parse_gtfs_time('07:55:00'))
+        
+        assert rides(connections, legs) == [('T2', 'A', 'B'), ('T3', 'C', 'D')]
+        assert legs[2] == Leg(1, 2, parse_gtfs_time('08:20:00'), parse_gtfs_time('08:22:00'))
+        assert legs[1].arrival == legs[2].departure
+        assert all(before.arrival <= after.departure for before, after in zip(legs, legs[1:]))
+
+
+class TestBuildConnectionTimetable:
+    """Tests for reading connections from a database."""
+
+    def test_stop_times_read_in_trip_order(self):
+        """Test hops follow stop_sequence, not table order."""
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE stops (stop_id TEXT, stop_name TEXT, stop_lat REAL, stop_lon REAL)")
+        conn.execute("CREATE TABLE trips (route_id TEXT, service_id TEXT, trip_id TEXT, trip_headsign TEXT)")
+        conn.execute(
+            "CREATE TABLE stop_times (trip_id TEXT, arrival_time TEXT, departure_time TEXT, stop_id TEXT, stop_sequence INTEGER)"
+        )
+        conn.executemany("INSERT INTO stops VALUES (?, ?, 51.1, 17.0)", [('A', 'A'), ('B', 'B')])
+        conn.execute("INSERT INTO trips VALUES ('R1', 'WD', 'T1', 'B')")
+        conn.executemany("INSERT INTO stop_times VALUES ('T1', ?, ?, ?, ?)", [
+            ('08:05:00', '08:05:00', 'B', 2), ('08:00:00', '08:00:00', 'A', 1)
+        ])
+        
+        connections = build_connection_timetable(conn)
+        
+        assert len(connections) == 1
+        assert (connections.departure_stops[0], connections.arrival_stops[0]) == (0, 1)
+        conn.close()
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+from unittest.mock import Mock
+
+import pytest
+
+from utils.connection_pool import ConnectionPool
+from utils.db_versions import (
+    VersionTracker, collect_garbage, hold_version, list_versions, new_version_path,
+    publish_version, resolve_db_path
+)
+from utils.feed_cache import FeedCache
+
+
+def make_version(db_path, stop_id):
+    """Write and return a new version file with one stop."""
+    path = new_version_path(db_path)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE stops (stop_id TEXT)")
+    conn.execute("INSERT INTO stops VALUES (?)", (stop_id,))
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Logical database path in an empty directory."""
+    return str(tmp_path / 'feed.db')
+
+
+class TestPublishing:
+    """Tests for publishing versions and collecting old ones."""
+
+    def test_unpublished_database_resolves_to_itself(self, db_path):
+        """Test databases written before versioning keep working."""
+        assert resolve_db_path(db_path) == db_path
+        assert collect_garbage(db_path) == []
+
+    def test_publish_switches_live_version(self, db_path):
+        """Test the pointer names the last published version."""
+        first = make_version(db_path, 'S1')
+        publish_version(db_path, first)
+        second = make_version(db_path, 'S2')
+        
+        assert resolve_db_path(db_path) == first
+        publish_version(db_path, second)
+        assert resolve_db_path(db_path) == second
+
+    def test_collect_garbage_keeps_live_held_and_newer_versions(self, db_path):
+        """Test only old versions nobody holds are deleted."""
+        with open(db_path, 'w'):
+            pass
+        old, held, live = (make_version(db_path, stop) for stop in ('S1', 'S2', 'S3'))
+        publish_version(db_path, live)
+        pending = make_version(db_path, 'S4')
+        
+        with hold_version(held):
+            removed = collect_garbage(db_path)
+        
+        assert sorted(removed) == sorted([old, db_path])
+        assert list_versions(db_path) == [held, live, pending]
+
+
+class TestVersionTracker:
+    """Tests for pinning versions to requests."""
+
+    @pytest.fixture
+    def tracker(self):
+        """Tracker with its own cache and pool."""
+        cache, pool = FeedCache(), ConnectionPool()
+        cache.discard = Mock(wraps=cache.discard)
+        yield VersionTracker(cache=cache, pool=pool)
+        pool.close_all()
+
+    def test_in_flight_request_finishes_on_old_version(self, tracker, db_path):
+        """Test a publish mid-request is seen by the next request only, then the old file is retired."""
+        first = make_version(db_path, 'S1')
+        publish_version(db_path, first)
+        
+        with tracker.use(db_path) as path:
+            with tracker.pool.connection(path):
+                pass
+            second = make_version(db_path, 'S2')
+            publish_version(db_path, second)
+            
+            with tracker.use(db_path) as new_path:
+                with tracker.pool.connection(new_path) as conn:
+                    assert conn.execute("SELECT stop_id FROM stops").fetchall() == [('S2',)]
+            with tracker.pool.connection(path) as conn:
+                assert conn.execute("SELECT stop_id FROM stops").fetchall() == [('S1',)]
+            assert os.path.exists(first)
+        
+        assert not os.path.exists(first)
+        assert tracker.versions_in_use() == {os.path.abspath(second): 0}
+        assert tracker.pool.stats()['idle'] == 1
+        tracker.cache.discard.assert_called_once_with(os.path.abspath(first))
+
+    def test_missing_database(self, tracker, db_path):
+        """Test a database that was never imported is reported as a SQLite error."""
+        with pytest.raises(sqlite3.OperationalError):
+            with tracker.use(db_path):
+                pass
@@ -0,0 +1,206 @@
+import math
+import sqlite3
+from datetime import date
+
+import pytest
+
+from utils.departure_index import DepartureIndex, get_departure_index, parse_gtfs_time
+from utils.feed_cache import feed_cache
+from utils.geo_utils import calculate_bearing
+from utils.service_calendar import ServiceCalendar
+from utils.stop_catalogue import StopCatalogue
+
+
+@pytest.fixture
+def catalogue():
+    """Three stops."""
+    return StopCatalogue(['A', 'B', 'C'], ['Stop A', 'Stop B', 'Stop C'], [51.10, 51.11, 51.12], [17.00, 17.01, 17.02])
+
+
+@pytest.fixture
+def trips():
+    """Trip rows (trip_id, route_id, trip_headsign, service_id)."""
+    return [('T1', 'R1', 'North', 'WD'), ('T2', 'R1', 'North', 'SU'), ('T3', 'R2', 'Night', 'WD')]
+
+
+@pytest.fixture
+def stop_time_rows():
+    """Stop time rows grouped by stop, unsorted within a stop."""
+    return [
+        ('A', 'T2', 1, '09:00:00', '09:01:00'),
+        ('A', 'T1', 1, '08:00:00', '08:01:00'),
+        ('A', 'T3', 1, '24:30:00', '24:30:00'),
+        ('B', 'T1', 2, '08:10:00', '08:11:00'),
+        ('B', 'T2', 2, '09:10:00', '09:11:00'),
+        ('C', 'T1', 3, '08:20:00', '08:20:00'),
+        ('X', 'T1', 4, '08:30:00', '08:30:00'),
+        ('C', 'T9', 1, '08:30:00', '08:30:00'),
+    ]
+
+
+@pytest.fixture
+def index(catalogue, trips, stop_time_rows):
+    """Departure index over the sample rows."""
+    return DepartureIndex(catalogue, trips, stop_time_rows)
+
+
+class TestParseGtfsTime:
+    """Tests for parse_gtfs_time."""
+
+    @pytest.mark.parametrize('time_str, expected', [
+        ('00:00:00', 0),
+        ('08:30:15', 30615),
+        ('5:00:00', 18000),
+        ('25:30:00', 91800),
+    ])
+    def test_parse(self, time_str, expected):
+        """Test conversion to seconds, including times past midnight."""
+        assert parse_gtfs_time(time_str) == expected
+
+
+class TestDepartureIndex:
+    """Tests for DepartureIndex."""
+
+    def test_stop_segments_sorted_by_departure(self, index):
+        """Test each stop's departures are stored in time order."""
+        entries = index.stop_departures(0)
+        
+        assert [index.departure_times[e] for e in entries] == [28860, 32460, 88200]
+        assert [index.trip_ids[index.trips[e]] for e in entries] == ['T1', 'T2', 'T3']
+
+    def test_departures_after(self, index):
+        """Test departures are found by bisecting from the requested time."""
+        def times(stop, after):
+            return [index.departure_times[e] for e in index.departures_after(stop, parse_gtfs_time(after))]
+        
+        assert times(0, '08:01:00') == [28860, 32460, 88200]
+        assert times(0, '08:01:01') == [32460, 88200]
+        assert times(1, '10:00:00') == []
+
+    def test_unknown_stops_and_trips_skipped(self, index):
+        """Test rows referring to missing stops or trips are ignored."""
+        assert len(index) == 6
+        assert [index.trip_ids[index.trips[e]] for e in index.stop_departures(2)] == ['T1']
+
+    def test_trip_endpoints(self, index):
+        """Test first and last stops of each trip by stop_sequence."""
+        assert (index.trip_first_stops[0], index.trip_last_stops[0]) == (0, 2)
+        assert (index.trip_first_stops[1], index.trip_last_stops[1]) == (0, 1)
+        assert (index.trip_first_stops[2], index.trip_last_stops[2]) == (0, 0)
+
+    def test_trip_bearings_from_stop_times(self, index):
+        """Test bearings are derived from first and last stops when not supplied."""
+        assert index.trip_bearings[0] == pytest.approx(calculate_bearing(51.10, 17.00, 51.12, 17.02))
+        assert index.trip_bearings[1] == pytest.approx(calculate_bearing(51.10, 17.00, 51.11, 17.01))
+        assert math.isnan(index.trip_bearings[2])
+
+    def test_precomputed_trip_bearings(self, catalogue, trips, stop_time_rows):
+        """Test supplied bearings are used as is, missing or NULL ones as NaN."""
+        index = DepartureIndex(catalogue, trips, stop_time_rows, trip_bearings={'T1': 90.0, 'T2': None})
+        
+        assert index.trip_bearings[0] == 90.0
+        assert math.isnan(index.trip_bearings[1])
+        assert math.isnan(index.trip_bearings[2])
+
+    def test_stop_without_departures(self, catalogue, trips):
+        """Test a stop that no trip serves."""
+        index = DepartureIndex(catalogue, trips, [])
+        
+        assert index.stop_departures(1) == range(0, 0)
+        assert len(index.departures_after(1, 0)) == 0
+
+    def test_arrays_are_read_only(self, index):
+        """Test the shared index cannot be modified."""
+        with pytest.raises(TypeError):
+            index.departure_times[0] = 0
+
+
+class TestActiveDepartures:
+    """Tests for calendar-aware departure lookup."""
+
+    @pytest.fixture
+    def calendar(self):
+        """Weekday service WD and Sunday service SU, April 2025."""
+        return ServiceCalendar([
+            ('WD', 1, 1, 1, 1, 1, 0, 0, '20250401', '20250430'),
+            ('SU', 0, 0, 0, 0, 0, 0, 1, '20250401', '20250430'),
+        ])
+
+    @pytest.fixture
+    def calendar_index(self, catalogue, trips, stop_time_rows, calendar):
+        """Departure index with the service calendar."""
+        return DepartureIndex(catalogue, trips, stop_time_rows, calendar)
+
+    def names(self, index, active):
+        return [(index.trip_ids[index.trips[entry]], offset) for entry, offset in active]
+
+    def test_inactive_service_skipped(self, calendar_index):
+        """Test a Sunday-only trip is not offered on a Tuesday."""
+        active = calendar_index.active_departures_after(0, date(2025, 4, 1), 0)
+        
+        assert self.names(calendar_index, active) == [('T1', 0), ('T3', 0)]
+
+    def test_only_sunday_service_on_sunday(self, calendar_index):
+        """Test weekday trips are skipped on a Sunday."""
+        active = calendar_index.active_departures_after(0, date(2025, 4, 6), 0)
+        
+        assert self.names(calendar_index, active) == [('T2', 0)]
+
+    def test_previous_day_after_midnight(self, calendar_index):
+        """Test a 24:30 trip of Tuesday's service departs at 00:30 on Wednesday."""
+        active = calendar_index.active_departures_after(0, date(2025, 4, 2), parse_gtfs_time('00:15:00'))
+        
+        assert self.names(calendar_index, active)[0] == ('T3', -1)
+
+    def test_previous_day_inactive(self, calendar_index):
+        """Test no after-midnight trips on Monday, when Sunday has no night service."""
+        active = calendar_index.active_departures_after(0, date(2025, 4, 7), 0)
+        
+        assert self.names(calendar_index, active) == [('T1', 0), ('T3', 0)]
+
+    def test_outside_feed_validity(self, calendar_index):
+        """Test dates the calendar does not cover have no departures."""
+        assert list(calendar_index.active_departures_after(0, date(2025, 6, 3), 0)) == []
+
+    def test_without_calendar_every_trip_runs(self, index):
+        """Test an index without calendar treats every service as active."""
+        active = index.active_departures_after(0, date(2025, 4, 6), parse_gtfs_time('08:30:00'))
+        
+        assert self.names(index, active) == [('T2', 0), ('T3', 0)]
+
+
+class TestGetDepartureIndex:
+    """Tests for the shared departure index."""
+
+    def test_built_once_per_database_version(self, tmp_path, stop_time_rows):
+        """Test the index is shared, bound to its catalogue and reads imported bearings."""
+        db_path = str(tmp_path / 'feed.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE stops (stop_id TEXT, stop_name TEXT, stop_lat REAL, stop_lon REAL)")
+        conn.execute("CREATE TABLE trips (route_id TEXT, service_id TEXT, trip_id TEXT, trip_headsign TEXT)")
+        conn.execute(
+            "CREATE TABLE stop_times (trip_id TEXT, arrival_time TEXT, departure_time TEXT, stop_id TEXT, stop_sequence INTEGER)"
+        )
+        conn.executemany("INSERT INTO stops VALUES (?, ?, 51.1, 17.0)", [('A', 'Stop A'), ('B', 'Stop B'), ('C', 'Stop C')])
+        conn.executemany("INSERT INTO trips VALUES ('R1', 'WD', ?, 'North')", [('T1',), ('T2',), ('T3',)])
+        conn.executemany(
+            "INSERT INTO stop_times VALUES (?, ?, ?, ?, ?)",
+            [(trip, arr, dep, stop, seq) for stop, trip, seq, arr, dep in stop_time_rows]
+        )
+        conn.execute("CREATE TABLE patterns (pattern_id INTEGER PRIMARY KEY, bearing REAL)")
+        conn.execute("CREATE TABLE trip_patterns (trip_id PRIMARY KEY, pattern_id INTEGER)")
+        conn.executemany("INSERT INTO patterns VALUES (?, ?)", [(0, None), (1, 180.0)])
+        conn.executemany("INSERT INTO trip_patterns VALUES (?, ?)", [('T1', 0), ('T2', 1), ('T3', 1)])
+        conn.commit()
+        conn.close()
+        
+        try:
+            index = get_departure_index(db_path)
+            
+            assert index is get_departure_index(db_path)
+            assert index.catalogue.stop_ids == ('A', 'B', 'C')
+            assert len(index) == 6
+            assert math.isnan(index.trip_bearings[0])
+            assert index.trip_bearings[1] == 180.0
+        finally:
+            feed_cache.clear()
@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+
+from utils.footpaths import Footpaths, build_footpaths, find_footpaths, walking_seconds
+from utils.stop_catalogue import StopCatalogue
+
+
+@pytest.fixture
+def catalogue():
+    """Two stops 222 m apart and one far away."""
+    return StopCatalogue(['A', 'B', 'C'], ['A', 'B', 'C'], [51.1000, 51.1020, 51.2000], [17.0] * 3)
+
+
+class TestFindFootpaths:
+    """Tests for linking nearby stops."""
+
+    def test_nearby_stops_linked(self, catalogue):
+        """Test stops within the radius are linked both ways and never to themselves."""
+        footpaths = find_footpaths(catalogue, radius=400)
+        
+        assert [(a, b) for a, b, _, _ in footpaths] == [(0, 1), (1, 0)]
+        assert footpaths[0][3] == walking_seconds(footpaths[0][2])
+
+    def test_speed(self, catalogue):
+        """Test walking times follow the given speed."""
+        (_, _, distance, seconds), _ = find_footpaths(catalogue, radius=400, speed=2.0)
+        
+        assert seconds == walking_seconds(distance, 2.0) == 112
+
+
+class TestFootpaths:
+    """Tests for the footpath adjacency lists."""
+
+    def test_closest_first(self):
+        """Test a stop's footpaths are listed by walking time."""
+        footpaths = Footpaths(3, [(0, 2, 300.0, 240), (0, 1, 100.0, 80), (2, 0, 300.0, 240)])
+        
+        assert len(footpaths) == 3
+        assert footpaths.from_stop(0) == [(1, 80), (2, 240)]
+        assert footpaths.from_stop(1) == []
+        assert footpaths.from_stop(2) == [(0, 240)]
+
+
+class TestBuildFootpaths:
+    """Tests for reading footpaths from a database."""
+
+    def make_stops(self, conn):
+        conn.execute("CREATE TABLE stops (stop_id TEXT, stop_name TEXT, stop_lat REAL, stop_lon REAL)")
+        conn.executemany("INSERT INTO stops VALUES (?, ?, ?, 17.0)", [
+            ('A', 'A', 51.1000), ('B', 'B', 51.1020), ('C', 'C', 51.2000)
+        ])
+
+    def test_table_read(self):
+        """Test the importer's table is used as stored, mapped to stop positions."""
+        conn = sqlite3.connect(':memory:')
+        self.make_stops(conn)
+        conn.execute("CREATE TABLE footpaths (from_stop_id TEXT, to_stop_id TEXT, distance REAL, walking_seconds INTEGER)")
+        conn.executemany("INSERT INTO footpaths VALUES (?, ?, ?, ?)", [('A', 'C', 50.0, 60), ('X', 'A', 1.0, 1)])
+        
+        footpaths = build_footpaths(conn)
+        
+        assert footpaths.from_stop(0) == [(2, 60)]
+        assert len(footpaths) == 1
+        conn.close()
+
+    def test_computed_without_table(self):
+        """Test footpaths are computed from the stops of databases imported without them."""
+        conn = sqlite3.connect(':memory:')
+        self.make_stops(conn)
+        
+        footpaths = build_footpaths(conn)
+        
+        assert [stop for stop, _ in footpaths.from_stop(0)] == [1]
+        assert footpaths.from_stop(2) == []
+        conn.close()
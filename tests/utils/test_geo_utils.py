@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from utils import geo_utils
+from utils.geo_utils import (
+    calculate_bearing,
+    calculate_bearings,
+    calculate_distance,
+    calculate_distances,
+    filter_stops_by_radius,
+)
+
+
+@pytest.fixture
+def coordinate_pairs():
+    """Random coordinate pairs, mostly around Wroclaw plus a few global ones."""
+    rng = random.Random(3)
+    pairs = [
+        (51.0 + rng.random() * 0.3, 16.8 + rng.random() * 0.4, 51.0 + rng.random() * 0.3, 16.8 + rng.random() * 0.4)
+        for _ in range(500)
+    ]
+    pairs += [
+        (rng.uniform(-89, 89), rng.uniform(-180, 180), rng.uniform(-89, 89), rng.uniform(-180, 180))
+        for _ in range(100)
+    ]
+    pairs.append((51.1079, 17.0385, 51.1079, 17.0385))
+    return pairs
+
+
+@pytest.fixture(params=['numpy', 'pure-python'])
+def backend(request, monkeypatch):
+    """Run a test with and without NumPy."""
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(geo_utils, 'np', None)
+    return request.param
+
+
+def columns(pairs):
+    return [[p[i] for p in pairs] for i in range(4)]
+
+
+class TestBatchKernels:
+    """Tests that batch kernels match the scalar functions."""
+
+    def test_distances_match_scalar(self, backend, coordinate_pairs):
+        """Test batch distances against calculate_distance."""
+        expected = [calculate_distance(*p) for p in coordinate_pairs]
+        
+        result = calculate_distances(*columns(coordinate_pairs))
+        
+        assert list(result) == pytest.approx(expected, rel=1e-9, abs=1e-6)
+
+    def test_bearings_match_scalar(self, backend, coordinate_pairs):
+        """Test batch bearings against calculate_bearing."""
+        expected = [calculate_bearing(*p) for p in coordinate_pairs]
+        
+        result = calculate_bearings(*columns(coordinate_pairs))
+        
+        assert list(result) == pytest.approx(expected, rel=1e-9, abs=1e-9)
+
+    def test_scalar_origin_broadcast(self, backend, coordinate_pairs):
+        """Test one origin against arrays of destinations."""
+        _, _, lats, lons = columns(coordinate_pairs)
+        expected = [calculate_distance(51.1079, 17.0385, lat, lon) for lat, lon in zip(lats, lons)]
+        
+        result = calculate_distances(51.1079, 17.0385, lats, lons)
+        
+        assert list(result) == pytest.approx(expected, rel=1e-9, abs=1e-6)
+
+    def test_empty_arrays(self, backend):
+        """Test batch kernels with no coordinates."""
+        assert len(calculate_distances(51.1, 17.0, [], [])) == 0
+        assert len(calculate_bearings(51.1, 17.0, [], [])) == 0
+
+    def test_filter_stops_by_radius_same_on_both_paths(self, backend, coordinate_pairs):
+        """Test vectorized radius filter matches the scalar definition."""
+        stops = [{'stop_id': str(i), 'stop_lat': p[2], 'stop_lon': p[3]} for i, p in enumerate(coordinate_pairs)]
+        expected = sorted(
+            (s['stop_id'] for s in stops if calculate_distance(51.1079, 17.0385, s['stop_lat'], s['stop_lon']) <= 10000),
+            key=lambda stop_id: calculate_distance(51.1079, 17.0385, stops[int(stop_id)]['stop_lat'], stops[int(stop_id)]['stop_lon'])
+        )
+        
+        result = filter_stops_by_radius(51.1079, 17.0385, stops, radius=10000)
+        
+        assert [s['stop_id'] for s in result] == expected
+        assert all(isinstance(s['distance'], float) for s in result)
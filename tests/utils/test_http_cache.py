@@ -0,0 +1,143 @@
+import os
+import sqlite3
+from datetime import date, datetime, timezone
+
+import pytest
+from flask import Flask
+
+from utils.http_cache import FEED_END_GRACE, MAX_AGE, etag_for, feed_static, load_feed_end_date, max_age
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Database file whose feed ends on 2025-04-06."""
+    path = str(tmp_path / 'feed.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE feed_info (feed_publisher_name TEXT, feed_end_date TEXT)")
+    conn.execute("INSERT INTO feed_info VALUES ('UM Wroclaw', '20250406')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def client(db_path):
+    """Test client of a feed-static view counting its calls."""
+    app = Flask(__name__)
+    app.calls = []
+    app.db_paths = []
+
+    @app.route('/unpublished')
+    @feed_static(lambda: db_path + '.missing', lambda: 'unpublished')
+    def unpublished(db_path):
+        return {}
+
+    @app.route('/item/<item_id>')
+    @feed_static(lambda: db_path, lambda item_id: f'item/{item_id}')
+    def item(item_id, db_path):
+        app.calls.append(item_id)
+        app.db_paths.append(db_path)
+        if item_id == 'missing':
+            return {'error': 'not found'}, 404
+        return {'item': item_id}
+
+    return app.test_client()
+
+
+class TestFeedStatic:
+    """Tests for the feed_static decorator."""
+
+    def test_headers_on_success(self, client):
+        """Test a successful response carries an ETag, Last-Modified and Cache-Control."""
+        response = client.get('/item/a')
+        
+        assert response.status_code == 200
+        assert response.headers['ETag']
+        assert response.headers['Last-Modified']
+        assert response.cache_control.public
+        assert response.cache_control.max_age == FEED_END_GRACE  # The feed ended in 2025
+
+    def test_matching_etag_skips_view(self, client):
+        """Test a matching If-None-Match gets a 304 without running the view."""
+        etag = client.get('/item/a').headers['ETag']
+        
+        response = client.get('/item/a', headers={'If-None-Match': etag})
+        
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert client.application.calls == ['a']
+
+    def test_etag_per_resource(self, client):
+        """Test another resource's ETag does not match."""
+        etag = client.get('/item/a').headers['ETag']
+        
+        response = client.get('/item/b', headers={'If-None-Match': etag})
+        
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_etag_changes_with_feed(self, client, db_path):
+        """Test a new import invalidates earlier ETags."""
+        etag = client.get('/item/a').headers['ETag']
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO feed_info VALUES ('Other', '20250501')")
+        conn.commit()
+        conn.close()
+        
+        assert client.get('/item/a', headers={'If-None-Match': etag}).status_code == 200
+
+    def test_if_modified_since(self, client):
+        """Test If-Modified-Since at or after the feed's modification time gets a 304."""
+        last_modified = client.get('/item/a').headers['Last-Modified']
+        
+        assert client.get('/item/a', headers={'If-Modified-Since': last_modified}).status_code == 304
+
+    def test_view_gets_pinned_version(self, client, db_path):
+        """Test the view reads the database version the headers were built from."""
+        client.get('/item/a')
+        
+        assert client.application.db_paths == [os.path.abspath(db_path)]
+
+    def test_missing_database(self, client):
+        """Test a database that cannot be opened is a JSON 500 rather than an HTML error page."""
+        response = client.get('/unpublished')
+        
+        assert response.status_code == 500
+        assert response.get_json()['error'].startswith('Database error')
+        assert 'ETag' not in response.headers
+
+    def test_errors_not_cached(self, client):
+        """Test error responses get no caching headers."""
+        response = client.get('/item/missing')
+        
+        assert response.status_code == 404
+        assert 'ETag' not in response.headers
+
+
+class TestHelpers:
+    """Tests for etag_for, max_age and load_feed_end_date."""
+
+    def test_etag_for(self):
+        """Test ETags are stable and differ by version and resource."""
+        version = ('/feed.db', 1, 2)
+        
+        assert etag_for(version, 'trip/1') == etag_for(version, 'trip/1')
+        assert etag_for(version, 'trip/1') != etag_for(version, 'trip/2')
+        assert etag_for(version, 'trip/1') != etag_for(('/feed.db', 3, 2), 'trip/1')
+
+    def test_max_age(self):
+        """Test lifetimes end with the feed's last day and are capped."""
+        now = datetime(2025, 4, 6, 23, 0, tzinfo=timezone.utc)
+        
+        assert max_age(date(2025, 4, 6), now) == 3600
+        assert max_age(date(2025, 4, 6), now.replace(hour=23, minute=50)) == 600
+        assert max_age(date(2025, 4, 5), now) == FEED_END_GRACE
+        assert max_age(date(2025, 5, 1), now) == MAX_AGE
+        assert max_age(None, now) == MAX_AGE
+
+    def test_load_feed_end_date(self, db_path):
+        """Test the end date is read from feed_info and missing tables give None."""
+        conn = sqlite3.connect(db_path)
+        
+        assert load_feed_end_date(conn) == date(2025, 4, 6)
+        assert load_feed_end_date(sqlite3.connect(':memory:')) is None
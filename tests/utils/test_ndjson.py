@@ -0,0 +1,58 @@
+import json
+from contextlib import ExitStack
+
+from flask import Flask
+
+from utils.ndjson import NDJSON_MIMETYPE, ndjson_response, wants_ndjson
+
+app = Flask(__name__)
+
+
+class TestWantsNdjson:
+    """Tests for content negotiation."""
+
+    def test_explicit_accept(self):
+        """Test asking for NDJSON selects it."""
+        with app.test_request_context(headers={'Accept': NDJSON_MIMETYPE}):
+            assert wants_ndjson()
+
+    def test_browsers_get_json(self):
+        """Test wildcard and JSON Accept headers keep the JSON document."""
+        for accept in ('*/*', 'application/json', f'application/json, {NDJSON_MIMETYPE};q=0.5'):
+            with app.test_request_context(headers={'Accept': accept}):
+                assert not wants_ndjson()
+        with app.test_request_context():
+            assert not wants_ndjson()
+
+
+class TestNdjsonResponse:
+    """Tests for ndjson_response."""
+
+    def test_one_object_per_line(self):
+        """Test rows are serialized one per line, as they are produced."""
+        produced = []
+
+        def rows():
+            for i in range(3):
+                produced.append(i)
+                yield {'n': i}
+        
+        with app.test_request_context():
+            response = ndjson_response(rows())
+            assert response.mimetype == NDJSON_MIMETYPE
+            chunks = response.response
+            assert json.loads(next(chunks)) == {'n': 0}
+            assert produced == [0]
+            assert [json.loads(line) for line in chunks] == [{'n': 1}, {'n': 2}]
+
+    def test_resources_closed_with_response(self):
+        """Test held resources are released when the response closes, even unread."""
+        closed = []
+        resources = ExitStack()
+        resources.callback(closed.append, True)
+        
+        with app.test_request_context():
+            response = ndjson_response(iter([{'n': 0}]), resources)
+            response.close()
+        
+        assert closed == [True]
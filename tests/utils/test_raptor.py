@@ -0,0 +1,174 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+from utils.connection_scan import DESTINATION, ORIGIN, Leg
+from utils.departure_index import DepartureIndex, parse_gtfs_time
+from utils.footpaths import Footpaths
+from utils.raptor import RouteTimetable, build_route_timetable
+from utils.service_calendar import ServiceCalendar
+from utils.stop_catalogue import StopCatalogue
+
+WEDNESDAY, THURSDAY, SUNDAY = date(2025, 4, 2), date(2025, 4, 3), date(2025, 4, 6)
+
+STOP_TIMES = [
+    ('T1', 'A', '08:00:00', '08:00:00'), ('T1', 'B', '08:05:00', '08:05:00'), ('T1', 'C', '08:10:00', '08:10:00'),
+    ('T2', 'C', '08:12:00', '08:12:00'), ('T2', 'D', '08:20:00', '08:20:00'),
+    ('T3', 'A', '08:01:00', '08:01:00'), ('T3', 'D', '08:40:00', '08:40:00'),
+    ('T4', 'A', '07:00:00', '07:00:00'), ('T4', 'D', '07:10:00', '07:10:00'),
+    ('T5', 'B', '24:10:00', '24:10:00'), ('T5', 'D', '24:20:00', '24:20:00'),
+]
+
+
+@pytest.fixture
+def routes():
+    """A fast route with a transfer at C, a slow direct trip, a Sunday trip and a night trip."""
+    catalogue = StopCatalogue(['A', 'B', 'C', 'D'], ['A', 'B', 'C', 'D'], [51.10, 51.11, 51.12, 51.13], [17.0] * 4)
+    calendar = ServiceCalendar([
+        ('WD', 1, 1, 1, 1, 1, 0, 0, '20250331', '20250406'),
+        ('SU', 0, 0, 0, 0, 0, 0, 1, '20250331', '20250406'),
+    ])
+    trips = [('T1', 'R1', 'C', 'WD'), ('T2', 'R2', 'D', 'WD'), ('T3', 'R3', 'D', 'WD'), ('T4', 'R3', 'D', 'SU'),
+             ('T5', 'N1', 'D', 'WD')]
+    stop_time_rows = [(stop, trip, 0, arr, dep) for trip, stop, arr, dep in STOP_TIMES]
+    index = DepartureIndex(catalogue, trips, sorted(stop_time_rows), calendar)
+    return RouteTimetable(index, STOP_TIMES)
+
+
+def rides(routes, legs):
+    """(trip_id, from stop_id, to stop_id) of each ride."""
+    ids, stop_ids = routes.index.trip_ids, routes.index.catalogue.stop_ids
+    return [(ids[leg.trip], stop_ids[leg.from_stop], stop_ids[leg.to_stop]) for leg in legs if leg.trip is not None]
+
+
+def pattern_trips(routes):
+    """Trip ids of each pattern, in pattern order."""
+    ids, starts = routes.index.trip_ids, routes.pattern_trip_starts
+    return sorted([ids[t] for t in routes.pattern_trips[starts[p]:starts[p + 1]]] for p in range(len(routes)))
+
+
+class TestRouteTimetable:
+    """Tests for grouping trips into route patterns."""
+
+    def test_trips_grouped_by_stop_sequence(self, routes):
+        """Test trips with the same stops share a pattern in departure order and night trips get a previous-day copy."""
+        assert pattern_trips(routes) == [['T1'], ['T2'], ['T4', 'T3'], ['T5', 'T5']]
+
+    def test_overtaking_trip_split_off(self):
+        """Test a trip overtaking an earlier one of the same sequence gets its own pattern."""
+        catalogue = StopCatalogue(['A', 'B'], ['A', 'B'], [51.10, 51.11], [17.0] * 2)
+        stop_times = [
+            ('S', 'A', '08:00:00', '08:00:00'), ('S', 'B', '08:30:00', '08:30:00'),
+            ('F', 'A', '08:05:00', '08:05:00'), ('F', 'B', '08:15:00', '08:15:00'),
+            ('L', 'A', '08:10:00', '08:10:00'), ('L', 'B', '08:40:00', '08:40:00'),
+        ]
+        trips = [(trip, 'R1', 'B', 'WD') for trip in ('S', 'F', 'L')]
+        index = DepartureIndex(catalogue, trips, sorted((s, t, 0, a, d) for t, s, a, d in stop_times))
+        
+        routes = RouteTimetable(index, stop_times)
+        
+        assert pattern_trips(routes) == [['F'], ['S', 'L']]
+        legs = routes.pareto_journeys([(0, 0.0)], [(1, 0.0)], WEDNESDAY, parse_gtfs_time('07:55:00'))
+        assert rides(routes, legs[-1]) == [('F', 'A', 'B')]
+
+
+class TestParetoJourneys:
+    """Tests for the RAPTOR search."""
+
+    def test_direct_and_transfer_journeys(self, routes):
+        """Test the slower direct trip and the faster journey with a transfer are both returned."""
+        journeys = routes.pareto_journeys([(0, 0.0)], [(3, 0.0)], WEDNESDAY, parse_gtfs_time('07:55:00'))
+        
+        assert [rides(routes, legs) for legs in journeys] == [
+            [('T3', 'A', 'D')],
+            [('T1', 'A', 'C'), ('T2', 'C', 'D')],
+        ]
+        assert journeys[1][0] == Leg(ORIGIN, 0, parse_gtfs_time('08:00:00'), parse_gtfs_time('08:00:00'))
+        assert journeys[1][-1] == Leg(3, DESTINATION, parse_gtfs_time('08:20:00'), parse_gtfs_time('08:20:00'))
+
+    def test_dominated_journey_dropped(self, routes):
+        """Test a journey with more transfers is left out when it does not arrive earlier."""
+        journeys = routes.pareto_journeys([(0, 0.0)], [(2, 0.0)], WEDNESDAY, parse_gtfs_time('07:55:00'))
+        
+        assert [rides(routes, legs) for legs in journeys] == [[('T1', 'A', 'C')]]
+
+    def test_inactive_service_skipped(self, routes):
+        """Test only trips running on the query date are used."""
+        sunday = routes.pareto_journeys([(0, 0.0)], [(3, 0.0)], SUNDAY, parse_gtfs_time('06:55:00'))
+        
+        assert [rides(routes, legs) for legs in sunday] == [[('T4', 'A', 'D')]]
+
+    def test_previous_day_night_trip(self, routes):
+        """Test trips of the previous service day running past midnight are found."""
+        journeys = routes.pareto_journeys([(1, 0.0)], [(3, 0.0)], THURSDAY, parse_gtfs_time('00:05:00'))
+        
+        assert [rides(routes, legs) for legs in journeys] == [[('T5', 'B', 'D')]]
+        assert journeys[0][1].day_offset == -1
+        assert journeys[0][-1].arrival == parse_gtfs_time('00:20:00')
+
+    def test_direct_walk_first(self, routes):
+        """Test walking all the way is the zero-transfer option and rides must beat it."""
+        journeys = routes.pareto_journeys([(0, 0.0)], [(3, 0.0)], WEDNESDAY, parse_gtfs_time('07:55:00'), 3000.0)
+        
+        assert journeys[0] == [Leg(ORIGIN, DESTINATION, parse_gtfs_time('07:55:00'), parse_gtfs_time('07:55:00') + 2400)]
+        assert [rides(routes, legs) for legs in journeys[1:]] == [[('T1', 'A', 'C'), ('T2', 'C', 'D')]]
+
+    def test_max_rides(self, routes):
+        """Test journeys needing more rides than allowed are not looked for."""
+        journeys = routes.pareto_journeys([(0, 0.0)], [(3, 0.0)], WEDNESDAY, parse_gtfs_time('07:55:00'), max_rides=1)
+        
+        assert [rides(routes, legs) for legs in journeys] == [[('T3', 'A', 'D')]]
+
+    def test_unreachable(self, routes):
+        """Test an empty list when no trip gets there."""
+        assert routes.pareto_journeys([(0, 0.0)], [(3, 0.0)], WEDNESDAY, parse_gtfs_time('09:00:00')) == []
+
+
+class TestFootpathTransfers:
+    """Tests for changing between stops on foot."""
+
+    def test_walk_between_rides(self):
+        """Test a footpath connects a ride ending at B with one starting at C."""
+        catalogue = StopCatalogue(['A', 'B', 'C', 'D'], ['A', 'B', 'C', 'D'], [51.10, 51.11, 51.111, 51.13], [17.0] * 4)
+        stop_times = [
+            ('T1', 'A', '08:00:00', '08:00:00'), ('T1', 'B', '08:05:00', '08:05:00'),
+            ('T2', 'C', '08:08:00', '08:08:00'), ('T2', 'D', '08:15:00', '08:15:00'),
+        ]
+        trips = [('T1', 'R1', 'B', 'WD'), ('T2', 'R2', 'D', 'WD')]
+        index = DepartureIndex(catalogue, trips, sorted((s, t, 0, a, d) for t, s, a, d in stop_times))
+        footpaths = Footpaths(4, [(1, 2, 111.0, 120), (2, 1, 111.0, 120)])
+        
+        without = RouteTimetable(index, stop_times)
+        routes = RouteTimetable(index, stop_times, footpaths)
+        
+        assert without.pareto_journeys([(0, 0.0)], [(3, 0.0)], WEDNESDAY, parse_gtfs_time('07:55:00')) == []
+        legs, = routes.pareto_journeys([(0, 0.0)], [(3, 0.0)], WEDNESDAY, parse_gtfs_time('07:55:00'))
+        assert [(leg.from_stop, leg.to_stop, leg.trip is None) for leg in legs[1:-1]] == [
+            (0, 1, False), (1, 2, True), (2, 3, False)
+        ]
+        assert legs[2] == Leg(1, 2, parse_gtfs_time('08:05:00'), parse_gtfs_time('08:07:00'))
+
+
+class TestBuildRouteTimetable:
+    """Tests for reading route patterns from a database."""
+
+    def test_stop_times_read_in_trip_order(self):
+        """Test pattern stops follow stop_sequence, not table order."""
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE stops (stop_id TEXT, stop_name TEXT, stop_lat REAL, stop_lon REAL)")
+        conn.execute("CREATE TABLE trips (route_id TEXT, service_id TEXT, trip_id TEXT, trip_headsign TEXT)")
+        conn.execute(
+            "CREATE TABLE stop_times (trip_id TEXT, arrival_time TEXT, departure_time TEXT, stop_id TEXT, stop_sequence INTEGER)"
+        )
+        conn.executemany("INSERT INTO stops VALUES (?, ?, 51.1, 17.0)", [('A', 'A'), ('B', 'B')])
+        conn.execute("INSERT INTO trips VALUES ('R1', 'WD', 'T1', 'B')")
+        conn.executemany("INSERT INTO stop_times VALUES ('T1', ?, ?, ?, ?)", [
+            ('08:05:00', '08:05:00', 'B', 2), ('08:00:00', '08:00:00', 'A', 1)
+        ])
+        
+        routes = build_route_timetable(conn)
+        
+        assert len(routes) == 1
+        assert list(routes.pattern_stops) == [0, 1]
+        conn.close()
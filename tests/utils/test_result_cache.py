@@ -0,0 +1,126 @@
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+from utils.geo_utils import calculate_distance
+from utils.result_cache import DEFAULT_CONFIG, ResultCache, minute_bucket, snap_point
+
+
+class FakeClock:
+    """Monotonic clock advanced by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Clock replacing time.monotonic in the result cache."""
+    clock = FakeClock()
+    monkeypatch.setattr('utils.result_cache.time.monotonic', clock)
+    return clock
+
+
+class TestResultCache:
+    """Tests for ResultCache."""
+
+    def test_hit_after_miss(self):
+        """Test a stored result is served after the first miss."""
+        cache = ResultCache()
+        
+        assert cache.get('key') is None
+        cache.put('key', ['result'])
+        assert cache.get('key') == ['result']
+        
+        assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 0, 'expirations': 0, 'size': 1}
+
+    def test_least_recently_used_evicted(self):
+        """Test the entry unused for longest goes first when the cache is full."""
+        cache = ResultCache(RESULT_CACHE_SIZE=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        assert cache.get('a') == 1
+        
+        cache.put('c', 3)
+        
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+        assert cache.stats()['evictions'] == 1
+
+    def test_expired_after_ttl(self, clock):
+        """Test results are not served once their time to live has passed."""
+        cache = ResultCache(RESULT_CACHE_TTL=10)
+        cache.put('key', 'value')
+        
+        clock.now += 9
+        assert cache.get('key') == 'value'
+        clock.now += 1
+        assert cache.get('key') is None
+        
+        stats = cache.stats()
+        assert stats['expirations'] == 1
+        assert stats['size'] == 0
+
+    def test_disabled(self):
+        """Test a disabled cache stores nothing and counts nothing."""
+        cache = ResultCache(RESULT_CACHE_ENABLED=False)
+        
+        cache.put('key', 'value')
+        
+        assert cache.get('key') is None
+        assert cache.stats() == {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'size': 0}
+
+    def test_configure_clears_entries(self):
+        """Test changing settings drops cached results."""
+        cache = ResultCache()
+        cache.put('key', 'value')
+        
+        cache.configure(RESULT_CACHE_TTL=5)
+        
+        assert cache.get('key') is None
+
+    def test_invalid_settings(self):
+        """Test unknown settings and non-positive limits are rejected."""
+        cache = ResultCache()
+        with pytest.raises(ValueError):
+            cache.configure(RESULT_CACHE_ENTRIES=10)
+        with pytest.raises(ValueError):
+            cache.configure(RESULT_CACHE_SIZE=0)
+        with pytest.raises(ValueError):
+            cache.configure(RESULT_CACHE_TTL=-1)
+
+    def test_init_app(self):
+        """Test app config overrides defaults and receives the effective settings."""
+        app = Flask(__name__)
+        app.config['RESULT_CACHE_ENABLED'] = False
+        cache = ResultCache()
+        
+        cache.init_app(app)
+        
+        assert app.extensions['result_cache'] is cache
+        assert not cache.enabled
+        assert app.config['RESULT_CACHE_SIZE'] == DEFAULT_CONFIG['RESULT_CACHE_SIZE']
+
+
+class TestKeys:
+    """Tests for snap_point and minute_bucket."""
+
+    def test_nearby_points_share_a_cell(self):
+        """Test points a few meters apart in one cell snap to the same centre."""
+        centre = snap_point(51.1100, 17.0300, 25)
+        
+        assert snap_point(*centre, 25) == centre
+        assert calculate_distance(51.1100, 17.0300, *centre) < 25
+
+    def test_distant_points_differ(self):
+        """Test points further apart than the grid snap to different centres."""
+        assert snap_point(51.1100, 17.0300, 25) != snap_point(51.1100, 17.0310, 25)
+
+    def test_minute_bucket(self):
+        """Test times are truncated to the minute."""
+        assert minute_bucket(datetime(2024, 1, 15, 8, 30, 59, 999)) == datetime(2024, 1, 15, 8, 30)
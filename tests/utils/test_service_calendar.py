@@ -0,0 +1,98 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+from utils.service_calendar import ALL_SERVICES, ServiceCalendar, load_service_calendar, parse_gtfs_date
+
+
+@pytest.fixture
+def calendar():
+    """Weekday and weekend services in April 2025, with Easter Monday exceptions."""
+    return ServiceCalendar(
+        [
+            ('WD', 1, 1, 1, 1, 1, 0, 0, '20250401', '20250430'),
+            ('WE', 0, 0, 0, 0, 0, 1, 1, '20250401', '20250430'),
+        ],
+        [
+            ('WD', '20250421', 2),
+            ('WE', '20250421', 1),
+            ('EXTRA', '20250503', 1),
+        ]
+    )
+
+
+class TestParseGtfsDate:
+    """Tests for parse_gtfs_date."""
+
+    @pytest.mark.parametrize('value', ['20250322', 20250322, 20250322.0, '20250322.0'])
+    def test_parse(self, value):
+        """Test text and numeric column values."""
+        assert parse_gtfs_date(value) == date(2025, 3, 22)
+
+
+class TestServiceCalendar:
+    """Tests for ServiceCalendar."""
+
+    def test_weekly_patterns(self, calendar):
+        """Test services follow their weekday flags."""
+        assert calendar.active_services(date(2025, 4, 2)) == {'WD'}
+        assert calendar.active_services(date(2025, 4, 6)) == {'WE'}
+
+    def test_exceptions(self, calendar):
+        """Test calendar_dates removes and adds services."""
+        assert calendar.active_services(date(2025, 4, 21)) == {'WE'}
+        assert calendar.active_services(date(2025, 5, 3)) == {'EXTRA'}
+
+    def test_outside_date_range(self, calendar):
+        """Test no service runs outside its start and end dates."""
+        assert calendar.active_mask(date(2025, 3, 31)) == 0
+        assert calendar.active_mask(date(2025, 5, 5)) == 0
+
+    def test_compact_positions(self, calendar):
+        """Test service ids map to consecutive bit positions."""
+        assert calendar.service_ids == ('WD', 'WE', 'EXTRA')
+        mask = calendar.active_mask(date(2025, 4, 2))
+        assert mask >> calendar.service_position('WD') & 1
+        assert not mask >> calendar.service_position('WE') & 1
+
+    def test_unknown_service_never_runs(self, calendar):
+        """Test services missing from the calendar are inactive."""
+        position = calendar.service_position('MISSING')
+        
+        assert not calendar.active_mask(date(2025, 4, 2)) >> position & 1
+
+    def test_unrestricted_without_data(self):
+        """Test every service runs when the feed has no calendar."""
+        calendar = ServiceCalendar()
+        
+        assert calendar.active_mask(date(2025, 4, 2)) == ALL_SERVICES
+        assert ALL_SERVICES >> calendar.service_position('ANY') & 1
+
+
+class TestLoadServiceCalendar:
+    """Tests for load_service_calendar."""
+
+    def test_numeric_columns(self):
+        """Test tables imported with REAL service ids and dates."""
+        conn = sqlite3.connect(':memory:')
+        conn.execute(
+            "CREATE TABLE calendar (service_id REAL, monday REAL, tuesday REAL, wednesday REAL, thursday REAL,"
+            " friday REAL, saturday REAL, sunday REAL, start_date REAL, end_date REAL)"
+        )
+        conn.execute("CREATE TABLE calendar_dates (service_id REAL, date REAL, exception_type REAL)")
+        conn.execute("INSERT INTO calendar VALUES (3.0, 1, 1, 1, 1, 1, 0, 0, 20250322.0, 20250406.0)")
+        conn.execute("INSERT INTO calendar_dates VALUES (3.0, 20250402.0, 2.0)")
+        
+        calendar = load_service_calendar(conn)
+        
+        assert calendar.active_services(date(2025, 4, 1)) == {3.0}
+        assert calendar.active_services(date(2025, 4, 2)) == frozenset()
+        conn.close()
+
+    def test_missing_tables(self):
+        """Test a database without calendar tables is unrestricted."""
+        conn = sqlite3.connect(':memory:')
+        
+        assert load_service_calendar(conn).active_mask(date(2025, 4, 2)) == ALL_SERVICES
+        conn.close()
@@ -0,0 +1,84 @@
+import math
+import sqlite3
+
+import pytest
+
+from utils.shapes import (
+    MAX_ZOOM, decode_polyline, encode_polyline, load_shape, pack_points, significance, simplify, zoom_tolerance
+)
+
+
+@pytest.fixture
+def line():
+    """A line heading east with a 100 m detour north and a 5 m wiggle."""
+    return [(51.1000, 17.0000), (51.10000, 17.0010), (51.1009, 17.0020), (51.10000, 17.0030), (51.10005, 17.0040), (51.1000, 17.0050)]
+
+
+class TestSimplify:
+    """Tests for Douglas-Peucker simplification."""
+
+    def test_endpoints_always_kept(self, line):
+        """Test a huge tolerance leaves the first and last point."""
+        assert simplify(line, 10_000) == [line[0], line[-1]]
+
+    def test_small_deviations_dropped(self, line):
+        """Test points closer to the line than the tolerance are dropped, larger detours kept."""
+        assert simplify(line, 45) == [line[0], line[2], line[3], line[5]]
+        assert simplify(line, 20) == [line[0], line[1], line[2], line[3], line[5]]
+        assert simplify(line, 1) == line
+
+    def test_ranks_nested(self, line):
+        """Test every simplification keeps the points of coarser ones."""
+        ranks = significance(line)
+        
+        coarse, fine = set(simplify(line, 50, ranks)), set(simplify(line, 3, ranks))
+        assert coarse <= fine
+
+    def test_short_lines(self):
+        """Test lines of fewer than three points are kept whole."""
+        assert simplify([], 10) == []
+        assert simplify([(51.0, 17.0), (51.1, 17.1)], 10) == [(51.0, 17.0), (51.1, 17.1)]
+
+    def test_zoom_tolerance(self):
+        """Test the tolerance halves with each zoom level and is about a pixel."""
+        assert zoom_tolerance(1, 0) == pytest.approx(zoom_tolerance(0, 0) / 2)
+        assert zoom_tolerance(MAX_ZOOM, 51.1) == pytest.approx(0.0937, abs=0.001)
+
+
+class TestPolyline:
+    """Tests for the encoded polyline format."""
+
+    def test_reference_example(self):
+        """Test the example from the format's documentation."""
+        points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        
+        assert encode_polyline(points) == '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+        assert decode_polyline('_p~iF~ps|U_ulLnnqC_mqNvxq`@') == points
+
+    def test_round_trip(self, line):
+        """Test decoding returns the points rounded to five decimals."""
+        decoded = decode_polyline(encode_polyline(line))
+        
+        assert all(math.isclose(a, b, abs_tol=1e-5) for p, q in zip(decoded, line) for a, b in zip(p, q))
+
+
+class TestLoadShape:
+    """Tests for load_shape."""
+
+    def test_packed_geometries(self):
+        """Test shapes are read from the packed table when it exists."""
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE shape_geometries (shape_id TEXT PRIMARY KEY, point_count INTEGER, coords BLOB)")
+        conn.execute("INSERT INTO shape_geometries VALUES ('S1', 2, ?)", (pack_points([(51.0, 17.0), (51.1, 17.1)]),))
+        
+        assert load_shape(conn, 'S1') == [(51.0, 17.0), (51.1, 17.1)]
+        assert load_shape(conn, 'S2') is None
+
+    def test_shapes_table_fallback(self):
+        """Test databases without packed geometries are read from the shapes table in sequence."""
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE shapes (shape_id TEXT, shape_pt_lat REAL, shape_pt_lon REAL, shape_pt_sequence INTEGER)")
+        conn.executemany("INSERT INTO shapes VALUES (?, ?, ?, ?)", [('S1', 51.1, 17.1, 2), ('S1', 51.0, 17.0, 1)])
+        
+        assert load_shape(conn, 'S1') == [(51.0, 17.0), (51.1, 17.1)]
+        assert load_shape(sqlite3.connect(':memory:'), 'S1') is None
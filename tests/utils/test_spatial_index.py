@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from utils.geo_utils import filter_stops_by_radius
+from utils.spatial_index import StopGridIndex
+
+
+@pytest.fixture
+def random_stops():
+    """Random stops scattered around Wroclaw."""
+    rng = random.Random(42)
+    return [
+        {'stop_id': str(i), 'stop_lat': 51.0 + rng.random() * 0.25, 'stop_lon': 16.85 + rng.random() * 0.35}
+        for i in range(2000)
+    ]
+
+
+@pytest.fixture
+def grid(random_stops):
+    """Grid index over the random stops."""
+    return StopGridIndex(
+        [s['stop_lat'] for s in random_stops],
+        [s['stop_lon'] for s in random_stops]
+    )
+
+
+class TestStopGridIndex:
+    """Tests for StopGridIndex."""
+
+    @pytest.mark.parametrize('radius', [50, 300, 1000, 5000])
+    def test_query_radius_matches_full_scan(self, grid, random_stops, radius):
+        """Test radius query returns exactly the stops a full scan finds."""
+        lat, lon = 51.1079, 17.0385
+        expected = filter_stops_by_radius(lat, lon, [dict(s) for s in random_stops], radius)
+        
+        result = grid.query_radius(lat, lon, radius)
+        
+        assert [random_stops[i]['stop_id'] for i, _ in result] == [s['stop_id'] for s in expected]
+        assert [d for _, d in result] == pytest.approx([s['distance'] for s in expected])
+
+    def test_query_radius_sorted_by_distance(self, grid):
+        """Test radius results are ordered closest first."""
+        distances = [d for _, d in grid.query_radius(51.1, 17.0, 2000)]
+        assert distances == sorted(distances)
+
+    def test_query_radius_outside_coverage(self, grid):
+        """Test query far away from all stops."""
+        assert grid.query_radius(52.2297, 21.0122, 1000) == []
+
+    def test_query_bbox(self, grid, random_stops):
+        """Test bounding-box query against a full scan."""
+        box = (51.05, 16.95, 51.10, 17.05)
+        expected = [
+            i for i, s in enumerate(random_stops)
+            if box[0] <= s['stop_lat'] <= box[2] and box[1] <= s['stop_lon'] <= box[3]
+        ]
+        
+        assert sorted(grid.query_bbox(*box)) == expected
+
+    def test_query_bbox_larger_than_grid(self, grid, random_stops):
+        """Test a box covering the whole world returns every stop."""
+        assert sorted(grid.query_bbox(-90, -180, 90, 180)) == list(range(len(random_stops)))
+
+    def test_query_radius_across_antimeridian(self):
+        """Test radius query wrapping around longitude 180."""
+        grid = StopGridIndex([0.0, 0.0, 0.0], [179.999, -179.999, 90.0])
+        
+        found = sorted(i for i, _ in grid.query_radius(0.0, 180.0, 500))
+        
+        assert found == [0, 1]
+
+    def test_empty_index(self):
+        """Test queries against an index without stops."""
+        grid = StopGridIndex([], [])
+        assert len(grid) == 0
+        assert grid.query_radius(51.1, 17.0, 1000) == []
+        assert grid.query_bbox(51.0, 16.0, 52.0, 18.0) == []
+
+    def test_mismatched_coordinates(self):
+        """Test that parallel arrays must have equal length."""
+        with pytest.raises(ValueError):
+            StopGridIndex([51.1], [])
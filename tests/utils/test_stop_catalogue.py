@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from utils.feed_cache import feed_cache
+from utils.stop_catalogue import StopCatalogue, get_stop_catalogue
+
+
+@pytest.fixture
+def stops_db(tmp_path):
+    """Database file with a small stops table."""
+    db_path = str(tmp_path / 'stops.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE stops (stop_id TEXT, stop_code TEXT, stop_name TEXT, stop_lat REAL, stop_lon REAL)")
+    conn.executemany("INSERT INTO stops VALUES (?, ?, ?, ?, ?)", [
+        ('1', '101', 'Plac Grunwaldzki', 51.1092, 17.0415),
+        ('2', '102', 'Renoma', 51.1040, 17.0280),
+        ('3', '103', 'Far Stop', 51.2000, 17.2000),
+    ])
+    conn.commit()
+    conn.close()
+    yield db_path
+    feed_cache.clear()
+
+
+def bump_mtime(path):
+    """Move the file's modification time forward so a change is always visible."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+class TestStopCatalogue:
+    """Tests for StopCatalogue and the shared catalogue cache."""
+
+    def test_parallel_columns(self, stops_db):
+        """Test the catalogue exposes stops as parallel columns."""
+        catalogue = get_stop_catalogue(stops_db)
+        
+        assert len(catalogue) == 3
+        assert catalogue.stop_ids == ('1', '2', '3')
+        assert catalogue.stop_names[1] == 'Renoma'
+        assert list(catalogue.stop_lats) == [51.1092, 51.1040, 51.2000]
+        assert catalogue.positions['3'] == 2
+
+    def test_columns_are_read_only(self, stops_db):
+        """Test the shared catalogue cannot be modified."""
+        catalogue = get_stop_catalogue(stops_db)
+        
+        with pytest.raises(TypeError):
+            catalogue.stop_lats[0] = 0.0
+        with pytest.raises(TypeError):
+            catalogue.positions['4'] = 3
+
+    def test_find_nearby(self, stops_db):
+        """Test radius lookup returns stop rows with distances."""
+        nearby = get_stop_catalogue(stops_db).find_nearby(51.1079, 17.0385, 1000)
+        
+        assert [s['stop_name'] for s in nearby] == ['Plac Grunwaldzki', 'Renoma']
+        assert nearby[0]['distance'] < nearby[1]['distance']
+
+    def test_loaded_once_per_version(self, stops_db):
+        """Test repeated lookups share one catalogue."""
+        assert get_stop_catalogue(stops_db) is get_stop_catalogue(stops_db)
+
+    def test_reloaded_when_database_changes(self, stops_db):
+        """Test a modified database produces a fresh catalogue."""
+        before = get_stop_catalogue(stops_db)
+        
+        conn = sqlite3.connect(stops_db)
+        conn.execute("INSERT INTO stops VALUES ('4', '104', 'Dworzec', 51.0990, 17.0360)")
+        conn.commit()
+        conn.close()
+        bump_mtime(stops_db)
+        after = get_stop_catalogue(stops_db)
+        
+        assert after is not before
+        assert after.stop_ids == ('1', '2', '3', '4')
+        assert before.stop_ids == ('1', '2', '3')
+
+    def test_shared_across_threads(self, stops_db):
+        """Test concurrent first use builds a single catalogue."""
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_stop_catalogue(stops_db))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        assert len(results) == 8
+        assert all(c is results[0] for c in results)
+
+    def test_mismatched_columns(self):
+        """Test that columns must have equal length."""
+        with pytest.raises(ValueError):
+            StopCatalogue(['1'], [], [51.1], [17.0])
@@ -0,0 +1,109 @@
+import math
+import sqlite3
+from datetime import date
+
+import pytest
+
+from utils.departure_index import DepartureIndex, get_departure_index
+from utils.feed_cache import feed_cache
+from utils.service_calendar import ServiceCalendar
+from utils.stop_catalogue import StopCatalogue, get_stop_catalogue
+from utils.timetable_snapshot import StringTable, TimetableSnapshot, snapshot_path, write_snapshot
+
+
+@pytest.fixture
+def index():
+    """Departure index with a calendar, a NULL headsign and non-ASCII names."""
+    catalogue = StopCatalogue(['A', 'B'], ['Plac Grunwaldzki', 'Świdnicka'], [51.10, 51.11], [17.00, 17.01])
+    calendar = ServiceCalendar([('WD', 1, 1, 1, 1, 1, 0, 0, '20250331', '20250406')], [('WD', '20250402', 2)])
+    trips = [('T1', 'R1', 'Leśnica', 'WD'), ('T2', 'R2', None, 'WD')]
+    stop_times = [
+        ('A', 'T1', 1, '08:00:00', '08:01:00'),
+        ('A', 'T2', 1, '07:00:00', '07:00:00'),
+        ('B', 'T1', 2, '08:10:00', '08:10:00'),
+    ]
+    return DepartureIndex(catalogue, trips, stop_times, calendar)
+
+
+@pytest.fixture
+def snapshot(index, tmp_path):
+    """Snapshot of the index, mapped back."""
+    path = str(tmp_path / 'feed.db.snapshot')
+    write_snapshot(path, index)
+    return TimetableSnapshot(path)
+
+
+class TestTimetableSnapshot:
+    """Tests for writing and mapping snapshots."""
+
+    def test_round_trip(self, index, snapshot):
+        """Test the mapped index answers like the one it was written from."""
+        catalogue = StopCatalogue.from_snapshot(snapshot)
+        mapped = DepartureIndex.from_snapshot(snapshot, catalogue)
+        
+        assert list(catalogue.stop_names) == ['Plac Grunwaldzki', 'Świdnicka']
+        assert catalogue.find_nearby(51.10, 17.00, 100)[0]['stop_id'] == 'A'
+        assert list(mapped.trip_headsigns) == ['Leśnica', None]
+        assert mapped.trip_positions['T2'] == 1
+        day = date(2025, 4, 1)
+        assert list(mapped.active_departures_after(0, day, 0)) == list(index.active_departures_after(0, day, 0)) == [(0, 0), (1, 0)]
+        assert mapped.trip_bearings[0] == index.trip_bearings[0]
+        assert math.isnan(mapped.trip_bearings[1])
+        for day in (date(2025, 4, 1), date(2025, 4, 2), date(2025, 4, 5)):
+            assert mapped.calendar.active_mask(day) == index.calendar.active_mask(day)
+
+    def test_columns_are_read_only_views(self, snapshot):
+        """Test columns are not copied out of the mapping."""
+        departures = snapshot.array('departure_times')
+        
+        assert isinstance(departures, memoryview) and departures.readonly
+        assert isinstance(snapshot.strings('trip_ids'), StringTable)
+        with pytest.raises(TypeError):
+            departures[0] = 0
+
+    def test_string_table_indexing(self, snapshot):
+        """Test negative indexes, slices and bounds."""
+        trip_ids = snapshot.strings('trip_ids')
+        
+        assert trip_ids[-1] == 'T2'
+        assert trip_ids[0:2] == ['T1', 'T2']
+        with pytest.raises(IndexError):
+            trip_ids[2]
+
+    def test_failed_write_leaves_nothing(self, index, tmp_path, monkeypatch):
+        """Test a snapshot that fails while being written leaves neither it nor its temporary file."""
+        def failing_fsync(fd):
+            raise OSError('disk full')
+        monkeypatch.setattr('utils.timetable_snapshot.os.fsync', failing_fsync)
+        
+        with pytest.raises(OSError):
+            write_snapshot(str(tmp_path / 'feed.db.snapshot'), index)
+        
+        assert list(tmp_path.iterdir()) == []
+
+    def test_rejects_other_files(self, tmp_path):
+        """Test files without the snapshot header are refused."""
+        path = tmp_path / 'feed.db.snapshot'
+        path.write_bytes(b'SQLite format 3\0' + bytes(64))
+        
+        with pytest.raises(ValueError):
+            TimetableSnapshot(str(path))
+
+
+class TestSnapshotLoading:
+    """Tests for the shared catalogue and index of a database with a snapshot."""
+
+    def test_snapshot_preferred_over_database(self, index, tmp_path):
+        """Test the shared structures are mapped from the snapshot when there is one."""
+        db_path = str(tmp_path / 'feed.db')
+        sqlite3.connect(db_path).close()
+        write_snapshot(snapshot_path(db_path), index)
+        feed_cache.clear()
+        
+        shared = get_departure_index(db_path)
+        
+        assert isinstance(shared.trip_ids, StringTable)
+        assert shared.catalogue is get_stop_catalogue(db_path)
+        day = date(2025, 4, 1)
+        assert list(shared.active_departures_after(0, day, 0)) == list(index.active_departures_after(0, day, 0))
+        feed_cache.clear()
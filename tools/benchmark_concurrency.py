@@ -0,0 +1,128 @@
+"""Benchmark how request throughput scales with concurrency.
+
+Drives the API's ASGI app in-process with a mix of closest-departures,
+trip-details and journey requests at increasing numbers of concurrent
+clients. One pool thread is what the sync dev server does (one request at a
+time); thread and process pools of the configured size show what the ASGI
+entry point gains. The result cache is switched off so every request is
+computed.
+
+    python tools/benchmark_concurrency.py [wroclaw_transport.db] --requests 400 --workers 8
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.public_transport_api.asgi import ProcessPoolAsgiApp, ThreadPoolAsgiApp
+from src.public_transport_api.controllers import departures_controller
+from src.public_transport_api.main import app as flask_app
+from src.public_transport_api.prefork import preload
+from src.public_transport_api.services import trips_service
+from utils.db_versions import resolve_db_path
+from utils.departure_index import get_departure_index
+from utils.result_cache import result_cache
+from tools.benchmark_routing import DB_FILE, busiest_day, percentile
+
+
+def make_paths(db_path: str, count: int, seed: int):
+    """Build a reproducible mix of request paths and query strings."""
+    index = get_departure_index(db_path)
+    catalogue = index.catalogue
+    lats, lons = list(catalogue.stop_lats), list(catalogue.stop_lons)
+    day = busiest_day(index.calendar).isoformat()
+    rng = random.Random(seed)
+
+    def point():
+        return f'{rng.uniform(min(lats), max(lats)):.6f},{rng.uniform(min(lons), max(lons)):.6f}'
+
+    paths = []
+    for i in range(count):
+        start_time = f'{day}T{rng.randrange(5, 23):02d}:{rng.randrange(60):02d}:00Z'
+        kind = i % 4
+        if kind < 2:
+            paths.append(('/public_transport/city/wroclaw/closest_departures',
+                          f'start_coordinates={point()}&end_coordinates={point()}&start_time={start_time}&limit=10'))
+        elif kind == 2:
+            trip_id = index.trip_ids[rng.randrange(len(index.trip_ids))]
+            paths.append((f'/public_transport/city/wroclaw/trip/{trip_id}', f'date={day}'))
+        else:
+            paths.append(('/public_transport/city/wroclaw/journey',
+                          f'start_coordinates={point()}&end_coordinates={point()}&start_time={start_time}&limit=1'))
+    return paths
+
+
+async def request(asgi_app, path: str, query: str) -> int:
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query.encode(), 'headers': []}
+    await asgi_app(scope, receive, send)
+    return sent[0]['status']
+
+
+async def run_clients(asgi_app, paths, clients: int):
+    """Send all requests from ``clients`` concurrent clients; return latencies and wall time."""
+    queue = list(reversed(paths))
+    latencies, statuses = [], []
+
+    async def client():
+        while queue:
+            path, query = queue.pop()
+            started = time.perf_counter()
+            statuses.append(await request(asgi_app, path, query))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def main(db_file: str, requests: int, workers: int, seed: int, concurrency) -> None:
+    departures_controller.DB_FILE = trips_service.DB_FILE = db_file
+    result_cache.configure(RESULT_CACHE_ENABLED=False)
+    paths = make_paths(resolve_db_path(db_file), requests, seed)
+
+    # Warm the shared timetables so the first run does not pay for loading them
+    asyncio.run(run_clients(ThreadPoolAsgiApp(flask_app, workers, requests), paths[:8], 1))
+
+    pools = [
+        ('sync (1 thread)', lambda: ThreadPoolAsgiApp(flask_app, 1, requests)),
+        (f'asgi ({workers} threads)', lambda: ThreadPoolAsgiApp(flask_app, workers, requests)),
+        (f'asgi ({workers} processes)', lambda: ProcessPoolAsgiApp(flask_app, workers, requests, preload=preload)),
+    ]
+    print(f"{requests} requests (departures, trip details, journeys); req/s, latency p50 / p99 in ms")
+    print(f"{'clients':>8s} | " + ' | '.join(f'{name:>28s}' for name, _ in pools))
+    for clients in concurrency:
+        row = []
+        for _, make_app in pools:
+            asgi_app = make_app()
+            latencies, statuses, elapsed = asyncio.run(run_clients(asgi_app, paths, clients))
+            asgi_app.executor.shutdown()
+            errors = sum(status >= 500 for status in statuses)
+            row.append(
+                f"{len(paths) / elapsed:6.0f} req/s {percentile(latencies, 0.5) * 1000:6.1f} / "
+                f"{percentile(latencies, 0.99) * 1000:6.1f}" + (f" ({errors} errors)" if errors else "")
+            )
+        print(f"{clients:8d} | " + ' | '.join(f'{cell:>28s}' for cell in row))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark request throughput against concurrency.')
+    parser.add_argument('db_file', nargs='?', default=DB_FILE, help=f'database file (default: {DB_FILE})')
+    parser.add_argument('--requests', type=int, default=400, help='requests per run (default: 400)')
+    parser.add_argument('--workers', type=int, default=8, help='ASGI pool threads or processes (default: 8)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed (default: 1)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64],
+                        help='numbers of concurrent clients (default: 1 4 16 64)')
+    args = parser.parse_args()
+    main(args.db_file, args.requests, args.workers, args.seed, args.concurrency)
@@ -0,0 +1,92 @@
+"""Benchmark journey planning on a full feed.
+
+Times random queries between points inside the feed's bounding box with the
+Connection Scan (earliest arrival) and RAPTOR (arrival time vs. transfers)
+and prints p50/p99 query times for both.
+
+    python tools/benchmark_routing.py [wroclaw_transport.db] --queries 500
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.connection_scan import get_connection_timetable
+from utils.db_versions import resolve_db_path
+from utils.raptor import MAX_RIDES, get_route_timetable
+
+DB_FILE = 'wroclaw_transport.db'
+
+
+def busiest_day(calendar) -> date:
+    """Return the date with the most active services, or today for a feed without a calendar."""
+    masks = calendar.daily_masks()
+    if not masks:
+        return date.today()
+    return max(masks, key=lambda day: bin(masks[day]).count('1'))
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def report(name: str, samples) -> None:
+    print(
+        f"{name:8s}: p50 {percentile(samples, 0.5) * 1000:7.1f} ms   "
+        f"p99 {percentile(samples, 0.99) * 1000:7.1f} ms   "
+        f"mean {statistics.fmean(samples) * 1000:7.1f} ms"
+    )
+
+
+def main(db_file: str, queries: int, radius: float, seed: int, max_rides: int) -> None:
+    db_path = resolve_db_path(db_file)
+
+    started = time.perf_counter()
+    connections = get_connection_timetable(db_path)
+    print(f"Connection timetable: {len(connections):,} connections in {time.perf_counter() - started:.1f} s")
+    started = time.perf_counter()
+    routes = get_route_timetable(db_path)
+    print(f"Route timetable:      {len(routes):,} patterns in {time.perf_counter() - started:.1f} s")
+
+    catalogue = routes.index.catalogue
+    grid = catalogue.grid
+    lats, lons = list(catalogue.stop_lats), list(catalogue.stop_lons)
+    day = busiest_day(routes.index.calendar)
+    rng = random.Random(seed)
+
+    csa_times, raptor_times, found = [], [], 0
+    for _ in range(queries):
+        start_point = (rng.uniform(min(lats), max(lats)), rng.uniform(min(lons), max(lons)))
+        end_point = (rng.uniform(min(lats), max(lats)), rng.uniform(min(lons), max(lons)))
+        start = rng.randrange(5 * 3600, 23 * 3600)
+        access, egress = grid.query_radius(*start_point, radius), grid.query_radius(*end_point, radius)
+
+        started = time.perf_counter()
+        legs = connections.earliest_arrival(access, egress, day, start)
+        csa_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        routes.pareto_journeys(access, egress, day, start, max_rides=max_rides)
+        raptor_times.append(time.perf_counter() - started)
+        found += legs is not None
+
+    print(f"{queries} queries on {day.isoformat()}, {found} with a journey")
+    report('CSA', csa_times)
+    report('RAPTOR', raptor_times)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark journey planning on a full feed.')
+    parser.add_argument('db_file', nargs='?', default=DB_FILE, help=f'database file (default: {DB_FILE})')
+    parser.add_argument('--queries', type=int, default=500, help='number of random queries (default: 500)')
+    parser.add_argument('--radius', type=float, default=500, help='walking radius in meters (default: 500)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed (default: 1)')
+    parser.add_argument('--max-rides', type=int, default=MAX_RIDES, help=f'RAPTOR rounds (default: {MAX_RIDES})')
+    args = parser.parse_args()
+    main(args.db_file, args.queries, args.radius, args.seed, args.max_rides)
@@ -0,0 +1,128 @@
+"""Report how much memory the pre-fork server's workers share.
+
+Starts the pre-fork server on a free port in the current directory, sends
+it a mix of requests so every worker has served traffic, and prints, for
+the master and each worker, the memory only that process uses (private
+pages) against the memory shared with the others, from
+/proc/<pid>/smaps_rollup (Linux only). PSS splits shared pages evenly
+between the processes mapping them, so the PSS total is what the whole
+server costs.
+
+    python tools/memory_report.py [wroclaw_transport.db] --workers 4 --requests 400
+    python tools/memory_report.py --pid <master pid>   # an already running server
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_memory(pid: int) -> Dict[str, int]:
+    """Return the smaps_rollup totals of a process, in KiB."""
+    totals = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in FIELDS:
+                totals[name] = int(rest.split()[0])
+    return totals
+
+
+def child_pids(pid: int) -> List[int]:
+    """Return the pids of a process's children."""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces; the parent pid is the second field after it
+        if int(stat.rsplit(')', 1)[1].split()[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def report(master: int) -> None:
+    processes = [('master', master)] + [('worker', pid) for pid in child_pids(master)]
+    print(f"{'process':>8s} {'pid':>8s} | {'RSS':>8s} {'unique':>8s} {'shared':>8s} {'PSS':>8s}  (MiB)")
+    total_pss = 0
+    for role, pid in processes:
+        memory = read_memory(pid)
+        unique = memory['Private_Clean'] + memory['Private_Dirty']
+        shared = memory['Shared_Clean'] + memory['Shared_Dirty']
+        total_pss += memory['Pss']
+        print(f"{role:>8s} {pid:8d} | {memory['Rss'] / 1024:8.1f} {unique / 1024:8.1f} "
+              f"{shared / 1024:8.1f} {memory['Pss'] / 1024:8.1f}")
+    master_rss = read_memory(master)['Rss']
+    workers = len(processes) - 1
+    print(f"total PSS {total_pss / 1024:.1f} MiB for {workers} workers; "
+          f"unshared copies would take about {master_rss * (workers + 1) / 1024:.1f} MiB")
+
+
+def load(base_url: str, paths, clients: int) -> int:
+    """Send every request from ``clients`` threads; return the number of failures."""
+    def get(path_query):
+        path, query = path_query
+        try:
+            with urllib.request.urlopen(f'{base_url}{path}?{query}', timeout=60) as response:
+                response.read()
+            return 0
+        except urllib.error.URLError:
+            return 1
+
+    with ThreadPoolExecutor(clients) as pool:
+        return sum(pool.map(get, paths))
+
+
+def main(db_file: str, workers: int, requests: int, seed: int) -> None:
+    from tools.benchmark_concurrency import make_paths
+    from utils.db_versions import resolve_db_path
+
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'src.public_transport_api.prefork', '--port', '0', '--workers', str(workers)],
+        cwd=os.getcwd(), env=dict(os.environ, PYTHONPATH=str(ROOT)), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    try:
+        line = server.stdout.readline()
+        if not line.startswith('Listening on '):
+            raise SystemExit("Server did not start; run python -m src.public_transport_api.prefork to see why")
+        base_url = line.split()[2]
+        paths = make_paths(resolve_db_path(db_file), requests, seed)
+        failures = load(base_url, paths, clients=workers * 2)
+        time.sleep(0.5)  # Let workers finish logging before reading their memory
+        print(f"{requests} requests sent, {failures} failed")
+        report(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(30)
+
+
+if __name__ == '__main__':
+    from tools.benchmark_routing import DB_FILE
+
+    parser = argparse.ArgumentParser(description='Report per-worker unique and shared memory of the pre-fork server.')
+    parser.add_argument('db_file', nargs='?', default=DB_FILE, help=f'database file (default: {DB_FILE})')
+    parser.add_argument('--pid', type=int, help='report on a running server with this master pid instead')
+    parser.add_argument('--workers', type=int, default=4, help='worker processes (default: 4)')
+    parser.add_argument('--requests', type=int, default=400, help='requests to send before measuring (default: 400)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed (default: 1)')
+    args = parser.parse_args()
+    if args.pid is not None:
+        report(args.pid)
+    else:
+        main(args.db_file, args.workers, args.requests, args.seed)
@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+from utils.feed_cache import FeedVersion, feed_version
+
+# Defaults, overridable through the Flask app config (see ConnectionPool.init_app)
+DEFAULT_CONFIG = {
+    'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,  # Bytes of the database file mapped into memory
+    'SQLITE_CACHE_SIZE': -64 * 1024,  # Page cache per connection; negative values are KiB
+    'SQLITE_TEMP_STORE': 'MEMORY',  # Where temporary tables and indices live
+    'SQLITE_IMMUTABLE': False,  # Open with immutable=1 instead of mode=ro (no locking at all)
+    'SQLITE_CACHED_STATEMENTS': 256,  # Prepared statements kept per connection
+    'SQLITE_POOL_SIZE': 8,  # Idle connections kept per database
+}
+
+TEMP_STORE_VALUES = ('DEFAULT', 'FILE', 'MEMORY')
+
+
+class ConnectionPool:
+    """Long-lived, read-only SQLite connections shared across requests.
+
+    A request borrows a connection with ``connection(db_path)`` and gives it
+    back when the ``with`` block ends, so the connection's page cache,
+    memory map and prepared-statement cache survive from one request to the
+    next. Each connection is used by one thread at a time. Connections are
+    tagged with the feed version of the file they were opened on and are
+    reopened when the file changes, which keeps ``immutable`` mode safe across
+    re-imports.
+    """
+
+    def __init__(self, **config: Any):
+        """Create an empty pool.
+
+        Args:
+            **config: Settings named like the keys of DEFAULT_CONFIG
+        """
+        self._lock = threading.Lock()
+        self._idle: Dict[str, List[Tuple[FeedVersion, sqlite3.Connection]]] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.config = dict(DEFAULT_CONFIG)
+        self.configure(**config)
+
+    def configure(self, **config: Any) -> None:
+        """Change settings; idle connections opened with the old ones are closed.
+
+        Raises:
+            ValueError: On unknown settings or an invalid SQLITE_TEMP_STORE
+        """
+        unknown = set(config) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise ValueError(f"Unknown connection pool settings: {', '.join(sorted(unknown))}")
+        temp_store = str(config.get('SQLITE_TEMP_STORE', self.config['SQLITE_TEMP_STORE'])).upper()
+        if temp_store not in TEMP_STORE_VALUES:
+            raise ValueError(f"SQLITE_TEMP_STORE must be one of {', '.join(TEMP_STORE_VALUES)}")
+        with self._lock:
+            self.config.update(config, SQLITE_TEMP_STORE=temp_store)
+            self._generation += 1
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for _, conn in connections:
+                conn.close()
+
+    def init_app(self, app) -> None:
+        """Configure the pool from a Flask app's config.
+
+        Missing keys are filled in with the defaults, so the effective settings
+        can be read back from ``app.config``.
+        """
+        for key, value in DEFAULT_CONFIG.items():
+            app.config.setdefault(key, value)
+        self.configure(**{key: app.config[key] for key in DEFAULT_CONFIG})
+        app.extensions['connection_pool'] = self
+
+    @contextmanager
+    def connection(self, db_path: str) -> Iterator[sqlite3.Connection]:
+        """Borrow a read-only connection to a database file.
+
+        Args:
+            db_path: Path to the SQLite database file
+
+        Yields:
+            Connection, returned to the pool when the block exits
+
+        Raises:
+            sqlite3.OperationalError: If the database cannot be opened
+        """
+        try:
+            version = feed_version(db_path)
+        except OSError as e:
+            raise sqlite3.OperationalError(f"unable to open database file: {e}")
+        conn, generation = self._acquire(version)
+        try:
+            yield conn
+        finally:
+            self._release(version, conn, generation)
+
+    def _acquire(self, version: FeedVersion) -> Tuple[sqlite3.Connection, int]:
+        path = version[0]
+        stale = []
+        with self._lock:
+            generation = self._generation
+            idle = self._idle.get(path, [])
+            conn = None
+            while idle:
+                conn_version, candidate = idle.pop()
+                if conn_version == version:
+                    conn = candidate
+                    break
+                stale.append(candidate)
+            if conn is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            config = dict(self.config)
+        for candidate in stale:
+            candidate.close()
+        if conn is None:
+            conn = self._open(path, config)
+        return conn, generation
+
+    def _release(self, version: FeedVersion, conn: sqlite3.Connection, generation: int) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = None  # Borrowers may change it; the next one gets plain tuples
+        with self._lock:
+            idle = self._idle.setdefault(version[0], [])
+            if generation == self._generation and len(idle) < self.config['SQLITE_POOL_SIZE']:
+                idle.append((version, conn))
+                return
+        conn.close()
+
+    def _open(self, path: str, config: Dict[str, Any]) -> sqlite3.Connection:
+        mode = 'immutable=1' if config['SQLITE_IMMUTABLE'] else 'mode=ro'
+        conn = sqlite3.connect(
+            f"{Path(path).as_uri()}?{mode}",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=int(config['SQLITE_CACHED_STATEMENTS'])
+        )
+        conn.execute(f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}")
+        conn.execute(f"PRAGMA cache_size = {int(config['SQLITE_CACHE_SIZE'])}")
+        conn.execute(f"PRAGMA temp_store = {config['SQLITE_TEMP_STORE']}")
+        return conn
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and the number of idle connections."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'idle': sum(len(idle) for idle in self._idle.values())
+            }
+
+    def discard(self, db_path: str) -> None:
+        """Close the idle connections to one database file."""
+        with self._lock:
+            idle = self._idle.pop(os.path.abspath(db_path), [])
+        for _, conn in idle:
+            conn.close()
+
+    def close_all(self) -> None:
+        """Close every idle connection; borrowed ones are closed when returned."""
+        self.configure()
+
+    def after_fork(self) -> None:
+        """Start afresh in a forked child process.
+
+        SQLite connections must not be carried across fork, so the idle ones
+        inherited from the parent are set aside without being used or closed,
+        and the lock is replaced in case another thread held it while forking.
+        """
+        self._abandoned = [conn for idle in self._idle.values() for _, conn in idle]
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._generation += 1
+
+
+connection_pool = ConnectionPool()
@@ -0,0 +1,334 @@
+import math
+import sqlite3
+from array import array
+from bisect import bisect_left
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from utils.departure_index import SECONDS_PER_DAY, DepartureIndex, build_departure_index, get_departure_index, parse_gtfs_time
+from utils.feed_cache import feed_cache
+from utils.footpaths import Footpaths, build_footpaths, get_footpaths, walking_seconds
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAX_JOURNEY_SECONDS = 3 * 3600  # Scan horizon; nothing across the city takes longer
+ORIGIN = -1  # Stop position standing for the journey's start coordinates
+DESTINATION = -2  # Stop position standing for the journey's end coordinates
+
+
+class Leg(NamedTuple):
+    """One part of a journey: a walk, or a ride on one trip between two stops.
+
+    Stops are catalogue positions, or ORIGIN/DESTINATION for the journey's
+    end points. Times are seconds since the start of the query's service day.
+    """
+    from_stop: int
+    to_stop: int
+    departure: int
+    arrival: int
+    trip: Optional[int] = None  # Trip position for rides, None for walks
+    day_offset: int = 0  # 0 for the query day's service, -1 for the previous day's
+
+
+class ConnectionTimetable:
+    """Elementary connections of a feed, sorted by departure time.
+
+    A connection is one hop of a trip between two consecutive stops. Connections
+    are stored as parallel read-only arrays in (departure, arrival) order, which
+    is the order a Connection Scan visits them in. Hops of trips running past
+    midnight are stored a second time shifted back by one day, tagged with day
+    offset -1, so scanning one service day also sees the previous day's late trips.
+    """
+
+    def __init__(
+        self,
+        index: DepartureIndex,
+        stop_time_rows: Iterable[Tuple[Any, Any, str, str]],
+        footpaths: Optional[Footpaths] = None
+    ):
+        """Build the connections.
+
+        Args:
+            index: Departure index of the same feed, for stop and trip positions and the calendar
+            stop_time_rows: (trip_id, stop_id, arrival_time, departure_time) tuples grouped
+                by trip_id and ordered by stop_sequence within a trip
+            footpaths: Walking transfers between the index's stops; without them a
+                transfer is only possible at the stop where a ride ends
+        """
+        self.index = index
+        self.footpaths = footpaths if footpaths is not None else Footpaths(len(index.catalogue), ())
+        departure_stops, arrival_stops = array('i'), array('i')
+        departures, arrivals, trips = array('i'), array('i'), array('i')
+
+        stop_positions, trip_positions = index.catalogue.positions, index.trip_positions
+        times: Dict[str, int] = {}
+        previous_trip = previous_stop = previous_departure = None
+        for trip_id, stop_id, arrival_time, departure_time in stop_time_rows:
+            stop = stop_positions.get(stop_id)
+            trip = trip_positions.get(trip_id)
+            if stop is None or trip is None:
+                continue
+            arrival_time = arrival_time or departure_time
+            departure_time = departure_time or arrival_time
+            if not arrival_time:
+                continue
+            arrival = times.get(arrival_time)
+            if arrival is None:
+                arrival = times[arrival_time] = parse_gtfs_time(arrival_time)
+            departure = times.get(departure_time)
+            if departure is None:
+                departure = times[departure_time] = parse_gtfs_time(departure_time)
+
+            if trip == previous_trip:
+                departure_stops.append(previous_stop)
+                arrival_stops.append(stop)
+                departures.append(previous_departure)
+                arrivals.append(arrival)
+                trips.append(trip)
+            previous_trip, previous_stop, previous_departure = trip, stop, departure
+
+        # Hops departing after midnight of their service day, once more on the previous day's clock
+        late = [c for c in range(len(departures)) if departures[c] >= SECONDS_PER_DAY]
+        day_offsets = array('b', [0]) * len(departures) + array('b', [-1]) * len(late)
+        for c in late:
+            departure_stops.append(departure_stops[c])
+            arrival_stops.append(arrival_stops[c])
+            departures.append(departures[c] - SECONDS_PER_DAY)
+            arrivals.append(arrivals[c] - SECONDS_PER_DAY)
+            trips.append(trips[c])
+
+        # Stable, so zero-duration hops of one trip stay in stop order
+        order = _sort_order(departures, arrivals)
+        self.departure_stops = _reorder(departure_stops, order)
+        self.arrival_stops = _reorder(arrival_stops, order)
+        self.departure_times = _reorder(departures, order)
+        self.arrival_times = _reorder(arrivals, order)
+        self.trips = _reorder(trips, order)
+        self.day_offsets = _reorder(day_offsets, order)
+
+    def __len__(self) -> int:
+        return len(self.departure_times)
+
+    def earliest_arrival(
+        self,
+        access: Sequence[Tuple[int, float]],
+        egress: Sequence[Tuple[int, float]],
+        day: date,
+        start: int,
+        direct_walk: Optional[float] = None
+    ) -> Optional[List[Leg]]:
+        """Find the journey arriving first at the destination.
+
+        Args:
+            access: (stop position, walking distance in meters) of stops reachable from the start
+            egress: (stop position, walking distance in meters) of stops the destination is reachable from
+            day: Service date of the query
+            start: Seconds since midnight of ``day`` the journey may start at
+            direct_walk: Walking distance from start to destination, if short enough to consider
+
+        Returns:
+            Legs of the journey in travel order, or None if the destination cannot be
+            reached within MAX_JOURNEY_SECONDS
+        """
+        egress_seconds = {stop: walking_seconds(distance) for stop, distance in egress}
+        horizon = start + MAX_JOURNEY_SECONDS
+        if direct_walk is not None:
+            horizon = start + walking_seconds(direct_walk)
+
+        arrival_at, reached_by, best_arrival, best_stop = self._scan(access, egress_seconds, day, start, horizon)
+        if best_stop is None:
+            if direct_walk is None:
+                return None
+            return [Leg(ORIGIN, DESTINATION, start, start + walking_seconds(direct_walk))]
+        return self._journey_to(best_stop, reached_by, arrival_at, start, best_arrival)
+
+    def earliest_arrivals(
+        self, access: Sequence[Tuple[int, float]], day: date, start: int, until: int
+    ) -> Dict[int, int]:
+        """Find the earliest arrival at every stop reachable by a given time.
+
+        One scan over the connections departing between ``start`` and ``until``,
+        so the cost depends on the time budget, not on the number of stops.
+
+        Args:
+            access: (stop position, walking distance in meters) of stops reachable from the start
+            day: Service date of the query
+            start: Seconds since midnight of ``day`` the journey may start at
+            until: Latest arrival, in seconds since midnight of ``day``
+
+        Returns:
+            {stop position: arrival seconds} of the stops reached by ``until``
+        """
+        arrival_at = self._scan(access, {}, day, start, until + 1)[0]
+        return {stop: arrival for stop, arrival in enumerate(arrival_at) if arrival <= until}
+
+    def _scan(
+        self,
+        access: Sequence[Tuple[int, float]],
+        egress_seconds: Dict[int, int],
+        day: date,
+        start: int,
+        horizon: int
+    ) -> Tuple[List[float], List[Any], int, Optional[int]]:
+        """Scan connections departing from ``start`` until none can beat the best arrival.
+
+        Returns:
+            Arrival times and journey pointers per stop, the best arrival at the
+            destination (``horizon`` if none beat it) and its egress stop, if any
+        """
+        n_stops = len(self.index.catalogue)
+        arrival_at = [math.inf] * n_stops
+        # (boarding, alighting) connections, (footpath Leg, (boarding, alighting) of the ride before it)
+        # or access distance; each label keeps what it was relaxed from, so later improvements cannot change it
+        reached_by: List[Any] = [None] * n_stops
+        # Earliest arrival by ride alone; footpaths leave from these even when a walk got there first
+        ride_arrival_at = [math.inf] * n_stops
+
+        for stop, distance in access:
+            arrival = start + walking_seconds(distance)
+            if arrival < arrival_at[stop]:
+                arrival_at[stop] = arrival
+                reached_by[stop] = distance
+        best_arrival, best_stop = horizon, None
+
+        calendar, trip_services = self.index.calendar, self.index.trip_services
+        masks = (calendar.active_mask(day), calendar.active_mask(day - timedelta(days=1)))
+        departure_stops, arrival_stops = self.departure_stops, self.arrival_stops
+        departures, arrivals = self.departure_times, self.arrival_times
+        trips, day_offsets = self.trips, self.day_offsets
+        footpath_starts, footpath_targets, footpath_seconds = (
+            self.footpaths.starts, self.footpaths.targets, self.footpaths.seconds
+        )
+        boarded: Dict[int, int] = {}  # Trip run (trip * 2 + 1 for the previous day's) -> boarding connection
+
+        for c in range(bisect_left(departures, start), len(departures)):
+            departure = departures[c]
+            if departure >= best_arrival:
+                break
+            trip, previous_day = trips[c], -day_offsets[c]
+            run = trip + trip + previous_day
+            boarding = boarded.get(run)
+            if boarding is None:
+                if arrival_at[departure_stops[c]] > departure or not masks[previous_day] >> trip_services[trip] & 1:
+                    continue
+                boarding = boarded[run] = c
+            stop, arrival = arrival_stops[c], arrivals[c]
+            if arrival < ride_arrival_at[stop]:
+                ride_arrival_at[stop] = arrival
+                ride = (boarding, c)
+                if arrival < arrival_at[stop]:
+                    arrival_at[stop] = arrival
+                    reached_by[stop] = ride
+                    seconds = egress_seconds.get(stop)
+                    if seconds is not None and arrival + seconds < best_arrival:
+                        best_arrival, best_stop = arrival + seconds, stop
+                # Walking transfers from where the ride ends
+                for f in range(footpath_starts[stop], footpath_starts[stop + 1]):
+                    neighbour, walked = footpath_targets[f], arrival + footpath_seconds[f]
+                    if walked < arrival_at[neighbour]:
+                        arrival_at[neighbour] = walked
+                        reached_by[neighbour] = (Leg(stop, neighbour, arrival, walked), ride)
+                        seconds = egress_seconds.get(neighbour)
+                        if seconds is not None and walked + seconds < best_arrival:
+                            best_arrival, best_stop = walked + seconds, neighbour
+        return arrival_at, reached_by, best_arrival, best_stop
+
+    def _journey_to(
+        self,
+        stop: int,
+        reached_by: List[Any],
+        arrival_at: List[float],
+        start: int,
+        destination_arrival: int
+    ) -> List[Leg]:
+        """Follow the journey pointers back from the egress stop."""
+        legs = [Leg(stop, DESTINATION, arrival_at[stop], destination_arrival)]
+        while isinstance(reached_by[stop], tuple):
+            ride = reached_by[stop]
+            if isinstance(ride[0], Leg):
+                walk, ride = ride
+                legs.append(walk)
+                stop = walk.from_stop
+            boarding, alighting = ride
+            legs.append(Leg(
+                self.departure_stops[boarding], stop,
+                self.departure_times[boarding], self.arrival_times[alighting],
+                self.trips[boarding], self.day_offsets[boarding]
+            ))
+            stop = self.departure_stops[boarding]
+        legs.append(Leg(ORIGIN, stop, start, arrival_at[stop]))
+        legs.reverse()
+        return leave_late(legs)
+
+
+def leave_late(legs: List[Leg]) -> List[Leg]:
+    """Shift the access walk to leave as late as still catches the first ride, rather than at the requested time."""
+    if len(legs) > 2 and legs[0].trip is None and legs[1].trip is not None:
+        wait = legs[1].departure - legs[0].arrival
+        legs[0] = legs[0]._replace(departure=legs[0].departure + wait, arrival=legs[1].departure)
+    return legs
+
+
+def _sort_order(departures: array, arrivals: array) -> Sequence[int]:
+    if np is not None:
+        return np.lexsort((np.asarray(arrivals), np.asarray(departures))).tolist()
+    return sorted(range(len(departures)), key=lambda c: (departures[c], arrivals[c]))
+
+
+def _reorder(values: array, order: Sequence[int]) -> memoryview:
+    return memoryview(array(values.typecode, [values[c] for c in order])).toreadonly()
+
+
+def load_connection_timetable(
+    db_connection: sqlite3.Connection, index: DepartureIndex, footpaths: Optional[Footpaths] = None
+) -> ConnectionTimetable:
+    """Read stop_times in trip order into a new connection timetable.
+
+    Args:
+        db_connection: SQLite database connection
+        index: Departure index of the same database
+        footpaths: Walking transfers of the same database
+
+    Returns:
+        Connection timetable over all trips
+    """
+    stop_time_rows = db_connection.execute(
+        "SELECT trip_id, stop_id, arrival_time, departure_time FROM stop_times ORDER BY trip_id, stop_sequence"
+    )
+    return ConnectionTimetable(index, stop_time_rows, footpaths)
+
+
+def _load_from_file(db_path: str) -> ConnectionTimetable:
+    index = get_departure_index(db_path)
+    footpaths = get_footpaths(db_path)
+    conn = sqlite3.connect(Path(db_path).as_uri() + '?mode=ro', uri=True)
+    try:
+        return load_connection_timetable(conn, index, footpaths)
+    finally:
+        conn.close()
+
+
+def get_connection_timetable(db_path: str) -> ConnectionTimetable:
+    """Return the process-wide connection timetable for a database file.
+
+    Built on first use and rebuilt when the file changes. Its ``index`` and
+    ``footpaths`` attributes are the shared departure index and footpaths of
+    the same file.
+
+    Args:
+        db_path: Path to the SQLite database file
+
+    Returns:
+        Shared connection timetable for the current version of the database
+    """
+    return feed_cache.get(db_path, 'connections', _load_from_file)
+
+
+def build_connection_timetable(db_connection: sqlite3.Connection) -> ConnectionTimetable:
+    """Build an unshared connection timetable for any connection, e.g. an in-memory database."""
+    index = build_departure_index(db_connection)
+    return load_connection_timetable(db_connection, index, build_footpaths(db_connection, index.catalogue))
@@ -0,0 +1,255 @@
+import glob
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List
+
+from utils.connection_pool import ConnectionPool, connection_pool
+from utils.feed_cache import FeedCache, feed_cache
+from utils.timetable_snapshot import snapshot_path
+
+try:
+    import fcntl
+except ImportError:  # Windows refuses to delete open files, which protects them instead
+    fcntl = None
+
+POINTER_SUFFIX = '.current'  # wroclaw_transport.db.current names the live version
+VERSION_MARKER = '.v'  # Versions are named like wroclaw_transport.v20250401T031500123456.db
+OPEN_RETRIES = 3
+
+
+def version_pointer(db_path: str) -> str:
+    """Return the path of the file naming the live version of a database."""
+    return db_path + POINTER_SUFFIX
+
+
+def new_version_path(db_path: str) -> str:
+    """Return a fresh, time-ordered path for a new version of a database.
+
+    Args:
+        db_path: Logical database path, e.g. 'wroclaw_transport.db'
+
+    Returns:
+        Path next to db_path, e.g. 'wroclaw_transport.v20250401T031500123456.db'
+    """
+    stem, suffix = os.path.splitext(db_path)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+    return f"{stem}{VERSION_MARKER}{stamp}{suffix}"
+
+
+def list_versions(db_path: str) -> List[str]:
+    """Return the paths of all version files of a database, oldest first."""
+    stem, suffix = os.path.splitext(db_path)
+    pattern = f"{glob.escape(stem)}{VERSION_MARKER}*{glob.escape(suffix)}"
+    return sorted(glob.glob(pattern))
+
+
+def resolve_db_path(db_path: str) -> str:
+    """Return the file holding the live version of a database.
+
+    Args:
+        db_path: Logical database path
+
+    Returns:
+        Path of the version named by the pointer file, or db_path itself when
+        the database has never been published as versions
+    """
+    try:
+        with open(version_pointer(db_path), encoding='utf-8') as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return db_path
+    return os.path.join(os.path.dirname(db_path), name)
+
+
+def publish_version(db_path: str, version_path: str) -> None:
+    """Make a fully written version file the live one.
+
+    The pointer file is replaced atomically, so readers see either the old or
+    the new version, never a partial pointer.
+
+    Args:
+        db_path: Logical database path
+        version_path: Version file in the same directory, e.g. from new_version_path
+    """
+    # Versions are written without syncing; make the contents durable before pointing at them
+    fd = os.open(version_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    pointer = version_pointer(db_path)
+    temp = f"{pointer}.{os.getpid()}.tmp"
+    with open(temp, 'w', encoding='utf-8') as f:
+        f.write(os.path.basename(version_path))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, pointer)
+
+
+def _lock_shared(path: str, create: bool = False) -> int:
+    """Open a file and take a shared lock on it, which blocks collect_garbage."""
+    fd = os.open(path, os.O_RDONLY | (os.O_CREAT if create else 0), 0o644)
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_SH)
+    return fd
+
+
+@contextmanager
+def hold_version(version_path: str) -> Iterator[None]:
+    """Protect a version file from garbage collection while the block runs.
+
+    Used by the importer while it writes a version. Creates the file if needed.
+    """
+    fd = _lock_shared(version_path, create=True)
+    try:
+        yield
+    finally:
+        os.close(fd)
+
+
+def _try_remove(path: str) -> bool:
+    """Delete a file unless a process holds it; return whether it was deleted."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return False
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+
+
+def collect_garbage(db_path: str) -> List[str]:
+    """Delete versions of a database that are neither live nor in use.
+
+    Versions newer than the live one are kept, since an importer may still be
+    writing them. Once versions are published, a plain file at db_path left
+    over from before is treated as an old version too. A deleted version's
+    timetable snapshot is deleted with it.
+
+    Args:
+        db_path: Logical database path
+
+    Returns:
+        Paths of the deleted files
+    """
+    live = resolve_db_path(db_path)
+    if live == db_path:
+        return []
+    candidates = [path for path in list_versions(db_path) if path < live]
+    if os.path.isfile(db_path):
+        candidates.append(db_path)
+    removed = [path for path in candidates if _try_remove(path)]
+    for path in removed:
+        try:
+            os.remove(snapshot_path(path))
+        except OSError:
+            pass
+    return removed
+
+
+class VersionTracker:
+    """Hands the live database version to requests and retires old versions.
+
+    A request enters ``use(db_path)`` and runs entirely on the version that
+    was live at that moment, even if a new one is published meanwhile. While
+    a process uses a version it holds a shared lock on the file. Once a
+    version is no longer live and its last request has finished, its cached
+    structures and pooled connections are dropped, the lock is released and
+    the file is offered to collect_garbage.
+    """
+
+    def __init__(self, cache: FeedCache = feed_cache, pool: ConnectionPool = connection_pool):
+        self.cache = cache
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._users: Dict[str, int] = {}  # Version path -> requests using it
+        self._holds: Dict[str, int] = {}  # Version path -> locked file descriptor
+        self._databases: Dict[str, str] = {}  # Version path -> logical path
+
+    @contextmanager
+    def use(self, db_path: str) -> Iterator[str]:
+        """Pin the live version of a database for the duration of the block.
+
+        Args:
+            db_path: Logical database path
+
+        Yields:
+            Path of the pinned version file
+
+        Raises:
+            sqlite3.OperationalError: If the database does not exist
+        """
+        try:
+            path = self._acquire(db_path)
+        except FileNotFoundError as e:
+            raise sqlite3.OperationalError(f"unable to open database file: {e}")
+        try:
+            yield path
+        finally:
+            self._release(path)
+
+    def _acquire(self, db_path: str) -> str:
+        for attempt in range(OPEN_RETRIES):
+            path = os.path.abspath(resolve_db_path(db_path))
+            with self._lock:
+                if path not in self._holds:
+                    try:
+                        self._holds[path] = _lock_shared(path)
+                    except FileNotFoundError:
+                        # Collected between reading the pointer and opening the file; read it again
+                        if attempt == OPEN_RETRIES - 1:
+                            raise
+                        continue
+                    self._databases[path] = db_path
+                self._users[path] = self._users.get(path, 0) + 1
+            break
+        self._retire_unused(db_path, keep=path)
+        return path
+
+    def _release(self, path: str) -> None:
+        with self._lock:
+            self._users[path] -= 1
+            db_path = self._databases[path]
+        live = os.path.abspath(resolve_db_path(db_path))
+        if path != live:
+            self._retire_unused(db_path, keep=live)
+
+    def _retire_unused(self, db_path: str, keep: str) -> None:
+        retired = []
+        with self._lock:
+            for path, users in list(self._users.items()):
+                if path != keep and users == 0 and self._databases[path] == db_path:
+                    del self._users[path]
+                    del self._databases[path]
+                    retired.append((path, self._holds.pop(path)))
+        for path, fd in retired:
+            self.cache.discard(path)
+            self.pool.discard(path)
+            os.close(fd)
+        if retired:
+            collect_garbage(db_path)
+
+    def versions_in_use(self) -> Dict[str, int]:
+        """Return the number of requests running on each version."""
+        with self._lock:
+            return dict(self._users)
+
+
+version_tracker = VersionTracker()
+
+
+def use_database(db_path: str):
+    """Pin the live version of a database for one request (see VersionTracker.use)."""
+    return version_tracker.use(db_path)
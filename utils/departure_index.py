@@ -0,0 +1,309 @@
+import heapq
+import math
+import sqlite3
+from array import array
+from bisect import bisect_left
+from datetime import date, timedelta
+from functools import cached_property
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from utils.feed_cache import feed_cache
+from utils.geo_utils import calculate_bearings
+from utils.service_calendar import ServiceCalendar, load_service_calendar
+from utils.stop_catalogue import StopCatalogue, get_stop_catalogue, load_stop_catalogue
+from utils.timetable_snapshot import INDEX_ARRAYS, INDEX_STRINGS, TimetableSnapshot, get_snapshot
+
+SECONDS_PER_DAY = 86400
+
+
+def parse_gtfs_time(time_str: str) -> int:
+    """Convert a GTFS HH:MM:SS time to seconds since the start of the service day.
+
+    Args:
+        time_str: Time string, hours may exceed 23 for trips running past midnight
+
+    Returns:
+        Seconds since service-day start
+    """
+    hours, minutes, seconds = time_str.split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def _read_only(values: array) -> memoryview:
+    return memoryview(values).toreadonly()
+
+
+class DepartureIndex:
+    """In-memory departure index built once from stop_times.
+
+    For every stop of a StopCatalogue, its departures are stored as one
+    contiguous, time-sorted segment of parallel arrays (departure seconds,
+    arrival seconds, trip position). Finding the next departures at a stop is a
+    bisect on that segment plus a slice. Trips are described by parallel
+    columns indexed by trip position, including the compact service position
+    used to test against a ServiceCalendar's daily bitmask and the bearing from
+    the trip's first to its last stop.
+    """
+
+    def __init__(
+        self,
+        catalogue: StopCatalogue,
+        trip_rows: Sequence[Tuple[Any, Any, Any, Any]],
+        stop_time_rows: Iterable[Tuple[Any, Any, Any, str, str]],
+        calendar: Optional[ServiceCalendar] = None,
+        trip_bearings: Optional[Mapping[Any, Optional[float]]] = None
+    ):
+        """Build the index.
+
+        Args:
+            catalogue: Stops the index refers to by position
+            trip_rows: (trip_id, route_id, trip_headsign, service_id) tuples
+            stop_time_rows: (stop_id, trip_id, stop_sequence, arrival_time, departure_time)
+                tuples grouped by stop_id; order within a stop does not matter
+            calendar: Service calendar of the feed (optional, every trip runs daily if omitted)
+            trip_bearings: Precomputed bearing per trip_id, None for trips without a
+                direction (optional, derived from the trips' first and last stops if omitted)
+        """
+        self.catalogue = catalogue
+        self.calendar = calendar if calendar is not None else ServiceCalendar()
+        self.trip_ids = tuple(row[0] for row in trip_rows)
+        self.route_ids = tuple(row[1] for row in trip_rows)
+        self.trip_headsigns = tuple(row[2] for row in trip_rows)
+        self.trip_services = _read_only(array('i', (self.calendar.service_position(row[3]) for row in trip_rows)))
+
+        n_stops, n_trips = len(catalogue), len(self.trip_ids)
+        stop_starts = array('i', [0]) * n_stops
+        stop_ends = array('i', [0]) * n_stops
+        departures, arrivals, trips = array('i'), array('i'), array('i')
+
+        # First and last stop of each trip, by stop_sequence
+        first_sequence = [None] * n_trips
+        last_sequence = [None] * n_trips
+        first_stops = array('i', [-1]) * n_trips
+        last_stops = array('i', [-1]) * n_trips
+
+        times: Dict[str, int] = {}
+        segment: List[Tuple[int, int, int]] = []
+        segment_stop = None
+
+        def flush():
+            segment.sort()
+            stop_starts[segment_stop] = len(departures)
+            for departure, arrival, trip in segment:
+                departures.append(departure)
+                arrivals.append(arrival)
+                trips.append(trip)
+            stop_ends[segment_stop] = len(departures)
+            segment.clear()
+
+        stop_positions, trip_positions = catalogue.positions, self.trip_positions
+        for stop_id, trip_id, stop_sequence, arrival_time, departure_time in stop_time_rows:
+            stop = stop_positions.get(stop_id)
+            trip = trip_positions.get(trip_id)
+            if stop is None or trip is None or not departure_time:
+                continue
+            if stop != segment_stop:
+                if segment_stop is not None:
+                    flush()
+                segment_stop = stop
+
+            # Timetables repeat the same few thousand time strings
+            departure = times.get(departure_time)
+            if departure is None:
+                departure = times[departure_time] = parse_gtfs_time(departure_time)
+            arrival_time = arrival_time or departure_time
+            arrival = times.get(arrival_time)
+            if arrival is None:
+                arrival = times[arrival_time] = parse_gtfs_time(arrival_time)
+            segment.append((departure, arrival, trip))
+
+            if first_sequence[trip] is None or stop_sequence < first_sequence[trip]:
+                first_sequence[trip] = stop_sequence
+                first_stops[trip] = stop
+            if last_sequence[trip] is None or stop_sequence > last_sequence[trip]:
+                last_sequence[trip] = stop_sequence
+                last_stops[trip] = stop
+        if segment_stop is not None:
+            flush()
+
+        self.stop_starts = _read_only(stop_starts)
+        self.stop_ends = _read_only(stop_ends)
+        self.departure_times = _read_only(departures)
+        self.arrival_times = _read_only(arrivals)
+        self.trips = _read_only(trips)
+        self.trip_first_stops = _read_only(first_stops)
+        self.trip_last_stops = _read_only(last_stops)
+        
+        if trip_bearings is None:
+            bearings = self._endpoint_bearings(first_sequence, last_sequence)
+        else:
+            bearings = array('d', (
+                math.nan if trip_bearings.get(trip_id) is None else trip_bearings[trip_id]
+                for trip_id in self.trip_ids
+            ))
+        self.trip_bearings = _read_only(bearings)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: TimetableSnapshot, catalogue: StopCatalogue) -> 'DepartureIndex':
+        """Open the index stored in a timetable snapshot without copying its columns.
+
+        Args:
+            snapshot: Snapshot written by timetable_snapshot.write_snapshot
+            catalogue: Stop catalogue of the same snapshot
+        """
+        index = cls.__new__(cls)
+        index.catalogue = catalogue
+        index.calendar = snapshot.service_calendar()
+        for name in INDEX_ARRAYS:
+            setattr(index, name, snapshot.array(name))
+        for name in INDEX_STRINGS:
+            setattr(index, name, snapshot.strings(name))
+        return index
+
+    @cached_property
+    def trip_positions(self) -> Mapping[Any, int]:
+        """Trip position of every trip_id, built on first use."""
+        return MappingProxyType({trip_id: i for i, trip_id in enumerate(self.trip_ids)})
+
+    def _endpoint_bearings(self, first_sequence: List[Any], last_sequence: List[Any]) -> array:
+        """Bearings from each trip's first to last stop, NaN for trips with fewer than two stops."""
+        bearings = array('d', [math.nan]) * len(self.trip_ids)
+        directed = [
+            trip for trip in range(len(self.trip_ids))
+            if first_sequence[trip] is not None and first_sequence[trip] != last_sequence[trip]
+        ]
+        if directed:
+            lats, lons = self.catalogue.stop_lats, self.catalogue.stop_lons
+            first = [self.trip_first_stops[trip] for trip in directed]
+            last = [self.trip_last_stops[trip] for trip in directed]
+            values = calculate_bearings(
+                [lats[stop] for stop in first], [lons[stop] for stop in first],
+                [lats[stop] for stop in last], [lons[stop] for stop in last]
+            )
+            for trip, bearing in zip(directed, values):
+                bearings[trip] = bearing
+        return bearings
+
+    def __len__(self) -> int:
+        return len(self.departure_times)
+
+    def stop_departures(self, stop: int) -> range:
+        """Return the entry positions of all departures at a stop, in time order."""
+        return range(self.stop_starts[stop], self.stop_ends[stop])
+
+    def departures_after(self, stop: int, after: int) -> range:
+        """Return the entry positions of departures at a stop at or after a time.
+
+        Args:
+            stop: Stop position in the catalogue
+            after: Seconds since service-day start
+
+        Returns:
+            Range of entry positions, in time order
+        """
+        start, end = self.stop_starts[stop], self.stop_ends[stop]
+        return range(bisect_left(self.departure_times, after, start, end), end)
+
+    def active_departures_after(self, stop: int, day: date, after: int) -> Iterator[Tuple[int, int]]:
+        """Yield departures at a stop from a time of day on, for trips running on that day.
+
+        Both the service day ``day`` and the previous service day are searched;
+        the previous day contributes its times at or after 24:00:00, which fall
+        on ``day``. Trips whose service is inactive are skipped by a mask test
+        before anything else is looked at.
+
+        Args:
+            stop: Stop position in the catalogue
+            day: Calendar date of the query
+            after: Seconds since midnight of ``day``
+
+        Yields:
+            (entry position, day offset) tuples in time order; the offset is 0 for
+            ``day``'s service and -1 for the previous day's
+        """
+        streams = []
+        for offset in (0, -1):
+            mask = self.calendar.active_mask(day + timedelta(days=offset))
+            if mask:
+                entries = self.departures_after(stop, after - offset * SECONDS_PER_DAY)
+                streams.append(self._active_entries(entries, mask, offset))
+        for _, entry, offset in heapq.merge(*streams):
+            yield entry, offset
+
+    def _active_entries(self, entries: range, mask: int, offset: int) -> Iterator[Tuple[int, int, int]]:
+        departures, trips, trip_services = self.departure_times, self.trips, self.trip_services
+        shift = offset * SECONDS_PER_DAY
+        for entry in entries:
+            if mask >> trip_services[trips[entry]] & 1:
+                yield departures[entry] + shift, entry, offset
+
+
+def load_departure_index(db_connection: sqlite3.Connection, catalogue: StopCatalogue) -> DepartureIndex:
+    """Read trips, stop_times and the service calendar into a new departure index.
+
+    Trip bearings come from the importer's trip_patterns and patterns tables
+    when present and are otherwise derived from the stop times.
+
+    Args:
+        db_connection: SQLite database connection
+        catalogue: Stops of the same database
+
+    Returns:
+        Departure index over all stop times
+    """
+    trip_rows = db_connection.execute(
+        "SELECT trip_id, route_id, trip_headsign, service_id FROM trips ORDER BY rowid"
+    ).fetchall()
+    stop_time_rows = db_connection.execute(
+        "SELECT stop_id, trip_id, stop_sequence, arrival_time, departure_time FROM stop_times ORDER BY stop_id"
+    )
+    trip_bearings = None
+    if _has_tables(db_connection, 'trip_patterns', 'patterns'):
+        trip_bearings = dict(db_connection.execute(
+            "SELECT tp.trip_id, p.bearing FROM trip_patterns tp JOIN patterns p ON p.pattern_id = tp.pattern_id"
+        ))
+    return DepartureIndex(catalogue, trip_rows, stop_time_rows, load_service_calendar(db_connection), trip_bearings)
+
+
+def _has_tables(db_connection: sqlite3.Connection, *tables: str) -> bool:
+    placeholders = ', '.join('?' for _ in tables)
+    row = db_connection.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})", tables
+    ).fetchone()
+    return row[0] == len(tables)
+
+
+def _load_from_file(db_path: str) -> DepartureIndex:
+    snapshot = get_snapshot(db_path)
+    if snapshot is not None:
+        return DepartureIndex.from_snapshot(snapshot, get_stop_catalogue(db_path))
+    conn = sqlite3.connect(Path(db_path).as_uri() + '?mode=ro', uri=True)
+    try:
+        # Read every table in one transaction, so an importer swapping tables in cannot mix feeds
+        conn.execute('BEGIN')
+        return load_departure_index(conn, get_stop_catalogue(db_path))
+    finally:
+        conn.close()
+
+
+def get_departure_index(db_path: str) -> DepartureIndex:
+    """Return the process-wide departure index for a database file.
+
+    The index is built on first use and rebuilt when the file changes, or
+    mapped from the database's timetable snapshot when the importer wrote
+    one. Its ``catalogue`` attribute is the stop catalogue it was built against.
+
+    Args:
+        db_path: Path to the SQLite database file
+
+    Returns:
+        Shared departure index for the current version of the database
+    """
+    return feed_cache.get(db_path, 'departures', _load_from_file)
+
+
+def build_departure_index(db_connection: sqlite3.Connection) -> DepartureIndex:
+    """Build an unshared departure index for any connection, e.g. an in-memory database."""
+    return load_departure_index(db_connection, load_stop_catalogue(db_connection))
@@ -0,0 +1,84 @@
+import os
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+FeedVersion = Tuple[str, int, int]
+
+
+def feed_version(db_path: str) -> FeedVersion:
+    """Identify the current contents of a database file.
+
+    Args:
+        db_path: Path to the SQLite database file
+
+    Returns:
+        Tuple of (absolute path, modification time in ns, size in bytes)
+
+    Raises:
+        OSError: If the file does not exist
+    """
+    path = os.path.abspath(db_path)
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+class FeedCache:
+    """Process-wide cache of read-only structures derived from a feed database.
+
+    Each entry is keyed by database path and a name, and remembers the feed
+    version it was built from. When the file changes on disk the next lookup
+    rebuilds the entry; readers holding the old object keep using it safely
+    because cached objects are never mutated.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], Tuple[FeedVersion, Any]] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db_path: str, name: str, loader: Callable[[str], Any]) -> Any:
+        """Return the cached structure for a database, building it if needed.
+
+        Args:
+            db_path: Path to the SQLite database file
+            name: Name of the structure (e.g. 'stops')
+            loader: Called with the absolute database path to build the structure
+
+        Returns:
+            The structure built from the current version of the database
+        """
+        version = feed_version(db_path)
+        key = (version[0], name)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+
+        # Only one thread builds a given entry; others wait and reuse its result
+        with key_lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+            value = loader(version[0])
+            self._entries[key] = (version, value)
+            return value
+
+    def discard(self, db_path: str) -> None:
+        """Drop all cached structures of one database file."""
+        path = os.path.abspath(db_path)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == path]:
+                del self._entries[key]
+            for key in [key for key in self._locks if key[0] == path]:
+                del self._locks[key]
+
+    def clear(self) -> None:
+        """Drop all cached structures."""
+        with self._lock:
+            self._entries.clear()
+
+
+feed_cache = FeedCache()
@@ -0,0 +1,142 @@
+import math
+import sqlite3
+from array import array
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from utils.feed_cache import feed_cache
+from utils.stop_catalogue import StopCatalogue, get_stop_catalogue, load_stop_catalogue
+
+WALKING_SPEED = 1.25  # Meters per second, about 4.5 km/h
+FOOTPATH_RADIUS = 400  # Meters; stops closer than this are linked by a footpath
+
+# A footpath: (from stop position, to stop position, distance in meters, walking seconds)
+Footpath = Tuple[int, int, float, int]
+
+
+def walking_seconds(distance: float, speed: float = WALKING_SPEED) -> int:
+    """Return the whole seconds it takes to walk a distance in meters."""
+    return math.ceil(distance / speed)
+
+
+def find_footpaths(
+    catalogue: StopCatalogue, radius: float = FOOTPATH_RADIUS, speed: float = WALKING_SPEED
+) -> List[Footpath]:
+    """Link every stop to the other stops within walking radius.
+
+    Neighbours come from the catalogue's grid index, so the cost grows with
+    the number of stops times the local stop density rather than quadratically.
+
+    Args:
+        catalogue: Stops to link
+        radius: Maximum straight-line distance of a footpath in meters
+        speed: Walking speed in meters per second
+
+    Returns:
+        Footpaths ordered by from stop, then by distance
+    """
+    footpaths = []
+    for stop in range(len(catalogue)):
+        lat, lon = catalogue.stop_lats[stop], catalogue.stop_lons[stop]
+        for neighbour, distance in catalogue.grid.query_radius(lat, lon, radius):
+            if neighbour != stop:
+                footpaths.append((stop, neighbour, distance, walking_seconds(distance, speed)))
+    return footpaths
+
+
+class Footpaths:
+    """Walking transfers between nearby stops as read-only adjacency lists.
+
+    The footpaths leaving stop ``s`` are ``targets[starts[s]:starts[s + 1]]``,
+    with their walking times at the same positions in ``seconds``, closest first.
+    """
+
+    def __init__(self, n_stops: int, footpaths: Iterable[Footpath]):
+        """Build the adjacency lists.
+
+        Args:
+            n_stops: Number of stops in the catalogue the positions refer to
+            footpaths: (from stop, to stop, distance, walking seconds) tuples
+        """
+        by_stop: List[List[Tuple[int, int]]] = [[] for _ in range(n_stops)]
+        for from_stop, to_stop, distance, seconds in footpaths:
+            by_stop[from_stop].append((seconds, to_stop))
+        starts, targets, walks = array('i', [0]), array('i'), array('i')
+        for neighbours in by_stop:
+            neighbours.sort()
+            for seconds, to_stop in neighbours:
+                targets.append(to_stop)
+                walks.append(seconds)
+            starts.append(len(targets))
+        self.starts = memoryview(starts).toreadonly()
+        self.targets = memoryview(targets).toreadonly()
+        self.seconds = memoryview(walks).toreadonly()
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+    def from_stop(self, stop: int) -> List[Tuple[int, int]]:
+        """Return (to stop, walking seconds) of the footpaths leaving a stop, closest first."""
+        start, end = self.starts[stop], self.starts[stop + 1]
+        return list(zip(self.targets[start:end], self.seconds[start:end]))
+
+
+def load_footpaths(db_connection: sqlite3.Connection, catalogue: StopCatalogue) -> Footpaths:
+    """Read the importer's footpaths table into adjacency lists.
+
+    Databases imported before footpaths existed have no table; their
+    footpaths are computed from the catalogue with the default radius and speed.
+
+    Args:
+        db_connection: SQLite database connection
+        catalogue: Stop catalogue of the same database
+
+    Returns:
+        Footpaths between the catalogue's stops
+    """
+    exists = db_connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'footpaths'"
+    ).fetchone()
+    if not exists:
+        return Footpaths(len(catalogue), find_footpaths(catalogue))
+
+    positions = catalogue.positions
+    footpaths = []
+    for from_stop_id, to_stop_id, distance, seconds in db_connection.execute(
+        "SELECT from_stop_id, to_stop_id, distance, walking_seconds FROM footpaths"
+    ):
+        from_stop, to_stop = positions.get(from_stop_id), positions.get(to_stop_id)
+        if from_stop is not None and to_stop is not None:
+            footpaths.append((from_stop, to_stop, distance, seconds))
+    return Footpaths(len(catalogue), footpaths)
+
+
+def _load_from_file(db_path: str) -> Footpaths:
+    catalogue = get_stop_catalogue(db_path)
+    conn = sqlite3.connect(Path(db_path).as_uri() + '?mode=ro', uri=True)
+    try:
+        return load_footpaths(conn, catalogue)
+    finally:
+        conn.close()
+
+
+def get_footpaths(db_path: str) -> Footpaths:
+    """Return the process-wide footpaths for a database file.
+
+    Loaded on first use and reloaded when the file changes. Stop positions
+    refer to the shared stop catalogue of the same file.
+
+    Args:
+        db_path: Path to the SQLite database file
+
+    Returns:
+        Shared footpaths for the current version of the database
+    """
+    return feed_cache.get(db_path, 'footpaths', _load_from_file)
+
+
+def build_footpaths(db_connection: sqlite3.Connection, catalogue: Optional[StopCatalogue] = None) -> Footpaths:
+    """Build unshared footpaths for any connection, e.g. an in-memory database."""
+    if catalogue is None:
+        catalogue = load_stop_catalogue(db_connection)
+    return load_footpaths(db_connection, catalogue)
@@ -1,5 +1,12 @@
 import math
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Sequence, Union
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+Coordinates = Union[float, Sequence[float]]
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Calculate distance in meters between two GPS coordinates using Haversine formula.
@@ -25,6 +32,93 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     
     return R * c
 
+def calculate_bearing(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Calculate bearing (direction) in degrees from point 1 to point 2.
+    
+    Args:
+        lat1: Latitude of first point
+        lon1: Longitude of first point
+        lat2: Latitude of second point
+        lon2: Longitude of second point
+        
+    Returns:
+        Bearing in degrees (0-360), where 0 is North, 90 is East, 180 is South, 270 is West
+    """
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lon = math.radians(lon2 - lon1)
+    
+    x = math.sin(delta_lon) * math.cos(lat2_rad)
+    y = math.cos(lat1_rad) * math.sin(lat2_rad) - math.sin(lat1_rad) * math.cos(lat2_rad) * math.cos(delta_lon)
+    
+    bearing = math.atan2(x, y)
+    bearing_degrees = (math.degrees(bearing) + 360) % 360
+    
+    return bearing_degrees
+
+def _broadcast(*columns: Coordinates) -> List[Sequence[float]]:
+    """Repeat scalar arguments to the length of the array arguments (pure-Python fallback)."""
+    lengths = {len(c) for c in columns if not isinstance(c, (int, float))}
+    if len(lengths) > 1:
+        raise ValueError("Coordinate arrays must have the same length")
+    n = lengths.pop() if lengths else 1
+    return [[c] * n if isinstance(c, (int, float)) else c for c in columns]
+
+def calculate_distances(lat1: Coordinates, lon1: Coordinates, lat2: Coordinates, lon2: Coordinates) -> Sequence[float]:
+    """Calculate Haversine distances in meters for arrays of coordinate pairs.
+    
+    Batch variant of calculate_distance. Any argument may be a scalar, which is
+    broadcast against the others, e.g. one origin against many stops.
+    
+    Args:
+        lat1: Latitude(s) of first points
+        lon1: Longitude(s) of first points
+        lat2: Latitude(s) of second points
+        lon2: Longitude(s) of second points
+        
+    Returns:
+        NumPy array of distances in meters, or a list when NumPy is not installed
+    """
+    if np is None:
+        return [calculate_distance(*point) for point in zip(*_broadcast(lat1, lon1, lat2, lon2))]
+    
+    phi1 = np.radians(np.asarray(lat1, dtype=float))
+    phi2 = np.radians(np.asarray(lat2, dtype=float))
+    delta_phi = phi2 - phi1
+    delta_lambda = np.radians(np.asarray(lon2, dtype=float) - np.asarray(lon1, dtype=float))
+    
+    a = np.sin(delta_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    
+    return np.atleast_1d(6371000 * c)
+
+def calculate_bearings(lat1: Coordinates, lon1: Coordinates, lat2: Coordinates, lon2: Coordinates) -> Sequence[float]:
+    """Calculate bearings in degrees for arrays of coordinate pairs.
+    
+    Batch variant of calculate_bearing. Any argument may be a scalar, which is
+    broadcast against the others.
+    
+    Args:
+        lat1: Latitude(s) of first points
+        lon1: Longitude(s) of first points
+        lat2: Latitude(s) of second points
+        lon2: Longitude(s) of second points
+        
+    Returns:
+        NumPy array of bearings (0-360), or a list when NumPy is not installed
+    """
+    if np is None:
+        return [calculate_bearing(*point) for point in zip(*_broadcast(lat1, lon1, lat2, lon2))]
+    
+    lat1_rad = np.radians(np.asarray(lat1, dtype=float))
+    lat2_rad = np.radians(np.asarray(lat2, dtype=float))
+    delta_lon = np.radians(np.asarray(lon2, dtype=float) - np.asarray(lon1, dtype=float))
+    
+    x = np.sin(delta_lon) * np.cos(lat2_rad)
+    y = np.cos(lat1_rad) * np.sin(lat2_rad) - np.sin(lat1_rad) * np.cos(lat2_rad) * np.cos(delta_lon)
+    
+    return np.atleast_1d((np.degrees(np.arctan2(x, y)) + 360) % 360)
+
 def filter_stops_by_radius(start_lat: float, start_lon: float, stops: List[Dict[str, Any]], radius: float = 1000) -> List[Dict[str, Any]]:
     """Filter stops within a given radius from start coordinates.
     
@@ -37,6 +131,19 @@ def filter_stops_by_radius(start_lat: float, start_lon: float, stops: List[Dict[
     Returns:
         List of stops within radius, each with added 'distance' key
     """
+    if np is not None and stops:
+        distances = calculate_distances(
+            start_lat, start_lon,
+            [float(stop['stop_lat']) for stop in stops],
+            [float(stop['stop_lon']) for stop in stops]
+        )
+        filtered = []
+        for i in np.flatnonzero(distances <= radius):
+            stop = stops[i]
+            stop['distance'] = float(distances[i])
+            filtered.append(stop)
+        return sorted(filtered, key=lambda s: s['distance'])
+    
     filtered = []
     for stop in stops:
         distance = calculate_distance(start_lat, start_lon, float(stop['stop_lat']), float(stop['stop_lon']))
@@ -0,0 +1,123 @@
+import hashlib
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Optional
+
+from flask import current_app, jsonify, make_response, request
+
+from utils.db_versions import use_database
+from utils.feed_cache import FeedVersion, feed_cache, feed_version
+
+MAX_AGE = 3600  # Seconds a response may be reused without revalidation, at most
+FEED_END_GRACE = 60  # Seconds a response may be reused once the feed has expired
+
+
+def etag_for(version: FeedVersion, resource: str) -> str:
+    """Return an opaque entity tag for a resource rendered from one version of a feed."""
+    digest = hashlib.sha1(repr((version, resource)).encode('utf-8')).hexdigest()
+    return digest[:20]
+
+
+def load_feed_end_date(db_connection: sqlite3.Connection) -> Optional[date]:
+    """Read the last service day of the feed from feed_info, if the feed has one."""
+    exists = db_connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'feed_info'"
+    ).fetchone()
+    if not exists:
+        return None
+    try:
+        row = db_connection.execute("SELECT feed_end_date FROM feed_info LIMIT 1").fetchone()
+    except sqlite3.OperationalError:
+        return None  # feed_end_date is optional in GTFS
+    if not row or not row[0]:
+        return None
+    try:
+        return datetime.strptime(row[0], '%Y%m%d').date()
+    except ValueError:
+        return None
+
+
+def _load_from_file(db_path: str) -> Optional[date]:
+    conn = sqlite3.connect(Path(db_path).as_uri() + '?mode=ro', uri=True)
+    try:
+        return load_feed_end_date(conn)
+    finally:
+        conn.close()
+
+
+def get_feed_end_date(db_path: str) -> Optional[date]:
+    """Return the feed end date of a database file, read once per feed version."""
+    return feed_cache.get(db_path, 'feed_end_date', _load_from_file)
+
+
+def max_age(end_date: Optional[date], now: datetime) -> int:
+    """Return how long a response may be cached, never past the end of the feed.
+
+    Args:
+        end_date: Last service day of the feed, or None if unknown
+        now: Current time in UTC
+
+    Returns:
+        Seconds, at most MAX_AGE
+    """
+    if end_date is None:
+        return MAX_AGE
+    expires = datetime.combine(end_date + timedelta(days=1), datetime.min.time(), timezone.utc)
+    remaining = int((expires - now).total_seconds())
+    return min(max(remaining, FEED_END_GRACE), MAX_AGE)
+
+
+def feed_static(db_file: Callable[[], str], resource: Callable[..., str]):
+    """Make a view's responses cacheable until the feed database changes.
+
+    Successful responses get an ETag built from the feed version and the
+    resource id, a Last-Modified time of the feed file and a Cache-Control
+    lifetime bounded by the feed end date. A request whose If-None-Match (or,
+    without it, If-Modified-Since) matches the current feed is answered with
+    304 Not Modified before the view runs, so no database work is done.
+
+    The database version is pinned for the whole request and passed to the
+    view as ``db_path``, so the body always comes from the version the
+    headers describe. A database that cannot be opened gets a JSON 500.
+
+    Args:
+        db_file: Returns the logical database path the view reads
+        resource: Called with the view's arguments; returns the id of the resource,
+            including anything else the response depends on
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                with use_database(db_file()) as db_path:
+                    return _respond(view, db_path, resource(*args, **kwargs), args, kwargs)
+            except sqlite3.Error as e:
+                return make_response(jsonify({'error': f'Database error: {str(e)}'}), 500)
+        return wrapper
+    return decorator
+
+
+def _respond(view, db_path: str, resource_id: str, args, kwargs):
+    version = feed_version(db_path)
+    etag = etag_for(version, resource_id)
+    last_modified = datetime.fromtimestamp(version[1] // 1_000_000_000, timezone.utc)
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        not_modified = request.if_modified_since is not None and request.if_modified_since >= last_modified
+
+    if not_modified:
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(view(*args, db_path=db_path, **kwargs))
+        if response.status_code != 200:
+            return response
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age(get_feed_end_date(db_path), datetime.now(timezone.utc))
+    return response
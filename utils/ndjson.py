@@ -0,0 +1,39 @@
+import json
+from contextlib import ExitStack
+from typing import Any, Iterable, Optional
+
+from flask import Response, request, stream_with_context
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_ndjson() -> bool:
+    """Return whether the client prefers newline-delimited JSON over a JSON document.
+
+    Only an Accept header ranking application/x-ndjson above application/json
+    selects it, so browsers sending */* keep getting JSON.
+    """
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def ndjson_response(rows: Iterable[Any], resources: Optional[ExitStack] = None) -> Response:
+    """Stream rows as newline-delimited JSON, one object per line.
+
+    Each row is serialized as it is produced, so the first line goes out
+    before the last row is computed and memory does not grow with the number
+    of rows. The request context stays available to the iterator.
+
+    Args:
+        rows: Iterator of JSON-serializable rows
+        resources: Context (pinned database version, pooled connection) the
+            iterator reads from; closed when the response is, even if the
+            client disconnects before the first row
+    """
+    def generate():
+        for row in rows:
+            yield json.dumps(row) + '\n'
+
+    response = Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+    if resources is not None:
+        response.call_on_close(resources.close)
+    return response
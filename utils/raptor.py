@@ -0,0 +1,348 @@
+import math
+import sqlite3
+from array import array
+from bisect import bisect_left
+from datetime import date, timedelta
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.connection_scan import DESTINATION, MAX_JOURNEY_SECONDS, ORIGIN, Leg, leave_late
+from utils.departure_index import SECONDS_PER_DAY, DepartureIndex, build_departure_index, get_departure_index, parse_gtfs_time
+from utils.feed_cache import feed_cache
+from utils.footpaths import Footpaths, build_footpaths, get_footpaths, walking_seconds
+
+MAX_RIDES = 5  # Rounds of the search; journeys with more transfers are not looked for
+
+# A trip run: (trip position, day offset, arrival seconds per stop, departure seconds per stop)
+TripRun = Tuple[int, int, array, array]
+
+
+class RouteTimetable:
+    """Trips grouped into route patterns for RAPTOR.
+
+    A route pattern is a stop sequence together with the trips serving exactly
+    that sequence, ordered by departure. Trips that would overtake another
+    trip of the same sequence go to a pattern of their own, so within a
+    pattern an earlier trip is earlier at every stop. Times are stored stop by
+    stop, so the departures of a pattern at one stop form a sorted column that
+    the earliest catchable trip is bisected from. As in the ConnectionTimetable,
+    runs of trips past midnight are also stored on the previous day's clock.
+    """
+
+    def __init__(
+        self,
+        index: DepartureIndex,
+        stop_time_rows: Iterable[Tuple[Any, Any, str, str]],
+        footpaths: Optional[Footpaths] = None
+    ):
+        """Build the patterns.
+
+        Args:
+            index: Departure index of the same feed, for stop and trip positions and the calendar
+            stop_time_rows: (trip_id, stop_id, arrival_time, departure_time) tuples grouped
+                by trip_id and ordered by stop_sequence within a trip
+            footpaths: Walking transfers between the index's stops; without them a
+                transfer is only possible at the stop where a ride ends
+        """
+        self.index = index
+        self.footpaths = footpaths if footpaths is not None else Footpaths(len(index.catalogue), ())
+        stop_positions, trip_positions = index.catalogue.positions, index.trip_positions
+        times: Dict[str, int] = {}
+
+        def seconds(value: str) -> int:
+            parsed = times.get(value)
+            if parsed is None:
+                parsed = times[value] = parse_gtfs_time(value)
+            return parsed
+
+        runs_by_sequence: Dict[Tuple[int, ...], List[TripRun]] = {}
+        for trip_id, rows in groupby(stop_time_rows, key=itemgetter(0)):
+            trip = trip_positions.get(trip_id)
+            if trip is None:
+                continue
+            stops, arrivals, departures = [], array('i'), array('i')
+            for _, stop_id, arrival_time, departure_time in rows:
+                stop = stop_positions.get(stop_id)
+                if stop is None or not (arrival_time or departure_time):
+                    continue
+                stops.append(stop)
+                arrivals.append(seconds(arrival_time or departure_time))
+                departures.append(seconds(departure_time or arrival_time))
+            if len(stops) < 2:
+                continue
+            runs = runs_by_sequence.setdefault(tuple(stops), [])
+            runs.append((trip, 0, arrivals, departures))
+            if arrivals[-1] >= SECONDS_PER_DAY:
+                runs.append((
+                    trip, -1,
+                    array('i', (t - SECONDS_PER_DAY for t in arrivals)),
+                    array('i', (t - SECONDS_PER_DAY for t in departures))
+                ))
+
+        self.pattern_stop_starts, self.pattern_stops = array('i', [0]), array('i')
+        self.pattern_trip_starts, self.pattern_trips, self.pattern_day_offsets = array('i', [0]), array('i'), array('b')
+        self.pattern_time_starts, self.arrival_times, self.departure_times = array('i', [0]), array('i'), array('i')
+        for sequence, runs in runs_by_sequence.items():
+            for pattern_runs in _split_overtaking(runs):
+                self._add_pattern(sequence, pattern_runs)
+
+        # Patterns serving each stop, with the stop's index in the pattern
+        visits: List[List[Tuple[int, int]]] = [[] for _ in range(len(index.catalogue))]
+        for pattern in range(len(self)):
+            start = self.pattern_stop_starts[pattern]
+            for i, stop in enumerate(self.pattern_stops[start:self.pattern_stop_starts[pattern + 1]]):
+                visits[stop].append((pattern, i))
+        self.stop_pattern_starts, self.stop_patterns, self.stop_pattern_indexes = array('i', [0]), array('i'), array('i')
+        for stop_visits in visits:
+            for pattern, i in stop_visits:
+                self.stop_patterns.append(pattern)
+                self.stop_pattern_indexes.append(i)
+            self.stop_pattern_starts.append(len(self.stop_patterns))
+
+        for name in (
+            'pattern_stop_starts', 'pattern_stops', 'pattern_trip_starts', 'pattern_trips', 'pattern_day_offsets',
+            'pattern_time_starts', 'arrival_times', 'departure_times',
+            'stop_pattern_starts', 'stop_patterns', 'stop_pattern_indexes'
+        ):
+            setattr(self, name, memoryview(getattr(self, name)).toreadonly())
+
+    def _add_pattern(self, sequence: Tuple[int, ...], runs: List[TripRun]) -> None:
+        self.pattern_stops.extend(sequence)
+        self.pattern_stop_starts.append(len(self.pattern_stops))
+        for trip, offset, _, _ in runs:
+            self.pattern_trips.append(trip)
+            self.pattern_day_offsets.append(offset)
+        self.pattern_trip_starts.append(len(self.pattern_trips))
+        for i in range(len(sequence)):
+            self.arrival_times.extend(run[2][i] for run in runs)
+            self.departure_times.extend(run[3][i] for run in runs)
+        self.pattern_time_starts.append(len(self.departure_times))
+
+    def __len__(self) -> int:
+        return len(self.pattern_stop_starts) - 1
+
+    def pareto_journeys(
+        self,
+        access: Sequence[Tuple[int, float]],
+        egress: Sequence[Tuple[int, float]],
+        day: date,
+        start: int,
+        direct_walk: Optional[float] = None,
+        max_rides: int = MAX_RIDES
+    ) -> List[List[Leg]]:
+        """Find the journeys that are best for arrival time or for number of transfers.
+
+        Round k of the search finds the earliest arrival using at most k rides.
+        A round's journey is kept only if it arrives strictly earlier than every
+        journey with fewer rides, so the result is the Pareto set of
+        (arrival time, transfers).
+
+        Args:
+            access: (stop position, walking distance in meters) of stops reachable from the start
+            egress: (stop position, walking distance in meters) of stops the destination is reachable from
+            day: Service date of the query
+            start: Seconds since midnight of ``day`` the journey may start at
+            direct_walk: Walking distance from start to destination, if short enough to consider
+            max_rides: Maximum number of rides in a journey
+
+        Returns:
+            Legs of each journey, fewest rides (and latest arrival) first
+        """
+        n_stops = len(self.index.catalogue)
+        best = [math.inf] * n_stops  # Earliest arrival at each stop in any round so far
+        best_ride = [math.inf] * n_stops  # The same by ride alone; footpaths leave from these
+        ready = [math.inf] * n_stops  # Earliest arrival with the previous round's number of rides
+        # Per round: stop -> access distance, ride (pattern, trip, board, alight) or (footpath Leg, ride)
+        labels: List[Dict[int, Any]] = [{}]
+
+        for stop, distance in access:
+            arrival = start + walking_seconds(distance)
+            if arrival < ready[stop]:
+                ready[stop] = best[stop] = arrival
+                labels[0][stop] = distance
+        egress_seconds = {stop: walking_seconds(distance) for stop, distance in egress}
+
+        journeys = []
+        best_target = start + MAX_JOURNEY_SECONDS
+        if direct_walk is not None:
+            best_target = start + walking_seconds(direct_walk)
+            journeys.append([Leg(ORIGIN, DESTINATION, start, best_target)])
+
+        calendar, trip_services = self.index.calendar, self.index.trip_services
+        masks = (calendar.active_mask(day), calendar.active_mask(day - timedelta(days=1)))
+        pattern_stop_starts, pattern_stops = self.pattern_stop_starts, self.pattern_stops
+        pattern_trip_starts, pattern_trips, day_offsets = self.pattern_trip_starts, self.pattern_trips, self.pattern_day_offsets
+        pattern_time_starts, arrivals, departures = self.pattern_time_starts, self.arrival_times, self.departure_times
+        stop_pattern_starts, stop_patterns, stop_pattern_indexes = (
+            self.stop_pattern_starts, self.stop_patterns, self.stop_pattern_indexes
+        )
+        footpath_starts, footpath_targets, footpath_seconds = (
+            self.footpaths.starts, self.footpaths.targets, self.footpaths.seconds
+        )
+
+        marked = set(labels[0])
+        for _ in range(max_rides):
+            if not marked:
+                break
+            # Each pattern is scanned once per round, from its first marked stop
+            queue: Dict[int, int] = {}
+            for stop in marked:
+                for v in range(stop_pattern_starts[stop], stop_pattern_starts[stop + 1]):
+                    pattern, i = stop_patterns[v], stop_pattern_indexes[v]
+                    if i < queue.get(pattern, n_stops):
+                        queue[pattern] = i
+
+            marked = set()
+            reached = ready[:]
+            round_labels: Dict[int, Any] = {}
+            ridden: Dict[int, Tuple[int, Any]] = {}  # Stop -> (arrival, ride) of rides improving best_ride
+            target_stop = None
+            for pattern, first in queue.items():
+                stops_start = pattern_stop_starts[pattern]
+                n_pattern_stops = pattern_stop_starts[pattern + 1] - stops_start
+                trips_start = pattern_trip_starts[pattern]
+                n_trips = pattern_trip_starts[pattern + 1] - trips_start
+                times_start = pattern_time_starts[pattern]
+                trip = board = -1
+                for i in range(first, n_pattern_stops):
+                    stop = pattern_stops[stops_start + i]
+                    column = times_start + i * n_trips
+                    if trip >= 0:
+                        arrival = arrivals[column + trip]
+                        if arrival < best_ride[stop] and arrival < best_target:
+                            best_ride[stop] = arrival
+                            ridden[stop] = (arrival, (pattern, trip, board, i))
+                            if arrival < best[stop]:
+                                best[stop] = reached[stop] = arrival
+                                round_labels[stop] = ridden[stop][1]
+                                marked.add(stop)
+                                seconds = egress_seconds.get(stop)
+                                if seconds is not None and arrival + seconds < best_target:
+                                    best_target, target_stop = arrival + seconds, stop
+                    # Catch an earlier trip if this stop was reached in time for one
+                    if ready[stop] < math.inf and (trip < 0 or ready[stop] <= departures[column + trip]):
+                        t = bisect_left(departures, ready[stop], column, column + (trip if trip >= 0 else n_trips)) - column
+                        while t < (trip if trip >= 0 else n_trips):
+                            run = trips_start + t
+                            if masks[-day_offsets[run]] >> trip_services[pattern_trips[run]] & 1:
+                                trip, board = t, i
+                                break
+                            t += 1
+
+            # Walking transfers from where this round's rides end
+            for stop, (arrival, ride) in ridden.items():
+                for f in range(footpath_starts[stop], footpath_starts[stop + 1]):
+                    neighbour, walked = footpath_targets[f], arrival + footpath_seconds[f]
+                    if walked < best[neighbour] and walked < best_target:
+                        best[neighbour] = reached[neighbour] = walked
+                        round_labels[neighbour] = (Leg(stop, neighbour, arrival, walked), ride)
+                        marked.add(neighbour)
+                        seconds = egress_seconds.get(neighbour)
+                        if seconds is not None and walked + seconds < best_target:
+                            best_target, target_stop = walked + seconds, neighbour
+
+            labels.append(round_labels)
+            ready = reached
+            if target_stop is not None:
+                journeys.append(self._journey_to(target_stop, labels, best_target, start))
+        return journeys
+
+    def _journey_to(self, stop: int, labels: List[Dict[int, Any]], destination_arrival: int, start: int) -> List[Leg]:
+        """Follow the labels back from the egress stop of the last round's journey."""
+        legs = []
+        round_ = len(labels) - 1
+        while round_ > 0:
+            label = labels[round_][stop]
+            if isinstance(label[0], Leg):
+                walk, label = label
+                legs.append(walk)
+                stop = walk.from_stop
+            pattern, trip, board, alight = label
+            n_trips = self.pattern_trip_starts[pattern + 1] - self.pattern_trip_starts[pattern]
+            times_start = self.pattern_time_starts[pattern]
+            run = self.pattern_trip_starts[pattern] + trip
+            board_stop = self.pattern_stops[self.pattern_stop_starts[pattern] + board]
+            legs.append(Leg(
+                board_stop, stop,
+                self.departure_times[times_start + board * n_trips + trip],
+                self.arrival_times[times_start + alight * n_trips + trip],
+                self.pattern_trips[run], self.pattern_day_offsets[run]
+            ))
+            stop = board_stop
+            # The boarding stop was reached in the latest earlier round that improved it
+            round_ -= 1
+            while round_ > 0 and stop not in labels[round_]:
+                round_ -= 1
+        legs.reverse()
+        last = legs[-1]
+        legs.insert(0, Leg(ORIGIN, stop, start, start + walking_seconds(labels[0][stop])))
+        legs.append(Leg(last.to_stop, DESTINATION, last.arrival, destination_arrival))
+        return leave_late(legs)
+
+
+def _split_overtaking(runs: List[TripRun]) -> List[List[TripRun]]:
+    """Sort runs of one stop sequence by departure and split them so no run overtakes another."""
+    runs.sort(key=lambda run: (run[3][0], run[2][-1]))
+    patterns: List[List[TripRun]] = []
+    for run in runs:
+        for pattern_runs in patterns:
+            last = pattern_runs[-1]
+            if all(a <= b for a, b in zip(last[2], run[2])) and all(a <= b for a, b in zip(last[3], run[3])):
+                pattern_runs.append(run)
+                break
+        else:
+            patterns.append([run])
+    return patterns
+
+
+def load_route_timetable(
+    db_connection: sqlite3.Connection, index: DepartureIndex, footpaths: Optional[Footpaths] = None
+) -> RouteTimetable:
+    """Read stop_times in trip order into a new route timetable.
+
+    Args:
+        db_connection: SQLite database connection
+        index: Departure index of the same database
+        footpaths: Walking transfers of the same database
+
+    Returns:
+        Route timetable over all trips
+    """
+    stop_time_rows = db_connection.execute(
+        "SELECT trip_id, stop_id, arrival_time, departure_time FROM stop_times ORDER BY trip_id, stop_sequence"
+    )
+    return RouteTimetable(index, stop_time_rows, footpaths)
+
+
+def _load_from_file(db_path: str) -> RouteTimetable:
+    index = get_departure_index(db_path)
+    footpaths = get_footpaths(db_path)
+    conn = sqlite3.connect(Path(db_path).as_uri() + '?mode=ro', uri=True)
+    try:
+        return load_route_timetable(conn, index, footpaths)
+    finally:
+        conn.close()
+
+
+def get_route_timetable(db_path: str) -> RouteTimetable:
+    """Return the process-wide route timetable for a database file.
+
+    Built on first use and rebuilt when the file changes. Its ``index`` and
+    ``footpaths`` attributes are the shared departure index and footpaths of
+    the same file.
+
+    Args:
+        db_path: Path to the SQLite database file
+
+    Returns:
+        Shared route timetable for the current version of the database
+    """
+    return feed_cache.get(db_path, 'routes', _load_from_file)
+
+
+def build_route_timetable(db_connection: sqlite3.Connection) -> RouteTimetable:
+    """Build an unshared route timetable for any connection, e.g. an in-memory database."""
+    index = build_departure_index(db_connection)
+    return load_route_timetable(db_connection, index, build_footpaths(db_connection, index.catalogue))
@@ -0,0 +1,143 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from utils.spatial_index import EARTH_RADIUS
+
+# Defaults, overridable through the Flask app config (see ResultCache.init_app)
+DEFAULT_CONFIG = {
+    'RESULT_CACHE_ENABLED': True,  # Serve repeated queries from memory
+    'RESULT_CACHE_SIZE': 4096,  # Results kept; the least recently used is evicted first
+    'RESULT_CACHE_TTL': 60,  # Seconds a result is served for
+    'RESULT_CACHE_GRID': 25,  # Meters; coordinates in one grid cell share results
+}
+
+
+class ResultCache:
+    """Bounded, thread-safe LRU cache of query results with a time to live.
+
+    Keys are built by the caller, typically with ``snap_point`` and
+    ``minute_bucket`` so that queries a few meters and seconds apart share
+    an entry, and should include the feed version the result was computed
+    from. Cached values are handed out as they are and must not be mutated.
+    """
+
+    def __init__(self, **config: Any):
+        """Create an empty cache.
+
+        Args:
+            **config: Settings named like the keys of DEFAULT_CONFIG
+        """
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.config = dict(DEFAULT_CONFIG)
+        self.configure(**config)
+
+    def configure(self, **config: Any) -> None:
+        """Change settings; cached results are dropped.
+
+        Raises:
+            ValueError: On unknown settings or a non-positive size, TTL or grid
+        """
+        unknown = set(config) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise ValueError(f"Unknown result cache settings: {', '.join(sorted(unknown))}")
+        merged = {**self.config, **config}
+        for key in ('RESULT_CACHE_SIZE', 'RESULT_CACHE_TTL', 'RESULT_CACHE_GRID'):
+            if merged[key] <= 0:
+                raise ValueError(f"{key} must be positive")
+        with self._lock:
+            self.config = merged
+            self._entries.clear()
+
+    def init_app(self, app) -> None:
+        """Configure the cache from a Flask app's config.
+
+        Missing keys are filled in with the defaults, so the effective settings
+        can be read back from ``app.config``.
+        """
+        for key, value in DEFAULT_CONFIG.items():
+            app.config.setdefault(key, value)
+        self.configure(**{key: app.config[key] for key in DEFAULT_CONFIG})
+        app.extensions['result_cache'] = self
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config['RESULT_CACHE_ENABLED'])
+
+    @property
+    def grid(self) -> float:
+        return self.config['RESULT_CACHE_GRID']
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached result for a key, or None on a miss or with the cache disabled."""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a result, evicting the least recently used ones over the size limit."""
+        if not self.enabled:
+            return
+        expires = time.monotonic() + self.config['RESULT_CACHE_TTL']
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.config['RESULT_CACHE_SIZE']:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters and the number of cached results."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'size': len(self._entries)
+            }
+
+    def clear(self) -> None:
+        """Drop every cached result; counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+
+def snap_point(lat: float, lon: float, grid: float) -> Tuple[float, float]:
+    """Snap a point to the centre of its cell on a grid of roughly ``grid`` meters.
+
+    Latitude is snapped first and the longitude step is scaled for it, so
+    cells stay about square anywhere but at the poles.
+    """
+    step_lat = math.degrees(grid / EARTH_RADIUS)
+    snapped_lat = (math.floor(lat / step_lat) + 0.5) * step_lat
+    step_lon = step_lat / max(math.cos(math.radians(snapped_lat)), 0.01)
+    snapped_lon = (math.floor(lon / step_lon) + 0.5) * step_lon
+    return round(snapped_lat, 7), round(snapped_lon, 7)
+
+
+def minute_bucket(moment: datetime) -> datetime:
+    """Truncate a time to the start of its minute."""
+    return moment.replace(second=0, microsecond=0)
+
+
+result_cache = ResultCache()
@@ -0,0 +1,151 @@
+import sqlite3
+from datetime import date, datetime, timedelta
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Sequence
+
+ALL_SERVICES = -1  # Mask with every bit set, used when the feed has no calendar
+
+WEEKDAY_COLUMNS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+
+def parse_gtfs_date(value: Any) -> date:
+    """Convert a GTFS YYYYMMDD date to a date.
+
+    Args:
+        value: Date as string or number (numeric columns may hold e.g. 20250322.0)
+
+    Returns:
+        Parsed date
+    """
+    return datetime.strptime(str(value).split('.')[0], '%Y%m%d').date()
+
+
+class ServiceCalendar:
+    """Active services for every date of the feed.
+
+    Service ids are mapped to compact integer positions, and for each date the
+    set of active services is precomputed as a bitmask over those positions
+    from calendar (weekly patterns) and calendar_dates (exceptions). Checking
+    whether a trip runs on a date is then a single shift-and-mask.
+    """
+
+    def __init__(self, calendar_rows: Iterable[Sequence[Any]] = (), calendar_date_rows: Iterable[Sequence[Any]] = ()):
+        """Build the calendar.
+
+        Args:
+            calendar_rows: (service_id, monday, ..., sunday, start_date, end_date) rows
+            calendar_date_rows: (service_id, date, exception_type) rows
+        """
+        calendar_rows = list(calendar_rows)
+        calendar_date_rows = list(calendar_date_rows)
+        positions: Dict[Any, int] = {}
+        for row in calendar_rows + calendar_date_rows:
+            positions.setdefault(row[0], len(positions))
+        self.service_ids = tuple(positions)
+        self.service_positions = MappingProxyType(positions)
+
+        # Without any calendar data every service is treated as always running
+        self.restricted = bool(positions)
+        self.unknown_position = len(positions)
+
+        masks: Dict[date, int] = {}
+        for row in calendar_rows:
+            bit = 1 << positions[row[0]]
+            weekdays = [bool(int(float(flag or 0))) for flag in row[1:8]]
+            day, end = parse_gtfs_date(row[8]), parse_gtfs_date(row[9])
+            while day <= end:
+                if weekdays[day.weekday()]:
+                    masks[day] = masks.get(day, 0) | bit
+                day += timedelta(days=1)
+
+        for service_id, day, exception_type in calendar_date_rows:
+            bit = 1 << positions[service_id]
+            day = parse_gtfs_date(day)
+            if int(float(exception_type)) == 1:
+                masks[day] = masks.get(day, 0) | bit
+            else:
+                masks[day] = masks.get(day, 0) & ~bit
+
+        self._masks = MappingProxyType(masks)
+
+    @classmethod
+    def from_masks(cls, service_ids: Sequence[Any], masks: Mapping[date, int]) -> 'ServiceCalendar':
+        """Rebuild a calendar from the service ids and daily masks of another one.
+
+        Args:
+            service_ids: Service ids in position order, as in ``service_ids``
+            masks: Active-service bitmask per date, as returned by daily_masks
+        """
+        calendar = cls()
+        positions = {service_id: i for i, service_id in enumerate(service_ids)}
+        calendar.service_ids = tuple(positions)
+        calendar.service_positions = MappingProxyType(positions)
+        calendar.restricted = bool(positions)
+        calendar.unknown_position = len(positions)
+        calendar._masks = MappingProxyType(dict(masks))
+        return calendar
+
+    def daily_masks(self) -> Mapping[date, int]:
+        """Return the active-service bitmask of every date with at least one change."""
+        return self._masks
+
+    def service_position(self, service_id: Any) -> int:
+        """Return the compact position of a service id.
+
+        Services missing from the calendar share one position that is never
+        active on a restricted calendar.
+        """
+        return self.service_positions.get(service_id, self.unknown_position)
+
+    def active_mask(self, day: date) -> int:
+        """Return the bitmask of services running on a date.
+
+        Args:
+            day: Service date
+
+        Returns:
+            Bitmask over service positions; ``mask >> position & 1`` tells whether a service runs
+        """
+        if not self.restricted:
+            return ALL_SERVICES
+        return self._masks.get(day, 0)
+
+    def active_services(self, day: date) -> frozenset:
+        """Return the service ids running on a date."""
+        mask = self.active_mask(day)
+        return frozenset(
+            service_id for service_id, position in self.service_positions.items()
+            if mask >> position & 1
+        )
+
+
+def _table_exists(db_connection: sqlite3.Connection, table: str) -> bool:
+    row = db_connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()
+    return row is not None
+
+
+def load_service_calendar(db_connection: sqlite3.Connection) -> ServiceCalendar:
+    """Read calendar and calendar_dates into a service calendar.
+
+    Missing tables are treated as empty, so a feed without any calendar data
+    yields a calendar on which every service runs every day.
+
+    Args:
+        db_connection: SQLite database connection
+
+    Returns:
+        Service calendar
+    """
+    calendar_rows = []
+    if _table_exists(db_connection, 'calendar'):
+        calendar_rows = db_connection.execute(
+            f"SELECT service_id, {', '.join(WEEKDAY_COLUMNS)}, start_date, end_date FROM calendar"
+        ).fetchall()
+    calendar_date_rows = []
+    if _table_exists(db_connection, 'calendar_dates'):
+        calendar_date_rows = db_connection.execute(
+            "SELECT service_id, date, exception_type FROM calendar_dates ORDER BY date"
+        ).fetchall()
+    return ServiceCalendar(calendar_rows, calendar_date_rows)
@@ -0,0 +1,161 @@
+import math
+import sqlite3
+from array import array
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from utils.spatial_index import EARTH_RADIUS
+
+MAX_ZOOM = 20  # Zoom levels served, as in web map tiles
+PIXEL_TOLERANCE = 1.0  # Screen pixels a simplified line may deviate by
+EQUATOR_METERS_PER_PIXEL = 2 * math.pi * EARTH_RADIUS / 256  # At zoom 0 on 256 px tiles
+
+Point = Tuple[float, float]
+
+
+def pack_points(points: Iterable[Point]) -> bytes:
+    """Pack (lat, lon) points into interleaved doubles for storage."""
+    coords = array('d')
+    for lat, lon in points:
+        coords.append(lat)
+        coords.append(lon)
+    return coords.tobytes()
+
+
+def unpack_points(blob: bytes) -> List[Point]:
+    """Inverse of pack_points."""
+    coords = array('d')
+    coords.frombytes(blob)
+    return list(zip(coords[0::2], coords[1::2]))
+
+
+def significance(points: Sequence[Point]) -> array:
+    """Rank points by the Douglas–Peucker tolerance, in meters, below which they are kept.
+
+    Running Douglas–Peucker once and recording for each point the distance
+    at which it split its segment (capped by the split above it) gives every
+    simplification at once: the line simplified to tolerance ``t`` is the
+    points whose significance is greater than ``t``. Endpoints are always kept.
+    Distances use an equirectangular projection around the first point, which
+    is accurate to well under a meter over the length of a city route.
+    """
+    n = len(points)
+    ranks = array('d', [0.0] * n)
+    if n == 0:
+        return ranks
+    ranks[0] = ranks[n - 1] = math.inf
+    if n < 3:
+        return ranks
+
+    scale = math.cos(math.radians(points[0][0]))
+    xy = [(math.radians(lon) * scale * EARTH_RADIUS, math.radians(lat) * EARTH_RADIUS) for lat, lon in points]
+
+    stack = [(0, n - 1, math.inf)]
+    while stack:
+        first, last, cap = stack.pop()
+        if last - first < 2:
+            continue
+        ax, ay = xy[first]
+        bx, by = xy[last]
+        dx, dy = bx - ax, by - ay
+        length_sq = dx * dx + dy * dy
+        farthest, max_distance = first + 1, -1.0
+        for i in range(first + 1, last):
+            px, py = xy[i]
+            if length_sq == 0:
+                distance = math.hypot(px - ax, py - ay)
+            else:
+                t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+                distance = math.hypot(px - ax - t * dx, py - ay - t * dy)
+            if distance > max_distance:
+                farthest, max_distance = i, distance
+        rank = min(max_distance, cap)
+        ranks[farthest] = rank
+        stack.append((first, farthest, rank))
+        stack.append((farthest, last, rank))
+    return ranks
+
+
+def simplify(points: Sequence[Point], tolerance: float, ranks: Optional[Sequence[float]] = None) -> List[Point]:
+    """Return the Douglas–Peucker simplification of a line to a tolerance in meters.
+
+    Args:
+        points: (lat, lon) points of the line
+        tolerance: Maximum distance of dropped points from the simplified line
+        ranks: Precomputed significance of the points, computed if omitted
+    """
+    if ranks is None:
+        ranks = significance(points)
+    return [point for point, rank in zip(points, ranks) if rank > tolerance]
+
+
+def zoom_tolerance(zoom: int, latitude: float) -> float:
+    """Return the tolerance in meters matching PIXEL_TOLERANCE at a map zoom level."""
+    return PIXEL_TOLERANCE * EQUATOR_METERS_PER_PIXEL * math.cos(math.radians(latitude)) / 2 ** zoom
+
+
+def encode_polyline(points: Iterable[Point], precision: int = 5) -> str:
+    """Encode points with the Google encoded polyline algorithm."""
+    factor = 10 ** precision
+    encoded = []
+    previous_lat = previous_lon = 0
+    for lat, lon in points:
+        lat_e5, lon_e5 = round(lat * factor), round(lon * factor)
+        for delta in (lat_e5 - previous_lat, lon_e5 - previous_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                encoded.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            encoded.append(chr(value + 63))
+        previous_lat, previous_lon = lat_e5, lon_e5
+    return ''.join(encoded)
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> List[Point]:
+    """Inverse of encode_polyline."""
+    factor = 10 ** precision
+    points = []
+    index = lat = lon = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append((lat / factor, lon / factor))
+    return points
+
+
+def load_shape(db_connection: sqlite3.Connection, shape_id: str) -> Optional[List[Point]]:
+    """Read the points of a shape, in order.
+
+    The importer's packed shape_geometries table is used when present;
+    databases imported before it existed are read from the shapes table.
+
+    Returns:
+        (lat, lon) points, or None if the feed has no such shape
+    """
+    tables = {
+        name for (name,) in db_connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('shape_geometries', 'shapes')"
+        )
+    }
+    if 'shape_geometries' in tables:
+        row = db_connection.execute(
+            "SELECT coords FROM shape_geometries WHERE shape_id = ?", (shape_id,)
+        ).fetchone()
+        return unpack_points(row[0]) if row else None
+    if 'shapes' in tables:
+        rows = db_connection.execute(
+            "SELECT shape_pt_lat, shape_pt_lon FROM shapes WHERE shape_id = ? ORDER BY shape_pt_sequence",
+            (shape_id,)
+        ).fetchall()
+        return [(lat, lon) for lat, lon in rows] or None
+    return None
@@ -0,0 +1,167 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import List, Sequence, Tuple
+
+from utils.geo_utils import calculate_distance, calculate_distances
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EARTH_RADIUS = 6371000  # Earth radius in meters, same as calculate_distance
+DEFAULT_CELL_SIZE = 500  # Grid cell edge in meters
+VECTORIZE_MIN_CANDIDATES = 32  # Below this, scalar refinement beats NumPy call overhead
+COLUMN_BIAS = 1 << 31  # Added to column numbers so a cell key orders by (row, column)
+
+
+class StopGridIndex:
+    """Uniform lat/lon grid over stop coordinates.
+
+    Stops are bucketed into cells of roughly ``cell_size`` meters. Radius and
+    bounding-box queries only visit the cells overlapping the query area and then
+    refine the candidates exactly, so lookup cost depends on local stop density
+    rather than on the total number of stops.
+
+    Occupied cells are stored as flat arrays rather than a dict of lists: cell
+    keys in (row, column) order, and the stop positions of each cell back to
+    back. The cells of one grid row overlapping a box are then one bisect and
+    one contiguous slice, and queries never touch the reference count of a
+    shared Python object, so a grid built before a fork stays shared.
+    """
+
+    def __init__(self, lats: Sequence[float], lons: Sequence[float], cell_size: float = DEFAULT_CELL_SIZE):
+        """Build the grid.
+
+        Args:
+            lats: Stop latitudes
+            lons: Stop longitudes, parallel to ``lats``
+            cell_size: Approximate cell edge in meters
+        """
+        if len(lats) != len(lons):
+            raise ValueError("lats and lons must have the same length")
+        self.lats = lats
+        self.lons = lons
+        self.cell_size = cell_size
+
+        # Cells are square in meters at the mean latitude of the stops
+        ref_lat = sum(lats) / len(lats) if lats else 0.0
+        self.cell_lat = math.degrees(cell_size / EARTH_RADIUS)
+        self.cell_lon = self.cell_lat / max(math.cos(math.radians(ref_lat)), 0.01)
+
+        cells = sorted((self._key(*self._cell(lats[i], lons[i])), i) for i in range(len(lats)))
+        cell_keys, cell_starts = array('q'), array('i')
+        for position, (key, _) in enumerate(cells):
+            if not cell_keys or cell_keys[-1] != key:
+                cell_keys.append(key)
+                cell_starts.append(position)
+        cell_starts.append(len(cells))
+        self.cell_keys = memoryview(cell_keys).toreadonly()
+        self.cell_starts = memoryview(cell_starts).toreadonly()
+        self.cell_members = memoryview(array('i', (i for _, i in cells))).toreadonly()
+
+        # Coordinate arrays for vectorized refinement (zero-copy for float buffers)
+        if np is not None:
+            self._lat_array = np.asarray(lats, dtype=float)
+            self._lon_array = np.asarray(lons, dtype=float)
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_lat), math.floor(lon / self.cell_lon)
+
+    @staticmethod
+    def _key(row: int, col: int) -> int:
+        return (row << 32) + col + COLUMN_BIAS
+
+    def _candidates(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[int]:
+        """Return positions of stops in cells overlapping the box (unrefined)."""
+        row0, col0 = self._cell(min_lat, min_lon)
+        row1, col1 = self._cell(max_lat, max_lon)
+
+        keys, starts, members = self.cell_keys, self.cell_starts, self.cell_members
+
+        # A box spanning more rows than there are occupied cells; scan the cells instead
+        if row1 - row0 + 1 > len(keys):
+            candidates = []
+            for cell, key in enumerate(keys):
+                row, col = key >> 32, (key & 0xffffffff) - COLUMN_BIAS
+                if row0 <= row <= row1 and col0 <= col <= col1:
+                    candidates.extend(members[starts[cell]:starts[cell + 1]])
+            return candidates
+
+        candidates = []
+        for row in range(row0, row1 + 1):
+            first = bisect_left(keys, self._key(row, col0))
+            last = bisect_right(keys, self._key(row, col1))
+            if first < last:
+                candidates.extend(members[starts[first]:starts[last]])
+        return candidates
+
+    def query_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[int]:
+        """Find stops inside a bounding box.
+
+        Args:
+            min_lat: Southern edge latitude
+            min_lon: Western edge longitude
+            max_lat: Northern edge latitude
+            max_lon: Eastern edge longitude
+
+        Returns:
+            Positions of stops inside the box (edges inclusive)
+        """
+        lats, lons = self.lats, self.lons
+        return [
+            i for i in self._candidates(min_lat, min_lon, max_lat, max_lon)
+            if min_lat <= lats[i] <= max_lat and min_lon <= lons[i] <= max_lon
+        ]
+
+    def query_radius(self, lat: float, lon: float, radius: float) -> List[Tuple[int, float]]:
+        """Find stops within a given radius from a point.
+
+        Args:
+            lat: Latitude of the query point
+            lon: Longitude of the query point
+            radius: Maximum distance in meters
+
+        Returns:
+            List of (position, distance) tuples sorted by distance
+        """
+        angular = radius / EARTH_RADIUS
+        delta_lat = math.degrees(angular)
+        min_lat = max(lat - delta_lat, -90.0)
+        max_lat = min(lat + delta_lat, 90.0)
+
+        # Widest longitude span of a spherical cap; the cap covers a pole when undefined
+        cos_lat = math.cos(math.radians(lat))
+        if min_lat <= -90.0 or max_lat >= 90.0 or math.sin(angular) >= cos_lat:
+            boxes = [(-180.0, 180.0)]
+        else:
+            delta_lon = math.degrees(math.asin(math.sin(angular) / cos_lat))
+            min_lon, max_lon = lon - delta_lon, lon + delta_lon
+            boxes = [(max(min_lon, -180.0), min(max_lon, 180.0))]
+            if min_lon < -180.0:
+                boxes.append((min_lon + 360.0, 180.0))
+            if max_lon > 180.0:
+                boxes.append((-180.0, max_lon - 360.0))
+
+        candidates = []
+        for box_min_lon, box_max_lon in boxes:
+            candidates.extend(self._candidates(min_lat, box_min_lon, max_lat, box_max_lon))
+
+        if np is not None and len(candidates) >= VECTORIZE_MIN_CANDIDATES:
+            positions = np.array(candidates, dtype=np.intp)
+            distances = calculate_distances(lat, lon, self._lat_array[positions], self._lon_array[positions])
+            within = distances <= radius
+            found = list(zip(positions[within].tolist(), distances[within].tolist()))
+        else:
+            lats, lons = self.lats, self.lons
+            found = []
+            for i in candidates:
+                distance = calculate_distance(lat, lon, lats[i], lons[i])
+                if distance <= radius:
+                    found.append((i, distance))
+        found.sort(key=lambda item: item[1])
+        return found
@@ -0,0 +1,131 @@
+import sqlite3
+from array import array
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, List, Sequence
+
+from utils.feed_cache import feed_cache
+from utils.spatial_index import StopGridIndex
+from utils.timetable_snapshot import CATALOGUE_ARRAYS, CATALOGUE_STRINGS, TimetableSnapshot, get_snapshot
+
+
+class StopCatalogue:
+    """Immutable, column-oriented copy of the stops table.
+
+    Stops are stored as parallel sequences indexed by stop position: ids and
+    names as tuples, coordinates as read-only float arrays. A grid index over
+    the coordinates is built together with the catalogue, so one instance can be
+    shared by every request and thread in the process.
+    """
+
+    def __init__(
+        self,
+        stop_ids: Sequence[Any],
+        stop_names: Sequence[str],
+        stop_lats: Sequence[float],
+        stop_lons: Sequence[float]
+    ):
+        """Build a catalogue from parallel stop columns.
+
+        Args:
+            stop_ids: Stop identifiers
+            stop_names: Stop names
+            stop_lats: Stop latitudes
+            stop_lons: Stop longitudes
+        """
+        if not len(stop_ids) == len(stop_names) == len(stop_lats) == len(stop_lons):
+            raise ValueError("Stop columns must have the same length")
+        self.stop_ids = tuple(stop_ids)
+        self.stop_names = tuple(stop_names)
+        self.stop_lats = memoryview(array('d', map(float, stop_lats))).toreadonly()
+        self.stop_lons = memoryview(array('d', map(float, stop_lons))).toreadonly()
+        self.positions = MappingProxyType({stop_id: i for i, stop_id in enumerate(self.stop_ids)})
+        self.grid = StopGridIndex(self.stop_lats, self.stop_lons)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: TimetableSnapshot) -> 'StopCatalogue':
+        """Open the catalogue stored in a timetable snapshot without copying its columns."""
+        catalogue = cls.__new__(cls)
+        for name in CATALOGUE_ARRAYS:
+            setattr(catalogue, name, snapshot.array(name))
+        for name in CATALOGUE_STRINGS:
+            setattr(catalogue, name, snapshot.strings(name))
+        catalogue.positions = MappingProxyType({stop_id: i for i, stop_id in enumerate(catalogue.stop_ids)})
+        catalogue.grid = StopGridIndex(catalogue.stop_lats, catalogue.stop_lons)
+        return catalogue
+
+    def __len__(self) -> int:
+        return len(self.stop_ids)
+
+    def stop(self, position: int) -> Dict[str, Any]:
+        """Return the stop at a position as a dictionary shaped like a stops row."""
+        return {
+            'stop_id': self.stop_ids[position],
+            'stop_name': self.stop_names[position],
+            'stop_lat': self.stop_lats[position],
+            'stop_lon': self.stop_lons[position]
+        }
+
+    def find_nearby(self, lat: float, lon: float, radius: float) -> List[Dict[str, Any]]:
+        """Find stops within a given radius from a point.
+
+        Args:
+            lat: Latitude of the point
+            lon: Longitude of the point
+            radius: Search radius in meters
+
+        Returns:
+            List of stops within radius, closest first, each with added 'distance' key
+        """
+        nearby = []
+        for position, distance in self.grid.query_radius(lat, lon, radius):
+            stop = self.stop(position)
+            stop['distance'] = distance
+            nearby.append(stop)
+        return nearby
+
+
+def load_stop_catalogue(db_connection: sqlite3.Connection) -> StopCatalogue:
+    """Read the stops table into a new catalogue.
+
+    Args:
+        db_connection: SQLite database connection
+
+    Returns:
+        Catalogue of all stops in table order
+    """
+    cursor = db_connection.execute("SELECT stop_id, stop_name, stop_lat, stop_lon FROM stops ORDER BY rowid")
+    rows = cursor.fetchall()
+    return StopCatalogue(
+        [row[0] for row in rows],
+        [row[1] for row in rows],
+        [row[2] for row in rows],
+        [row[3] for row in rows]
+    )
+
+
+def _load_from_file(db_path: str) -> StopCatalogue:
+    snapshot = get_snapshot(db_path)
+    if snapshot is not None:
+        return StopCatalogue.from_snapshot(snapshot)
+    conn = sqlite3.connect(Path(db_path).as_uri() + '?mode=ro', uri=True)
+    try:
+        return load_stop_catalogue(conn)
+    finally:
+        conn.close()
+
+
+def get_stop_catalogue(db_path: str) -> StopCatalogue:
+    """Return the process-wide stop catalogue for a database file.
+
+    The catalogue is loaded on first use and reloaded when the file's
+    modification time or size changes. It is read from the database's
+    timetable snapshot when the importer wrote one.
+
+    Args:
+        db_path: Path to the SQLite database file
+
+    Returns:
+        Shared catalogue for the current version of the database
+    """
+    return feed_cache.get(db_path, 'stops', _load_from_file)
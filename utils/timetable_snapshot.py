@@ -0,0 +1,206 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from utils.feed_cache import feed_cache
+from utils.service_calendar import ServiceCalendar
+
+SNAPSHOT_SUFFIX = '.snapshot'  # wroclaw_transport.v<stamp>.db.snapshot sits next to its database version
+MAGIC = b'GTFSSNAP'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sII')  # Magic, format version, length of the JSON table of contents
+ALIGNMENT = 8
+
+# Fixed-width columns of a DepartureIndex and its StopCatalogue, by attribute name
+INDEX_ARRAYS = (
+    'stop_starts', 'stop_ends', 'departure_times', 'arrival_times', 'trips',
+    'trip_services', 'trip_bearings', 'trip_first_stops', 'trip_last_stops'
+)
+INDEX_STRINGS = ('trip_ids', 'route_ids', 'trip_headsigns')
+CATALOGUE_ARRAYS = ('stop_lats', 'stop_lons')
+CATALOGUE_STRINGS = ('stop_ids', 'stop_names')
+
+
+def snapshot_path(db_path: str) -> str:
+    """Return the path of the timetable snapshot belonging to a database file."""
+    return db_path + SNAPSHOT_SUFFIX
+
+
+class StringTable(Sequence):
+    """Read-only sequence of strings stored back to back in a buffer.
+
+    Values are decoded on access, so opening a table costs nothing however
+    many strings it holds. None is stored as a flag next to the offsets.
+    """
+
+    def __init__(self, offsets: memoryview, nulls: memoryview, data: memoryview):
+        self._offsets = offsets
+        self._nulls = nulls
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._nulls)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('string table index out of range')
+        if self._nulls[i]:
+            return None
+        return str(self._data[self._offsets[i]:self._offsets[i + 1]], 'utf-8')
+
+
+class TimetableSnapshot:
+    """Timetable columns read zero-copy from a memory-mapped snapshot file.
+
+    The file holds a small JSON table of contents followed by fixed-width
+    arrays and string tables. Arrays are returned as read-only memoryviews
+    over the mapping, so opening a snapshot reads no timetable data at all
+    and every process mapping the same file shares its pages through the OS
+    page cache.
+    """
+
+    def __init__(self, path: str):
+        """Map a snapshot file.
+
+        Args:
+            path: Path to the snapshot file
+
+        Raises:
+            ValueError: If the file is not a snapshot of this format version
+        """
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        if len(self._buffer) < HEADER.size:
+            raise ValueError(f"{path} is not a timetable snapshot")
+        magic, version, toc_size = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} timetable snapshot")
+        toc = json.loads(str(self._buffer[HEADER.size:HEADER.size + toc_size], 'utf-8'))
+        self._sections: Dict[str, List[Any]] = toc['sections']
+        self._calendar: Dict[str, Any] = toc['calendar']
+
+    def array(self, name: str) -> memoryview:
+        """Return a fixed-width column as a read-only typed memoryview."""
+        offset, length, typecode = self._sections[name]
+        return self._buffer[offset:offset + length].cast(typecode)
+
+    def strings(self, name: str) -> StringTable:
+        """Return a string column."""
+        return StringTable(
+            self.array(f'{name}.offsets'),
+            self.array(f'{name}.nulls'),
+            self.array(f'{name}.data')
+        )
+
+    def service_calendar(self) -> ServiceCalendar:
+        """Return the stored service calendar."""
+        return ServiceCalendar.from_masks(
+            self._calendar['service_ids'],
+            {date.fromisoformat(day): int(mask, 16) for day, mask in self._calendar['masks'].items()}
+        )
+
+
+def _string_sections(values: Sequence[Optional[str]]) -> Tuple[array, array, bytes]:
+    offsets, nulls, data = array('q', [0]), array('B'), bytearray()
+    for value in values:
+        if value is not None:
+            if not isinstance(value, str):
+                raise TypeError(f"Snapshot string columns hold str or None, got {type(value).__name__}")
+            data += value.encode('utf-8')
+        nulls.append(value is None)
+        offsets.append(len(data))
+    return offsets, nulls, bytes(data)
+
+
+def write_snapshot(path: str, index) -> None:
+    """Write a departure index, with its stop catalogue and calendar, to a snapshot file.
+
+    The file is written next to its final name and moved into place, so a
+    reader never maps a partial snapshot.
+
+    Args:
+        path: Snapshot file to create, e.g. from snapshot_path
+        index: DepartureIndex to store
+    """
+    sections: List[Tuple[str, str, bytes]] = []
+    for source, arrays, strings in (
+        (index.catalogue, CATALOGUE_ARRAYS, CATALOGUE_STRINGS),
+        (index, INDEX_ARRAYS, INDEX_STRINGS)
+    ):
+        for name in arrays:
+            column = getattr(source, name)
+            sections.append((name, column.format, column.tobytes()))
+        for name in strings:
+            offsets, nulls, data = _string_sections(getattr(source, name))
+            sections.append((f'{name}.offsets', 'q', offsets.tobytes()))
+            sections.append((f'{name}.nulls', 'B', nulls.tobytes()))
+            sections.append((f'{name}.data', 'B', data))
+
+    calendar = index.calendar
+    toc = {
+        'sections': {},
+        'calendar': {
+            'service_ids': list(calendar.service_ids),
+            'masks': {day.isoformat(): format(mask, 'x') for day, mask in calendar.daily_masks().items()}
+        }
+    }
+    # Section offsets depend on the size of the table of contents that lists them; repeat until stable
+    while True:
+        toc_bytes = json.dumps(toc, separators=(',', ':')).encode('utf-8')
+        offset = HEADER.size + len(toc_bytes)
+        layout = {}
+        for name, typecode, data in sections:
+            offset += -offset % ALIGNMENT
+            layout[name] = [offset, len(data), typecode]
+            offset += len(data)
+        if layout == toc['sections']:
+            break
+        toc['sections'] = layout
+    toc_bytes = json.dumps(toc, separators=(',', ':')).encode('utf-8')
+
+    temp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(toc_bytes)))
+            f.write(toc_bytes)
+            for name, _, data in sections:
+                f.write(b'\0' * (toc['sections'][name][0] - f.tell()))
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+def _open_if_present(db_path: str) -> Optional[TimetableSnapshot]:
+    try:
+        return TimetableSnapshot(snapshot_path(db_path))
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        # Written by another format version; the database itself is still good
+        return None
+
+
+def get_snapshot(db_path: str) -> Optional[TimetableSnapshot]:
+    """Return the process-wide mapping of a database file's timetable snapshot.
+
+    Args:
+        db_path: Path to the SQLite database file
+
+    Returns:
+        Snapshot, or None if the importer wrote none for this database
+    """
+    return feed_cache.get(db_path, 'snapshot', _open_if_present)